@@ -0,0 +1,136 @@
+"""Admission control under a burst: N sessions start a turn at once against fake providers with limited capacity.
+
+The fakes return 429 once more calls are in flight than NOVAFLOW_FAKE_CAPACITY allows. The app runs
+twice: with admission control effectively off (unbounded limits, no retries) and with per-provider
+limits matched to that capacity. Reports completed, failed and degraded turns, latency, shed calls,
+retries and the 429s the providers returned:
+
+    python benchmarks/admission_burst.py --sessions 40 --capacity 6
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from typing import Any, Dict, List
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import TurnResult, free_port, percentile, session, start_app, wait_ready
+from benchmarks.stt_load import load_frames
+
+PROVIDERS = ("gemini", "murf", "stt", "search")
+
+
+def capacities(capacity: int) -> Dict[str, int]:
+    # STT sessions are cheap on the provider side; search is the scarcest
+    return {"gemini": capacity, "murf": capacity, "stt": capacity * 2, "search": max(1, capacity // 2)}
+
+
+def config_env(name: str, capacity: int) -> Dict[str, str]:
+    caps = capacities(capacity)
+    env = {"NOVAFLOW_FAKE_CAPACITY": ",".join(f"{p}={c}" for p, c in caps.items())}
+    if name == "unlimited":
+        env["NOVAFLOW_PROVIDER_RETRIES"] = "0"
+        env["NOVAFLOW_HTTP_RETRIES"] = "0"
+        for provider in PROVIDERS:
+            env[f"NOVAFLOW_LIMITS_{provider.upper()}"] = "concurrency=100000,rate=0,queue=100000,degrade=0,budget=0"
+    else:
+        for provider in PROVIDERS:
+            env[f"NOVAFLOW_LIMITS_{provider.upper()}"] = f"concurrency={caps[provider]}"
+    return env
+
+
+async def server_stats(base: str) -> Dict[str, Any]:
+    async with aiohttp.ClientSession() as http:
+        async with http.get(f"http://{base}/admission_stats") as response:
+            admission = await response.json()
+        async with http.get(f"http://{base}/metrics") as response:
+            metrics = await response.text()
+    retries = rejected = 0.0
+    for line in metrics.splitlines():
+        if line.startswith("novaflow_provider_retries_total{"):
+            retries += float(line.split()[-1])
+        elif line.startswith("novaflow_fake_providers_") and line.split()[0].endswith("_rejected"):
+            rejected += float(line.split()[-1])
+    return {"admission": admission, "retries": retries, "rejected": rejected}
+
+
+async def burst(name: str, args) -> Dict[str, Any]:
+    port = free_port()
+    base = f"127.0.0.1:{port}"
+    recordings = load_frames() if "audio" in args.mix else []
+    with tempfile.TemporaryDirectory() as workdir:
+        server = start_app(workdir, port, args, config_env(name, args.capacity))
+        try:
+            await wait_ready(base)
+            results: List[TurnResult] = []
+            started = time.perf_counter()
+            await asyncio.gather(*(session(base, i, args, recordings, results) for i in range(args.sessions)))
+            elapsed = time.perf_counter() - started
+            stats = await server_stats(base)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    ok = [r.latency for r in results if r.latency is not None and not r.error]
+    return {
+        "name": name,
+        "turns": len(results),
+        "ok": len(ok),
+        "errors": sum(bool(r.error) for r in results),
+        "degraded": sum(bool(r.notices) for r in results),
+        "p50": percentile(ok, 50),
+        "p95": percentile(ok, 95),
+        "elapsed": elapsed,
+        "shed": sum(limiter["shed"] for limiter in stats["admission"].values()),
+        "max_waiting": {p: limiter["max_wait_ms"] for p, limiter in stats["admission"].items()},
+        "retries": stats["retries"],
+        "rejected": stats["rejected"],
+        "sample_errors": sorted({r.error for r in results if r.error})[:3],
+    }
+
+
+def ms(value) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+async def run(args) -> int:
+    failures: List[str] = []
+    print(f"{args.sessions} sessions x {args.turns} turns at once, mix {','.join(args.mix)}, "
+          f"provider capacity {capacities(args.capacity)}")
+    print(f"{'config':<12}{'turns':>7}{'ok':>6}{'errors':>8}{'degraded':>10}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'shed':>6}{'retries':>9}{'429s':>6}{'wall s':>8}")
+    for name in ("unlimited", "admission"):
+        r = await burst(name, args)
+        print(f"{r['name']:<12}{r['turns']:>7}{r['ok']:>6}{r['errors']:>8}{r['degraded']:>10}{ms(r['p50']):>9}"
+              f"{ms(r['p95']):>9}{r['shed']:>6}{r['retries']:>9.0f}{r['rejected']:>6.0f}{r['elapsed']:>8.1f}")
+        for error in r["sample_errors"]:
+            print(f"    error: {error}")
+        if name == "admission":
+            waits = ", ".join(f"{p} {w:.0f} ms" for p, w in r["max_waiting"].items())
+            print(f"    longest queue wait: {waits}")
+            # With admission control every turn is answered, degraded at worst, and no provider sees a 429
+            expected = args.sessions * args.turns
+            if r["turns"] != expected or r["ok"] != expected:
+                failures.append(f"admission: {r['ok']}/{expected} turns answered ({r['errors']} errors)")
+            if r["rejected"]:
+                failures.append(f"admission: providers rejected {r['rejected']:.0f} calls with 429")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=1, help="turns per session")
+    parser.add_argument("--capacity", type=int, default=6, help="concurrent Gemini/Murf calls the fakes accept")
+    parser.add_argument("--mix", type=lambda s: s.split(","), default=["audio", "speak", "search", "text"])
+    args = parser.parse_args()
+    # Settings session() and start_app() expect from the load test's CLI
+    args.speedup, args.audio_seconds, args.binary, args.timeout = 4.0, 3.0, False, 60.0
+    args.providers, args.cache, args.verbose = "all", False, False
+    sys.exit(asyncio.run(run(args)))
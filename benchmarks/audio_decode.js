@@ -0,0 +1,87 @@
+// Client-side TTS audio decode time: base64-in-JSON (atob + copy) vs binary PCM frames.
+//
+//     node benchmarks/audio_decode.js [chunk-ms ...]
+//
+// Mirrors queueAudio / queueAudioFrame in static/index.js up to the AudioBuffer, which node does
+// not have; a Float32Array of the same length stands in for getChannelData(0).
+
+const MURF_RATE = 44100;
+const FRAME_HEADER_BYTES = 8;
+const ITERATIONS = 20;
+
+function speechLikePcm(samples) {
+  const pcm = new Int16Array(samples);
+  for (let i = 0; i < samples; i++) {
+    pcm[i] = Math.round(8000 * Math.sin(i / 7) * Math.sin(i / 3000) + (Math.random() - 0.5) * 800);
+  }
+  return pcm;
+}
+
+function jsonMessage(pcm) {
+  const data = Buffer.from(pcm.buffer, pcm.byteOffset, pcm.byteLength).toString("base64");
+  return JSON.stringify({ type: "audio", data, is_final: false });
+}
+
+function binaryFrame(pcm) {
+  const frame = new ArrayBuffer(FRAME_HEADER_BYTES + pcm.byteLength);
+  const view = new DataView(frame);
+  view.setUint8(0, 1);
+  view.setUint8(1, 1);
+  view.setUint32(4, MURF_RATE, true);
+  new Int16Array(frame, FRAME_HEADER_BYTES).set(pcm);
+  return frame;
+}
+
+function decodeJson(text) {
+  const jsonData = JSON.parse(text);
+  const binaryString = atob(jsonData.data);
+  const bytes = new Uint8Array(binaryString.length);
+  for (let i = 0; i < binaryString.length; i++) {
+    bytes[i] = binaryString.charCodeAt(i);
+  }
+  const int16 = new Int16Array(bytes.buffer);
+  const float32 = new Float32Array(int16.length);
+  for (let i = 0; i < int16.length; i++) {
+    float32[i] = int16[i] / 32768;
+  }
+  const channel = new Float32Array(float32.length);
+  channel.set(float32);
+  return channel;
+}
+
+function decodeBinary(frame) {
+  const view = new DataView(frame);
+  view.getUint8(2);
+  view.getUint32(4, true);
+  const int16 = new Int16Array(frame, FRAME_HEADER_BYTES, (frame.byteLength - FRAME_HEADER_BYTES) >> 1);
+  const channel = new Float32Array(int16.length);
+  for (let i = 0; i < int16.length; i++) {
+    channel[i] = int16[i] / 32768;
+  }
+  return channel;
+}
+
+function timePerChunk(decode, messages) {
+  let best = Infinity;
+  for (let run = 0; run < ITERATIONS; run++) {
+    const started = process.hrtime.bigint();
+    for (const message of messages) decode(message);
+    best = Math.min(best, Number(process.hrtime.bigint() - started) / 1e3 / messages.length);
+  }
+  return best;
+}
+
+const chunkSizes = process.argv.slice(2).map(Number);
+console.log("chunk".padStart(6) + "json (us)".padStart(12) + "binary (us)".padStart(14) + "speedup".padStart(10));
+for (const chunkMs of chunkSizes.length ? chunkSizes : [100, 250, 500]) {
+  const samples = (MURF_RATE * chunkMs) / 1000;
+  const chunks = Array.from({ length: 20 }, () => speechLikePcm(samples));
+  const json = timePerChunk(decodeJson, chunks.map(jsonMessage));
+  const binary = timePerChunk(decodeBinary, chunks.map(binaryFrame));
+  console.log(
+    `${chunkMs}ms`.padStart(6) +
+      json.toFixed(0).padStart(12) +
+      binary.toFixed(0).padStart(14) +
+      `${(json / binary).toFixed(1)}x`.padStart(10)
+  );
+}
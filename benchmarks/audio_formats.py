@@ -0,0 +1,118 @@
+"""TTS audio formats: bytes on the wire, time to first audio and resampling cost per audioQuality tier and codec.
+
+Each negotiated format (services/audio_format.py) speaks the same reply through MurfPool against the
+in-process fake Murf, which honours the requested sample rate and format, and is relayed both as
+base64 JSON and as binary frames. The fake's MP3 is sized at NOVAFLOW_FAKE_TTS_MP3_KBPS rather than
+encoded, so MP3 rows show transport cost at a typical Murf bitrate, not codec quality. Time to first
+audio is measured in-process and modeled on a slow link (first message's bytes at --link-kbps);
+"realtime" is the link share the stream needs to keep up with playback:
+
+    python benchmarks/audio_formats.py --link-kbps 1000 256
+"""
+import os
+import sys
+import glob
+import json
+import time
+import wave
+import asyncio
+import argparse
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Murf-sized chunks (about a third of a second) rather than the fake's default, so the first one is representative
+os.environ.setdefault("NOVAFLOW_FAKE_TTS_CHARS_PER_CHUNK", "5")
+
+from services.audio_format import LEGACY_FORMAT, AudioFormat, PcmResampler, negotiate
+from services.murf import MurfPool
+from services.providers import SPOKEN_CHARS_PER_SECOND, fake_murf_connect
+from services.timing import TurnTimer
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+TEXT = "Here is a spoken reply long enough to span several Murf audio chunks for every format. " * 3
+VOICE = ("fake-key", "en-IN-alia", 1.0)
+# "high" never negotiates MP3, so it has one row
+FORMATS = [("legacy", LEGACY_FORMAT)] + list({
+    (f.tier, f.codec): (f"{f.tier}/{f.codec}", f)
+    for f in (negotiate(tier, [codec]) for tier in ("high", "medium", "low") for codec in ("pcm", "mp3"))
+}.values())
+
+
+class Wire:
+    # Counts what one client would receive: JSON text or binary frames, first message timed
+    def __init__(self):
+        self.bytes = 0
+        self.messages = 0
+        self.first_bytes: Optional[int] = None
+
+    async def send_json(self, message: Dict[str, Any]) -> None:
+        self._count(len(json.dumps(message).encode()))
+
+    async def send_bytes(self, frame: bytes) -> None:
+        self._count(len(frame))
+
+    def _count(self, size: int) -> None:
+        self.bytes += size
+        self.messages += 1
+        if self.first_bytes is None:
+            self.first_bytes = size
+
+
+async def speak(pool: MurfPool, audio_format: AudioFormat, binary: bool) -> Dict[str, Any]:
+    wire = Wire()
+    timer = TurnTimer("tts")
+    async with pool.connection(*VOICE, audio_format=audio_format) as murf:
+        await murf.speak(TEXT, wire.send_json, timer=timer, send_bytes=wire.send_bytes if binary else None)
+    return {"bytes": wire.bytes, "messages": wire.messages, "first_bytes": wire.first_bytes or 0,
+            "ttfa": timer.get("first_audio") or float("nan")}
+
+
+def speech_pcm() -> bytes:
+    # Recorded speech from uploads/; resampling cost does not depend on the rate it was recorded at
+    pcm = b""
+    for path in sorted(glob.glob(os.path.join(UPLOADS, "*.wav"))):
+        with wave.open(path, "rb") as wf:
+            pcm += wf.readframes(wf.getnframes())
+    return pcm or b"\x00\x01" * 1000
+
+
+def resample_cost(audio_format: AudioFormat, speech: bytes, seconds: float, chunk_bytes: int) -> float:
+    # CPU seconds per second of audio, fed in Murf-sized chunks at Murf's rate
+    size = int(seconds * audio_format.provider_rate) * 2
+    source = (speech * (size // len(speech) + 1))[:size]
+    resampler = PcmResampler(audio_format.provider_rate, audio_format.sample_rate)
+    started = time.process_time()
+    for i in range(0, len(source), chunk_bytes):
+        resampler.process(source[i:i + chunk_bytes])
+    return (time.process_time() - started) / seconds
+
+
+async def run(args) -> None:
+    pool = MurfPool(connect=fake_murf_connect)
+    seconds = len(TEXT) / SPOKEN_CHARS_PER_SECOND
+    speech = speech_pcm()
+    links = "".join(f"{f'ttfa@{kbps}k ms':>15}{f'rt@{kbps}k':>10}" for kbps in args.link_kbps)
+    print(f"{seconds:.1f} s of speech per reply; resampling timed over {args.resample_seconds:.0f} s")
+    print(f"{'format':<12}{'rate':>7}{'transport':>11}{'msgs':>6}{'wire KB':>9}{'KB/s audio':>12}"
+          f"{'ttfa ms':>9}{links}{'resample cpu %':>16}")
+    for name, audio_format in FORMATS:
+        # Warm the pooled connection for this format so rows compare synthesis and transport, not the handshake
+        await speak(pool, audio_format, False)
+        cost = resample_cost(audio_format, speech, args.resample_seconds, args.chunk_bytes) if audio_format.resample else 0.0
+        for transport in ("json", "binary"):
+            r = await speak(pool, audio_format, transport == "binary")
+            row = (f"{name:<12}{audio_format.sample_rate:>7}{transport:>11}{r['messages']:>6}{r['bytes'] / 1024:>9.0f}"
+                   f"{r['bytes'] / 1024 / seconds:>12.1f}{r['ttfa'] * 1000:>9.0f}")
+            for kbps in args.link_kbps:
+                link = kbps * 1000 / 8
+                row += f"{(r['ttfa'] + r['first_bytes'] / link) * 1000:>15.0f}{r['bytes'] / seconds / link:>10.2f}"
+            print(row + f"{cost * 100:>16.2f}")
+    await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--link-kbps", type=int, nargs="+", default=[1000, 256], help="modeled downlink speeds")
+    parser.add_argument("--resample-seconds", type=float, default=30.0)
+    parser.add_argument("--chunk-bytes", type=int, default=9600, help="PCM bytes per Murf chunk when timing the resampler")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,134 @@
+"""TTS audio transport: base64-in-JSON vs binary PCM frames, bytes on the wire and server encode time.
+
+Speech PCM from the WAVs in uploads/ is cut into Murf-sized chunks and relayed both ways through a
+byte-counting TCP proxy, with and without permessage-deflate:
+
+    python benchmarks/audio_frames.py --chunk-ms 100 250 500
+
+Client-side decode time is measured separately with node (see benchmarks/audio_decode.js).
+"""
+import os
+import sys
+import io
+import glob
+import json
+import time
+import wave
+import base64
+import asyncio
+import argparse
+from typing import List
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.audio_frames import AudioFrameEncoder
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+MURF_RATE = 44100
+
+
+def murf_messages(chunk_ms: int) -> List[str]:
+    # Murf messages as they arrive from the TTS socket: JSON with base64 audio, WAV header first
+    pcm = b""
+    for path in sorted(glob.glob(os.path.join(UPLOADS, "*.wav"))):
+        with wave.open(path, "rb") as wf:
+            pcm += wf.readframes(wf.getnframes())
+    chunk_bytes = MURF_RATE * 2 * chunk_ms // 1000
+    header = wave_header(len(pcm))
+    chunks = [header + pcm[:chunk_bytes]] + [pcm[i:i + chunk_bytes] for i in range(chunk_bytes, len(pcm), chunk_bytes)]
+    return [json.dumps({"audio": base64.b64encode(c).decode(), "context_id": "ctx", "is_final": i == len(chunks) - 1})
+            for i, c in enumerate(chunks)]
+
+
+def wave_header(data_bytes: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(MURF_RATE)
+        wf.writeframes(b"")
+    header = bytearray(buffer.getvalue())
+    header[40:44] = data_bytes.to_bytes(4, "little")
+    return bytes(header)
+
+
+def encode_json(messages: List[str]) -> List[str]:
+    out = []
+    for raw in messages:
+        data = json.loads(raw)
+        out.append(json.dumps({"type": "audio", "data": data["audio"], "is_final": data["is_final"]}))
+    return out
+
+
+def encode_binary(messages: List[str]) -> List[bytes]:
+    encoder = AudioFrameEncoder("audio")
+    return [encoder.encode(data["audio"], data["is_final"]) for data in map(json.loads, messages)]
+
+
+def best_of(func, messages, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(messages)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+async def wire_bytes(frames, compression) -> int:
+    # Sends the frames server -> client through a TCP proxy that counts downstream bytes
+    counted = 0
+
+    async def handler(ws):
+        for frame in frames:
+            await ws.send(frame)
+        await ws.close()
+
+    async def pipe(reader, writer, count: bool):
+        nonlocal counted
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                if count:
+                    counted += len(data)
+                writer.write(data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def proxy(client_reader, client_writer):
+        upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", server_port)
+        await asyncio.gather(pipe(client_reader, upstream_writer, False), pipe(upstream_reader, client_writer, True))
+
+    server = await websockets.serve(handler, "127.0.0.1", 0, compression=compression, max_size=None)
+    server_port = server.sockets[0].getsockname()[1]
+    relay = await asyncio.start_server(proxy, "127.0.0.1", 0)
+    relay_port = relay.sockets[0].getsockname()[1]
+    async with websockets.connect(f"ws://127.0.0.1:{relay_port}", compression=compression, max_size=None) as ws:
+        async for _ in ws:
+            pass
+    server.close()
+    relay.close()
+    await server.wait_closed()
+    return counted
+
+
+def run(args) -> None:
+    print(f"{'chunk':>6}{'chunks':>8}{'format':>8}{'wire (KB)':>11}{'deflate (KB)':>14}{'encode (us/chunk)':>19}")
+    for chunk_ms in args.chunk_ms:
+        messages = murf_messages(chunk_ms)
+        for name, encode in (("json", encode_json), ("binary", encode_binary)):
+            frames = encode(messages)
+            plain = asyncio.run(wire_bytes(frames, None))
+            deflated = asyncio.run(wire_bytes(frames, "deflate"))
+            per_chunk = best_of(encode, messages) / len(messages) * 1e6
+            print(f"{f'{chunk_ms}ms':>6}{len(messages):>8}{name:>8}{plain / 1024:>11.0f}{deflated / 1024:>14.0f}{per_chunk:>19.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-ms", type=int, nargs="+", default=[100, 250, 500])
+    run(parser.parse_args())
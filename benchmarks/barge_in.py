@@ -0,0 +1,196 @@
+"""Barge-in benchmark: interruption-to-silence time and provider work saved when a spoken reply is cut off.
+
+Runs the app in-process against a fake AssemblyAI server, a fake Murf server and a fake streaming
+Gemini model. Each voice turn is interrupted shortly after its audio starts, with "cancel", a new
+utterance ("start_stream") or a typed message ("text:"), and compared with letting the reply finish:
+
+    python benchmarks/barge_in.py --turns 5 --interrupt-after 0.3
+"""
+import os
+import sys
+import time
+import json
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import aiohttp
+import uvicorn
+import websockets
+
+from benchmarks.fake_assemblyai import FakeAssemblyAIServer
+from benchmarks.fake_murf import FakeMurfServer
+from benchmarks.turn_latency import REPLY, FakeStreamingModel
+
+MURF_BYTES_PER_SECOND = 44100 * 2
+FRAME = b"\x10\x00\xf0\xff" * 160  # 20 ms of 16 kHz audio; VAD is off so every frame reaches STT
+
+
+class CountingModel(FakeStreamingModel):
+    # Counts the chunks the fake Gemini actually produced, i.e. the generation work paid for
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.generated = 0
+
+    def generate_content(self, contents, stream=False):
+        chunks = super().generate_content(contents, stream)
+        if not stream:
+            return chunks
+
+        def counted():
+            for chunk in chunks:
+                self.generated += 1
+                yield chunk
+        return counted()
+
+
+class TurnResult:
+    def __init__(self):
+        self.silence: Optional[float] = None
+        self.stale_audio = 0
+        self.audio_chunks = 0
+        self.audio_seconds = 0.0
+        self.gemini_chunks = 0
+        self.murf_clears = 0
+
+
+async def next_message(ws, timeout: float = 15.0):
+    raw = await asyncio.wait_for(ws.recv(), timeout=timeout)
+    if isinstance(raw, bytes):
+        return {"type": "binary"}
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return {"type": "text", "data": raw}
+
+
+async def voice_turn(base: str, interrupt: Optional[str], args, model: CountingModel, murf: FakeMurfServer) -> TurnResult:
+    result = TurnResult()
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"http://{base}/new_chat") as response:
+            chat_id = (await response.json())["chat_id"]
+    generated, cleared = model.generated, murf.cleared
+    async with websockets.connect(f"ws://{base}/ws?chat_id={chat_id}", max_size=None) as ws:
+        await ws.send("start_stream")
+        while (await next_message(ws)).get("data") != "Started transcription":
+            pass
+        for _ in range(int(args.speech / 0.02)):
+            await ws.send(FRAME)
+        await ws.send("stop")
+
+        first_audio: Optional[float] = None
+        interrupted_at: Optional[float] = None
+        while True:
+            message = await next_message(ws)
+            now = time.perf_counter()
+            if message["type"] == "audio":
+                result.audio_chunks += 1
+                result.audio_seconds += len(message["data"]) * 3 / 4 / MURF_BYTES_PER_SECOND
+                first_audio = first_audio or now
+                if interrupt and interrupted_at is None and now - first_audio >= args.interrupt_after:
+                    interrupted_at = time.perf_counter()
+                    await ws.send("start_stream" if interrupt == "start" else "text:Actually, never mind." if interrupt == "text" else "cancel")
+            elif message["type"] == "flush_audio" and interrupted_at is not None:
+                # The browser stops its audio sources on this message
+                result.silence = now - interrupted_at
+                # A "text:" interruption starts a new reply; count only what the cancelled one generated
+                result.gemini_chunks = model.generated - generated
+                # Anything from the cancelled reply that still arrives would be heard after the flush
+                try:
+                    while True:
+                        message = await next_message(ws, timeout=args.grace)
+                        if message["type"] == "audio":
+                            result.stale_audio += 1
+                except asyncio.TimeoutError:
+                    break
+            elif message.get("data") == "Stopped transcription" and not interrupt:
+                # Without a barge-in the user hears the whole reply from the point they wanted to interrupt
+                played_until = first_audio + result.audio_seconds
+                result.silence = max(now, played_until) - (first_audio + args.interrupt_after)
+                break
+    if not interrupt:
+        result.gemini_chunks = model.generated - generated
+    result.murf_clears = murf.cleared - cleared
+    return result
+
+
+async def run(args) -> int:
+    stt, murf = FakeAssemblyAIServer(partial_every=0.2), FakeMurfServer(handshake_delay=0.05)
+    stt_url, murf_url = await stt.start(), await murf.start()
+    workdir = tempfile.TemporaryDirectory()
+    os.environ.update({
+        "NOVAFLOW_AAI_STREAMING_URL": stt_url, "NOVAFLOW_VAD": "off",
+        "NOVAFLOW_LLM_CACHE_MAX_BYTES": "0", "NOVAFLOW_TTS_CACHE_MAX_BYTES": "0",
+        "gemini_api_key": "bench", "murf_api_key": "bench", "aai_api_key": "bench",
+    })
+    # The app keeps chats and uploads under the working directory; only its static files are shared
+    os.symlink(os.path.join(ROOT, "static"), os.path.join(workdir.name, "static"))
+    os.chdir(workdir.name)
+    import main
+    from services.murf import MurfPool
+    # Disconnecting while a new utterance is being captured logs send-after-close errors; keep the table readable
+    logging.disable(logging.ERROR)
+
+    model = CountingModel(REPLY * 2, args.first_token_delay, args.token_delay)
+    main.gemini_model = lambda api_key, conversation_type, **kwargs: model
+    main.murf_pool = MurfPool(base_url=murf_url)
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=0, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    base = f"127.0.0.1:{port}"
+
+    print(f"{args.turns} voice turns per mode, interrupted {args.interrupt_after * 1000:.0f} ms after the first audio")
+    print(f"{'interrupt':<12}{'silence p50 (ms)':>18}{'max (ms)':>10}{'stale audio':>13}{'gemini chunks':>15}"
+          f"{'audio chunks':>14}{'audio (s)':>11}{'murf clears':>13}")
+    failures: List[str] = []
+    for interrupt in (None, "cancel", "start", "text"):
+        results: List[TurnResult] = []
+        for _ in range(args.turns):
+            results.append(await voice_turn(base, interrupt, args, model, murf))
+            await asyncio.sleep(0.2)
+        silence = [r.silence for r in results if r.silence is not None]
+        if not silence:
+            failures.append(f"{interrupt or 'none'}: no turn finished or was flushed")
+            continue
+        totals: Dict[str, float] = {name: statistics.mean(getattr(r, name) for r in results)
+                                    for name in ("stale_audio", "gemini_chunks", "audio_chunks", "audio_seconds", "murf_clears")}
+        print(f"{interrupt or 'none':<12}{statistics.median(silence) * 1000:>18.0f}{max(silence) * 1000:>10.0f}"
+              f"{totals['stale_audio']:>13.1f}{totals['gemini_chunks']:>15.1f}{totals['audio_chunks']:>14.1f}"
+              f"{totals['audio_seconds']:>11.1f}{totals['murf_clears']:>13.1f}")
+        if interrupt:
+            # Every interruption must flush the client promptly, and nothing from the cancelled reply may follow
+            if len(silence) < len(results):
+                failures.append(f"{interrupt}: {len(results) - len(silence)}/{len(results)} interruptions never flushed audio")
+            if max(silence) > args.max_silence:
+                failures.append(f"{interrupt}: audio kept playing {max(silence) * 1000:.0f} ms after the interruption")
+            stale = sum(r.stale_audio for r in results)
+            if stale:
+                failures.append(f"{interrupt}: {stale} audio chunks from cancelled replies arrived after the flush")
+
+    server.should_exit = True
+    await serving
+    await stt.stop()
+    await murf.stop()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--speech", type=float, default=1.0, help="seconds of audio per utterance")
+    parser.add_argument("--interrupt-after", type=float, default=0.3)
+    parser.add_argument("--grace", type=float, default=0.5, help="seconds to watch for stale audio after the flush")
+    parser.add_argument("--max-silence", type=float, default=0.1, help="longest acceptable time to flush after an interruption")
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.03)
+    sys.exit(asyncio.run(run(parser.parse_args())))
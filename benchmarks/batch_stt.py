@@ -0,0 +1,95 @@
+"""Batch transcription throughput: saved recordings through BatchTranscriber at several pool sizes vs a stub AssemblyAI.
+
+Copies of uploads/*.wav (each made unique so none is skipped by hash) are transcribed against a local
+stub of AssemblyAI's REST API that processes `--capacity` jobs at a time, with transcripts appended
+to a chat and the knowledge base as they finish. A second pass over the same files shows the
+content-hash skip:
+
+    python benchmarks/batch_stt.py --files 40 --concurrency 1 4 8 16
+"""
+import os
+import sys
+import glob
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Short first poll so the stub's sub-second jobs are not dominated by the wait before the first GET
+os.environ.setdefault("NOVAFLOW_BATCH_STT_POLL_INTERVAL", "0.2")
+
+from benchmarks.fake_assemblyai import FakeTranscriptServer
+from services.batch_stt import BatchTranscriber
+from services.executor import executor
+from services.history import create_history_store
+from services.http_client import HttpClient
+from services.knowledge import KnowledgeStore
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+
+
+def make_recordings(directory: str, count: int) -> float:
+    # Returns the total audio seconds; a trailing marker makes every copy hash differently
+    sources = sorted(glob.glob(os.path.join(UPLOADS, "recorded_audio_*.wav")))
+    total = 0
+    for i in range(count):
+        with open(sources[i % len(sources)], "rb") as f:
+            data = f.read()
+        with open(os.path.join(directory, f"recorded_audio_bench_{i:03d}.wav"), "wb") as f:
+            f.write(data + i.to_bytes(4, "little"))
+        total += len(data) - 44
+    return total / 32000
+
+
+async def run_batch(directory: str, server_url: str, concurrency: int):
+    history = create_history_store(os.path.join(directory, "chats"))
+    chat_id = history.create_chat()
+    knowledge = KnowledgeStore(os.path.join(directory, "knowledge_base"))
+    http = HttpClient()
+    transcriber = BatchTranscriber(directory, history, knowledge, http, concurrency=concurrency, base_url=server_url)
+    try:
+        started = time.perf_counter()
+        job = transcriber.submit("bench-key", chat_id=chat_id)
+        await transcriber.wait(job.job_id)
+        elapsed = time.perf_counter() - started
+        return job, elapsed, history.count(chat_id), len(knowledge)
+    finally:
+        await http.close()
+
+
+async def run(args) -> None:
+    print(f"{args.files} recordings, stub processes {args.capacity} at a time at {args.ratio}x audio duration "
+          f"+ {args.base_delay}s")
+    print(f"{'pool':>5}{'wall s':>8}{'files/s':>9}{'audio s/s':>11}{'polls/file':>12}{'done':>6}{'failed':>8}"
+          f"{'history':>9}{'kb docs':>9}")
+    for concurrency in args.concurrency:
+        with tempfile.TemporaryDirectory() as directory:
+            for sub in ("chats", "knowledge_base"):
+                os.makedirs(os.path.join(directory, sub))
+            audio_seconds = make_recordings(directory, args.files)
+            server = FakeTranscriptServer(args.ratio, args.base_delay, args.capacity)
+            url = await server.start()
+            try:
+                job, elapsed, entries, documents = await run_batch(directory, url, concurrency)
+                print(f"{concurrency:>5}{elapsed:>8.2f}{len(job.items) / elapsed:>9.1f}{audio_seconds / elapsed:>11.0f}"
+                      f"{server.stats['polls'] / max(1, server.stats['transcripts']):>12.1f}{job.count('done'):>6}"
+                      f"{job.count('failed'):>8}{entries:>9}{documents:>9}")
+                if concurrency == args.concurrency[-1]:
+                    uploads = server.stats["uploads"]
+                    again, elapsed, _, _ = await run_batch(directory, url, concurrency)
+                    print(f"second pass over the same files: {again.count('skipped')} skipped, "
+                          f"{server.stats['uploads'] - uploads} uploads, {elapsed:.2f}s")
+            finally:
+                await server.stop()
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--capacity", type=int, default=8, help="jobs the stub processes at once")
+    parser.add_argument("--ratio", type=float, default=0.1, help="stub processing seconds per audio second")
+    parser.add_argument("--base-delay", type=float, default=0.3, help="stub per-job overhead in seconds")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,75 @@
+"""Chat history benchmark: legacy whole-file JSON rewrites vs the SQLite and JSONL stores.
+
+    python benchmarks/chat_history.py --turns 10000 --legacy-turns 2000
+
+The legacy path is O(n) per turn, so it is run for fewer turns by default.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.history import create_history_store
+
+QUERY = "What are the main service models of cloud computing?"
+RESPONSE = "The main service models are IaaS, PaaS and SaaS, each abstracting more of the stack. " * 3
+
+
+def legacy_append(path: str) -> None:
+    history = []
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            history = json.load(f)
+    history.append({"timestamp": datetime.now().isoformat(), "user_query": QUERY, "ai_response": RESPONSE})
+    with open(path, "w") as f:
+        json.dump(history, f, indent=2)
+
+
+def time_appends(append, turns: int):
+    started = time.perf_counter()
+    tail_started = started
+    for i in range(turns):
+        if i == turns - 100:
+            tail_started = time.perf_counter()
+        append()
+    finished = time.perf_counter()
+    return finished - started, (finished - tail_started) / min(100, turns)
+
+
+def run(args) -> None:
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.json")
+        total, tail = time_appends(lambda: legacy_append(legacy_path), args.legacy_turns)
+        started = time.perf_counter()
+        with open(legacy_path, "r") as f:
+            json.load(f)[-args.page_size:]
+        rows.append(("legacy json", args.legacy_turns, total, tail, time.perf_counter() - started))
+
+        for backend in ("sqlite", "jsonl"):
+            directory = os.path.join(tmp, backend)
+            os.makedirs(directory)
+            store = create_history_store(directory, backend)
+            chat_id = store.create_chat()
+            total, tail = time_appends(lambda: store.append(chat_id, QUERY, RESPONSE), args.turns)
+            started = time.perf_counter()
+            page = store.page(chat_id, limit=args.page_size)
+            store.page(chat_id, before=page[0]["id"], limit=args.page_size)
+            rows.append((backend, args.turns, total, tail, (time.perf_counter() - started) / 2))
+
+    print(f"{'backend':<12}{'turns':>8}{'total (s)':>12}{'last-100 append (ms)':>24}{'page read (ms)':>18}")
+    for name, turns, total, tail, page in rows:
+        print(f"{name:<12}{turns:>8}{total:>12.2f}{tail * 1000:>24.3f}{page * 1000:>18.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=10000)
+    parser.add_argument("--legacy-turns", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=100)
+    run(parser.parse_args())
@@ -0,0 +1,87 @@
+"""Conversation memory benchmark: prompt tokens per turn for no memory, full-history replay and budgeted memory.
+
+Plays a long chat through a SQLite history store. Each turn carries knowledge base context (and
+every fourth turn search results). Older turns are folded into the rolling summary with the
+extractive summarizer, so no API key is needed:
+
+    python benchmarks/conversation_memory.py --turns 200 --budget 4000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.history import SQLiteHistoryStore
+from services.memory import ContextBudget, ConversationMemory, extractive_summary
+from services.retrieval import estimate_tokens
+from services.state import MemoryStateBackend
+
+SENTENCE = "The assistant explains the trade-offs in plain words and suggests a next step for the user. "
+
+
+def answer(rng: random.Random) -> str:
+    return SENTENCE * rng.randint(2, 6)
+
+
+def run(args) -> None:
+    rng = random.Random(9)
+    knowledge = "\n\nKnowledge Base Content:\n" + "File: handbook.pdf (part 1)\nPolicy text. " * 400
+    search = "\n\nWeb search results follow.\n" + "1. Result: a long snippet about the topic. (Source: https://example.com)\n" * 40
+    checkpoints = [t for t in (1, 10, 50, 100, 200, 500, 1000) if t <= args.turns]
+    rows: Dict[str, Dict[int, int]] = {"current only": {}, "full replay": {}, "budgeted memory": {}}
+    build_times: List[float] = []
+    summaries = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = SQLiteHistoryStore(os.path.join(tmp, "history.sqlite3"))
+        memory = ConversationMemory(history, MemoryStateBackend(), turns=args.memory_turns, batch=args.batch)
+        chat_id = history.create_chat()
+
+        def summarize(previous, turns):
+            nonlocal summaries
+            summaries += 1
+            return extractive_summary(previous, turns)
+
+        for turn in range(1, args.turns + 1):
+            question = f"Question {turn}: how should I handle case {rng.randint(1, 500)} in my project?"
+            search_text = search if turn % 4 == 0 else ""
+            question_tokens = estimate_tokens(question)
+            extra = estimate_tokens(knowledge[:6000]) + (estimate_tokens(search_text) if search_text else 0)
+
+            started = time.perf_counter()
+            chat = memory.load(chat_id)
+            budget = ContextBudget(question, chat, bool(search_text), total=args.budget)
+            prompt = budget.build([{"text": question}], chat, search_text, knowledge[:budget.knowledge * 4])
+            build_times.append(time.perf_counter() - started)
+
+            if turn in checkpoints:
+                replay = sum(estimate_tokens(t["user_query"]) + estimate_tokens(t["ai_response"])
+                             for t in history.page(chat_id, limit=turn))
+                rows["current only"][turn] = question_tokens + extra
+                rows["full replay"][turn] = question_tokens + extra + replay
+                rows["budgeted memory"][turn] = prompt.prompt_tokens
+            history.append(chat_id, question, answer(rng))
+            memory.update_summary(chat_id, summarize)
+
+    print(f"{args.turns}-turn chat, budget {args.budget} tokens, {args.memory_turns} verbatim turns + summary "
+          f"(folded every {args.batch} turns)")
+    print(f"{'prompt tokens at turn':<22}" + "".join(f"{t:>8}" for t in checkpoints))
+    for name, values in rows.items():
+        print(f"{name:<22}" + "".join(f"{values[t]:>8}" for t in checkpoints))
+    print(f"context load + build: p50 {statistics.median(build_times) * 1000:.2f} ms, "
+          f"max {max(build_times) * 1000:.2f} ms; {summaries} summary calls for {args.turns} turns")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=4000)
+    parser.add_argument("--memory-turns", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=4)
+    run(parser.parse_args())
@@ -0,0 +1,67 @@
+"""Event loop stall check: one slow turn vs the other open sessions on the same worker.
+
+Each simulated /ws session pings on a fixed interval and records how late its pings fire.
+One session runs a slow blocking turn (a stand-in for a synchronous Gemini call, PDF parse
+or chat-history rewrite), first inline on the loop and then through the executor layer:
+
+    python benchmarks/event_loop_stalls.py --sessions 20 --slow-turn 1.0
+
+Exits non-zero if the executor path still stalls the other sessions.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.executor import executor
+
+PING_INTERVAL = 0.01
+
+
+def blocking_turn(seconds: float) -> str:
+    time.sleep(seconds)
+    return "done"
+
+
+async def session(stop: asyncio.Event) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        expected = time.perf_counter() + PING_INTERVAL
+        await asyncio.sleep(PING_INTERVAL)
+        worst = max(worst, time.perf_counter() - expected)
+    return worst
+
+
+async def measure(sessions: int, slow_turn: float, offloaded: bool) -> float:
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(session(stop)) for _ in range(sessions)]
+    await asyncio.sleep(0.1)
+    if offloaded:
+        await executor.run_io("slow_turn", blocking_turn, slow_turn)
+    else:
+        blocking_turn(slow_turn)
+    await asyncio.sleep(0.1)
+    stop.set()
+    return max(await asyncio.gather(*tasks))
+
+
+async def run(args) -> int:
+    inline = await measure(args.sessions, args.slow_turn, offloaded=False)
+    offloaded = await measure(args.sessions, args.slow_turn, offloaded=True)
+    print(f"{'mode':<12}{'worst stall of other sessions (ms)':>38}")
+    print(f"{'inline':<12}{inline * 1000:>38.0f}")
+    print(f"{'executor':<12}{offloaded * 1000:>38.0f}")
+    print(f"executor stats: {executor.snapshot()['calls']}")
+    executor.shutdown()
+    return 0 if offloaded < args.max_stall else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--slow-turn", type=float, default=1.0)
+    parser.add_argument("--max-stall", type=float, default=0.1)
+    sys.exit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,143 @@
+import json
+import uuid
+import asyncio
+from typing import Dict, Optional
+
+import websockets
+from aiohttp import web
+
+BYTES_PER_SECOND = 16000 * 2
+
+
+class FakeAssemblyAIServer:
+    # Local stand-in for AssemblyAI's v3 streaming WebSocket: Begin on connect, a partial Turn every
+    # `partial_every` seconds of received audio, and a formatted Turn plus Termination on Terminate.
+    # `frame_delay` simulates a slow upstream so client-side backpressure and drops can be observed.
+    def __init__(self, partial_every: float = 0.5, frame_delay: float = 0.0, finalize_delay: float = 0.05):
+        self.partial_every = partial_every
+        self.frame_delay = frame_delay
+        self.finalize_delay = finalize_delay
+        self.connections = 0
+        self.active = 0
+        self.peak_active = 0
+        self.audio_bytes = 0
+        self._server: Optional[websockets.WebSocketServer] = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._server = await websockets.serve(self._handler, host, port, max_size=None)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"ws://{host}:{port}/v3/ws"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handler(self, ws):
+        self.connections += 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        received = 0
+        next_partial = int(self.partial_every * BYTES_PER_SECOND)
+        words = []
+        try:
+            await ws.send(json.dumps({"type": "Begin", "id": f"session-{self.connections}"}))
+            async for raw in ws:
+                if isinstance(raw, bytes):
+                    if self.frame_delay:
+                        await asyncio.sleep(self.frame_delay)
+                    received += len(raw)
+                    self.audio_bytes += len(raw)
+                    if received >= next_partial:
+                        next_partial += int(self.partial_every * BYTES_PER_SECOND)
+                        words.append(f"word{len(words) + 1}")
+                        await ws.send(json.dumps({
+                            "type": "Turn", "transcript": " ".join(words), "end_of_turn": False,
+                            "turn_is_formatted": False, "audio_ms": received * 1000 // BYTES_PER_SECOND,
+                        }))
+                    continue
+                if json.loads(raw).get("type") == "Terminate":
+                    await asyncio.sleep(self.finalize_delay)
+                    await ws.send(json.dumps({
+                        "type": "Turn", "transcript": " ".join(words).capitalize() + ".", "end_of_turn": True,
+                        "turn_is_formatted": True, "audio_ms": received * 1000 // BYTES_PER_SECOND,
+                    }))
+                    await ws.send(json.dumps({"type": "Termination", "audio_duration_seconds": received / BYTES_PER_SECOND}))
+                    return
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.active -= 1
+
+
+class FakeTranscriptServer:
+    # Local stand-in for AssemblyAI's v2 REST API: /upload stores the body, /transcript queues a job,
+    # and GET /transcript/<id> reports queued/processing/completed. A job takes `base_delay` plus
+    # `processing_ratio` seconds per second of audio, and at most `capacity` jobs process at once
+    # (the rest wait queued), so client-side concurrency past that only adds polls.
+    def __init__(self, processing_ratio: float = 0.1, base_delay: float = 0.3, capacity: int = 8):
+        self.processing_ratio = processing_ratio
+        self.base_delay = base_delay
+        self.capacity = capacity
+        self.uploads: Dict[str, int] = {}
+        self.jobs: Dict[str, Dict] = {}
+        self.stats = {"uploads": 0, "transcripts": 0, "polls": 0, "peak_processing": 0}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._slots = asyncio.Semaphore(self.capacity)
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_post("/v2/upload", self._upload)
+        app.router.add_post("/v2/transcript", self._create)
+        app.router.add_get("/v2/transcript/{id}", self._get)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}/v2"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _upload(self, request):
+        body = await request.read()
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = len(body)
+        self.stats["uploads"] += 1
+        return web.json_response({"upload_url": f"{self.url}/files/{upload_id}"})
+
+    async def _create(self, request):
+        payload = await request.json()
+        size = self.uploads.get(payload["audio_url"].rsplit("/", 1)[-1])
+        if size is None:
+            return web.json_response({"error": "unknown upload"}, status=400)
+        job_id = uuid.uuid4().hex
+        seconds = max(0, size - 44) / BYTES_PER_SECOND
+        self.jobs[job_id] = {"id": job_id, "status": "queued", "audio_duration": round(seconds, 2), "text": None}
+        self.stats["transcripts"] += 1
+        asyncio.ensure_future(self._process(self.jobs[job_id], seconds))
+        return web.json_response(self.jobs[job_id])
+
+    async def _process(self, job: Dict, seconds: float) -> None:
+        async with self._slots:
+            job["status"] = "processing"
+            processing = sum(j["status"] == "processing" for j in self.jobs.values())
+            self.stats["peak_processing"] = max(self.stats["peak_processing"], processing)
+            await asyncio.sleep(self.base_delay + seconds * self.processing_ratio)
+            words = max(1, int(seconds * 2.5))
+            job["text"] = " ".join(f"word{i + 1}" for i in range(words)).capitalize() + "."
+            job["status"] = "completed"
+
+    async def _get(self, request):
+        self.stats["polls"] += 1
+        job = self.jobs.get(request.match_info["id"])
+        if job is None:
+            return web.json_response({"error": "not found"}, status=404)
+        return web.json_response(job)
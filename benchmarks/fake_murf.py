@@ -0,0 +1,82 @@
+import json
+import base64
+import asyncio
+from typing import Dict, Optional, Set
+
+import websockets
+
+
+class FakeMurfServer:
+    # Local stand-in for Murf's stream-input WebSocket: handshake latency, per-context synthesis
+    # with one audio chunk per `chars_per_chunk` characters, and "clear" to cancel a context.
+    def __init__(self, handshake_delay: float = 0.15, first_chunk_delay: float = 0.1,
+                 chunk_interval: float = 0.02, chars_per_chunk: int = 40, chunk_bytes: int = 4410):
+        self.handshake_delay = handshake_delay
+        self.first_chunk_delay = first_chunk_delay
+        self.chunk_interval = chunk_interval
+        self.chars_per_chunk = chars_per_chunk
+        self.chunk_audio = base64.b64encode(b"\x00" * chunk_bytes).decode()
+        self.connections = 0
+        self.cleared = 0
+        self._sockets: Set[websockets.WebSocketServerProtocol] = set()
+        self._server: Optional[websockets.WebSocketServer] = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._server = await websockets.serve(self._handler, host, port, process_request=self._delay_handshake)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"ws://{host}:{port}/v1/speech/stream-input"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def drop_connections(self) -> None:
+        for ws in list(self._sockets):
+            await ws.close()
+
+    async def _delay_handshake(self, path, headers):
+        await asyncio.sleep(self.handshake_delay)
+        return None
+
+    async def _synthesize(self, ws, context_id: Optional[str], texts: asyncio.Queue) -> None:
+        while True:
+            message = await texts.get()
+            text = message.get("text", "")
+            if text:
+                await asyncio.sleep(self.first_chunk_delay)
+                for _ in range(max(1, len(text) // self.chars_per_chunk)):
+                    await asyncio.sleep(self.chunk_interval)
+                    await ws.send(json.dumps({"audio": self.chunk_audio, "context_id": context_id, "is_final": False}))
+            await ws.send(json.dumps({"audio": "", "context_id": context_id, "is_final": True}))
+            if message.get("end"):
+                return
+
+    async def _handler(self, ws):
+        self.connections += 1
+        self._sockets.add(ws)
+        workers: Dict[Optional[str], asyncio.Task] = {}
+        queues: Dict[Optional[str], asyncio.Queue] = {}
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                context_id = message.get("context_id")
+                if message.get("clear"):
+                    self.cleared += 1
+                    worker = workers.pop(context_id, None)
+                    queues.pop(context_id, None)
+                    if worker:
+                        worker.cancel()
+                elif "text" in message:
+                    if context_id not in workers or workers[context_id].done():
+                        queues[context_id] = asyncio.Queue()
+                        workers[context_id] = asyncio.create_task(self._synthesize(ws, context_id, queues[context_id]))
+                    await queues[context_id].put(message)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for worker in workers.values():
+                worker.cancel()
+            self._sockets.discard(ws)
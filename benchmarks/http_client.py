@@ -0,0 +1,185 @@
+"""Outbound HTTP benchmark: a new aiohttp session per call vs the shared HttpClient, against a local stub.
+
+The stub serves a Tavily-like /search and a Zapier-like /hook over TLS (self-signed, generated
+with openssl; plain HTTP if openssl is missing), with optional latency and transient 503s:
+
+    python benchmarks/http_client.py --calls 50 --concurrency 5 --error-rate 0.1
+"""
+import os
+import ssl
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import List, Optional
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.http_client import HttpClient, HttpError, TtlCache, WebhookQueue
+
+
+class StubServer:
+    def __init__(self, latency: float, hook_latency: float, error_rate: float, seed: int = 3):
+        self.latency = latency
+        self.hook_latency = hook_latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.connections = set()
+        self.requests = {"search": 0, "hook": 0}
+        self.runner: Optional[web.AppRunner] = None
+
+    async def search(self, request: web.Request) -> web.Response:
+        self.connections.add(request.transport.get_extra_info("peername"))
+        self.requests["search"] += 1
+        body = await request.json()
+        await asyncio.sleep(self.latency)
+        if self.rng.random() < self.error_rate:
+            return web.json_response({"error": "busy"}, status=503)
+        results = [{"title": f"Result {i}", "content": f"About {body['query']}. " * 20, "url": f"https://example.com/{i}"}
+                   for i in range(body.get("max_results", 3))]
+        return web.json_response({"results": results})
+
+    async def hook(self, request: web.Request) -> web.Response:
+        self.connections.add(request.transport.get_extra_info("peername"))
+        self.requests["hook"] += 1
+        await request.json()
+        await asyncio.sleep(self.hook_latency)
+        return web.json_response({"status": "success"})
+
+    async def start(self, ssl_context: Optional[ssl.SSLContext]) -> str:
+        app = web.Application()
+        app.router.add_post("/search", self.search)
+        app.router.add_post("/hook", self.hook)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0, ssl_context=ssl_context)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"{'https' if ssl_context else 'http'}://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        if self.runner:
+            await self.runner.cleanup()
+
+
+def tls_contexts(directory: str):
+    # Self-signed certificate for 127.0.0.1; returns (server context, client context) or (None, None)
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    try:
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                        "-keyout", key, "-out", cert, "-subj", "/CN=127.0.0.1",
+                        "-addext", "subjectAltName=IP:127.0.0.1"], check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    server = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server.load_cert_chain(cert, key)
+    client = ssl.create_default_context(cafile=cert)
+    return server, client
+
+
+async def legacy_search(url: str, query: str, client_ssl) -> bool:
+    # The previous tavily_search: a fresh ClientSession (and connection) per call, no retries
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{url}/search", json={"query": query, "max_results": 3}, ssl=client_ssl or True) as response:
+            if response.status == 200:
+                await response.json()
+                return True
+            return False
+
+
+async def pooled_search(client: HttpClient, cache: TtlCache, url: str, query: str) -> bool:
+    if cache.get(query) is not None:
+        return True
+    try:
+        status, data = await client.post_json(f"{url}/search", {"query": query, "max_results": 3}, idempotent=True)
+    except HttpError:
+        return False
+    if status == 200:
+        cache.put(query, data)
+        return True
+    return False
+
+
+async def measure(calls, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    ok = 0
+
+    async def one(call):
+        nonlocal ok
+        async with semaphore:
+            started = time.perf_counter()
+            succeeded = await call()
+            ok += succeeded
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(call) for call in calls))
+    return time.perf_counter() - started, latencies, ok
+
+
+async def run(args) -> None:
+    logging.getLogger("novaflow").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp:
+        server_ssl, client_ssl = tls_contexts(tmp)
+    rng = random.Random(11)
+    queries = [f"query {rng.randint(0, args.distinct - 1)}" for _ in range(args.calls)]
+    print(f"{args.calls} searches ({args.distinct} distinct), concurrency {args.concurrency}, "
+          f"{'TLS' if server_ssl else 'plain HTTP'}, server latency {args.latency * 1000:.0f} ms, "
+          f"{args.error_rate:.0%} transient 503s")
+    print(f"{'mode':<10}{'ok':>5}{'p50 (ms)':>10}{'p95 (ms)':>10}{'total (s)':>11}{'connections':>13}{'requests':>10}")
+    for mode in ("legacy", "pooled"):
+        stub = StubServer(args.latency, args.hook_latency, args.error_rate)
+        url = await stub.start(server_ssl)
+        client = HttpClient(ssl_context=client_ssl or True)
+        cache = TtlCache(ttl=60)
+        if mode == "legacy":
+            calls = [lambda q=q: legacy_search(url, q, client_ssl) for q in queries]
+        else:
+            await client.start()
+            calls = [lambda q=q: pooled_search(client, cache, url, q) for q in queries]
+        total, latencies, ok = await measure(calls, args.concurrency)
+        latencies.sort()
+        print(f"{mode:<10}{ok:>5}{statistics.median(latencies) * 1000:>10.1f}"
+              f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>10.1f}{total:>11.2f}"
+              f"{len(stub.connections):>13}{stub.requests['search']:>10}")
+        await client.close()
+        await stub.stop()
+
+    # Zapier: awaited inside the turn vs handed to the webhook queue
+    stub = StubServer(args.latency, args.hook_latency, 0.0)
+    url = await stub.start(server_ssl)
+    client = HttpClient(ssl_context=client_ssl or True)
+    queue = WebhookQueue(client)
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{url}/hook", json={"response": "hi"}, ssl=client_ssl or True) as response:
+            await response.read()
+    awaited = time.perf_counter() - started
+    started = time.perf_counter()
+    queue.submit(f"{url}/hook", {"response": "hi"})
+    queued = time.perf_counter() - started
+    await queue.close()
+    print(f"zapier webhook: turn blocked {awaited * 1000:.1f} ms awaited vs {queued * 1000:.2f} ms queued "
+          f"(delivered in background: {queue.stats['sent']}/1)")
+    await client.close()
+    await stub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--distinct", type=int, default=25, help="distinct queries among the calls")
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--hook-latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,73 @@
+"""PDF ingestion throughput in pages per second across process-pool worker counts.
+
+Builds a large PDF by repeating the pages of the sample knowledge base PDF:
+
+    python benchmarks/ingest_throughput.py --pages 400 --workers 1 2 4
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+import PyPDF2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.executor import BlockingExecutor
+from services.files import extract_pdf_text
+from services.ingest import IngestionManager
+from services.knowledge import KnowledgeStore
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "uploads", "knowledge_base", "Cloud Computing - Unit1.pdf")
+
+
+def build_pdf(path: str, pages: int) -> None:
+    reader = PyPDF2.PdfReader(SAMPLE_PDF)
+    writer = PyPDF2.PdfWriter()
+    for i in range(pages):
+        writer.add_page(reader.pages[i % len(reader.pages)])
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+async def ingest(directory: str, filename: str, workers: int, pages_per_batch: int):
+    pool = BlockingExecutor(cpu_workers=workers)
+    store = KnowledgeStore(directory)
+    manager = IngestionManager(store, pool, pages_per_batch=pages_per_batch)
+    started = time.perf_counter()
+    job = manager.submit(filename, os.path.join(directory, filename))
+    first_searchable = None
+    while job.status in ("queued", "running"):
+        if first_searchable is None and len(store.index):
+            first_searchable = time.perf_counter() - started
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+    if job.status != "done":
+        raise RuntimeError(job.error)
+    return job, elapsed, first_searchable or elapsed
+
+
+def run(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = "bench.pdf"
+        build_pdf(os.path.join(tmp, filename), args.pages)
+        started = time.perf_counter()
+        extract_pdf_text(os.path.join(tmp, filename))
+        serial = time.perf_counter() - started
+        print(f"{'mode':<16}{'pages/s':>10}{'total (s)':>12}{'first searchable (s)':>22}")
+        print(f"{'serial extract':<16}{args.pages / serial:>10.1f}{serial:>12.2f}{serial:>22.2f}")
+        for workers in args.workers:
+            job, elapsed, first = asyncio.run(ingest(tmp, filename, workers, args.pages_per_batch))
+            print(f"{f'{workers} workers':<16}{job.pages_done / elapsed:>10.1f}{elapsed:>12.2f}{first:>22.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pages-per-batch", type=int, default=8)
+    run(parser.parse_args())
@@ -0,0 +1,118 @@
+"""Intent routing microbenchmark: per-turn keyword scans and filename loops vs the precompiled IntentRouter.
+
+Builds a knowledge base of generated filenames and routes a mix of transcripts (file summaries,
+summaries of unknown files, searches, plain chat), including the Gemini model each turn needs:
+
+    python benchmarks/intent_router.py --files 5000 --turns 2000
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.generativeai import GenerativeModel
+
+from services.gemini import gemini_model, get_system_instruction
+from services.intents import FilenameIndex, IntentRouter
+
+WORDS = ["budget", "report", "roadmap", "hiring", "plan", "invoice", "contract", "notes", "design", "review",
+         "q1", "q2", "q3", "q4", "sales", "marketing", "support", "policy", "handbook", "minutes"]
+CONVERSATION_TYPES = ["casual", "formal", "technical"]
+
+
+def make_files(count: int, rng: random.Random) -> List[str]:
+    return [f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i:05d}{rng.choice(['.pdf', '.txt'])}" for i in range(count)]
+
+
+def make_turns(files: List[str], count: int, rng: random.Random) -> List[Dict[str, str]]:
+    turns = []
+    for i in range(count):
+        kind = ("summary", "summary-miss", "search", "chat")[i % 4]
+        if kind == "summary":
+            text = f"Give me a summary of {rng.choice(files).rsplit(' ', 1)[1]}"
+        elif kind == "summary-miss":
+            text = "Can I get a quick summary of yesterday's standup?"
+        elif kind == "search":
+            text = "Search for the latest news about electric cars and send to email"
+        else:
+            text = "How are you doing today? Tell me something interesting."
+        turns.append({"kind": kind, "text": text, "type": rng.choice(CONVERSATION_TYPES)})
+    return turns
+
+
+def legacy_route(transcript: str, filenames: List[str], conversation_type: str):
+    # The previous stream_gemini_response: re.sub over the transcript and every filename, substring
+    # scans for the keywords and a new GenerativeModel per turn
+    summary_file: Optional[str] = None
+    if "summary" in transcript.lower():
+        query_words = set(re.sub(r'[^\w\s]', '', transcript.lower()).split())
+        for filename in filenames:
+            filename_words = set(re.sub(r'[^\w\s]', '', filename.lower()).split())
+            if query_words & filename_words:
+                summary_file = filename
+                break
+    search = any(word in transcript.lower() for word in ["search", "find", "look up"])
+    email = "send to email" in transcript.lower() or "email the summary" in transcript.lower()
+    model = GenerativeModel(model_name="gemini-1.5-flash", system_instruction=get_system_instruction(conversation_type))
+    return summary_file, search, email, model
+
+
+def routed(router: IntentRouter, index: FilenameIndex, transcript: str, conversation_type: str):
+    intent = router.route(transcript, index)
+    return intent.summary_file, intent.search, intent.email, gemini_model("bench-key", conversation_type)
+
+
+def measure(turns: List[Dict[str, str]], route) -> Dict[str, float]:
+    totals: Dict[str, List[float]] = {}
+    for turn in turns:
+        started = time.perf_counter()
+        route(turn["text"], turn["type"])
+        totals.setdefault(turn["kind"], []).append(time.perf_counter() - started)
+    return {kind: sum(values) / len(values) * 1e6 for kind, values in totals.items()}
+
+
+def run(args) -> None:
+    rng = random.Random(5)
+    files = make_files(args.files, rng)
+    turns = make_turns(files, args.turns, rng)
+
+    started = time.perf_counter()
+    index = FilenameIndex()
+    for filename in files:
+        index.add(filename)
+    build = time.perf_counter() - started
+    router = IntentRouter()
+
+    # Both must pick the same file and intents for every turn
+    mismatches = sum(legacy_route(t["text"], files, t["type"])[:3] != routed(router, index, t["text"], t["type"])[:3]
+                     for t in turns[:200])
+
+    legacy = measure(turns, lambda text, kind: legacy_route(text, files, kind))
+    new = measure(turns, lambda text, kind: routed(router, index, text, kind))
+    print(f"{args.files} knowledge base files, {args.turns} turns, {mismatches} routing mismatches")
+    print(f"{'turn kind':<14}{'legacy (us)':>13}{'router (us)':>13}{'speedup':>10}")
+    for kind in ("summary", "summary-miss", "search", "chat"):
+        print(f"{kind:<14}{legacy[kind]:>13.1f}{new[kind]:>13.1f}{legacy[kind] / new[kind]:>9.0f}x")
+
+    started = time.perf_counter()
+    for i in range(1000):
+        index.add(f"upload {i}.pdf")
+    added = (time.perf_counter() - started) / 1000
+    started = time.perf_counter()
+    for i in range(1000):
+        index.remove(f"upload {i}.pdf")
+    removed = (time.perf_counter() - started) / 1000
+    print(f"index build {build * 1000:.1f} ms for {args.files} files; incremental add {added * 1e6:.1f} us, "
+          f"remove {removed * 1e6:.1f} us per file")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--turns", type=int, default=2000)
+    run(parser.parse_args())
@@ -0,0 +1,307 @@
+"""End-to-end /ws load test: N concurrent sessions driving text:, speak: and recorded-audio turns.
+
+Starts the app with NOVAFLOW_FAKE_PROVIDERS=all (deterministic local Gemini, Murf, AssemblyAI and
+Tavily fakes) in a scratch directory, or targets a running app with --app-url. Audio turns replay
+uploads/*.wav through browser-capture mode. Reports turn latency and time-to-first-audio percentiles,
+throughput and server RSS; --save writes the results and --compare diffs against a saved baseline:
+
+    python benchmarks/load_test.py --sessions 20 --turns 3 --mix text,speak,audio --save baseline.json
+    python benchmarks/load_test.py --sessions 20 --turns 3 --mix text,speak,audio --compare baseline.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stt_load import load_frames
+
+TURN_KINDS = ("text", "speak", "audio", "search")
+DEFAULT_MIX = ["text", "speak", "audio"]
+FRAME_FLAG_FINAL = 0x01
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))]
+
+
+class TurnResult:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.latency: Optional[float] = None
+        self.first_audio: Optional[float] = None
+        self.error = ""
+        # "info" notices, e.g. a reply degraded to text or a search skipped under load
+        self.notices = 0
+
+
+async def read_until(ws, result: TurnResult, started: float, done) -> None:
+    # Reads server messages until done(message) says the turn is over; notes the first audio chunk
+    while True:
+        raw = await ws.recv()
+        now = time.perf_counter() - started
+        if isinstance(raw, bytes):
+            message = {"type": "binary", "is_final": bool(raw[2] & FRAME_FLAG_FINAL) if len(raw) > 2 else False}
+        else:
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                message = {"type": "text", "data": raw}
+        if message["type"] in ("audio", "speak_audio", "binary") and result.first_audio is None:
+            result.first_audio = now
+        if message["type"] == "info":
+            result.notices += 1
+        if message["type"] == "error" and not result.error:
+            result.error = str(message.get("data", ""))[:120]
+        if done(message):
+            result.latency = now
+            return
+
+
+async def text_turn(ws, session: int, turn: int, search: bool = False) -> TurnResult:
+    # Search turns ask for a web search, so the answer waits on (or degrades past) the search provider
+    result = TurnResult("search" if search else "text")
+    started = time.perf_counter()
+    ask = "Search the web for" if search else "Question"
+    await ws.send(f"text:{ask} {session}-{turn}: how do cloud storage costs scale with usage?")
+    await read_until(ws, result, started, lambda m: m["type"] in ("response", "error"))
+    return result
+
+
+async def speak_turn(ws, session: int, turn: int) -> TurnResult:
+    result = TurnResult("speak")
+    started = time.perf_counter()
+    await ws.send(f"speak:Reading answer {session}-{turn} aloud. Cloud storage costs depend on usage and region.")
+    await read_until(ws, result, started, lambda m: m["type"] == "error" or (
+        m["type"] in ("speak_audio", "binary") and m.get("is_final")))
+    return result
+
+
+async def audio_turn(ws, frames: List[bytes], speedup: float) -> TurnResult:
+    # Time is measured from "stop" (the user finishing their utterance) to the reply's end
+    result = TurnResult("audio")
+    await ws.send("start_stream")
+    await read_until(ws, result, time.perf_counter(), lambda m: m.get("data") == "Started transcription" or m["type"] == "error")
+    if result.error:
+        return result
+    interval = 0.1 / speedup
+    paced = time.perf_counter()
+    for i, frame in enumerate(frames):
+        delay = paced + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await ws.send(frame)
+    result.first_audio = None
+    started = time.perf_counter()
+    await ws.send("stop")
+    await read_until(ws, result, started, lambda m: m.get("data") == "Stopped transcription")
+    return result
+
+
+async def session(base: str, index: int, args, recordings: List[List[bytes]], results: List[TurnResult]) -> None:
+    async with aiohttp.ClientSession() as http:
+        async with http.post(f"http://{base}/new_chat") as response:
+            chat_id = (await response.json())["chat_id"]
+    query = f"chat_id={chat_id}" + ("&audio=binary" if args.binary else "")
+    async with websockets.connect(f"ws://{base}/ws?{query}", max_size=None) as ws:
+        for turn in range(args.turns):
+            kind = args.mix[(index + turn) % len(args.mix)]
+            try:
+                if kind in ("text", "search"):
+                    result = await asyncio.wait_for(text_turn(ws, index, turn, kind == "search"), args.timeout)
+                elif kind == "speak":
+                    result = await asyncio.wait_for(speak_turn(ws, index, turn), args.timeout)
+                else:
+                    frames = recordings[(index + turn) % len(recordings)][:int(args.audio_seconds * 10)]
+                    result = await asyncio.wait_for(audio_turn(ws, frames, args.speedup), args.timeout)
+            except (asyncio.TimeoutError, websockets.ConnectionClosed) as e:
+                result = TurnResult(kind)
+                result.error = type(e).__name__
+                results.append(result)
+                return
+            results.append(result)
+
+
+async def server_rss(http: aiohttp.ClientSession, base: str) -> Optional[float]:
+    try:
+        async with http.get(f"http://{base}/metrics") as response:
+            for line in (await response.text()).splitlines():
+                if line.startswith("novaflow_process_resident_memory_bytes "):
+                    return float(line.split()[1])
+    except aiohttp.ClientError:
+        pass
+    return None
+
+
+async def sample_rss(base: str, samples: List[float], stop: asyncio.Event) -> None:
+    async with aiohttp.ClientSession() as http:
+        while not stop.is_set():
+            rss = await server_rss(http, base)
+            if rss is not None:
+                samples.append(rss)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=0.5)
+            except asyncio.TimeoutError:
+                pass
+
+
+def summarize(results: List[TurnResult], elapsed: float, rss: List[float], args) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {
+        "config": {k: getattr(args, k) for k in ("sessions", "turns", "mix", "speedup", "audio_seconds", "binary")},
+        "turns": len(results),
+        "errors": sum(bool(r.error) for r in results),
+        "degraded": sum(bool(r.notices) for r in results),
+        "throughput_turns_per_s": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "rss_start_mb": round(rss[0] / 2**20, 1) if rss else None,
+        "rss_peak_mb": round(max(rss) / 2**20, 1) if rss else None,
+        "kinds": {},
+    }
+    for kind in TURN_KINDS:
+        turns = [r for r in results if r.kind == kind]
+        if not turns:
+            continue
+        latency = [r.latency for r in turns if r.latency is not None and not r.error]
+        first_audio = [r.first_audio for r in turns if r.first_audio is not None and not r.error]
+        summary["kinds"][kind] = {
+            "turns": len(turns),
+            "errors": sum(bool(r.error) for r in turns),
+            "degraded": sum(bool(r.notices) for r in turns),
+            **{f"latency_p{p}_ms": round(percentile(latency, p) * 1000, 1) if latency else None for p in (50, 95, 99)},
+            **{f"first_audio_p{p}_ms": round(percentile(first_audio, p) * 1000, 1) if first_audio else None
+               for p in (50, 95, 99)},
+        }
+    first_errors = sorted({r.error for r in results if r.error})[:3]
+    if first_errors:
+        summary["sample_errors"] = first_errors
+    return summary
+
+
+def fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.0f}"
+
+
+def print_summary(summary: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"{summary['turns']} turns, {summary['errors']} errors, {summary.get('degraded', 0)} degraded, "
+          f"{summary['throughput_turns_per_s']} turns/s, "
+          f"server RSS {summary['rss_start_mb']} MB -> peak {summary['rss_peak_mb']} MB")
+    columns = ("latency_p50_ms", "latency_p95_ms", "latency_p99_ms", "first_audio_p50_ms", "first_audio_p95_ms", "first_audio_p99_ms")
+    print(f"{'kind':<8}{'turns':>7}{'errors':>8}" + "".join(f"{c.replace('_ms', '').replace('first_audio', 'tfa'):>16}" for c in columns))
+    for kind, stats in summary["kinds"].items():
+        print(f"{kind:<8}{stats['turns']:>7}{stats['errors']:>8}" + "".join(f"{fmt(stats[c]):>16}" for c in columns))
+        old = (baseline or {}).get("kinds", {}).get(kind)
+        if old:
+            deltas = []
+            for c in columns:
+                if stats[c] is None or not old.get(c):
+                    deltas.append("-")
+                else:
+                    deltas.append(f"{(stats[c] - old[c]) / old[c]:+.0%}")
+            print(f"{'  vs base':<23}" + "".join(f"{d:>16}" for d in deltas))
+    if baseline:
+        old = baseline.get("throughput_turns_per_s") or 0
+        change = f"{(summary['throughput_turns_per_s'] - old) / old:+.0%}" if old else "-"
+        print(f"throughput vs baseline: {change}; peak RSS {baseline.get('rss_peak_mb')} -> {summary['rss_peak_mb']} MB")
+    for error in summary.get("sample_errors", []):
+        print(f"  error: {error}")
+
+
+def start_app(workdir: str, port: int, args, extra_env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    # A scratch working directory keeps chats, recordings and caches out of the repo's uploads/
+    for name in ("static", "templates"):
+        os.symlink(os.path.join(ROOT, name), os.path.join(workdir, name))
+    env = {**os.environ, "NOVAFLOW_FAKE_PROVIDERS": args.providers, "NOVAFLOW_LOG_LEVEL": "WARNING",
+           "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH", "")]))}
+    if not args.cache:
+        env.update({"NOVAFLOW_LLM_CACHE_MAX_BYTES": "0", "NOVAFLOW_TTS_CACHE_MAX_BYTES": "0"})
+    env.update(extra_env or {})
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+
+
+async def wait_ready(base: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            if await server_rss(http, base) is not None:
+                return
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"App did not start within {timeout:.0f}s")
+
+
+async def drive(base: str, args) -> Dict[str, Any]:
+    recordings = load_frames() if "audio" in args.mix else []
+    results: List[TurnResult] = []
+    rss: List[float] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(base, rss, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(session(base, i, args, recordings, results) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+    return summarize(results, elapsed, rss, args)
+
+
+async def run(args) -> None:
+    if args.app_url:
+        summary = await drive(args.app_url.split("://")[-1].rstrip("/"), args)
+    else:
+        port = free_port()
+        with tempfile.TemporaryDirectory() as workdir:
+            server = start_app(workdir, port, args)
+            try:
+                await wait_ready(f"127.0.0.1:{port}")
+                summary = await drive(f"127.0.0.1:{port}", args)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(f"{args.sessions} sessions x {args.turns} turns, mix {','.join(args.mix)}")
+    print_summary(summary, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"results saved to {args.save}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3, help="turns per session")
+    parser.add_argument("--mix", type=lambda s: [k for k in s.split(",") if k in TURN_KINDS], default=DEFAULT_MIX,
+                        help="turn kinds to cycle through: text,speak,audio,search")
+    parser.add_argument("--speedup", type=float, default=4.0, help="audio replay speed vs real time")
+    parser.add_argument("--audio-seconds", type=float, default=3.0, help="seconds of each recording to send")
+    parser.add_argument("--binary", action="store_true", help="receive TTS audio as binary frames")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds before a turn counts as failed")
+    parser.add_argument("--providers", default="all", help="NOVAFLOW_FAKE_PROVIDERS for the spawned app")
+    parser.add_argument("--cache", action="store_true", help="keep the LLM/TTS response caches enabled")
+    parser.add_argument("--app-url", default="", help="drive a running app (e.g. http://127.0.0.1:8000) instead")
+    parser.add_argument("--save", default="", help="write the results as JSON (a baseline for --compare)")
+    parser.add_argument("--compare", default="", help="baseline JSON from an earlier --save")
+    parser.add_argument("--verbose", action="store_true", help="show the spawned app's log output")
+    asyncio.run(run(parser.parse_args()))
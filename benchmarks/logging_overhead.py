@@ -0,0 +1,97 @@
+"""Logging overhead benchmark: caller-side cost of a log call with a direct stream handler vs the queue handler.
+
+The sink simulates a slow terminal or log shipper by sleeping per write, which is where a direct
+handler stalls the event loop. Also times TurnTimer spans and histogram observations per call:
+
+    python benchmarks/logging_overhead.py --records 2000 --sink-delay 0.0002
+"""
+import os
+import io
+import sys
+import time
+import logging
+import argparse
+import statistics
+from logging.handlers import QueueListener
+from queue import Queue
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.logs import LOG_FORMAT, NonBlockingQueueHandler
+from services.metrics import Histogram
+from services.timing import TurnTimer
+
+
+class SlowSink(io.StringIO):
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        return super().write(text)
+
+
+def stream_handler(delay: float) -> logging.Handler:
+    handler = logging.StreamHandler(SlowSink(delay))
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+def measure(logger: logging.Logger, records: int) -> List[float]:
+    timings = []
+    for i in range(records):
+        started = time.perf_counter()
+        logger.info(f"Sent audio chunk to client (final: False, length: {4410 + i})")
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(name: str, timings: List[float]) -> None:
+    timings = sorted(timings)
+    print(f"{name:<18}{statistics.median(timings) * 1e6:>12.1f}{timings[int(len(timings) * 0.99) - 1] * 1e6:>12.1f}"
+          f"{sum(timings) * 1000:>14.1f}")
+
+
+def run(args) -> None:
+    print(f"{args.records} INFO records, sink write delay {args.sink_delay * 1e6:.0f} us")
+    print(f"{'handler':<18}{'p50 (us)':>12}{'p99 (us)':>12}{'caller ms':>14}")
+
+    direct = logging.getLogger("bench.direct")
+    direct.propagate = False
+    direct.setLevel(logging.INFO)
+    direct.addHandler(stream_handler(args.sink_delay))
+    report("stream (direct)", measure(direct, args.records))
+
+    queued = logging.getLogger("bench.queued")
+    queued.propagate = False
+    queued.setLevel(logging.INFO)
+    log_queue: Queue = Queue(maxsize=args.queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    queued.addHandler(handler)
+    listener = QueueListener(log_queue, stream_handler(args.sink_delay))
+    listener.start()
+    report("queue handler", measure(queued, args.records))
+    started = time.perf_counter()
+    listener.stop()
+    print(f"listener drained the backlog in {(time.perf_counter() - started) * 1000:.0f} ms off the caller; "
+          f"{handler.dropped} records dropped (queue size {args.queue_size})")
+
+    histogram = Histogram("bench_seconds", "bench", ["stage"])
+    timer = TurnTimer("bench")
+    started = time.perf_counter()
+    for i in range(args.records):
+        with timer.span("client_send"):
+            pass
+        histogram.observe(i / args.records, stage="client_send")
+    per_call = (time.perf_counter() - started) / args.records
+    print(f"span + histogram observation: {per_call * 1e6:.2f} us per call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--sink-delay", type=float, default=0.0002)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    run(parser.parse_args())
@@ -0,0 +1,102 @@
+"""Mic gain DSP: per-frame float32 round trip vs the preallocated MicProcessor, CPU per second of audio.
+
+Runs 100 ms frames of speech from uploads/*.wav through each path and reports CPU time per frame,
+CPU milliseconds per second of audio for one session, and the bytes allocated per frame:
+
+    python benchmarks/mic_gain.py --seconds 300
+"""
+import os
+import sys
+import glob
+import time
+import wave
+import argparse
+import tracemalloc
+from typing import Callable, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.mic_dsp import MicProcessor
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+FRAME_SAMPLES = 1600
+FRAME_MS = 100
+
+
+def source_frames() -> List[bytes]:
+    pcm = b""
+    for path in sorted(glob.glob(os.path.join(UPLOADS, "*.wav"))):
+        with wave.open(path, "rb") as wf:
+            pcm += wf.readframes(wf.getnframes())
+    step = FRAME_SAMPLES * 2
+    return [pcm[i:i + step] for i in range(0, len(pcm) - step, step)]
+
+
+def legacy(gain: float) -> Callable[[bytes], bytes]:
+    # The previous stream_audio path: float32 copy, clip copy, int16 copy, then tobytes() for the
+    # recorded frame list and again for client.stream
+    def process(data: bytes) -> bytes:
+        audio_data = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        audio_data *= gain
+        clipped = np.clip(audio_data, -32768, 32767).astype(np.int16)
+        clipped.tobytes()
+        return clipped.tobytes()
+    return process
+
+
+def processor(gain: float, mode: str) -> Callable[[bytes], bytes]:
+    dsp = MicProcessor(frame_samples=FRAME_SAMPLES)
+    dsp.configure(gain, mode)
+    return dsp.process
+
+
+def cpu_per_frame(process: Callable[[bytes], bytes], frames: List[bytes], count: int, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        for i in range(count):
+            process(frames[i % len(frames)])
+        timings.append((time.process_time() - started) / count)
+    return min(timings)
+
+
+def allocated_per_frame(process: Callable[[bytes], bytes], frames: List[bytes], count: int = 200) -> float:
+    # Sums the size of every block allocated while processing, kept or not
+    process(frames[0])
+    tracemalloc.start()
+    total = 0
+    for i in range(count):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        process(frames[i % len(frames)])
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / count
+
+
+def run(args) -> None:
+    frames = source_frames()
+    count = int(args.seconds * 1000 / FRAME_MS)
+    cases = [
+        ("legacy, gain 1.0", legacy(1.0)),
+        ("dsp, gain 1.0", processor(1.0, "off")),
+        (f"legacy, gain {args.gain:g}", legacy(args.gain)),
+        (f"dsp, gain {args.gain:g}", processor(args.gain, "off")),
+        ("dsp, agc", processor(1.0, "agc")),
+        ("dsp, gate", processor(1.0, "gate")),
+    ]
+    print(f"{args.seconds:g}s of audio per case, {FRAME_MS} ms frames")
+    print(f"{'path':<18}{'us/frame':>10}{'CPU ms per audio s':>20}{'alloc B/frame':>15}")
+    for name, process in cases:
+        per_frame = cpu_per_frame(process, frames, count)
+        per_second = per_frame * 1000 / FRAME_MS * 1000
+        print(f"{name:<18}{per_frame * 1e6:>10.1f}{per_second:>20.3f}{allocated_per_frame(process, frames):>15.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=300)
+    parser.add_argument("--gain", type=float, default=1.4, help="micSensitivity / 50")
+    run(parser.parse_args())
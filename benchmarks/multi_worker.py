@@ -0,0 +1,215 @@
+"""Multi-worker load test: per-tenant settings under `uvicorn --workers N` for each state backend.
+
+Starts the app with several workers and has many tenants write and read back their settings and
+keys over fresh connections (so consecutive requests land on different workers), plus concurrent
+writers on one shared tenant. Tenants authenticate with tokens issued through POST /tenants, and
+anonymous access is off. Each tenant also creates a chat, lists its chats and tries to read a
+neighbour's, and a request naming a tenant without its token must be refused. Counts stale reads,
+cross-tenant leaks (settings, chats or unauthenticated access) and lost updates:
+
+    python benchmarks/multi_worker.py --workers 4 --tenants 20 --rounds 10 --backends memory sqlite
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import Any, Dict, List
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_TOKEN = "bench-admin"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Results:
+    def __init__(self):
+        self.tokens: Dict[str, str] = {}
+        self.latencies: List[float] = []
+        self.stale = 0
+        self.leaked = 0
+        self.errors = 0
+        self.refused = 0
+
+
+async def call(session: aiohttp.ClientSession, results: Results, method: str, url: str, tenant: str,
+               payload: Dict[str, Any] = None) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        async with session.request(method, url, json=payload, headers=auth(results, tenant)) as response:
+            if response.status == 401:
+                results.refused += 1
+                return {}
+            data = await response.json()
+    except (aiohttp.ClientError, ValueError):
+        results.errors += 1
+        return {}
+    results.latencies.append(time.perf_counter() - started)
+    if "error" in data:
+        results.errors += 1
+    return data
+
+
+def auth(results: Results, tenant: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {results.tokens[tenant]}"}
+
+
+async def issue_tokens(session, base: str, tenants: List[str], results: Results) -> None:
+    for tenant in tenants:
+        async with session.post(f"{base}/tenants", json={"tenant": tenant},
+                                headers={"Authorization": f"Bearer {ADMIN_TOKEN}"}) as response:
+            results.tokens[tenant] = (await response.json())["token"]
+
+
+async def unauthenticated(session, base: str, tenant: str, results: Results) -> None:
+    # Naming a tenant (the old header, a query parameter) or presenting a made-up token must not get in
+    for url, headers in ((f"{base}/get_settings", {"X-NovaFlow-Tenant": tenant}),
+                         (f"{base}/chats?tenant={tenant}", {}),
+                         (f"{base}/get_settings", {"Authorization": f"Bearer {tenant}"})):
+        async with session.get(url, headers=headers) as response:
+            if response.status != 401:
+                results.leaked += 1
+
+
+async def tenant_workload(session, base: str, tenant: str, rounds: int, results: Results) -> None:
+    # Every read must return this tenant's latest write, whichever worker handles it
+    await call(session, results, "POST", f"{base}/set_keys", tenant,
+               {"gemini_api_key": f"key-{tenant}", "override_env": "true"})
+    for r in range(rounds):
+        voice = f"{tenant}-voice-{r}"
+        await call(session, results, "POST", f"{base}/set_settings", tenant, {"voiceId": voice, "maxSearchResults": r})
+        state = await call(session, results, "GET", f"{base}/get_settings", tenant)
+        if not state:
+            continue
+        read = state.get("settings", {}).get("voiceId", "")
+        if state.get("tenant") != tenant or (read.startswith("tenant") and not read.startswith(f"{tenant}-")):
+            results.leaked += 1
+        elif read != voice or state.get("api_keys") != ["gemini_api_key"]:
+            results.stale += 1
+
+
+async def chat_isolation(session, base: str, tenants: List[str], results: Results) -> None:
+    # Listing must show exactly the tenant's own chat, and another tenant's history must be refused
+    created = await asyncio.gather(*(call(session, results, "POST", f"{base}/new_chat", t) for t in tenants))
+    owned = {tenant: chat["chat_id"] for tenant, chat in zip(tenants, created) if chat}
+    tenants = list(owned)
+    for i, tenant in enumerate(tenants):
+        listed = await call(session, results, "GET", f"{base}/chats", tenant)
+        if listed != {} and listed != [owned[tenant]]:
+            results.leaked += 1
+        neighbour = owned[tenants[(i + 1) % len(tenants)]]
+        async with session.get(f"{base}/chat_history", params={"chat_id": neighbour},
+                               headers=auth(results, tenant)) as response:
+            if isinstance(await response.json(), list):
+                results.leaked += 1
+
+
+async def shared_writers(session, base: str, writers: int, results: Results) -> int:
+    # Concurrent read-modify-writes of different fields on one tenant; returns how many survived
+    await asyncio.gather(*(call(session, results, "POST", f"{base}/set_settings", "shared", {f"field{i}": i})
+                           for i in range(writers)))
+    state = await call(session, results, "GET", f"{base}/get_settings", "shared")
+    return sum(f"field{i}" in state.get("settings", {}) for i in range(writers))
+
+
+async def wait_ready(base: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base}/tenant_stats") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"App did not start within {timeout:.0f}s")
+
+
+async def run_backend(backend: str, args) -> List[str]:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        # A scratch working directory keeps the chats this creates out of the repo's uploads/
+        for name in ("static", "templates"):
+            os.symlink(os.path.join(ROOT, name), os.path.join(tmp, name))
+        env = {**os.environ, "NOVAFLOW_STATE_BACKEND": backend, "NOVAFLOW_STATE_PATH": os.path.join(tmp, "state.sqlite3"),
+               "NOVAFLOW_ADMIN_TOKEN": ADMIN_TOKEN, "NOVAFLOW_ALLOW_ANONYMOUS": "0",
+               "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH", "")]))}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(args.workers),
+             "--log-level", "warning"],
+            cwd=tmp, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            await wait_ready(base)
+            results = Results()
+            # force_close: a new connection per request, so the kernel spreads requests over the workers
+            connector = aiohttp.TCPConnector(force_close=True, limit=args.concurrency)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                names = [f"tenant{t}" for t in range(args.tenants)]
+                # Tokens are issued before the clock starts; with the memory backend only the worker that
+                # issued a token knows it, so the others refuse it
+                await issue_tokens(session, base, names + ["shared"], results)
+                started = time.perf_counter()
+                await asyncio.gather(*(tenant_workload(session, base, f"tenant{t}", args.rounds, results)
+                                       for t in range(args.tenants)))
+                elapsed = time.perf_counter() - started
+                await chat_isolation(session, base, names, results)
+                await unauthenticated(session, base, names[0], results)
+                survived = await shared_writers(session, base, args.shared_writers, results)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    latencies = sorted(results.latencies)
+    reads = args.tenants * args.rounds
+    print(f"{backend:<8}{len(latencies) / elapsed:>10.0f}{statistics.median(latencies) * 1000:>10.1f}"
+          f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>10.1f}{f'{results.stale}/{reads}':>12}"
+          f"{results.leaked:>8}{f'{survived}/{args.shared_writers}':>14}{results.errors:>8}")
+    failures = []
+    if results.leaked:
+        failures.append(f"{backend}: {results.leaked} cross-tenant leaks")
+    if results.errors:
+        failures.append(f"{backend}: {results.errors} failed requests")
+    # The process-local memory backend is expected to go stale (and lose updates and tokens) across workers
+    if backend != "memory" or args.workers == 1:
+        if results.refused:
+            failures.append(f"{backend}: {results.refused} requests with a valid token refused")
+        if results.stale:
+            failures.append(f"{backend}: {results.stale}/{reads} stale reads")
+        if survived != args.shared_writers:
+            failures.append(f"{backend}: {args.shared_writers - survived}/{args.shared_writers} shared updates lost")
+    return failures
+
+
+async def run(args) -> int:
+    print(f"{args.workers} uvicorn workers, {args.tenants} tenants x {args.rounds} write+read rounds, "
+          f"{args.shared_writers} concurrent writers on one shared tenant")
+    print(f"{'backend':<8}{'req/s':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'stale':>12}{'leaked':>8}"
+          f"{'shared kept':>14}{'errors':>8}")
+    failures = []
+    for backend in args.backends:
+        failures += await run_backend(backend, args)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--shared-writers", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite"])
+    sys.exit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,107 @@
+"""Murf connection pool benchmark: reuse, reconnect, concurrency and barge-in against a local fake server.
+
+    python benchmarks/murf_pool.py --turns 10 --concurrency 8 --handshake-delay 0.15
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_murf import FakeMurfServer
+from services.murf import MurfPool
+from services.timing import TurnTimer
+
+TEXT = "This is a pooled Murf synthesis check that should produce several audio chunks. " * 2
+VOICE = ("fake-key", "en-IN-alia", 1.0)
+
+
+class Collector:
+    def __init__(self):
+        self.chunks = 0
+
+    async def send_json(self, message):
+        if message.get("data"):
+            self.chunks += 1
+
+
+async def turn(pool: MurfPool, text: str = TEXT) -> float:
+    timer = TurnTimer("murf")
+    collector = Collector()
+    async with pool.connection(*VOICE) as murf:
+        await murf.speak(text, collector.send_json, timer=timer)
+    return timer.get("first_audio") or float("nan")
+
+
+async def run(args) -> int:
+    server = FakeMurfServer(handshake_delay=args.handshake_delay)
+    url = await server.start()
+    failures = []
+
+    cold = []
+    for _ in range(args.turns):
+        cold.append(await turn(MurfPool(base_url=url, max_idle_per_key=0)))
+    pool = MurfPool(base_url=url)
+    warm = [await turn(pool) for _ in range(args.turns)]
+    print(f"{'mode':<10}{'first audio p50 (ms)':>24}{'connects':>10}")
+    print(f"{'cold':<10}{statistics.median(cold) * 1000:>24.0f}{args.turns:>10}")
+    print(f"{'pooled':<10}{statistics.median(warm) * 1000:>24.0f}{pool.stats['connects']:>10}")
+    if pool.stats["connects"] != 1:
+        failures.append("pooled turns did not reuse a single connection")
+
+    await server.drop_connections()
+    await asyncio.sleep(0.05)
+    connects = pool.stats["connects"]
+    await turn(pool)
+    print(f"reconnect after server drop: connects {connects} -> {pool.stats['connects']}")
+    if pool.stats["connects"] != connects + 1:
+        failures.append("pool did not reconnect after the server dropped its connections")
+
+    collectors = [Collector() for _ in range(args.concurrency)]
+
+    async def concurrent_turn(collector: Collector):
+        async with pool.connection(*VOICE) as murf:
+            await murf.speak(TEXT, collector.send_json)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(concurrent_turn(c) for c in collectors))
+    elapsed = time.perf_counter() - started
+    counts = {c.chunks for c in collectors}
+    print(f"{args.concurrency} concurrent turns in {elapsed * 1000:.0f}ms, chunks per turn {sorted(counts)}, "
+          f"idle connections {pool.snapshot()['idle']}")
+    if len(counts) != 1:
+        failures.append("concurrent turns received each other's audio")
+
+    collector = Collector()
+    async with pool.connection(*VOICE, owner="session") as murf:
+        speaking = asyncio.create_task(murf.speak(TEXT * 10, collector.send_json))
+        while collector.chunks == 0:
+            await asyncio.sleep(0.005)
+        cancelled_at = time.perf_counter()
+        await pool.cancel("session")
+        await speaking
+        silence = time.perf_counter() - cancelled_at
+    stale = Collector()
+    async with pool.connection(*VOICE) as murf:
+        await murf.speak("Short follow up.", stale.send_json)
+    print(f"barge-in: synthesis stopped {silence * 1000:.1f}ms after cancel, server clears {server.cleared}, "
+          f"follow-up chunks {stale.chunks}")
+    if server.cleared != 1 or stale.chunks != 1:
+        failures.append("barge-in did not clear the context cleanly")
+
+    await pool.close()
+    await server.stop()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--handshake-delay", type=float, default=0.15)
+    sys.exit(asyncio.run(run(parser.parse_args())))
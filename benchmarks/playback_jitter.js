@@ -0,0 +1,166 @@
+// TTS playback under network jitter: onended chaining vs clock scheduling vs the jitter-buffer worklet.
+//
+//     node benchmarks/playback_jitter.js [jitter-ms ...]
+//
+// Murf chunks are synthesized faster than real time and arrive in order with exponential network
+// jitter. The old engine started each chunk from the previous one's onended callback, so every
+// chunk paid the main thread's callback latency; the fallback schedules chunks ahead on the clock;
+// the worklet (static/playback-worklet.js, loaded as is) runs in 128-frame render quanta with its
+// adaptive jitter buffer, across consecutive replies so the target can settle.
+
+const fs = require("fs");
+const path = require("path");
+const vm = require("vm");
+
+const CONTEXT_RATE = 44100;
+const MURF_RATE = 24000;
+const QUANTUM = 128;
+const REPLIES = 40;
+const REPLY_SECONDS = 6;
+const CHUNK_MS = 200;
+const SYNTH_SPEED = 2; // seconds of audio synthesized per second
+const FIRST_CHUNK_MS = 300;
+const CALLBACK_MS = 4; // mean main-thread delay before an onended callback runs
+const SCHEDULE_LEAD_S = 0.05;
+
+function prng(seed) {
+  // mulberry32, so every engine sees the same arrivals
+  return () => {
+    seed = (seed + 0x6d2b79f5) | 0;
+    let t = Math.imul(seed ^ (seed >>> 15), 1 | seed);
+    t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+function replyArrivals(random, jitterMs) {
+  // Arrival times (s, from the reply's first byte being requested) of each chunk, in order
+  const chunks = Math.round((REPLY_SECONDS * 1000) / CHUNK_MS);
+  const arrivals = [];
+  let previous = 0;
+  for (let i = 0; i < chunks; i++) {
+    const generated = (FIRST_CHUNK_MS + (i * CHUNK_MS) / SYNTH_SPEED) / 1000;
+    const jitter = (-Math.log(1 - random()) * jitterMs) / 1000;
+    previous = Math.max(previous, generated + jitter);
+    arrivals.push(previous);
+  }
+  return arrivals;
+}
+
+function chained(arrivals, random) {
+  // static/index.js before: each chunk starts once the previous one's onended has run
+  let end = null;
+  const result = { start: 0, gaps: 0, stall: 0 };
+  for (const arrival of arrivals) {
+    const ready = end === null ? arrival : end + random() * 2 * CALLBACK_MS / 1000;
+    const start = Math.max(ready, arrival);
+    if (end === null) result.start = start - arrivals[0];
+    else if (start > end) {
+      result.gaps++;
+      result.stall += start - end;
+    }
+    end = start + CHUNK_MS / 1000;
+  }
+  return result;
+}
+
+function scheduled(arrivals) {
+  // Fallback engine: each chunk is scheduled on arrival right behind the previous one
+  let end = null;
+  const result = { start: 0, gaps: 0, stall: 0 };
+  for (const arrival of arrivals) {
+    const start = Math.max(end === null ? 0 : end, arrival + SCHEDULE_LEAD_S);
+    if (end === null) result.start = start - arrivals[0];
+    else if (start > end + 1e-9) {
+      result.gaps++;
+      result.stall += start - end;
+    }
+    end = start + CHUNK_MS / 1000;
+  }
+  return result;
+}
+
+function loadWorklet() {
+  const source = fs.readFileSync(path.join(__dirname, "..", "static", "playback-worklet.js"), "utf8");
+  const context = {
+    sampleRate: CONTEXT_RATE,
+    currentTime: 0,
+    Math,
+    Float32Array,
+    Int16Array,
+    AudioWorkletProcessor: class {
+      constructor() {
+        this.posted = [];
+        this.port = { postMessage: (message) => this.posted.push(message), onmessage: null };
+      }
+    },
+    registerProcessor: (name, processor) => {
+      context.Processor = processor;
+    },
+  };
+  vm.createContext(context);
+  vm.runInContext(source, context);
+  return context;
+}
+
+function worklet(context, processor, arrivals) {
+  const chunkSamples = (MURF_RATE * CHUNK_MS) / 1000;
+  const output = new Float32Array(QUANTUM);
+  let next = 0;
+  let time = 0;
+  processor.posted = [];
+  for (;;) {
+    while (next < arrivals.length && arrivals[next] <= time) {
+      const samples = new Int16Array(chunkSamples).fill(1000);
+      processor.port.onmessage({ data: { samples, sampleRate: MURF_RATE, final: next === arrivals.length - 1 } });
+      next++;
+    }
+    context.currentTime = time;
+    output.fill(0);
+    processor.process([], [[output]]);
+    const ended = processor.posted.find((message) => message.type === "ended");
+    if (ended) {
+      const stats = ended.stats;
+      return { start: stats.start_latency_ms / 1000, gaps: stats.underruns, stall: stats.stall_ms / 1000, target: stats.target_ms };
+    }
+    time += QUANTUM / CONTEXT_RATE;
+  }
+}
+
+function median(values) {
+  const sorted = [...values].sort((a, b) => a - b);
+  return sorted[Math.floor(sorted.length / 2)];
+}
+
+function run(jitters) {
+  const context = loadWorklet();
+  console.log(`${REPLIES} replies of ${REPLY_SECONDS} s in ${CHUNK_MS} ms chunks, synthesized at ${SYNTH_SPEED}x real time`);
+  console.log(
+    "jitter ms".padStart(10) + "engine".padStart(12) + "start p50 ms".padStart(14) +
+      "gaps/reply".padStart(12) + "stall ms/reply".padStart(16) + "target ms".padStart(11)
+  );
+  for (const jitterMs of jitters) {
+    const random = prng(42);
+    const replies = Array.from({ length: REPLIES }, () => replyArrivals(random, jitterMs));
+    const processor = new context.Processor();
+    const engines = {
+      chained: replies.map((arrivals) => chained(arrivals, random)),
+      scheduled: replies.map((arrivals) => scheduled(arrivals)),
+      worklet: replies.map((arrivals) => worklet(context, processor, arrivals)),
+    };
+    for (const [name, results] of Object.entries(engines)) {
+      const sum = (key) => results.reduce((total, r) => total + r[key], 0);
+      const target = results[results.length - 1].target;
+      console.log(
+        String(jitterMs).padStart(10) + name.padStart(12) +
+          (median(results.map((r) => r.start)) * 1000).toFixed(0).padStart(14) +
+          (sum("gaps") / REPLIES).toFixed(2).padStart(12) +
+          ((sum("stall") / REPLIES) * 1000).toFixed(0).padStart(16) +
+          (target === undefined ? "-" : target.toFixed(0)).padStart(11)
+      );
+    }
+  }
+}
+
+const args = process.argv.slice(2).map(Number).filter((n) => n >= 0);
+run(args.length ? args : [0, 20, 60, 150]);
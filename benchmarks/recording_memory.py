@@ -0,0 +1,88 @@
+"""Session recording memory: in-memory frame list + join vs the streaming AudioRecorder.
+
+Feeds a simulated session of 100 ms frames (speech from uploads/*.wav, looped) as fast as possible
+and reports peak traced memory and the time spent saving on stop:
+
+    python benchmarks/recording_memory.py --minutes 60
+"""
+import os
+import sys
+import glob
+import time
+import wave
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.recorder import AudioRecorder
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+FRAME_BYTES = 3200
+
+
+def source_frames() -> List[bytes]:
+    pcm = b""
+    for path in sorted(glob.glob(os.path.join(UPLOADS, "*.wav"))):
+        with wave.open(path, "rb") as wf:
+            pcm += wf.readframes(wf.getnframes())
+    return [pcm[i:i + FRAME_BYTES] for i in range(0, len(pcm) - FRAME_BYTES, FRAME_BYTES)]
+
+
+def legacy_session(directory: str, frames: List[bytes], count: int) -> float:
+    # The previous ws_handler path: append every frame, copy the list under a lock, join on save
+    recorded_frames: List[bytes] = []
+    frames_lock = threading.Lock()
+    for i in range(count):
+        # Each captured frame is a fresh bytes object, as apply_mic_gain returns
+        with frames_lock:
+            recorded_frames.append(bytes(memoryview(frames[i % len(frames)])))
+    started = time.perf_counter()
+    with frames_lock:
+        copied = recorded_frames.copy()
+        recorded_frames.clear()
+    with wave.open(os.path.join(directory, "legacy.wav"), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(b"".join(copied))
+    return time.perf_counter() - started
+
+
+def recorder_session(directory: str, frames: List[bytes], count: int) -> float:
+    recorder = AudioRecorder(directory, max_seconds=count / 10 + 1, compression="wav")
+    recorder.start()
+    for i in range(count):
+        recorder.write(bytes(memoryview(frames[i % len(frames)])))
+    started = time.perf_counter()
+    recorder.finish()
+    return time.perf_counter() - started
+
+
+def measure(session: Callable, frames: List[bytes], count: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        tracemalloc.start()
+        save_seconds = session(tmp, frames, count)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+    return peak, save_seconds, size
+
+
+def run(args) -> None:
+    frames = source_frames()
+    count = int(args.minutes * 60 * 10)
+    print(f"{args.minutes:g} minute session: {count} frames, {count * FRAME_BYTES / 2**20:.0f} MB of PCM")
+    print(f"{'mode':<12}{'peak (MB)':>12}{'save on stop (ms)':>20}{'file (MB)':>12}")
+    for name, session in (("in-memory", legacy_session), ("recorder", recorder_session)):
+        peak, save_seconds, size = measure(session, frames, count)
+        print(f"{name:<12}{peak / 2**20:>12.1f}{save_seconds * 1000:>20.0f}{size / 2**20:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=60)
+    run(parser.parse_args())
@@ -0,0 +1,128 @@
+"""Response cache benchmark: repeated FAQ voice turns with and without the LLM + TTS cache.
+
+Prompts are drawn from a Zipf distribution over a small FAQ set, with casing and punctuation
+variations, and answered through a fake streaming LLM and a local fake Murf server:
+
+    python benchmarks/response_cache.py --turns 200 --faqs 20
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_murf import FakeMurfServer
+from benchmarks.turn_latency import FakeStreamingModel
+from services.gemini import sentence_stream, stream_generate
+from services.murf import AudioCapture, MurfPool, replay_audio
+from services.response_cache import ResponseCache, TtsCache
+
+VOICE = ("fake-key", "en-IN-alia", 1.0)
+CONTEXT = "casual|no-kb"
+TOPICS = ["opening hours", "refund policy", "shipping times", "password reset", "plan pricing", "data export",
+          "team invites", "api limits", "billing dates", "account deletion", "mobile app", "integrations",
+          "security audits", "support hours", "trial length", "invoices", "language support", "uptime",
+          "student discounts", "data retention"]
+VARIANTS = ["What are your {}?", "what are your {}", "What are your {} ?!", "WHAT ARE YOUR {}"]
+
+
+class Collector:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_audio: Optional[float] = None
+
+    async def send_json(self, message):
+        if message.get("data") and self.first_audio is None:
+            self.first_audio = time.perf_counter() - self.started
+
+
+def workload(turns: int, faqs: int, skew: float, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    topics = [TOPICS[i % len(TOPICS)] + (f" {i // len(TOPICS)}" if i >= len(TOPICS) else "") for i in range(faqs)]
+    weights = [1 / (rank + 1) ** skew for rank in range(faqs)]
+    return [rng.choice(VARIANTS).format(rng.choices(topics, weights)[0]) for _ in range(turns)]
+
+
+async def voice_turn(prompt: str, pool: MurfPool, args, llm: Optional[ResponseCache], tts: Optional[TtsCache]):
+    # Mirrors stream_gemini_response + speak_text for a voice turn
+    collector = Collector()
+    calls = {"llm": 0, "tts": 0}
+    answer = llm.get(prompt, CONTEXT) if llm else None
+    if answer is None:
+        model = FakeStreamingModel(f"Here is what you need to know about {prompt.lower().strip('?! ')}. " * 4,
+                                   args.first_token_delay, args.token_delay)
+        parts: List[str] = []
+
+        async def deltas():
+            async for delta in stream_generate(model, []):
+                parts.append(delta)
+                yield delta
+
+        capture = AudioCapture()
+        async with pool.connection(*VOICE) as murf:
+            await murf.speak(sentence_stream(deltas()), collector.send_json, capture=capture)
+        calls = {"llm": 1, "tts": 1}
+        if llm:
+            llm.put(prompt, CONTEXT, "".join(parts))
+        if tts and capture.complete:
+            tts.put(capture.text, VOICE[1], VOICE[2], capture.chunks)
+    else:
+        chunks = tts.get(answer, VOICE[1], VOICE[2]) if tts else None
+        if chunks:
+            await replay_audio(chunks, collector.send_json)
+        else:
+            async with pool.connection(*VOICE) as murf:
+                await murf.speak(answer, collector.send_json)
+            calls["tts"] = 1
+    return collector.first_audio, time.perf_counter() - collector.started, calls
+
+
+async def run_mode(prompts: List[str], args, url: str, cached: bool):
+    pool = MurfPool(base_url=url)
+    with tempfile.TemporaryDirectory() as tmp:
+        llm = ResponseCache(os.path.join(tmp, "llm"), similarity=args.similarity) if cached else None
+        tts = TtsCache(os.path.join(tmp, "tts")) if cached else None
+        first_audio, totals, calls = [], [], {"llm": 0, "tts": 0}
+        for prompt in prompts:
+            first, total, turn_calls = await voice_turn(prompt, pool, args, llm, tts)
+            first_audio.append(first)
+            totals.append(total)
+            for name, count in turn_calls.items():
+                calls[name] += count
+        stats = (llm.snapshot(), tts.snapshot()) if cached else (None, None)
+    await pool.close()
+    return first_audio, totals, calls, stats
+
+
+async def run(args) -> None:
+    server = FakeMurfServer(handshake_delay=0.05, first_chunk_delay=args.tts_delay)
+    url = await server.start()
+    prompts = workload(args.turns, args.faqs, args.skew)
+    print(f"{args.turns} voice turns over {args.faqs} FAQs (zipf s={args.skew:g})")
+    print(f"{'mode':<10}{'llm calls':>10}{'tts calls':>10}{'first audio p50 (ms)':>22}{'turn p50 (ms)':>15}")
+    for name, cached in (("uncached", False), ("cached", True)):
+        first_audio, totals, calls, (llm, tts) = await run_mode(prompts, args, url, cached)
+        print(f"{name:<10}{calls['llm']:>10}{calls['tts']:>10}"
+              f"{statistics.median(first_audio) * 1000:>22.0f}{statistics.median(totals) * 1000:>15.0f}")
+    for tier, stats in (("llm", llm), ("tts", tts)):
+        print(f"{tier} cache: hit rate {stats['hit_rate']:.1%}, {stats['bytes_saved'] / 1024:.0f} KB served from cache, "
+              f"{stats['entries']} entries / {stats['bytes'] / 1024:.0f} KB on disk")
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--faqs", type=int, default=20)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--similarity", type=float, default=0.0)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--tts-delay", type=float, default=0.1)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,82 @@
+"""Knowledge base retrieval benchmark on a synthetic corpus of PDF-sized documents.
+
+Reports index build time, query latency and prompt size against the legacy
+"first 2000 characters of every file" context:
+
+    python benchmarks/retrieval.py --documents 300 --words 6000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.retrieval import KnowledgeIndex, estimate_tokens
+
+SEED_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "uploads", "knowledge_base", "Cloud Computing - Unit1.pdf.txt")
+TOPICS = ["virtualization", "kubernetes", "serverless", "encryption", "networking", "storage",
+          "databases", "monitoring", "billing", "compliance", "scheduling", "caching"]
+
+
+def build_corpus(documents: int, words: int, rng: random.Random):
+    vocabulary = open(SEED_FILE, encoding="utf-8").read().split() if os.path.exists(SEED_FILE) else TOPICS * 50
+    corpus = {}
+    for i in range(documents):
+        topic = TOPICS[i % len(TOPICS)]
+        body = rng.choices(vocabulary, k=words)
+        for _ in range(words // 100):
+            body[rng.randrange(words)] = topic
+        corpus[f"doc_{i:04d}_{topic}.pdf"] = " ".join(body)
+    return corpus
+
+
+def legacy_context(corpus) -> str:
+    context = "\n\nKnowledge Base Content:\n"
+    for filename, content in corpus.items():
+        context += f"\nFile: {filename}\n{content[:2000]}...\n"
+    return context
+
+
+def run(args) -> None:
+    rng = random.Random(7)
+    corpus = build_corpus(args.documents, args.words, rng)
+    queries = [f"how does {topic} work in the cloud" for topic in TOPICS] * (args.queries // len(TOPICS) + 1)
+    legacy = legacy_context(corpus)
+
+    print(f"corpus: {len(corpus)} documents, {sum(len(t) for t in corpus.values()) / 1e6:.1f}M chars")
+    print(f"{'index':<12}{'build (s)':>10}{'chunks':>9}{'query p50 (ms)':>16}{'query p95 (ms)':>16}{'prompt tokens':>15}")
+    print(f"{'legacy':<12}{'-':>10}{'-':>9}{'-':>16}{'-':>16}{estimate_tokens(legacy):>15}")
+    for name, use_embeddings in (("bm25", False), ("bm25+hash", True)):
+        index = KnowledgeIndex(use_embeddings=use_embeddings)
+        started = time.perf_counter()
+        for filename, text in corpus.items():
+            index.add_document(filename, text)
+        build = time.perf_counter() - started
+        latencies, sizes = [], []
+        for query in queries[:args.queries]:
+            started = time.perf_counter()
+            context = index.build_context(query)
+            latencies.append(time.perf_counter() - started)
+            sizes.append(estimate_tokens(context))
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{name:<12}{build:>10.2f}{len(index):>9}{statistics.median(latencies) * 1000:>16.2f}"
+              f"{p95 * 1000:>16.2f}{statistics.median(sizes):>15.0f}")
+
+    started = time.perf_counter()
+    for filename in list(corpus)[:10]:
+        index.remove_document(filename)
+    print(f"incremental remove: {(time.perf_counter() - started) / 10 * 1000:.1f}ms per document")
+    print(f"prompt size reduction: {estimate_tokens(legacy) / max(1, statistics.median(sizes)):.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=300)
+    parser.add_argument("--words", type=int, default=6000)
+    parser.add_argument("--queries", type=int, default=200)
+    run(parser.parse_args())
@@ -0,0 +1,114 @@
+"""Search-intent turn latency: sequential search vs speculative search started from partial transcripts.
+
+Partial transcripts arrive word by word, the formatted final follows after the end-of-turn delay, and
+search, knowledge base retrieval and the streaming LLM are fakes with fixed latencies. Latency is
+measured from the final transcript:
+
+    python benchmarks/speculative_search.py --search-latency 0.8 --word-interval 0.25
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.turn_latency import FakeStreamingModel
+from services.gemini import search_context, stream_generate
+from services.speculative import SpeculativeSearch
+
+UTTERANCES = [
+    ("can you search for the latest news about electric cars", "Can you search for the latest news about electric cars?"),
+    ("find me a good recipe for vegetable lasagna", "Find me a good recipe for vegetable lasagna."),
+    ("look up the weather in paris this weekend", "Look up the weather in Paris this weekend."),
+]
+CHANGED_INTENT = ("search for flights to tokyo", "Search for flights... actually never mind, tell me a joke.")
+NO_INTENT = "Actually, never mind. Tell me a joke."
+
+
+class FakeSearch:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def __call__(self, query: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return f"Here are the top search results:\n1. Result: about {query} (Source: https://example.com)\n"
+
+
+async def first_token(args, contents) -> float:
+    started = time.perf_counter()
+    model = FakeStreamingModel("Here is a short grounded answer. " * 3, args.first_token_delay, 0.01)
+    async for _ in stream_generate(model, contents):
+        return time.perf_counter() - started
+    return float("nan")
+
+
+async def speak_partials(partial: str, args, spec: SpeculativeSearch = None) -> None:
+    words = partial.split()
+    for i in range(1, len(words) + 1):
+        await asyncio.sleep(args.word_interval)
+        if spec:
+            spec.update(" ".join(words[:i]))
+    await asyncio.sleep(args.final_delay)
+
+
+async def turn(mode: str, partial: str, final: str, args) -> Tuple[float, int]:
+    search = FakeSearch(args.search_latency)
+    spec = SpeculativeSearch(search, debounce=args.debounce) if mode == "speculative" else None
+    await speak_partials(partial, args, spec)
+    started = time.perf_counter()
+    if mode == "raw results":
+        # The previous path: search, then read the raw result list out; nothing else overlaps it
+        await search(final)
+        return time.perf_counter() - started, search.calls
+    contents = [{"role": "user", "parts": [{"text": final}]}]
+    knowledge = asyncio.ensure_future(asyncio.sleep(args.kb_latency))
+    if mode == "sequential":
+        await knowledge
+        results = await search(final)
+    else:
+        results = await spec.result(final)
+        await knowledge
+    if results:
+        contents[0]["parts"].append({"text": search_context(results)})
+    return time.perf_counter() - started + await first_token(args, contents), search.calls
+
+
+async def run(args) -> None:
+    print(f"search {args.search_latency * 1000:.0f} ms, kb {args.kb_latency * 1000:.0f} ms, "
+          f"LLM first token {args.first_token_delay * 1000:.0f} ms, words every {args.word_interval * 1000:.0f} ms, "
+          f"final transcript {args.final_delay * 1000:.0f} ms after the last word")
+    print(f"{'mode':<14}{'first response p50 (ms)':>25}{'searches/turn':>15}")
+    for mode in ("raw results", "sequential", "speculative"):
+        latencies: List[float] = []
+        searches: List[int] = []
+        for partial, final in UTTERANCES * args.repeat:
+            latency, calls = await turn(mode, partial, final, args)
+            latencies.append(latency)
+            searches.append(calls)
+        print(f"{mode:<14}{statistics.median(latencies) * 1000:>25.0f}{statistics.mean(searches):>15.2f}")
+
+    # Intent that disappears in the final transcript: the speculative search must not be used
+    search = FakeSearch(args.search_latency)
+    spec = SpeculativeSearch(search, debounce=args.debounce)
+    await speak_partials(CHANGED_INTENT[0], args, spec)
+    results = await spec.result(NO_INTENT)
+    print(f"intent dropped in final: results used {results is not None}, searches issued {search.calls}, "
+          f"cancelled {spec.stats['cancelled']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--search-latency", type=float, default=0.8)
+    parser.add_argument("--kb-latency", type=float, default=0.1)
+    parser.add_argument("--first-token-delay", type=float, default=0.35)
+    parser.add_argument("--word-interval", type=float, default=0.25)
+    parser.add_argument("--final-delay", type=float, default=0.4)
+    parser.add_argument("--debounce", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=2)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,205 @@
+"""Browser-capture STT load test: N simulated clients replay the WAV files in uploads/ against a stub STT server.
+
+In-process (drives AsyncStreamingSTT directly, one asyncio session per client):
+
+    python benchmarks/stt_load.py --clients 50 --speedup 4 --frame-delay 0.002
+
+Against a running app (start it with NOVAFLOW_AAI_STREAMING_URL=ws://127.0.0.1:8765/v3/ws and any aai_api_key):
+
+    python benchmarks/stt_load.py --clients 20 --app-url ws://127.0.0.1:8000 --stub-port 8765
+"""
+import os
+import sys
+import glob
+import json
+import time
+import wave
+import asyncio
+import argparse
+import threading
+from typing import Dict, List
+
+import aiohttp
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_assemblyai import FakeAssemblyAIServer
+from services.stt import AsyncStreamingSTT
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+FRAME_BYTES = 1600 * 2  # 100 ms of 16 kHz mono Int16, the size the capture worklet posts
+
+
+def load_frames() -> List[List[bytes]]:
+    recordings = []
+    for path in sorted(glob.glob(os.path.join(UPLOADS, "*.wav"))):
+        with wave.open(path, "rb") as wf:
+            if wf.getframerate() != 16000 or wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+                continue
+            pcm = wf.readframes(wf.getnframes())
+        recordings.append([pcm[i:i + FRAME_BYTES] for i in range(0, len(pcm), FRAME_BYTES)])
+    if not recordings:
+        raise SystemExit(f"No 16 kHz mono 16-bit WAV files found in {UPLOADS}")
+    return recordings
+
+
+class ClientResult:
+    def __init__(self):
+        self.frames = 0
+        self.dropped = 0
+        self.partial_latencies: List[float] = []
+        self.final_latency = float("nan")
+        self.transcript = ""
+        self.error = ""
+
+
+async def replay(frames: List[bytes], speedup: float, send, submitted: Dict[int, float]) -> None:
+    # Paces frames at (real time / speedup) against a fixed schedule so slow sends do not drift the clock
+    interval = 0.1 / speedup
+    started = time.perf_counter()
+    audio_ms = 0
+    for i, frame in enumerate(frames):
+        delay = started + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        audio_ms += len(frame) * 1000 // (16000 * 2)
+        submitted[audio_ms] = time.perf_counter()
+        await send(frame)
+
+
+def partial_latency(submitted: Dict[int, float], audio_ms: int) -> float:
+    # Time from submitting the frame that completed `audio_ms` of audio to seeing its transcript
+    sent_at = submitted.get(audio_ms) or submitted[min(submitted, key=lambda ms: abs(ms - audio_ms))]
+    return time.perf_counter() - sent_at
+
+
+async def in_process_client(url: str, frames: List[bytes], speedup: float, queue_frames: int) -> ClientResult:
+    result = ClientResult()
+    submitted: Dict[int, float] = {}
+
+    async def on_event(event):
+        if event.type == "Turn" and event.transcript:
+            result.partial_latencies.append(partial_latency(submitted, event.data.get("audio_ms", 0)))
+            result.transcript = event.transcript
+        elif event.type == "error":
+            result.error = event.data.get("error", "")
+
+    stt = AsyncStreamingSTT("stub-key", on_event, url=url, queue_frames=queue_frames)
+    await stt.start()
+    await replay(frames, speedup, stt.send_audio, submitted)
+    stopped_at = time.perf_counter()
+    await stt.stop(timeout=30)
+    result.final_latency = time.perf_counter() - stopped_at
+    result.frames = len(frames)
+    result.dropped = stt.frames_dropped
+    return result
+
+
+async def app_client(app_url: str, frames: List[bytes], speedup: float) -> ClientResult:
+    result = ClientResult()
+    submitted: Dict[int, float] = {}
+    http_url = app_url.replace("ws://", "http://").replace("wss://", "https://")
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{http_url}/new_chat") as response:
+            chat_id = (await response.json())["chat_id"]
+    async with websockets.connect(f"{app_url}/ws?chat_id={chat_id}", max_size=None) as ws:
+        final = asyncio.get_running_loop().create_future()
+        started = asyncio.Event()
+
+        async def receive():
+            async for raw in ws:
+                try:
+                    message = json.loads(raw)
+                except ValueError:
+                    if raw == "Started transcription":
+                        started.set()
+                    continue
+                if not started.is_set():
+                    # Connect-time errors (e.g. missing API keys for other providers) are not STT failures
+                    continue
+                if message.get("type") == "user_message":
+                    if message.get("is_final"):
+                        result.transcript = message["data"]
+                        if not final.done():
+                            final.set_result(time.perf_counter())
+                    elif submitted:
+                        result.partial_latencies.append(time.perf_counter() - max(submitted.values()))
+                elif message.get("type") == "error" and not final.done():
+                    result.error = message.get("data", "")
+                    final.set_result(time.perf_counter())
+
+        receiver = asyncio.create_task(receive())
+        await ws.send("start_stream")
+        await asyncio.wait_for(started.wait(), timeout=10)
+        await replay(frames, speedup, ws.send, submitted)
+        stopped_at = time.perf_counter()
+        await ws.send("stop")
+        try:
+            result.final_latency = await asyncio.wait_for(final, timeout=30) - stopped_at
+        except asyncio.TimeoutError:
+            result.error = "no final transcript within 30s"
+        receiver.cancel()
+    result.frames = len(frames)
+    return result
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def run(args) -> int:
+    recordings = load_frames()
+    server = FakeAssemblyAIServer(frame_delay=args.frame_delay)
+    url = await server.start(port=args.stub_port)
+    threads_before = threading.active_count()
+    print(f"stub STT server at {url}; {len(recordings)} recordings, "
+          f"{sum(len(r) for r in recordings) / 10:.1f}s of audio per pass")
+
+    clients = []
+    for i in range(args.clients):
+        frames = recordings[i % len(recordings)]
+        if args.app_url:
+            clients.append(app_client(args.app_url, frames, args.speedup))
+        else:
+            clients.append(in_process_client(url, frames, args.speedup, args.queue_frames))
+    started = time.perf_counter()
+    results = await asyncio.gather(*clients, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    threads_after = threading.active_count()
+    await server.stop()
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    results = [r for r in results if not isinstance(r, Exception)]
+    errors = [r for r in results if r.error or not r.transcript]
+    partials = [latency for r in results for latency in r.partial_latencies]
+    finals = [r.final_latency for r in results if r.final_latency == r.final_latency]
+    frames = sum(r.frames for r in results)
+    dropped = sum(r.dropped for r in results)
+
+    print(f"{'clients':<26}{args.clients:>10}")
+    print(f"{'peak concurrent sessions':<26}{server.peak_active:>10}")
+    print(f"{'audio throughput (x RT)':<26}{server.audio_bytes / (16000 * 2) / elapsed:>10.1f}")
+    print(f"{'frames sent / dropped':<26}{f'{frames} / {dropped}':>10}")
+    print(f"{'partial p50 / p95 (ms)':<26}{f'{percentile(partials, 0.5) * 1000:.0f} / {percentile(partials, 0.95) * 1000:.0f}':>10}")
+    print(f"{'final p50 / p95 (ms)':<26}{f'{percentile(finals, 0.5) * 1000:.0f} / {percentile(finals, 0.95) * 1000:.0f}':>10}")
+    print(f"{'threads before / after':<26}{f'{threads_before} / {threads_after}':>10}")
+    for failure in failures[:5]:
+        print(f"FAIL: {failure!r}")
+    for result in errors[:5]:
+        print(f"FAIL: client error {result.error or 'empty transcript'}")
+    return 1 if failures or errors else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--speedup", type=float, default=4.0, help="replay faster than real time")
+    parser.add_argument("--frame-delay", type=float, default=0.0, help="stub processing time per frame")
+    parser.add_argument("--queue-frames", type=int, default=50)
+    parser.add_argument("--app-url", default="", help="drive a running app's /ws instead of AsyncStreamingSTT")
+    parser.add_argument("--stub-port", type=int, default=0)
+    sys.exit(asyncio.run(run(parser.parse_args())))
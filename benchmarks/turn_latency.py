@@ -0,0 +1,141 @@
+"""Turn latency benchmark: sequential generate-then-speak vs sentence-pipelined streaming.
+
+Uses fake streaming LLM and Murf backends, so no API keys are needed:
+
+    python benchmarks/turn_latency.py --turns 5 --token-delay 0.03
+"""
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.gemini import sentence_stream, stream_generate
+from services.murf import stream_text_to_speech, relay_murf_audio
+from services.timing import TurnTimer
+
+REPLY = ("Cloud computing delivers computing services over the internet. "
+         "It includes servers, storage, databases, networking and software, "
+         "so teams can innovate faster and scale flexibly. "
+         "You typically pay only for the resources you use, which lowers operating costs. "
+         "The main service models are infrastructure, platform and software as a service. ") * 2
+
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeStreamingModel:
+    def __init__(self, reply: str, first_token_delay: float, token_delay: float, chunk_words: int = 4):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.chunk_words = chunk_words
+
+    def generate_content(self, contents, stream=False):
+        words = self.reply.split(" ")
+        chunks = [" ".join(words[i:i + self.chunk_words]) + " " for i in range(0, len(words), self.chunk_words)]
+        if not stream:
+            time.sleep(self.first_token_delay + self.token_delay * len(chunks))
+            return FakeChunk("".join(chunks))
+
+        def generate():
+            time.sleep(self.first_token_delay)
+            for chunk in chunks:
+                yield FakeChunk(chunk)
+                time.sleep(self.token_delay)
+        return generate()
+
+
+class FakeMurfSocket:
+    # Synthesizes each text message in order: a fixed startup latency, then one audio chunk per 40 chars,
+    # then an is_final marker (as Murf does per text message)
+    def __init__(self, startup_latency: float, chunk_interval: float):
+        self.startup_latency = startup_latency
+        self.chunk_interval = chunk_interval
+        self.texts: asyncio.Queue = asyncio.Queue()
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self._synthesize())
+
+    async def send(self, message: str) -> None:
+        await self.texts.put(json.loads(message))
+
+    async def recv(self) -> str:
+        return await self.outbox.get()
+
+    async def _synthesize(self):
+        while True:
+            message = await self.texts.get()
+            text = message.get("text", "")
+            if text:
+                await asyncio.sleep(self.startup_latency)
+                for _ in range(max(1, len(text) // 40)):
+                    await asyncio.sleep(self.chunk_interval)
+                    await self.outbox.put(json.dumps({"audio": base64.b64encode(b"\x00" * 4410).decode(), "is_final": False}))
+            await self.outbox.put(json.dumps({"audio": "", "is_final": True}))
+
+    def close(self):
+        self.worker.cancel()
+
+
+async def discard(_message):
+    pass
+
+
+async def sequential_turn(model, murf) -> TurnTimer:
+    timer = TurnTimer("sequential")
+    response = await asyncio.to_thread(model.generate_content, [], False)
+    timer.mark("first_token")
+    await murf.send(json.dumps({"text": response.text}))
+    await relay_murf_audio(murf, discard, timer=timer)
+    timer.mark("complete")
+    return timer
+
+
+async def streaming_turn(model, murf) -> TurnTimer:
+    timer = TurnTimer("streaming")
+
+    async def deltas():
+        async for delta in stream_generate(model, []):
+            timer.mark("first_token")
+            yield delta
+
+    await stream_text_to_speech(murf, sentence_stream(deltas()), discard, timer=timer)
+    timer.mark("complete")
+    return timer
+
+
+async def run(args):
+    model = FakeStreamingModel(REPLY, args.first_token_delay, args.token_delay)
+    results = {}
+    for name, turn in (("sequential", sequential_turn), ("streaming", streaming_turn)):
+        first_audio, complete = [], []
+        for _ in range(args.turns):
+            murf = FakeMurfSocket(args.tts_startup, args.tts_chunk_interval)
+            timer = await turn(model, murf)
+            murf.close()
+            first_audio.append(timer.get("first_audio"))
+            complete.append(timer.get("complete"))
+        results[name] = (statistics.median(first_audio), statistics.median(complete))
+
+    print(f"{'mode':<12}{'first audio (ms)':>20}{'turn total (ms)':>20}")
+    for name, (first_audio, complete) in results.items():
+        print(f"{name:<12}{first_audio * 1000:>20.0f}{complete * 1000:>20.0f}")
+    speedup = results["sequential"][0] / results["streaming"][0]
+    print(f"time-to-first-audio speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.03)
+    parser.add_argument("--tts-startup", type=float, default=0.25)
+    parser.add_argument("--tts-chunk-interval", type=float, default=0.02)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,106 @@
+"""Voice activity detection and local endpointing: accuracy and latency over the WAVs in uploads/.
+
+Each recording is streamed in 100 ms frames followed by a 2 s noise tail at the recording's own
+noise level. Reference speech frames come from an offline pass that knows the whole file (noise
+floor = 10th percentile of frame energy, speech = 12 dB above it):
+
+    python benchmarks/vad_endpointing.py --modes energy webrtc --end-silence-ms 800
+"""
+import os
+import sys
+import glob
+import time
+import wave
+import argparse
+from typing import List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.vad import FULL_SCALE_DB, Endpointer, webrtcvad
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+FRAME = 1600
+TAIL_FRAMES = 20
+
+
+def frame_db(frames: np.ndarray) -> np.ndarray:
+    x = frames.astype(np.float32)
+    return 10 * np.log10(np.mean(x * x, axis=1) + 1e-3) - FULL_SCALE_DB
+
+
+def load(path: str, noise_db: float, seed: int) -> Tuple[List[bytes], np.ndarray]:
+    with wave.open(path, "rb") as wf:
+        pcm = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    frames = pcm[:len(pcm) // FRAME * FRAME].reshape(-1, FRAME)
+    energies = frame_db(frames)
+    floor = np.percentile(energies[energies > -80], 10)
+    reference = energies > floor + 12
+    rng = np.random.default_rng(seed)
+    tail_rms = 10 ** ((floor + FULL_SCALE_DB) / 20)
+    stream = np.concatenate([pcm[:frames.size], rng.normal(0, tail_rms, FRAME * TAIL_FRAMES)])
+    if noise_db is not None:
+        stream = stream + rng.normal(0, 10 ** ((noise_db + FULL_SCALE_DB) / 20), stream.size)
+    stream = np.clip(stream, -32768, 32767).astype(np.int16)
+    reference = np.concatenate([reference, np.zeros(TAIL_FRAMES, dtype=bool)])
+    return [stream[i:i + FRAME].tobytes() for i in range(0, stream.size, FRAME)], reference
+
+
+def evaluate(mode: str, args, noise_db) -> dict:
+    totals = {"speech": 0, "speech_sent": 0, "silence": 0, "silence_suppressed": 0, "premature": 0,
+              "missed": 0, "latencies": [], "cpu": 0.0, "frames": 0}
+    for seed, path in enumerate(sorted(glob.glob(os.path.join(UPLOADS, "*.wav")))):
+        frames, reference = load(path, noise_db, seed)
+        endpointer = Endpointer(mode=mode, end_silence_ms=args.end_silence_ms, min_speech_ms=args.min_speech_ms)
+        sent = np.zeros(len(frames), dtype=bool)
+        eot = None
+        for i, frame in enumerate(frames):
+            started = time.perf_counter()
+            result = endpointer.process(frame)
+            totals["cpu"] += time.perf_counter() - started
+            # Pre-roll frames flushed at an onset belong to earlier indices
+            for back in range(len(result.frames)):
+                sent[i - back] = True
+            if result.end_of_turn and eot is None:
+                eot = i
+        totals["frames"] += len(frames)
+        last_speech = int(np.flatnonzero(reference)[-1]) if reference.any() else -1
+        totals["speech"] += int(reference.sum())
+        totals["speech_sent"] += int((reference & sent).sum())
+        totals["silence"] += int((~reference).sum())
+        totals["silence_suppressed"] += int((~reference & ~sent).sum())
+        if eot is None:
+            totals["missed"] += 1
+        elif eot < last_speech:
+            totals["premature"] += 1
+        else:
+            totals["latencies"].append((eot - last_speech) * 100)
+    return totals
+
+
+def run(args) -> None:
+    files = len(glob.glob(os.path.join(UPLOADS, "*.wav")))
+    print(f"{files} recordings, end-of-turn after {args.end_silence_ms} ms silence, min speech {args.min_speech_ms} ms")
+    print(f"{'mode':<8}{'noise':>8}{'speech sent':>13}{'silence cut':>13}{'EOT p50/max (ms)':>18}"
+          f"{'early':>7}{'missed':>8}{'us/frame':>10}")
+    for mode in args.modes:
+        if mode == "webrtc" and webrtcvad is None:
+            print(f"{mode:<8} skipped: pip install webrtcvad")
+            continue
+        for noise_db in (None, args.noise_db):
+            t = evaluate(mode, args, noise_db)
+            latencies = t["latencies"] or [float("nan")]
+            print(f"{mode:<8}{'as-is' if noise_db is None else f'{noise_db:g}dB':>8}"
+                  f"{t['speech_sent'] / t['speech']:>13.1%}{t['silence_suppressed'] / t['silence']:>13.1%}"
+                  f"{f'{np.median(latencies):.0f}/{max(latencies):.0f}':>18}{t['premature']:>7}{t['missed']:>8}"
+                  f"{t['cpu'] / t['frames'] * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["energy", "webrtc"])
+    parser.add_argument("--end-silence-ms", type=int, default=800)
+    parser.add_argument("--min-speech-ms", type=int, default=300)
+    parser.add_argument("--noise-db", type=float, default=-50, help="added white noise level for the noisy pass")
+    run(parser.parse_args())
@@ -1,38 +1,62 @@
 import os
-import wave
 import json
 import logging
 import asyncio
 import threading
-from datetime import datetime
 from typing import Optional, List, Dict, Any
 import re
+import hmac
 import time
-import numpy as np
 
 import pyaudio
 import assemblyai as aai
-from fastapi import FastAPI, WebSocket, Request, Query, WebSocketException, UploadFile, File
+from fastapi import Depends, FastAPI, HTTPException, WebSocket, Request, Query, WebSocketException, UploadFile, File
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.requests import HTTPConnection
+from starlette.websockets import WebSocketDisconnect, WebSocketState
 from assemblyai.streaming.v3 import (
     StreamingClient,
     StreamingClientOptions,
     StreamingParameters,
     StreamingEvents,
 )
-from google.generativeai import GenerativeModel, configure
-import websockets
 from dotenv import load_dotenv
-import aiohttp
-import PyPDF2
+
+from services.executor import executor
+from services.batch_stt import BatchTranscriber
+from services.ingest import IngestionManager, UploadTooLarge, stream_upload_to_disk
+from services.knowledge import KnowledgeStore
+from services.files import remove_files
+from services.http_client import HttpClient, HttpError, TtlCache, WebhookQueue
+from services.history import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, create_history_store
+from services.logs import configure_logging, dropped_records
+from services.admission import ProviderBusy, scheduler
+from services.audio_format import LEGACY_FORMAT, AudioFormat, negotiate, parse_codecs, parse_rates
+from services.metrics import (ACTIVE_SESSIONS, INTERRUPTIONS, PLAYBACK_REPORTS, PLAYBACK_STALL, PLAYBACK_START,
+                              PLAYBACK_UNDERRUNS, PROVIDER_REQUESTS, registry as metrics_registry)
+from services.gemini import GeminiStreamError, gemini_model, search_context, sentence_stream, stream_generate
+from services.murf import AudioCapture, murf_pool, replay_audio
+from services.providers import FAKED, FakeSearch, FakeStreamingClient, TavilySearch, fake_api_key, is_fake, quota_snapshot
+from services.response_cache import ResponseCache, TtsCache
+from services.recorder import AudioRecorder, cleanup_recordings, is_recording_name, recording_dir, recording_dirs
+from services.stt import AsyncStreamingSTT, snapshot as stt_snapshot
+from services.vad import Endpointer
+from services.mic_dsp import MicProcessor
+from services.intents import router as intent_router
+from services.memory import ContextBudget, ContextStats, ConversationMemory, gemini_summarizer
+from services.speculative import SpeculativeSearch
+from services.state import create_state_backend
+from services.tenants import TOKEN_COOKIE, TenantAuthError, TenantContext, TenantRegistry, request_token
+from services.timing import TurnTimer
 
 # Load environment variables
 load_dotenv()
 
-# Logging configuration
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+# Logging goes through a queue drained by a background thread (NOVAFLOW_LOG_LEVEL, NOVAFLOW_LOG_LEVELS)
+log_listener = configure_logging()
 log = logging.getLogger("novaflow")
 
 # FastAPI app
@@ -52,102 +76,257 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 settings_store = {"theme": "dark", "accentColor": "orange"}
 
+@app.on_event("startup")
+async def load_knowledge_base():
+    asyncio.create_task(executor.run_io("kb_load", knowledge_store.load))
+    asyncio.create_task(executor.run_io("recording_cleanup", cleanup_all_recordings))
+    asyncio.create_task(executor.run_io("llm_cache_load", response_cache.load))
+    asyncio.create_task(executor.run_io("tts_cache_load", tts_cache.load))
+
+@app.on_event("startup")
+async def start_http_client():
+    await http_client.start()
+    webhook_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    for task in list(summary_tasks):
+        task.cancel()
+    await webhook_queue.close()
+    await http_client.close()
+    await murf_pool.close()
+    executor.shutdown()
+    log_listener.stop()
+
 # Directories
 UPLOAD_DIR = "uploads"
 KNOWLEDGE_BASE_DIR = os.path.join(UPLOAD_DIR, "knowledge_base")
 CHAT_DIR = os.path.join(UPLOAD_DIR, "chats")
+CACHE_DIR = os.path.join(UPLOAD_DIR, "cache")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(KNOWLEDGE_BASE_DIR, exist_ok=True)
 os.makedirs(CHAT_DIR, exist_ok=True)
 
+# Chat history store (SQLite WAL by default; NOVAFLOW_HISTORY_BACKEND=jsonl for append-only files)
+history_store = create_history_store(CHAT_DIR)
+
+# Outbound HTTP (Tavily search, Zapier webhooks) shares one pooled session for the app's lifetime
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+TEXT_ONLY_NOTICE = "Voice is busy right now; replying in text"
+http_client = HttpClient()
+search_cache = TtlCache()
+webhook_queue = WebhookQueue(http_client)
+search_provider = FakeSearch() if is_fake("search") else TavilySearch(http_client, TAVILY_SEARCH_URL)
+if FAKED:
+    log.warning(f"Using fake providers for {', '.join(sorted(FAKED))} (NOVAFLOW_FAKE_PROVIDERS); no API calls are made")
+
+# Repeated prompts and phrases: Gemini answers and Murf audio cached on disk (LRU + TTL + size cap)
+response_cache = ResponseCache(os.path.join(CACHE_DIR, "llm"))
+tts_cache = TtsCache(os.path.join(CACHE_DIR, "tts"))
+
 # Audio configuration
 SAMPLE_RATE = 16000
 CHANNELS = 1
 FORMAT = pyaudio.paInt16
 FRAMES_PER_BUFFER = 1600
 
-# In-memory storage for user settings
-USER_API_KEYS: Dict[str, str] = {}
-USER_OVERRIDE_ENV: bool = False
-USER_SETTINGS: Dict[str, Any] = {
-    "voiceId": "en-IN-alia",
-    "playbackSpeed": 1.0,
-    "conversationType": "casual",
-    "micSensitivity": 50,
-    "audioQuality": "medium",
-    "autoSaveHistory": True,
-    "includeKnowledgeBase": True,
-    "enableSearch": True,
-    "maxSearchResults": 3,
-    "enableSound": True,
-    "notificationDuration": 4,
-    "theme": "dark",
-    "accentColor": "orange"
-}
-
-# Knowledge base storage
-KNOWLEDGE_BASE: Dict[str, str] = {}
-
-# Constants
-CONTEXT_ID = "storyteller_context_27"
-MURF_WS_URL_DEFAULT = "wss://api.murf.ai/v1/speech/stream-input"
+# Per-tenant settings and API keys live in a shared state backend (NOVAFLOW_STATE_BACKEND=memory|sqlite|redis);
+# running several uvicorn workers needs sqlite (one host) or redis so every worker sees the same tenants
+tenants = TenantRegistry(create_state_backend(UPLOAD_DIR))
+# Issues tenant tokens through POST /tenants; without it no tokens can be issued over HTTP
+ADMIN_TOKEN = os.getenv("NOVAFLOW_ADMIN_TOKEN", "")
 
-# Utility Functions
-def get_chat_file(chat_id: str) -> str:
-    return os.path.join(CHAT_DIR, f"{chat_id}.json")
+# Multi-turn memory: recent turns verbatim plus a rolling per-chat summary, fitted to a prompt token budget
+conversation_memory = ConversationMemory(history_store, tenants.backend)
+context_stats = ContextStats()
+
+# Knowledge base storage (sidecars under KNOWLEDGE_BASE_DIR, rebuilt in the background at startup)
+knowledge_store = KnowledgeStore(KNOWLEDGE_BASE_DIR)
+ingestion = IngestionManager(knowledge_store)
+# Offline transcription of saved recordings into chat history and the knowledge base
+batch_transcriber = BatchTranscriber(UPLOAD_DIR, history_store, knowledge_store, http_client)
 
+# Prometheus /metrics: turn histograms and provider counters (services/metrics.py) plus the stats snapshots
+for name, snapshot in (
+    ("executor", lambda: {k: v for k, v in executor.snapshot().items() if k != "calls"}),
+    ("murf_pool", murf_pool.snapshot),
+    ("stt", stt_snapshot),
+    ("llm_cache", response_cache.snapshot),
+    ("tts_cache", tts_cache.snapshot),
+    ("http", http_client.snapshot),
+    ("search_cache", search_cache.snapshot),
+    ("webhooks", webhook_queue.snapshot),
+    ("ingestion", ingestion.snapshot),
+    ("batch_stt", batch_transcriber.snapshot),
+    ("context", context_stats.snapshot),
+    ("tenants", tenants.snapshot),
+    ("logging", lambda: {"dropped_records": dropped_records()}),
+    ("admission", scheduler.snapshot),
+):
+    metrics_registry.collector(name, snapshot)
+if FAKED:
+    metrics_registry.collector("fake_providers", quota_snapshot)
+
+# Utility Functions
 def sanitize_filename(filename: str) -> str:
     return re.sub(r'[^\w\s.-]', '', filename)
 
-def save_wav(frames: List[bytes]) -> Optional[str]:
-    if not frames:
-        return None
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = os.path.join(UPLOAD_DIR, f"recorded_audio_{ts}.wav")
-    with wave.open(path, "wb") as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(2)
-        wf.setframerate(SAMPLE_RATE)
-        wf.writeframes(b"".join(frames))
-    log.info(f"Saved audio file: {path}")
+async def request_tenant_id(connection: HTTPConnection) -> str:
+    # Raises TenantAuthError for a missing (when anonymous use is off), unknown or revoked token
+    token = request_token(connection.headers, connection.query_params, connection.cookies)
+    return await executor.run_io("tenant_auth", tenants.authenticate, token)
+
+async def authenticated_tenant(request: Request) -> str:
+    try:
+        return await request_tenant_id(request)
+    except TenantAuthError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+async def load_tenant(tenant_id: str) -> TenantContext:
+    return await executor.run_io("tenant_load", tenants.load, tenant_id)
+
+def apply_mic_gain(processor: MicProcessor, tenant: TenantContext, data: bytes) -> bytes:
+    if processor.settings_version != tenant.version:
+        processor.configure(tenant.settings.get("micSensitivity", 50) / 50.0, tenant.settings.get("micProcessing", "off"))
+        processor.settings_version = tenant.version
+    return processor.process(data)
+
+def save_recording(recorder: AudioRecorder) -> Optional[str]:
+    path = recorder.finish()
+    cleanup_recordings(recorder.directory)
     return path
 
-def save_chat_history(chat_id: str, user_query: str, ai_response: str) -> bool:
-    if not USER_SETTINGS.get("autoSaveHistory", True):
+def cleanup_all_recordings() -> int:
+    return sum(cleanup_recordings(directory) for directory in recording_dirs(UPLOAD_DIR))
+
+# Background conversation summaries, referenced until they finish so none is garbage-collected mid-run
+summary_tasks: set = set()
+
+def summary_done(task: asyncio.Task) -> None:
+    summary_tasks.discard(task)
+    if task.cancelled():
+        return
+    error = task.exception()
+    if isinstance(error, ProviderBusy):
+        log.info(f"Conversation summary deferred to a later turn: {error}")
+    elif error:
+        log.error(f"Conversation summary failed: {error}", exc_info=error)
+
+async def summarize_chat(chat_id: str, api_key: str, tenant_id: str) -> None:
+    if not await executor.run_io("memory_summary_due", conversation_memory.summary_due, chat_id, tenant_id):
+        return
+    # The summary is a Gemini call like any other, so it counts against the Gemini admission limits
+    async with scheduler.slot("gemini"):
+        await executor.run_io("memory_summarize", conversation_memory.update_summary,
+                              chat_id, gemini_summarizer(api_key), tenant_id)
+
+def save_chat_history(chat_id: str, user_query: str, ai_response: str, tenant: TenantContext) -> bool:
+    if not tenant.settings.get("autoSaveHistory", True):
         log.info(f"Chat history saving disabled for {chat_id}")
         return False
     try:
-        file = get_chat_file(chat_id)
-        history = []
-        if os.path.exists(file):
-            with open(file, "r") as f:
-                history = json.load(f)
-        entry = {
-            "timestamp": datetime.now().isoformat(),
-            "user_query": user_query,
-            "ai_response": ai_response,
-        }
-        history.append(entry)
-        with open(file, "w") as f:
-            json.dump(history, f, indent=2)
-        log.info(f"Chat history saved for {chat_id}: {entry}")
+        entry = history_store.append(chat_id, user_query, ai_response)
+        log.info(f"Chat history saved for {chat_id}: turn {entry['id']}")
         return True
     except Exception as e:
         log.error(f"Failed to save chat history for {chat_id}: {e}")
         return False
 
-def get_api_key(key_name: str, websocket: Optional[WebSocket] = None) -> str:
+def client_disconnected(websocket: WebSocket, error: Exception) -> bool:
+    # Sends to a browser that closed or dropped fail inside the Gemini and Murf relays too; those are
+    # neither provider failures nor worth reporting back over the closed socket
+    return (isinstance(error, WebSocketDisconnect) or websocket.client_state == WebSocketState.DISCONNECTED
+            or websocket.application_state == WebSocketState.DISCONNECTED)
+
+async def speak_text(websocket: WebSocket, tenant: TenantContext, text, message_type: str = "audio",
+                     timer: Optional[TurnTimer] = None) -> int:
+    voice_id = tenant.settings.get("voiceId", "en-IN-alia")
+    speed = tenant.settings.get("playbackSpeed", 1.0)
+    send_json = websocket.send_json
+    send_bytes = websocket.send_bytes if getattr(websocket.state, "binary_audio", False) else None
+    audio_format = await negotiate_audio_format(websocket, tenant)
+    if timer:
+        send_json = timer.timed_send(send_json)
+        send_bytes = timer.timed_send(send_bytes) if send_bytes else None
+    if isinstance(text, str):
+        cached = await executor.run_io("tts_cache_get", tts_cache.get, text, voice_id, speed, audio_format.murf_params)
+        if cached:
+            log.info(f"Replaying {len(cached)} cached audio chunks")
+            return await replay_audio(cached, send_json, message_type, send_bytes, audio_format)
+    capture = AudioCapture()
+    try:
+        # Raises ProviderBusy before any text is consumed when Murf is at capacity, so callers can fall back to text
+        async with scheduler.slot("murf", websocket):
+            async with murf_pool.connection(get_api_key("murf_api_key", tenant, websocket), voice_id, speed,
+                                            owner=websocket, audio_format=audio_format) as murf:
+                chunks = await murf.speak(text, send_json, message_type, timer, send_bytes, capture)
+    except asyncio.CancelledError:
+        PROVIDER_REQUESTS.inc(provider="murf", outcome="cancelled")
+        raise
+    except (GeminiStreamError, ProviderBusy):
+        # The text feeding Murf failed (counted against Gemini by the caller) or Murf was never called
+        raise
+    except Exception as e:
+        if not client_disconnected(websocket, e):
+            PROVIDER_REQUESTS.inc(provider="murf", outcome="error")
+        raise
+    PROVIDER_REQUESTS.inc(provider="murf", outcome="ok")
+    if timer:
+        timer.mark("tts_complete")
+    if capture.complete:
+        await executor.run_io("tts_cache_put", tts_cache.put, capture.text, voice_id, speed, capture.chunks,
+                              audio_format.murf_params)
+    return chunks
+
+async def negotiate_audio_format(websocket: WebSocket, tenant: TenantContext) -> AudioFormat:
+    # Binary clients and clients that sent ?codecs= get the tenant's audioQuality tier in a format they
+    # can play; other JSON clients keep Murf's 44.1 kHz WAV. Clients hear about each change of format.
+    caps = getattr(websocket.state, "audio_caps", None)
+    if caps is None:
+        return LEGACY_FORMAT
+    audio_format = negotiate(tenant.settings.get("audioQuality"), *caps)
+    if audio_format != getattr(websocket.state, "audio_format", None):
+        websocket.state.audio_format = audio_format
+        log.info(f"Audio format for this session: {audio_format}")
+        await websocket.send_json({"type": "audio_format", "data": audio_format.as_dict()})
+    return audio_format
+
+def record_playback_stats(payload: str) -> None:
+    # The browser's playback engine reports each reply once it ends or is flushed (static/playback-worklet.js)
+    try:
+        stats = json.loads(payload)
+        underruns = max(0, int(stats.get("underruns") or 0))
+        stall_ms = max(0.0, float(stats.get("stall_ms") or 0))
+        target_ms = float(stats.get("target_ms") or 0)
+        start_ms = stats.get("start_latency_ms")
+        interrupted = bool(stats.get("interrupted"))
+    except (ValueError, TypeError, AttributeError) as e:
+        log.debug(f"Ignoring malformed playback stats: {e}")
+        return
+    PLAYBACK_REPORTS.inc(outcome="interrupted" if interrupted else "completed")
+    if isinstance(start_ms, (int, float)) and start_ms >= 0:
+        PLAYBACK_START.observe(start_ms / 1000)
+    if underruns:
+        PLAYBACK_UNDERRUNS.inc(underruns)
+        PLAYBACK_STALL.inc(stall_ms / 1000)
+        log.warning(f"Client playback stalled {underruns} times ({stall_ms:.0f} ms); "
+                    f"jitter buffer now {target_ms:.0f} ms")
+    log.debug(f"Client playback: {stats}")
+
+def get_api_key(key_name: str, tenant: TenantContext, websocket: Optional[WebSocket] = None) -> str:
     env_key = os.getenv(key_name, "")
-    user_key = USER_API_KEYS.get(key_name, "")
-    if USER_OVERRIDE_ENV and user_key:
-        log.info(f"Using user-provided {key_name} from USER_API_KEYS")
+    user_key = tenant.api_keys.get(key_name, "")
+    if tenant.override_env and user_key:
+        log.debug(f"Using {key_name} provided by tenant {tenant.tenant_id}")
         return user_key
     elif env_key:
-        log.info(f"Using {key_name} from .env file")
+        log.debug(f"Using {key_name} from .env file")
         return env_key
     elif user_key:
         log.warning(f"No {key_name} in .env; falling back to user-provided key")
         return user_key
+    elif fake_api_key(key_name):
+        return fake_api_key(key_name)
     else:
         error_msg = f"No {key_name} found in .env or user-provided keys"
         log.error(error_msg)
@@ -179,37 +358,33 @@ async def settings(request: Request):
     log.info("Serving settings page")
     return templates.TemplateResponse("settings.html", {"request": request})
 
+# Chats belong to the tenant that created them; other tenants can neither list, read, use nor clear them
 @app.get("/chats")
-async def list_chats():
+async def list_chats(tenant_id: str = Depends(authenticated_tenant)):
     try:
-        chats = [f.split('.')[0] for f in os.listdir(CHAT_DIR) if f.endswith('.json')]
-        return sorted(chats, key=lambda x: int(x) if x.isdigit() else 0)
+        return await executor.run_io("chat_list", history_store.list_chats, tenant_id)
     except Exception as e:
         log.error(f"Failed to list chats: {e}")
         return []
 
 @app.post("/new_chat")
-async def new_chat():
+async def new_chat(tenant_id: str = Depends(authenticated_tenant)):
     try:
-        chats = await list_chats()
-        new_id = str(max([int(c) for c in chats if c.isdigit()] or [0]) + 1)
-        file = get_chat_file(new_id)
-        with open(file, "w") as f:
-            json.dump([], f)
-        log.info(f"Created new chat: {new_id}")
+        new_id = await executor.run_io("chat_create", history_store.create_chat, tenant_id)
+        log.info(f"Created new chat: {new_id} (tenant: {tenant_id})")
         return {"chat_id": new_id}
     except Exception as e:
         log.error(f"Failed to create new chat: {e}")
         return {"error": str(e)}
 
 @app.get("/chat_history")
-async def get_chat_history(chat_id: str = Query("1")):
+async def get_chat_history(chat_id: str = Query("1"), before: Optional[int] = Query(None),
+                           limit: int = Query(DEFAULT_PAGE_SIZE), tenant_id: str = Depends(authenticated_tenant)):
     try:
-        file = get_chat_file(chat_id)
-        if os.path.exists(file):
-            with open(file, "r") as f:
-                return json.load(f)
-        return []
+        if not await executor.run_io("chat_exists", history_store.chat_exists, chat_id, tenant_id):
+            return {"error": f"Unknown chat: {chat_id}"}
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        return await executor.run_io("chat_history_read", history_store.page, chat_id, before, limit)
     except Exception as e:
         log.error(f"Failed to read chat history for {chat_id}: {e}")
         return {"error": str(e)}
@@ -219,46 +394,19 @@ async def upload_file(file: UploadFile = File(...)):
     try:
         sanitized_filename = sanitize_filename(file.filename)
         file_path = os.path.join(KNOWLEDGE_BASE_DIR, sanitized_filename)
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        extracted_text = ""
-        if sanitized_filename.endswith(".pdf"):
-            try:
-                with open(file_path, "rb") as f:
-                    pdf = PyPDF2.PdfReader(f)
-                    extracted_text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-                if not extracted_text.strip():
-                    log.warning(f"No text extracted from PDF: {sanitized_filename}")
-                    return {
-                        "message": f"File {sanitized_filename} uploaded, but no text could be extracted.",
-                        "extracted_text": ""
-                    }
-            except Exception as e:
-                log.error(f"Failed to process PDF {sanitized_filename}: {e}")
-                return {
-                    "message": f"File {sanitized_filename} uploaded, but an error occurred: {str(e)}",
-                    "extracted_text": ""
-                }
-        elif sanitized_filename.endswith(".txt"):
-            with open(file_path, "r", encoding="utf-8") as f:
-                extracted_text = f.read()
-        else:
+        try:
+            size = await stream_upload_to_disk(file, file_path)
+        except UploadTooLarge as e:
+            log.warning(f"Rejected upload {sanitized_filename}: {e}")
+            return {"message": f"Failed to upload file {sanitized_filename}: {str(e)}", "extracted_text": ""}
+        if not sanitized_filename.endswith((".pdf", ".txt")):
             return {
                 "message": f"File {sanitized_filename} uploaded, but only .pdf and .txt are supported.",
                 "extracted_text": ""
             }
-        content_file = os.path.join(KNOWLEDGE_BASE_DIR, f"{sanitized_filename}.txt")
-        with open(content_file, "w", encoding="utf-8") as f:
-            f.write(extracted_text)
-        KNOWLEDGE_BASE[sanitized_filename] = extracted_text
-        word_count = len(extracted_text.split())
-        log.info(f"Processed file {sanitized_filename}: {word_count} words extracted")
-        text_preview = extracted_text[:200] + ("..." if len(extracted_text) > 200 else "")
-        return {
-            "message": f"File {sanitized_filename} uploaded and processed successfully! Extracted {word_count} words.",
-            "extracted_text": text_preview
-        }
+        job = ingestion.submit(sanitized_filename, file_path)
+        log.info(f"Queued ingestion job {job.job_id} for {sanitized_filename} ({size} bytes)")
+        return {**job.as_dict(), "extracted_text": ""}
     except Exception as e:
         log.error(f"Failed to upload file {file.filename}: {e}")
         return {
@@ -266,59 +414,170 @@ async def upload_file(file: UploadFile = File(...)):
             "extracted_text": ""
         }
 
+@app.get("/ingest/{job_id}")
+async def ingest_status(job_id: str):
+    job = ingestion.get(job_id)
+    if job is None:
+        return {"error": f"Unknown ingestion job: {job_id}"}
+    return {**job.as_dict(), "extracted_text": job.preview}
+
+@app.get("/ingest")
+async def list_ingest_jobs():
+    return [job.as_dict() for job in ingestion.jobs.values()]
+
+@app.post("/transcribe_recordings")
+async def transcribe_recordings(options: Dict[str, Any], tenant_id: str = Depends(authenticated_tenant)):
+    # {"files": [...], "chat_id": "1", "knowledge_base": true}; without files, every saved recording
+    tenant = await load_tenant(tenant_id)
+    api_key = get_api_key("aai_api_key", tenant)
+    if not api_key:
+        return {"error": "No aai_api_key found in .env or user-provided keys"}
+    chat_id = options.get("chat_id")
+    if chat_id is not None and not await executor.run_io("chat_exists", history_store.chat_exists, str(chat_id),
+                                                         tenant.tenant_id):
+        return {"error": f"Unknown chat: {chat_id}"}
+    paths = None
+    if options.get("files"):
+        # Only the tenant's own recordings; other files in uploads/ (state, chats, knowledge base) are refused
+        names = [str(name) for name in options["files"]]
+        invalid = [name for name in names if not is_recording_name(name)]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Not recordings: {', '.join(invalid)}")
+        directory = recording_dir(UPLOAD_DIR, tenant_id)
+        paths = [os.path.join(directory, name) for name in names]
+        missing = [os.path.basename(path) for path in paths if not os.path.isfile(path)]
+        if missing:
+            return {"error": f"Recordings not found: {', '.join(missing)}"}
+    job = batch_transcriber.submit(api_key, paths, None if chat_id is None else str(chat_id),
+                                   bool(options.get("knowledge_base", True)), tenant_id)
+    return job.as_dict()
+
+@app.get("/transcribe_recordings/{job_id}")
+async def transcribe_recordings_status(job_id: str, tenant_id: str = Depends(authenticated_tenant)):
+    job = batch_transcriber.get(job_id, tenant_id)
+    if job is None:
+        return {"error": f"Unknown transcription job: {job_id}"}
+    return job.as_dict()
+
+@app.get("/transcribe_recordings")
+async def list_transcription_jobs(tenant_id: str = Depends(authenticated_tenant)):
+    return [{k: v for k, v in job.as_dict().items() if k != "files"}
+            for job in batch_transcriber.jobs.values() if job.tenant_id == tenant_id]
+
+@app.get("/executor_stats")
+async def executor_stats():
+    return executor.snapshot()
+
+@app.get("/knowledge_base_stats")
+async def knowledge_base_stats():
+    return knowledge_store.stats()
+
+@app.get("/murf_pool_stats")
+async def murf_pool_stats():
+    return murf_pool.snapshot()
+
+@app.get("/cache_stats")
+async def cache_stats():
+    return {"llm": response_cache.snapshot(), "tts": tts_cache.snapshot()}
+
+@app.get("/http_stats")
+async def http_stats():
+    return {"client": http_client.snapshot(), "search_cache": search_cache.snapshot(), "webhooks": webhook_queue.snapshot()}
+
+@app.get("/admission_stats")
+async def admission_stats():
+    return scheduler.snapshot()
+
+@app.get("/context_stats")
+async def prompt_context_stats():
+    return context_stats.snapshot()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Collectors may touch the state backend (tenants), so rendering runs off the event loop
+    body = await executor.run_io("metrics_render", metrics_registry.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.get("/tenant_stats")
+async def tenant_stats():
+    return await executor.run_io("tenant_stats", tenants.snapshot)
+
+def require_admin(request: Request) -> None:
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    if not ADMIN_TOKEN or scheme.lower() != "bearer" or not hmac.compare_digest(credentials.strip(), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.post("/tenants", dependencies=[Depends(require_admin)])
+async def create_tenant_token(data: Dict[str, str]):
+    # {"tenant": "acme"} with "Authorization: Bearer $NOVAFLOW_ADMIN_TOKEN"; the token is shown once
+    try:
+        token = await executor.run_io("tenant_issue_token", tenants.issue_token, data.get("tenant", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"tenant": data["tenant"], "token": token}
+
+@app.post("/tenants/revoke", dependencies=[Depends(require_admin)])
+async def revoke_tenant_token(data: Dict[str, str]):
+    revoked = await executor.run_io("tenant_revoke_token", tenants.revoke_token, data.get("token", ""))
+    return {"revoked": revoked}
+
+@app.get("/login")
+async def login(token: str = Query(...)):
+    # Turns a tenant token into an HttpOnly cookie, so the browser app authenticates every request and /ws
+    try:
+        if not token:
+            raise TenantAuthError("A tenant token is required")
+        tenant_id = await executor.run_io("tenant_auth", tenants.authenticate, token)
+    except TenantAuthError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    log.info(f"Tenant {tenant_id} signed in")
+    response = RedirectResponse("/app", status_code=303)
+    response.set_cookie(TOKEN_COOKIE, token, httponly=True, samesite="strict", max_age=30 * 24 * 3600)
+    return response
+
+@app.post("/logout")
+async def logout():
+    response = RedirectResponse("/", status_code=303)
+    response.delete_cookie(TOKEN_COOKIE)
+    return response
+
+@app.get("/get_settings")
+async def get_settings(tenant_id: str = Depends(authenticated_tenant)):
+    try:
+        tenant = await load_tenant(tenant_id)
+        return tenant.as_dict()
+    except Exception as e:
+        log.error(f"Failed to read settings: {e}")
+        return {"error": str(e)}
+
 @app.post("/set_keys")
-async def set_api_keys(keys: Dict[str, str]):
-    global USER_API_KEYS, USER_OVERRIDE_ENV
+async def set_api_keys(keys: Dict[str, str], tenant_id: str = Depends(authenticated_tenant)):
     try:
-        required_keys = ["aai_api_key", "gemini_api_key", "murf_api_key", "tavily_api_key"]
-        USER_OVERRIDE_ENV = keys.get("override_env", "false").lower() == "true"
-        USER_API_KEYS.update({k: v for k, v in keys.items() if k in required_keys or k == "zapier_webhook_url"})
-        log.info("API keys updated successfully")
+        override_env = keys.get("override_env", "false").lower() == "true"
+        await executor.run_io("tenant_set_keys", tenants.set_api_keys, tenant_id, keys, override_env)
+        log.info(f"API keys updated for tenant {tenant_id}")
         return {"message": "API keys saved successfully."}
     except Exception as e:
         error_msg = f"Failed to set API keys: {str(e)}. Falling back to .env keys."
         log.error(error_msg)
-        USER_API_KEYS.update({k: v for k, v in keys.items() if k in required_keys or k == "zapier_webhook_url"})
         return {"error": error_msg}
 
 @app.post("/set_settings")
-async def set_settings(settings: Dict[str, Any]):
-    global USER_SETTINGS
+async def set_settings(settings: Dict[str, Any], tenant_id: str = Depends(authenticated_tenant)):
     try:
-        USER_SETTINGS.update(settings)
-        with open("settings.json", "w") as f:
-            json.dump(USER_SETTINGS, f, indent=2)
-        log.info("Settings updated successfully")
+        await executor.run_io("tenant_set_settings", tenants.update_settings, tenant_id, settings)
+        log.info(f"Settings updated for tenant {tenant_id}")
         return {"message": "Settings saved successfully."}
     except Exception as e:
         log.error(f"Failed to set settings: {e}")
         return {"error": str(e)}
 
 @app.post("/reset_settings")
-async def reset_settings(data: Dict[str, bool]):
-    global USER_API_KEYS, USER_OVERRIDE_ENV, USER_SETTINGS
+async def reset_settings(data: Dict[str, bool], tenant_id: str = Depends(authenticated_tenant)):
     try:
         if data.get("reset"):
-            USER_API_KEYS = {}
-            USER_OVERRIDE_ENV = False
-            USER_SETTINGS = {
-                "voiceId": "en-IN-alia",
-                "playbackSpeed": 1.0,
-                "conversationType": "casual",
-                "micSensitivity": 50,
-                "audioQuality": "medium",
-                "autoSaveHistory": True,
-                "includeKnowledgeBase": True,
-                "enableSearch": True,
-                "maxSearchResults": 3,
-                "enableSound": True,
-                "notificationDuration": 4,
-                "theme": "dark",
-                "accentColor": "orange"
-            }
-            with open("settings.json", "w") as f:
-                json.dump(USER_SETTINGS, f, indent=2)
-            log.info("Settings reset to defaults")
+            await executor.run_io("tenant_reset", tenants.reset, tenant_id)
+            log.info(f"Settings reset to defaults for tenant {tenant_id}")
             return {"message": "Settings reset successfully."}
         return {"error": "Invalid reset request"}
     except Exception as e:
@@ -326,12 +585,12 @@ async def reset_settings(data: Dict[str, bool]):
         return {"error": str(e)}
 
 @app.post("/clear_chat_history")
-async def clear_chat_history(data: Dict[str, bool]):
+async def clear_chat_history(data: Dict[str, bool], tenant_id: str = Depends(authenticated_tenant)):
     try:
         if data.get("clear"):
-            for file in os.listdir(CHAT_DIR):
-                os.remove(os.path.join(CHAT_DIR, file))
-            log.info("Chat history cleared")
+            await executor.run_io("chat_history_clear", history_store.clear, tenant_id)
+            await executor.run_io("memory_clear", conversation_memory.clear, tenant_id)
+            log.info(f"Chat history cleared for tenant {tenant_id}")
             return {"message": "Chat history cleared successfully."}
         return {"error": "Invalid clear request"}
     except Exception as e:
@@ -340,42 +599,73 @@ async def clear_chat_history(data: Dict[str, bool]):
 
 @app.post("/clear_knowledge_base")
 async def clear_knowledge_base(data: Dict[str, bool]):
-    global KNOWLEDGE_BASE
     try:
         if data.get("clear"):
-            for file in os.listdir(KNOWLEDGE_BASE_DIR):
-                os.remove(os.path.join(KNOWLEDGE_BASE_DIR, file))
-            KNOWLEDGE_BASE = {}
-            log.info("Knowledge base cleared")
+            # Running jobs would add text straight back after the clear
+            cancelled = await ingestion.cancel_all() + await batch_transcriber.cancel_all()
+            await executor.run_io("kb_clear", knowledge_store.clear)
+            await executor.run_io("batch_stt_reset", batch_transcriber.reset)
+            await executor.run_io("kb_remove_files", remove_files, KNOWLEDGE_BASE_DIR)
+            log.info(f"Knowledge base cleared ({cancelled} running jobs cancelled)")
             return {"message": "Knowledge base cleared successfully."}
         return {"error": "Invalid clear request"}
     except Exception as e:
         log.error(f"Failed to clear knowledge base: {e}")
         return {"error": str(e)}
 
-async def tavily_search(query: str, websocket: WebSocket) -> str:
-    if not USER_SETTINGS.get("enableSearch", True):
+async def tavily_search(query: str, websocket: WebSocket, tenant: TenantContext) -> str:
+    if not tenant.settings.get("enableSearch", True):
         return "Search is disabled in settings."
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            "https://api.tavily.com/search",
-            json={"api_key": get_api_key("tavily_api_key", websocket), "query": query, "max_results": USER_SETTINGS.get("maxSearchResults", 3)},
-        ) as response:
-            if response.status == 200:
-                data = await response.json()
-                results = data.get("results", [])
-                if not results:
-                    return "No search results found."
-                summary = "Here are the top search results:\n"
-                for idx, result in enumerate(results, 1):
-                    summary += f"{idx}. {result['title']}: {result['content'][:200]}... (Source: {result['url']})\n"
-                return summary
-            else:
-                error_msg = f"Error: Unable to perform web search (status {response.status})."
-                await websocket.send_json({"type": "error", "data": error_msg})
-                return error_msg
+    max_results = tenant.settings.get("maxSearchResults", 3)
+    cache_key = (" ".join(query.lower().split()), max_results)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        log.info(f"Using cached search results for: {query}")
+        return cached
+    try:
+        async with scheduler.slot("search", websocket):
+            status, data = await search_provider.search(get_api_key("tavily_api_key", tenant, websocket), query, max_results)
+    except ProviderBusy:
+        # Answered without search results rather than waiting on a saturated provider
+        scheduler.degrade("search", "skip_search", force=True)
+        await websocket.send_json({"type": "info", "data": "Web search is busy; answering without it"})
+        return ""
+    except HttpError as e:
+        PROVIDER_REQUESTS.inc(provider="tavily", outcome="error")
+        error_msg = f"Error: Unable to perform web search ({e})."
+        await websocket.send_json({"type": "error", "data": error_msg})
+        return error_msg
+    PROVIDER_REQUESTS.inc(provider="tavily", outcome="ok" if status == 200 else "error")
+    if status == 200 and data is not None:
+        results = data.get("results", [])
+        if not results:
+            return "No search results found."
+        summary = "Here are the top search results:\n"
+        for idx, result in enumerate(results, 1):
+            summary += f"{idx}. {result['title']}: {result['content'][:200]}... (Source: {result['url']})\n"
+        search_cache.put(cache_key, summary)
+        return summary
+    else:
+        error_msg = f"Error: Unable to perform web search (status {status})."
+        await websocket.send_json({"type": "error", "data": error_msg})
+        return error_msg
 
-async def stream_gemini_response(chat_id: str, transcript: str, websocket: WebSocket, is_voice_input: bool = False) -> Optional[str]:
+async def queue_email(websocket: WebSocket, tenant: TenantContext, response: str) -> None:
+    # Delivered by the webhook queue in the background so the turn does not wait on Zapier
+    webhook_url = get_api_key("zapier_webhook_url", tenant, websocket)
+    if not webhook_url:
+        return
+    if webhook_queue.submit(webhook_url, {"response": response}):
+        log.info("Queued response for the Zapier webhook")
+        await websocket.send_json({"type": "zapier", "data": "Email queued for sending"})
+    else:
+        await websocket.send_json({"type": "error", "data": "Email queue is full; please try again shortly"})
+
+async def stream_gemini_response(chat_id: str, transcript: str, websocket: WebSocket, tenant: TenantContext,
+                                 is_voice_input: bool = False, speculative: Optional[SpeculativeSearch] = None,
+                                 timer: Optional[TurnTimer] = None) -> Optional[str]:
+    # Voice turns pass the timer started when the user stopped speaking, so it includes STT finalization
+    timer = timer or TurnTimer(f"chat {chat_id}")
     try:
         if not isinstance(transcript, str) or not transcript.strip():
             log.error(f"Invalid transcript: {transcript}")
@@ -388,188 +678,202 @@ async def stream_gemini_response(chat_id: str, transcript: str, websocket: WebSo
             "is_final": True
         })
 
-        gemini_api_key = get_api_key("gemini_api_key", websocket)
+        gemini_api_key = get_api_key("gemini_api_key", tenant, websocket)
         if not gemini_api_key:
             error_msg = "No valid Gemini API key found"
             log.error(error_msg)
             await websocket.send_json({"type": "error", "data": error_msg})
             return None
-        configure(api_key=gemini_api_key)
+
+        if is_voice_input and scheduler.degrade("murf", "text_only"):
+            # Murf's queue is already long: answer in text now rather than speak late
+            await websocket.send_json({"type": "info", "data": TEXT_ONLY_NOTICE})
+            is_voice_input = False
 
         original_transcript = transcript
-        if USER_SETTINGS.get("includeKnowledgeBase", True) and "summary" in transcript.lower():
-            query_words = set(re.sub(r'[^\w\s]', '', transcript.lower()).split())
-            for filename in KNOWLEDGE_BASE:
-                filename_words = set(re.sub(r'[^\w\s]', '', filename.lower()).split())
-                if query_words & filename_words:
-                    transcript = f"Summarize the content of the file '{filename}'"
-                    log.info(f"Rewrote query '{original_transcript}' to '{transcript}'")
-                    break
-
-        if USER_SETTINGS.get("enableSearch", True) and any(word in transcript.lower() for word in ["search", "find", "look up"]):
-            log.info(f"Performing search for: {transcript}")
-            search_result = await tavily_search(transcript, websocket)
-            accumulated_response = search_result
+        use_files = tenant.settings.get("includeKnowledgeBase", True)
+        with timer.span("intent"):
+            intent = intent_router.route(transcript, knowledge_store.names if use_files else None)
+        summary_file = intent.summary_file
+        if summary_file:
+            transcript = f"Summarize the content of the file '{summary_file}'"
+            log.info(f"Rewrote query '{original_transcript}' to '{transcript}'")
+
+        # Search turns are answered by Gemini grounded in the results; the search may already be in
+        # flight from the partial transcripts (SpeculativeSearch) and overlaps knowledge base retrieval
+        search_intent = tenant.settings.get("enableSearch", True) and intent.search
+        if speculative and not search_intent:
+            speculative.cancel()
+        conversation_type = tenant.settings.get("conversationType", "casual")
+        use_knowledge = tenant.settings.get("includeKnowledgeBase", True) and len(knowledge_store) > 0
+        memory = await timer.timed("memory_load", executor.run_io("memory_load", conversation_memory.load,
+                                                                  chat_id, tenant.tenant_id))
+        # Answers depend on the remembered conversation too; first turns of any chat share "no-history"
+        cache_context = f"{conversation_type}|{knowledge_store.version if use_knowledge else 'no-kb'}|{memory.digest}"
+        cached_answer = None
+        if not search_intent:
+            cached_answer = await executor.run_io("llm_cache_get", response_cache.get, transcript, cache_context)
+        if cached_answer is not None:
+            log.info(f"Serving cached answer for: {transcript}")
+            await websocket.send_json({"type": "response_delta", "data": cached_answer})
             if is_voice_input:
-                murf_ws_url = f"{MURF_WS_URL_DEFAULT}?api_key={get_api_key('murf_api_key', websocket)}&context_id={CONTEXT_ID}&format=WAV&sample_rate=44100&channel_type=MONO"
                 try:
-                    async with websockets.connect(murf_ws_url, ping_interval=None) as murf_ws:
-                        await murf_ws.send(json.dumps({"init": True}))
-                        voice_config = {"voice_config": {"voiceId": USER_SETTINGS.get("voiceId", "en-IN-alia"), "style": "Narration", "speed": USER_SETTINGS.get("playbackSpeed", 1.0)}}
-                        await murf_ws.send(json.dumps(voice_config))
-                        await murf_ws.send(json.dumps({"text": search_result}))
-                        murf_response = await asyncio.wait_for(murf_ws.recv(), timeout=10.0)
-                        murf_data = json.loads(murf_response)
-                        base64_audio = murf_data.get("audio", "")
-                        is_final = murf_data.get("is_final", False)
-                        if base64_audio:
-                            await websocket.send_json({
-                                "type": "audio",
-                                "data": base64_audio,
-                                "is_final": is_final
-                            })
-                            log.info(f"Sent search audio to client (Final: {is_final}, Length: {len(base64_audio)})")
-                        while not is_final:
-                            try:
-                                murf_response = await asyncio.wait_for(murf_ws.recv(), timeout=5.0)
-                                murf_data = json.loads(murf_response)
-                                base64_audio = murf_data.get("audio", "")
-                                is_final = murf_data.get("is_final", False)
-                                if base64_audio:
-                                    await websocket.send_json({
-                                        "type": "audio",
-                                        "data": base64_audio,
-                                        "is_final": is_final
-                                    })
-                                    log.info(f"Sent additional base64 audio to client (Final: {is_final}, Length: {len(base64_audio)})")
-                            except asyncio.TimeoutError:
-                                log.warning("Timeout waiting for additional Murf audio")
-                                break
+                    await speak_text(websocket, tenant, cached_answer, timer=timer)
+                except ProviderBusy:
+                    scheduler.degrade("murf", "text_only", force=True)
+                    await websocket.send_json({"type": "info", "data": TEXT_ONLY_NOTICE})
                 except Exception as e:
+                    if client_disconnected(websocket, e):
+                        log.info(f"Client disconnected while the cached reply for chat {chat_id} was spoken")
+                        return None
                     log.error(f"Murf audio generation failed: {e}")
                     await websocket.send_json({"type": "error", "data": f"Failed to generate audio: {str(e)}"})
                     return None
-            if accumulated_response:
-                save_chat_history(chat_id, original_transcript, accumulated_response)
-                await websocket.send_json({
-                    "type": "search",
-                    "data": accumulated_response
-                })
-            if "send to email" in original_transcript.lower() or "email the summary" in original_transcript.lower():
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(get_api_key("zapier_webhook_url", websocket), json={"response": accumulated_response}) as resp:
-                        log.info(f"Sent search response to Zapier webhook: {resp.status}")
-                        await websocket.send_json({
-                            "type": "zapier",
-                            "data": "Email sent successfully"
-                        })
-            return accumulated_response
-
-        log.debug(f"Calling Gemini with transcript: {transcript}")
-        conversation_type = USER_SETTINGS.get("conversationType", "casual")
-        system_instruction = {
-            "casual": "You are a friendly and approachable assistant. Use simple, conversational language with a relaxed tone.",
-            "formal": "You are a professional assistant. Use clear, polite, and formal language in your responses.",
-            "technical": "You are a technical expert. Provide detailed, precise, and technical responses suitable for advanced users."
-        }.get(conversation_type, "You are a wise and gentle guide. Your tone is calm, clear, and comforting, like a thoughtful elder or a trusted friend. "
-                              "You explain things in a simple way, sometimes using small analogies or everyday examples if they help. "
-                              "Keep responses natural and conversational — never too formal, never dramatic, and not motivational. "
-                              "The goal is to make the user feel relaxed, understood, and stress-free, while still giving useful and thoughtful answers.")
-
-        model = GenerativeModel(
-            model_name="gemini-1.5-flash",
-            system_instruction=system_instruction
-        )
-        contents = [{"role": "user", "parts": [{"text": transcript}]}]
-        if USER_SETTINGS.get("includeKnowledgeBase", True) and KNOWLEDGE_BASE:
-            knowledge_context = "\n\nKnowledge Base Content:\n"
-            for filename, content in KNOWLEDGE_BASE.items():
-                knowledge_context += f"\nFile: {filename}\n{content[:2000]}...\n"
-            contents[0]["parts"].append({"text": knowledge_context})
+            accumulated_response = cached_answer
+        else:
+            log.debug(f"Calling Gemini with transcript: {transcript}")
+            model = gemini_model(gemini_api_key, conversation_type)
+            budget = ContextBudget(transcript, memory, search_intent)
+            knowledge_task = None
+            if use_knowledge:
+                knowledge_task = asyncio.ensure_future(timer.timed("kb_retrieve", executor.run_io(
+                    "kb_retrieve", knowledge_store.index.build_context, transcript,
+                    token_budget=budget.knowledge, filename=summary_file)))
+            search_text = knowledge_context = ""
+            if search_intent:
+                log.info(f"Performing search for: {transcript}")
+                search_result = None
+                if scheduler.degrade("search", "skip_search"):
+                    if speculative:
+                        speculative.cancel()
+                    await websocket.send_json({"type": "info", "data": "Web search is busy; answering without it"})
+                else:
+                    search = speculative.result(transcript) if speculative else tavily_search(transcript, websocket, tenant)
+                    try:
+                        # A slow search is dropped after its budget; the answer goes ahead without it
+                        search_result = await asyncio.wait_for(timer.timed("search", search),
+                                                               scheduler["search"].limits.budget or None)
+                    except asyncio.TimeoutError:
+                        scheduler.degrade("search", "skip_search", force=True)
+                        await websocket.send_json({"type": "info", "data": "Web search is slow; answering without it"})
+                if search_result:
+                    await websocket.send_json({"type": "search", "data": search_result})
+                    if not search_result.startswith("Error:"):
+                        search_text = search_context(search_result)
+            if knowledge_task:
+                knowledge_context = await knowledge_task
+            prompt = budget.build([{"text": transcript}], memory, search_text, knowledge_context)
+            contents = prompt.contents
+            usage: Dict[str, int] = {}
 
-        try:
-            response = model.generate_content(contents, stream=False)
-            accumulated_response = response.text
-        except Exception as e:
-            log.error(f"Gemini call failed: {e}")
-            await websocket.send_json({"type": "error", "data": f"Failed to generate response: {str(e)}"})
-            return None
+            response_parts: List[str] = []
+            stream_complete = False
+
+            async def relay_deltas():
+                nonlocal stream_complete
+                async for delta in stream_generate(model, contents, usage):
+                    timer.mark("first_token")
+                    response_parts.append(delta)
+                    with timer.span("client_send"):
+                        await websocket.send_json({"type": "response_delta", "data": delta})
+                    yield delta
+                stream_complete = True
+                timer.mark("llm_complete")
 
-        if is_voice_input:
-            murf_ws_url = f"{MURF_WS_URL_DEFAULT}?api_key={get_api_key('murf_api_key', websocket)}&context_id={CONTEXT_ID}&format=WAV&sample_rate=44100&channel_type=MONO"
+            # Set while Murf speaks the stream, so a failure that is neither Gemini's nor the client's is Murf's
+            speaking = False
             try:
-                async with websockets.connect(murf_ws_url, ping_interval=None) as murf_ws:
-                    await murf_ws.send(json.dumps({"init": True}))
-                    voice_config = {"voice_config": {"voiceId": USER_SETTINGS.get("voiceId", "en-IN-alia"), "style": "Narration", "speed": USER_SETTINGS.get("playbackSpeed", 1.0)}}
-                    await murf_ws.send(json.dumps(voice_config))
-                    await murf_ws.send(json.dumps({"text": accumulated_response}))
-                    murf_response = await asyncio.wait_for(murf_ws.recv(), timeout=10.0)
-                    murf_data = json.loads(murf_response)
-                    base64_audio = murf_data.get("audio", "")
-                    is_final = murf_data.get("is_final", False)
-                    if base64_audio:
-                        await websocket.send_json({
-                            "type": "audio",
-                            "data": base64_audio,
-                            "is_final": is_final
-                        })
-                        log.info(f"Sent base64 audio to client (Final: {is_final}, Length: {len(base64_audio)})")
-                    while not is_final:
+                async with scheduler.slot("gemini", websocket):
+                    spoken = False
+                    if is_voice_input:
+                        speaking = True
                         try:
-                            murf_response = await asyncio.wait_for(murf_ws.recv(), timeout=5.0)
-                            murf_data = json.loads(murf_response)
-                            base64_audio = murf_data.get("audio", "")
-                            is_final = murf_data.get("is_final", False)
-                            if base64_audio:
-                                await websocket.send_json({
-                                    "type": "audio",
-                                    "data": base64_audio,
-                                    "is_final": is_final
-                                })
-                                log.info(f"Sent additional base64 audio to client (Final: {is_final}, Length: {len(base64_audio)})")
-                        except asyncio.TimeoutError:
-                            log.warning("Timeout waiting for additional Murf audio")
-                            break
+                            await speak_text(websocket, tenant, sentence_stream(relay_deltas()), timer=timer)
+                            spoken = True
+                        except ProviderBusy:
+                            # Murf had no slot in time; nothing was streamed yet, so the reply goes out as text
+                            scheduler.degrade("murf", "text_only", force=True)
+                            await websocket.send_json({"type": "info", "data": TEXT_ONLY_NOTICE})
+                        speaking = False
+                    if not spoken:
+                        async for _ in relay_deltas():
+                            pass
+            except ProviderBusy:
+                PROVIDER_REQUESTS.inc(provider="gemini", outcome="shed")
+                await websocket.send_json({"type": "error", "data": "The assistant is busy right now; please try again in a moment"})
+                return None
+            except GeminiStreamError as e:
+                PROVIDER_REQUESTS.inc(provider="gemini", outcome="error")
+                log.error(f"Gemini call failed: {e}")
+                await websocket.send_json({"type": "error", "data": f"Failed to generate response: {str(e)}"})
+                return None
             except Exception as e:
-                log.error(f"Murf audio generation failed: {e}")
-                await websocket.send_json({"type": "error", "data": f"Failed to generate audio: {str(e)}"})
+                if client_disconnected(websocket, e):
+                    log.info(f"Client disconnected while the reply for chat {chat_id} was streaming")
+                    return None
+                if speaking:
+                    log.error(f"Murf audio generation failed: {e}")
+                    await websocket.send_json({"type": "error", "data": f"Failed to generate audio: {str(e)}"})
+                else:
+                    log.error(f"Streaming the reply failed: {e}")
+                    await websocket.send_json({"type": "error", "data": f"Failed to generate response: {str(e)}"})
                 return None
+            PROVIDER_REQUESTS.inc(provider="gemini", outcome="ok")
+            context_stats.record(chat_id, prompt, usage, timer.get("first_token"))
+            log.info(f"Prompt tokens [chat {chat_id}]: ~{prompt.prompt_tokens} estimated {prompt.tokens}, "
+                     f"{usage.get('prompt_tokens', 'n/a')} billed, {prompt.history_turns} history turns")
+            accumulated_response = "".join(response_parts)
+            if stream_complete and not search_intent:
+                # A barge-in stops the stream early; only whole answers are worth replaying
+                await executor.run_io("llm_cache_put", response_cache.put, transcript, cache_context, accumulated_response)
 
         if accumulated_response:
-            save_chat_history(chat_id, original_transcript, accumulated_response)
+            saved = await executor.run_io("chat_history_save", save_chat_history, chat_id, original_transcript, accumulated_response, tenant)
+            if saved:
+                # Folds older turns into the chat's summary in the background once enough have piled up
+                task = asyncio.create_task(summarize_chat(chat_id, gemini_api_key, tenant.tenant_id))
+                summary_tasks.add(task)
+                task.add_done_callback(summary_done)
             await websocket.send_json({
                 "type": "response",
                 "data": accumulated_response
             })
-            if "send to email" in original_transcript.lower() or "email the summary" in original_transcript.lower():
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(get_api_key("zapier_webhook_url", websocket), json={"response": accumulated_response}) as resp:
-                        log.info(f"Sent response to Zapier webhook: {resp.status}")
-                        await websocket.send_json({
-                            "type": "zapier",
-                            "data": "Email sent successfully"
-                        })
+            if intent.email:
+                await queue_email(websocket, tenant, accumulated_response)
+        timer.finish()
         log.info("Gemini Response Complete.")
         return accumulated_response
     except Exception as e:
+        if client_disconnected(websocket, e):
+            log.info(f"Client disconnected during the turn for chat {chat_id}")
+            return None
         log.error(f"Error in stream_gemini_response: {e}")
         await websocket.send_json({"type": "error", "data": f"Error processing response: {str(e)}"})
         return None
 
 @app.websocket("/ws")
-async def ws_handler(websocket: WebSocket, chat_id: str = Query(...)):
+async def ws_handler(websocket: WebSocket, chat_id: str = Query(...), audio: str = Query("json"),
+                     codecs: Optional[str] = Query(None), rates: str = Query("")):
     if not chat_id:
         raise WebSocketException(code=400, reason="Missing chat_id")
-    file = get_chat_file(chat_id)
-    if not os.path.exists(file):
+    try:
+        tenant_id = await request_tenant_id(websocket)
+    except TenantAuthError as e:
+        raise WebSocketException(code=1008, reason=str(e))
+    if not await executor.run_io("chat_exists", history_store.chat_exists, chat_id, tenant_id):
         raise WebSocketException(code=403, reason="Chat ID does not exist")
+    # This session's view of its tenant's settings and keys, refreshed from the state backend at each turn
+    tenant = await load_tenant(tenant_id)
     await websocket.accept()
-    log.info(f"WebSocket connected for chat_id: {chat_id}")
+    # Clients that connect with ?audio=binary get TTS audio as binary PCM frames (services/audio_frames.py)
+    websocket.state.binary_audio = audio == "binary"
+    # What the client can play (?codecs=mp3,pcm in preference order, ?rates=16000,24000); binary frames
+    # carry their codec and rate, so binary clients negotiate even without ?codecs=
+    if codecs is not None or websocket.state.binary_audio:
+        websocket.state.audio_caps = (parse_codecs(codecs or "pcm"), parse_rates(rates))
+    log.info(f"WebSocket connected for chat_id: {chat_id} (tenant: {tenant_id}, audio: {audio})")
 
-    gemini_api_key = get_api_key("murf_api_key", websocket)
-    if gemini_api_key:
-        configure(api_key=gemini_api_key)
-    else:
+    if not get_api_key("gemini_api_key", tenant):
         await websocket.send_json({
             "type": "error",
             "data": "No valid Gemini API key found; please set in .env or via /settings"
@@ -579,14 +883,86 @@ async def ws_handler(websocket: WebSocket, chat_id: str = Query(...)):
     mic_stream: Optional[pyaudio.Stream] = None
     audio_thread: Optional[threading.Thread] = None
     stop_event = threading.Event()
-    recorded_frames: List[bytes] = []
-    frames_lock = threading.Lock()
+    recorder: Optional[AudioRecorder] = None
+    mic_processor = MicProcessor(frame_samples=FRAMES_PER_BUFFER, sample_rate=SAMPLE_RATE)
+    # Drops silence before it reaches STT and ends the turn locally after a pause (services/vad.py)
+    endpointer: Optional[Endpointer] = None
+    capturing = False
+    turn_task: Optional[asyncio.Task] = None
+    # The reply being generated and spoken runs as its own task so the socket keeps reading commands;
+    # a new utterance, a typed message or "cancel" interrupts it (barge-in)
+    reply_task: Optional[asyncio.Task] = None
+    # Whether this session holds an STT slot (services/admission.py); held from "start" until the turn ends
+    stt_admitted = False
 
     loop = asyncio.get_running_loop()
     queue: asyncio.Queue[str] = asyncio.Queue()
 
     all_transcripts = []
     final_transcript = None
+    speculative = SpeculativeSearch(lambda query: tavily_search(query, websocket, tenant))
+
+    async def admit_stt() -> None:
+        nonlocal stt_admitted
+        if not stt_admitted:
+            await scheduler["stt"].acquire(websocket)
+            stt_admitted = True
+
+    def release_stt() -> None:
+        nonlocal stt_admitted
+        if stt_admitted:
+            scheduler["stt"].release()
+            stt_admitted = False
+
+    def start_reply(reply) -> None:
+        nonlocal reply_task
+        if reply_task and not reply_task.done():
+            # A newer turn supersedes a reply that is still running
+            reply_task.cancel()
+        reply_task = asyncio.create_task(reply)
+
+    async def interrupt_reply(reason: str) -> bool:
+        # Stops the Gemini stream and Murf synthesis of the current reply and tells the browser to drop
+        # the audio it still has queued; returns whether a reply was in flight
+        nonlocal reply_task
+        started = time.perf_counter()
+        task, reply_task = reply_task, None
+        interrupted = False
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                log.warning(f"Interrupted reply ended with an error: {e}")
+            interrupted = True
+        if await murf_pool.cancel(websocket):
+            interrupted = True
+        await websocket.send_json({"type": "flush_audio", "data": reason})
+        if interrupted:
+            INTERRUPTIONS.inc(reason=reason)
+            log.info(f"Barge-in ({reason}): reply stopped in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return interrupted
+
+    async def answer_turn(transcript: str, timer: TurnTimer) -> None:
+        await stream_gemini_response(chat_id, transcript, websocket, tenant, is_voice_input=True, speculative=speculative, timer=timer)
+        await websocket.send_text("Stopped transcription")
+        if tenant.settings.get("enableSound", True):
+            await websocket.send_json({"type": "sound_alert", "data": "stop"})
+
+    async def speak_reply(text: str) -> None:
+        try:
+            await speak_text(websocket, tenant, text, message_type="speak_audio")
+        except ProviderBusy:
+            await websocket.send_json({"type": "error", "data": "Voice is busy right now; please try again in a moment"})
+        except Exception as e:
+            if client_disconnected(websocket, e):
+                return
+            log.error(f"Murf audio generation failed for speak: {e}")
+            await websocket.send_json({"type": "error", "data": f"Failed to generate speak audio: {str(e)}"})
+            if tenant.settings.get("enableSound", True):
+                await websocket.send_json({"type": "sound_alert", "data": "error"})
 
     async def forward_event(client, message):
         nonlocal final_transcript
@@ -594,7 +970,9 @@ async def ws_handler(websocket: WebSocket, chat_id: str = Query(...)):
             if message.type == "Turn" and message.transcript:
                 transcript_text = message.transcript.strip()
                 all_transcripts.append(transcript_text)
-                log.info(f"Live Transcription: {transcript_text}")
+                log.debug(f"Live Transcription: {transcript_text}")
+                if tenant.settings.get("enableSearch", True):
+                    speculative.update(transcript_text)
                 await websocket.send_json({
                     "type": "user_message",
                     "data": transcript_text,
@@ -609,49 +987,102 @@ async def ws_handler(websocket: WebSocket, chat_id: str = Query(...)):
                         "is_final": True
                     })
             elif message.type == "Termination":
-                log.info("Turn ended detected")
-                if all_transcripts:
-                    if not final_transcript:
-                        final_transcript = all_transcripts[-1]
-                        log.info(f"No final transcript received, using last transcript: {final_transcript}")
-                        await websocket.send_json({
-                            "type": "user_message",
-                            "data": final_transcript,
-                            "is_final": True
-                        })
-                    await websocket.send_json({"type": "turn_ended"})
-                    await stream_gemini_response(chat_id, final_transcript, websocket, is_voice_input=True)
-                else:
-                    log.warning("No transcripts received during session")
-                    await websocket.send_json({
-                        "type": "error",
-                        "data": "No transcript received for this session"
-                    })
+                # The SDK client stays connected across turns, so this only arrives when the session is torn
+                # down; every turn has already been answered (or abandoned) through end_turn
+                log.info(f"STT session terminated ({getattr(message, 'audio_duration_seconds', 0)}s of audio)")
             elif message.type == "error":
+                PROVIDER_REQUESTS.inc(provider="assemblyai", outcome="error")
                 error_msg = f"Error: {str(message)}"
                 log.error(error_msg)
                 await websocket.send_json({"type": "error", "data": error_msg})
-                if USER_SETTINGS.get("enableSound", True):
+                if tenant.settings.get("enableSound", True):
                     await websocket.send_json({"type": "sound_alert", "data": "error"})
         except Exception as e:
             log.error(f"forward_event error: {e}")
             await websocket.send_json({"type": "error", "data": f"Transcription error: {str(e)}"})
-            if USER_SETTINGS.get("enableSound", True):
+            if tenant.settings.get("enableSound", True):
                 await websocket.send_json({"type": "sound_alert", "data": "error"})
 
-    client = StreamingClient(
-        StreamingClientOptions(api_key=get_api_key("aai_api_key", websocket), api_host="streaming.assemblyai.com")
-    )
-    client.on(StreamingEvents.Begin, lambda client, message: loop.call_soon_threadsafe(
-        lambda: asyncio.run_coroutine_threadsafe(forward_event(client, message), loop)))
-    client.on(StreamingEvents.Turn, lambda client, message: loop.call_soon_threadsafe(
-        lambda: asyncio.run_coroutine_threadsafe(forward_event(client, message), loop)))
-    client.on(StreamingEvents.Termination, lambda client, message: loop.call_soon_threadsafe(
-        lambda: asyncio.run_coroutine_threadsafe(forward_event(client, message), loop)))
-    client.on(StreamingEvents.Error, lambda client, message: loop.call_soon_threadsafe(
-        lambda: asyncio.run_coroutine_threadsafe(forward_event(client, message), loop)))
+    # Server-microphone mode uses the SDK client and a PyAudio thread; it is only connected on the
+    # first "start" so browser-capture sessions never pay for it
+    client: Optional[StreamingClient] = None
+    # Browser-capture mode: binary PCM frames from the socket go to an asyncio STT stream
+    stt_session: Optional[AsyncStreamingSTT] = None
+
+    def connect_sdk_client() -> StreamingClient:
+        client_class = FakeStreamingClient if is_fake("stt") else StreamingClient
+        sdk_client = client_class(
+            StreamingClientOptions(api_key=get_api_key("aai_api_key", tenant, websocket), api_host="streaming.assemblyai.com")
+        )
+        sdk_client.on(StreamingEvents.Begin, lambda client, message: loop.call_soon_threadsafe(
+            lambda: asyncio.run_coroutine_threadsafe(forward_event(client, message), loop)))
+        sdk_client.on(StreamingEvents.Turn, lambda client, message: loop.call_soon_threadsafe(
+            lambda: asyncio.run_coroutine_threadsafe(forward_event(client, message), loop)))
+        sdk_client.on(StreamingEvents.Termination, lambda client, message: loop.call_soon_threadsafe(
+            lambda: asyncio.run_coroutine_threadsafe(forward_event(client, message), loop)))
+        sdk_client.on(StreamingEvents.Error, lambda client, message: loop.call_soon_threadsafe(
+            lambda: asyncio.run_coroutine_threadsafe(forward_event(client, message), loop)))
+        sdk_client.connect(StreamingParameters(sample_rate=SAMPLE_RATE, format_turns=True))
+        return sdk_client
+
+    async def end_turn(reason: str):
+        # Runs once per turn, whichever comes first: the client's "stop" or a local VAD end-of-turn
+        nonlocal stt_session, recorder, final_transcript, capturing
+        if not capturing:
+            return
+        capturing = False
+        # The turn's clock starts when the user stops talking; stt_final covers flushing STT for the final text
+        timer = TurnTimer(f"chat {chat_id}")
+        stt_started = time.perf_counter()
+        if endpointer and endpointer.enabled:
+            log.info(f"Ending turn ({reason}): {endpointer.stats['sent']}/{endpointer.stats['frames']} frames sent to STT")
+        stop_event.set()
+        if audio_thread and audio_thread.is_alive():
+            await executor.run_io("audio_thread_join", audio_thread.join, 5.0)
+        if stt_session:
+            # Flushes queued frames and waits for the final formatted turn before answering
+            await stt_session.stop()
+            stt_session = None
+        release_stt()
+        timer.add("stt_final", time.perf_counter() - stt_started)
+        if recorder:
+            # Capture has ended, so the file is complete; save it before the (slower) response
+            await executor.run_io("recording_save", save_recording, recorder)
+            recorder = None
+
+        if all_transcripts:
+            if not final_transcript:
+                final_transcript = all_transcripts[-1]
+                log.info(f"No final transcript received on stop, using last transcript: {final_transcript}")
+                await websocket.send_json({
+                    "type": "user_message",
+                    "data": final_transcript,
+                    "is_final": True
+                })
+            await websocket.send_json({"type": "turn_ended"})
+            PROVIDER_REQUESTS.inc(provider="assemblyai", outcome="ok")
+            # Capture is torn down; the reply runs in the background so "start" can barge in on it
+            start_reply(answer_turn(final_transcript, timer))
+            return
+        PROVIDER_REQUESTS.inc(provider="assemblyai", outcome="empty")
+        log.warning("No transcripts received during session")
+        await websocket.send_json({
+            "type": "error",
+            "data": "No transcript received for this session"
+        })
+        if tenant.settings.get("enableSound", True):
+            await websocket.send_json({"type": "sound_alert", "data": "error"})
+
+        await websocket.send_text("Stopped transcription")
+        if tenant.settings.get("enableSound", True):
+            await websocket.send_json({"type": "sound_alert", "data": "stop"})
+
+    def schedule_end_turn():
+        nonlocal turn_task
+        turn_task = asyncio.create_task(end_turn("vad"))
 
-    client.connect(StreamingParameters(sample_rate=SAMPLE_RATE, format_turns=True))
+    async def on_stt_event(message):
+        await forward_event(None, message)
 
     async def pump_queue():
         try:
@@ -679,14 +1110,14 @@ async def ws_handler(websocket: WebSocket, chat_id: str = Query(...)):
             )
             while not stop_event.is_set():
                 try:
-                    data = mic_stream.read(FRAMES_PER_BUFFER, exception_on_overflow=False)
-                    sensitivity = USER_SETTINGS.get("micSensitivity", 50) / 50.0
-                    audio_data = np.frombuffer(data, dtype=np.int16).astype(np.float32)
-                    audio_data *= sensitivity
-                    audio_data = np.clip(audio_data, -32768, 32767).astype(np.int16)
-                    with frames_lock:
-                        recorded_frames.append(audio_data.tobytes())
-                    client.stream(audio_data.tobytes())
+                    data = apply_mic_gain(mic_processor, tenant, mic_stream.read(FRAMES_PER_BUFFER, exception_on_overflow=False))
+                    if recorder:
+                        recorder.write(data)
+                    result = endpointer.process(data)
+                    for frame in result.frames:
+                        client.stream(frame)
+                    if result.end_of_turn:
+                        loop.call_soon_threadsafe(schedule_end_turn)
                 except IOError as e:
                     log.warning(f"Audio read error: {e}, retrying...")
                     time.sleep(0.01)
@@ -710,110 +1141,94 @@ async def ws_handler(websocket: WebSocket, chat_id: str = Query(...)):
                 py_audio = None
             log.info("Audio streaming thread ended")
 
+    ACTIVE_SESSIONS.inc()
     try:
         while True:
             try:
-                msg = await websocket.receive_text()
-                log.info(f"Received client command: {msg}")
+                received = await websocket.receive()
             except Exception as e:
                 log.error(f"WebSocket receive error: {e}")
                 break
+            if received["type"] == "websocket.disconnect":
+                break
+
+            if received.get("bytes") is not None:
+                # Binary frames are 16 kHz mono Int16 PCM from the browser microphone
+                if stt_session and capturing:
+                    data = apply_mic_gain(mic_processor, tenant, received["bytes"])
+                    if recorder:
+                        recorder.submit(data)
+                    result = endpointer.process(data)
+                    for frame in result.frames:
+                        await stt_session.send_audio(frame)
+                    if result.end_of_turn:
+                        schedule_end_turn()
+                continue
 
-            if msg == "start":
-                if audio_thread and audio_thread.is_alive():
+            msg = received.get("text") or ""
+            log.debug(f"Received client command: {msg[:80]}")
+
+            if msg in ("start", "start_stream"):
+                # The user talking again ends the previous reply, whether it is still generating or speaking
+                await interrupt_reply("new_utterance")
+                if stt_session or (audio_thread and audio_thread.is_alive()):
                     await websocket.send_text("Already transcribing")
                     continue
+                tenant = await load_tenant(tenant_id)
                 stop_event.clear()
-                with frames_lock:
-                    recorded_frames.clear()
+                if recorder:
+                    await executor.run_io("recording_discard", recorder.discard)
+                recorder = AudioRecorder(recording_dir(UPLOAD_DIR, tenant_id), sample_rate=SAMPLE_RATE, channels=CHANNELS)
+                await executor.run_io("recording_start", recorder.start)
                 all_transcripts.clear()
                 final_transcript = None
-                audio_thread = threading.Thread(target=stream_audio, daemon=True)
-                audio_thread.start()
+                speculative.cancel()
+                try:
+                    await admit_stt()
+                    endpointer = Endpointer(sample_rate=SAMPLE_RATE)
+                    if msg == "start_stream":
+                        stt_session = AsyncStreamingSTT(get_api_key("aai_api_key", tenant, websocket), on_stt_event, sample_rate=SAMPLE_RATE)
+                        await stt_session.start()
+                    else:
+                        if client is None:
+                            client = await executor.run_io("stt_connect", connect_sdk_client)
+                        audio_thread = threading.Thread(target=stream_audio, daemon=True)
+                        audio_thread.start()
+                except Exception as e:
+                    stt_session = None
+                    release_stt()
+                    log.error(f"Failed to start transcription: {e}")
+                    await websocket.send_json({"type": "error", "data": f"Transcription error: {str(e)}"})
+                    if tenant.settings.get("enableSound", True):
+                        await websocket.send_json({"type": "sound_alert", "data": "error"})
+                    continue
+                capturing = True
                 await websocket.send_text("Started transcription")
-                if USER_SETTINGS.get("enableSound", True):
+                if tenant.settings.get("enableSound", True):
                     await websocket.send_json({"type": "sound_alert", "data": "start"})
 
             elif msg == "stop":
-                stop_event.set()
-                if audio_thread and audio_thread.is_alive():
-                    audio_thread.join(timeout=5.0)
-
-                if all_transcripts:
-                    if not final_transcript:
-                        final_transcript = all_transcripts[-1]
-                        log.info(f"No final transcript received on stop, using last transcript: {final_transcript}")
-                        await websocket.send_json({
-                            "type": "user_message",
-                            "data": final_transcript,
-                            "is_final": True
-                        })
-                    await websocket.send_json({"type": "turn_ended"})
-                    await stream_gemini_response(chat_id, final_transcript, websocket, is_voice_input=True)
-                else:
-                    log.warning("No transcripts received during session")
-                    await websocket.send_json({
-                        "type": "error",
-                        "data": "No transcript received for this session"
-                    })
-                    if USER_SETTINGS.get("enableSound", True):
-                        await websocket.send_json({"type": "sound_alert", "data": "error"})
-
-                with frames_lock:
-                    save_wav(recorded_frames.copy())
-                    recorded_frames.clear()
-
-                await websocket.send_text("Stopped transcription")
-                if USER_SETTINGS.get("enableSound", True):
-                    await websocket.send_json({"type": "sound_alert", "data": "stop"})
+                await end_turn("stop")
 
             elif msg.startswith("text:"):
                 transcript = msg[5:].strip()
                 if transcript:
-                    await stream_gemini_response(chat_id, transcript, websocket, is_voice_input=False)
+                    await interrupt_reply("new_message")
+                    tenant = await load_tenant(tenant_id)
+                    start_reply(stream_gemini_response(chat_id, transcript, websocket, tenant, is_voice_input=False))
 
             elif msg.startswith("speak:"):
                 transcript = msg[6:].strip()
                 if transcript:
-                    murf_ws_url = f"{MURF_WS_URL_DEFAULT}?api_key={get_api_key('murf_api_key', websocket)}&context_id={CONTEXT_ID}&format=WAV&sample_rate=44100&channel_type=MONO"
-                    try:
-                        async with websockets.connect(murf_ws_url, ping_interval=None) as murf_ws:
-                            await murf_ws.send(json.dumps({"init": True}))
-                            voice_config = {"voice_config": {"voiceId": USER_SETTINGS.get("voiceId", "en-IN-alia"), "style": "Narration", "speed": USER_SETTINGS.get("playbackSpeed", 1.0)}}
-                            await murf_ws.send(json.dumps(voice_config))
-                            await murf_ws.send(json.dumps({"text": transcript}))
-                            murf_response = await asyncio.wait_for(murf_ws.recv(), timeout=10.0)
-                            murf_data = json.loads(murf_response)
-                            base64_audio = murf_data.get("audio", "")
-                            is_final = murf_data.get("is_final", False)
-                            if base64_audio:
-                                await websocket.send_json({
-                                    "type": "speak_audio",
-                                    "data": base64_audio,
-                                    "is_final": is_final
-                                })
-                                log.info(f"Sent speak audio to client (Final: {is_final}, Length: {len(base64_audio)})")
-                            while not is_final:
-                                try:
-                                    murf_response = await asyncio.wait_for(murf_ws.recv(), timeout=5.0)
-                                    murf_data = json.loads(murf_response)
-                                    base64_audio = murf_data.get("audio", "")
-                                    is_final = murf_data.get("is_final", False)
-                                    if base64_audio:
-                                        await websocket.send_json({
-                                            "type": "speak_audio",
-                                            "data": base64_audio,
-                                            "is_final": is_final
-                                        })
-                                        log.info(f"Sent additional speak audio to client (Final: {is_final}, Length: {len(base64_audio)})")
-                                except asyncio.TimeoutError:
-                                    log.warning("Timeout waiting for additional Murf audio")
-                                    break
-                    except Exception as e:
-                        log.error(f"Murf audio generation failed for speak: {e}")
-                        await websocket.send_json({"type": "error", "data": f"Failed to generate speak audio: {str(e)}"})
-                        if USER_SETTINGS.get("enableSound", True):
-                            await websocket.send_json({"type": "sound_alert", "data": "error"})
+                    await interrupt_reply("speak")
+                    tenant = await load_tenant(tenant_id)
+                    start_reply(speak_reply(transcript))
+
+            elif msg == "cancel":
+                await interrupt_reply("cancel")
+
+            elif msg.startswith("playback_stats:"):
+                record_playback_stats(msg[15:])
 
             else:
                 await websocket.send_text(f"Unknown command: {msg}")
@@ -822,10 +1237,23 @@ async def ws_handler(websocket: WebSocket, chat_id: str = Query(...)):
 
     finally:
         stop_event.set()
+        speculative.cancel()
+        if turn_task and not turn_task.done():
+            turn_task.cancel()
+        if reply_task and not reply_task.done():
+            reply_task.cancel()
         if audio_thread and audio_thread.is_alive():
-            audio_thread.join(timeout=5.0)
-        client.disconnect(terminate=True)
+            await executor.run_io("audio_thread_join", audio_thread.join, 5.0)
+        if stt_session:
+            await stt_session.stop(timeout=1.0)
+        release_stt()
+        if recorder:
+            # Disconnecting without "stop" abandons the turn, as it did when frames were held in memory
+            await executor.run_io("recording_discard", recorder.discard)
+        if client:
+            await executor.run_io("stt_disconnect", client.disconnect, terminate=True)
         queue_task.cancel()
+        ACTIVE_SESSIONS.dec()
         log.info("WebSocket closed")
 
 if __name__ == "__main__":
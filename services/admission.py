@@ -0,0 +1,266 @@
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+from services.http_client import RETRY_STATUSES
+from services.metrics import DEGRADED_TURNS, PROVIDER_QUEUE_WAIT, PROVIDER_RETRIES, PROVIDER_SHED
+
+log = logging.getLogger("novaflow")
+
+# Per-provider limits, overridable key by key with NOVAFLOW_LIMITS_<PROVIDER>, e.g.
+# NOVAFLOW_LIMITS_MURF="concurrency=4,degrade=2":
+#   concurrency  calls in flight at once (a Gemini stream, a Murf reply, an STT capture, a search)
+#   rate, burst  token bucket for starting calls, per second (rate=0 disables it)
+#   queue        callers allowed to wait for a slot; beyond that new calls are shed
+#   wait         seconds a caller may wait for a slot before it is shed
+#   degrade      waiting callers at which turns with a fallback use it instead of queueing (0 = never)
+#   budget       seconds a call with a fallback may take before the turn goes on without it (0 = none)
+DEFAULT_LIMITS = {
+    "gemini": "concurrency=16,rate=10,burst=20,queue=128,wait=10",
+    "murf": "concurrency=16,rate=10,burst=20,queue=64,wait=3,degrade=8",
+    "stt": "concurrency=32,rate=10,burst=20,queue=64,wait=5",
+    "search": "concurrency=8,rate=5,burst=10,queue=32,wait=2,degrade=4,budget=4",
+}
+PROVIDER_RETRIES_MAX = int(os.getenv("NOVAFLOW_PROVIDER_RETRIES", "2"))
+PROVIDER_BACKOFF = float(os.getenv("NOVAFLOW_PROVIDER_BACKOFF", "0.25"))
+BACKOFF_CAP = 5.0
+STATUS_IN_MESSAGE = re.compile(r"\b(429|50[0234])\b")
+
+
+class ProviderBusy(Exception):
+    # Raised instead of queueing without bound; turns with a fallback degrade, others tell the user
+    def __init__(self, provider: str, reason: str):
+        super().__init__(f"{provider} is at capacity ({reason})")
+        self.provider = provider
+        self.reason = reason
+
+
+class Limits:
+    def __init__(self, concurrency: int = 8, rate: float = 0.0, burst: int = 0, queue: int = 64,
+                 wait: float = 5.0, degrade: int = 0, budget: float = 0.0):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.queue = queue
+        self.wait = wait
+        self.degrade = degrade
+        self.budget = budget
+
+    @classmethod
+    def parse(cls, spec: str, base: Optional["Limits"] = None) -> "Limits":
+        limits = cls(**vars(base)) if base else cls()
+        for item in spec.split(","):
+            name, _, value = item.strip().partition("=")
+            name = name.strip()
+            if not name:
+                continue
+            if not hasattr(limits, name):
+                log.warning(f"Ignoring unknown provider limit {name!r}")
+                continue
+            try:
+                setattr(limits, name, type(getattr(limits, name))(value.strip()))
+            except ValueError:
+                log.warning(f"Ignoring invalid provider limit {name}={value!r}")
+        return limits
+
+
+def load_limits() -> Dict[str, Limits]:
+    return {name: Limits.parse(os.getenv(f"NOVAFLOW_LIMITS_{name.upper()}", ""), Limits.parse(spec))
+            for name, spec in DEFAULT_LIMITS.items()}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = 0):
+        self.rate = rate
+        self.capacity = float(max(1, burst or int(rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        # Takes a token and returns how long the caller must wait for it; the balance may go negative,
+        # so callers that arrive together are spaced out in arrival order
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class ProviderLimiter:
+    # A semaphore with a bounded, fair wait queue: waiters are grouped by owner (the WebSocket session)
+    # and a freed slot goes to the sessions in turn, so one busy session cannot starve the others
+    def __init__(self, name: str, limits: Limits):
+        self.name = name
+        self.limits = limits
+        self.bucket = TokenBucket(limits.rate, limits.burst)
+        self.active = 0
+        self._waiters: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+        self.stats = {"admitted": 0, "queued": 0, "shed": 0, "degraded": 0, "timeouts": 0}
+        self.wait_max = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    @property
+    def saturated(self) -> bool:
+        return self.active >= self.limits.concurrency
+
+    def should_degrade(self) -> bool:
+        return bool(self.limits.degrade) and self.saturated and self.waiting >= self.limits.degrade
+
+    def _shed(self, reason: str) -> None:
+        self.stats["shed"] += 1
+        PROVIDER_SHED.inc(provider=self.name, reason=reason)
+        log.warning(f"Shedding {self.name} call ({reason}): {self.active} active, {self.waiting} waiting")
+        raise ProviderBusy(self.name, reason)
+
+    def _discard(self, owner: Hashable, future: asyncio.Future) -> None:
+        waiters = self._waiters.get(owner)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(future)
+        except ValueError:
+            pass
+        if not waiters:
+            del self._waiters[owner]
+
+    async def acquire(self, owner: Hashable = None) -> None:
+        started = time.monotonic()
+        if self.active < self.limits.concurrency and not self._waiters:
+            self.active += 1
+        else:
+            if self.waiting >= self.limits.queue:
+                self._shed("queue_full")
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(owner, deque()).append(future)
+            self.stats["queued"] += 1
+            try:
+                await asyncio.wait_for(future, self.limits.wait)
+            except BaseException as e:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just as the wait ended; pass it on
+                    self.release()
+                else:
+                    self._discard(owner, future)
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats["timeouts"] += 1
+                    self._shed("wait_timeout")
+                raise
+        delay = self.bucket.reserve()
+        if delay:
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:
+                self.release()
+                raise
+        waited = time.monotonic() - started
+        self.wait_max = max(self.wait_max, waited)
+        self.stats["admitted"] += 1
+        PROVIDER_QUEUE_WAIT.observe(waited, provider=self.name)
+
+    def release(self) -> None:
+        # Hands the slot straight to the next waiting session rather than back to the pool
+        while self._waiters:
+            owner, waiters = next(iter(self._waiters.items()))
+            future = waiters.popleft()
+            if waiters:
+                self._waiters.move_to_end(owner)
+            else:
+                del self._waiters[owner]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, owner: Hashable = None):
+        await self.acquire(owner)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "active": self.active,
+            "waiting": self.waiting,
+            "concurrency": self.limits.concurrency,
+            "queue_limit": self.limits.queue,
+            "max_wait_ms": round(self.wait_max * 1000, 2),
+        }
+
+
+class ProviderScheduler:
+    def __init__(self, limits: Optional[Dict[str, Limits]] = None):
+        self.limiters = {name: ProviderLimiter(name, provider_limits)
+                         for name, provider_limits in (limits or load_limits()).items()}
+
+    def __getitem__(self, provider: str) -> ProviderLimiter:
+        return self.limiters[provider]
+
+    def slot(self, provider: str, owner: Hashable = None):
+        return self.limiters[provider].slot(owner)
+
+    def degrade(self, provider: str, policy: str, force: bool = False) -> bool:
+        # True when the turn should take its fallback (policy) instead of waiting on the provider;
+        # force records a fallback the caller already took (shed call, blown budget)
+        limiter = self.limiters[provider]
+        if not force and not limiter.should_degrade():
+            return False
+        limiter.stats["degraded"] += 1
+        DEGRADED_TURNS.inc(policy=policy)
+        log.info(f"Degrading turn ({policy}): {provider} has {limiter.active} active, {limiter.waiting} waiting")
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: limiter.snapshot() for name, limiter in self.limiters.items()}
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    # HTTP status behind a provider failure: HttpError.status, websockets' InvalidStatusCode.status_code,
+    # google.api_core's .code, or a status quoted in the message (SDK errors re-raised as strings)
+    for attr in ("status", "status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    match = STATUS_IN_MESSAGE.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    status = error_status(error)
+    if status is not None:
+        return status in RETRY_STATUSES
+    return isinstance(error, (ConnectionError, asyncio.TimeoutError))
+
+
+def backoff_delay(attempt: int, base: float = PROVIDER_BACKOFF, retry_after: Optional[float] = None) -> float:
+    # Full jitter with a cap; a provider's Retry-After wins when it asks for longer
+    return max(random.uniform(0, min(BACKOFF_CAP, base * 2 ** attempt)), retry_after or 0.0)
+
+
+async def with_retries(provider: str, call: Callable[[], Awaitable[Any]], retries: int = PROVIDER_RETRIES_MAX) -> Any:
+    for attempt in range(retries + 1):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt)
+            PROVIDER_RETRIES.inc(provider=provider)
+            log.warning(f"{provider} call failed ({e!r}); retry {attempt + 1}/{retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+scheduler = ProviderScheduler()
@@ -0,0 +1,129 @@
+import os
+import struct
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+# TTS output format negotiation: the tenant's audioQuality picks a tier, the client says what it can
+# play (?codecs=pcm,mp3 in preference order, optionally ?rates=16000,24000), and Murf's own formats
+# decide what is requested upstream. PCM tiers Murf cannot produce directly are resampled here.
+QUALITY_RATES = {"low": 16000, "medium": 24000, "high": 44100}
+DEFAULT_QUALITY = "medium"
+MURF_SAMPLE_RATES = (8000, 24000, 44100, 48000)
+# Codec name -> Murf's format parameter; MP3 is passed through as Murf encodes it
+MURF_FORMATS = {"pcm": "WAV", "mp3": "MP3"}
+CODEC_IDS = {"pcm": 0, "mp3": 1}
+# Compressed audio is only offered for these tiers; "high" stays lossless
+COMPRESSED_TIERS = ("low", "medium")
+# off: a PCM tier Murf cannot produce is sent at the nearest higher rate Murf supports instead
+TTS_RESAMPLE = os.getenv("NOVAFLOW_TTS_RESAMPLE", "on").lower() != "off"
+RESAMPLE_TAPS = 33
+
+
+class AudioFormat:
+    def __init__(self, tier: str, codec: str, sample_rate: int, provider_rate: int):
+        self.tier = tier
+        self.codec = codec
+        # What the client receives, and what Murf is asked for
+        self.sample_rate = sample_rate
+        self.provider_rate = provider_rate
+
+    @property
+    def codec_id(self) -> int:
+        return CODEC_IDS[self.codec]
+
+    @property
+    def resample(self) -> bool:
+        return self.codec == "pcm" and self.sample_rate != self.provider_rate
+
+    @property
+    def murf_params(self) -> str:
+        return f"format={MURF_FORMATS[self.codec]}&sample_rate={self.provider_rate}&channel_type=MONO"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"tier": self.tier, "codec": self.codec, "sample_rate": self.sample_rate}
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, AudioFormat) and vars(self) == vars(other)
+
+    def __hash__(self) -> int:
+        return hash((self.tier, self.codec, self.sample_rate, self.provider_rate))
+
+    def __repr__(self) -> str:
+        return f"AudioFormat({self.codec} {self.sample_rate} Hz, {self.tier}, Murf {self.provider_rate} Hz)"
+
+
+# The format every client got before negotiation: Murf's 44.1 kHz WAV, unchanged
+LEGACY_FORMAT = AudioFormat("high", "pcm", 44100, 44100)
+
+
+def parse_codecs(value: str) -> Sequence[str]:
+    codecs = [codec.strip().lower() for codec in value.split(",") if codec.strip().lower() in MURF_FORMATS]
+    return codecs or ["pcm"]
+
+
+def parse_rates(value: str) -> Sequence[int]:
+    return sorted({int(rate) for rate in value.split(",") if rate.strip().isdigit() and int(rate) > 0})
+
+
+def _provider_rate(target: int) -> int:
+    # The lowest rate Murf offers at or above the target, so resampling only ever goes down
+    return next((rate for rate in MURF_SAMPLE_RATES if rate >= target), MURF_SAMPLE_RATES[-1])
+
+
+def negotiate(quality: Optional[str], codecs: Sequence[str] = ("pcm",), rates: Sequence[int] = (),
+              resample: bool = TTS_RESAMPLE) -> AudioFormat:
+    tier = quality if quality in QUALITY_RATES else DEFAULT_QUALITY
+    target = QUALITY_RATES[tier]
+    if rates:
+        # The highest rate the client accepts up to the tier's rate, else its lowest
+        target = max((rate for rate in rates if rate <= target), default=min(rates))
+    codec = next((c for c in codecs if c == "pcm" or tier in COMPRESSED_TIERS), "pcm")
+    provider_rate = _provider_rate(target)
+    if codec != "pcm" or not resample:
+        return AudioFormat(tier, codec, provider_rate, provider_rate)
+    return AudioFormat(tier, codec, target, provider_rate)
+
+
+def wav_header(sample_rate: int, data_bytes: int = 0) -> bytes:
+    # 44-byte mono s16le header; a streamed body has no known length, so data_bytes stays 0 as Murf's does
+    return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + data_bytes, b"WAVE", b"fmt ", 16, 1, 1,
+                       sample_rate, sample_rate * 2, 2, 16, b"data", data_bytes)
+
+
+class PcmResampler:
+    # Streaming s16le resampler: a windowed-sinc low-pass (cutoff below the target's Nyquist) and
+    # linear interpolation, carrying the filter history and the fractional read position between
+    # chunks so chunk boundaries leave no clicks
+    def __init__(self, source_rate: int, target_rate: int, taps: int = RESAMPLE_TAPS):
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.step = source_rate / target_rate
+        cutoff = min(1.0, target_rate / source_rate) * 0.9
+        n = np.arange(taps) - (taps - 1) / 2
+        kernel = np.sinc(cutoff * n) * np.hamming(taps)
+        self._kernel = kernel / kernel.sum()
+        self._history = np.zeros(taps - 1)
+        self._last = 0.0
+        self._next = 0.0
+        self._offset = 0
+
+    def process(self, pcm: bytes) -> bytes:
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float64)
+        if not len(samples):
+            return b""
+        padded = np.concatenate((self._history, samples))
+        filtered = np.convolve(padded, self._kernel, mode="valid")
+        self._history = padded[len(padded) - len(self._history):]
+        # Index 0 is the previous chunk's last sample, so positions between chunks interpolate too
+        extended = np.concatenate(([self._last], filtered))
+        start = self._next - self._offset
+        count = max(0, int(np.ceil((len(filtered) - 1 - start) / self.step)))
+        positions = start + 1 + np.arange(count) * self.step
+        index = positions.astype(np.int64)
+        fraction = positions - index
+        out = extended[index] * (1 - fraction) + extended[np.minimum(index + 1, len(filtered))] * fraction
+        self._next += count * self.step
+        self._offset += len(filtered)
+        self._last = filtered[-1]
+        return np.clip(np.rint(out), -32768, 32767).astype("<i2").tobytes()
@@ -0,0 +1,109 @@
+import struct
+import binascii
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from services.audio_format import AudioFormat, PcmResampler, wav_header
+
+# Binary audio frames sent to clients that connect with ?audio=binary:
+#   version (u8) | kind (u8) | flags (u8) | codec (u8) | sample_rate (u32 LE) | audio ...
+# codec 0 is s16le PCM (the byte was reserved and always 0 before formats were negotiated); 1 is MP3
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<BBBBI")
+FLAG_FINAL = 0x01
+FRAME_KINDS: Dict[str, int] = {"audio": 1, "speak_audio": 2}
+DEFAULT_SAMPLE_RATE = 44100
+
+SendBytes = Callable[[bytes], Awaitable[None]]
+
+
+def parse_wav_header(data: memoryview) -> Tuple[int, Optional[int]]:
+    # Returns (offset of the PCM data, sample rate) for a RIFF/WAVE prefix, or (0, None) for raw PCM
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return 0, None
+    offset = 12
+    sample_rate = None
+    while offset + 8 <= len(data):
+        chunk_id = bytes(data[offset:offset + 4])
+        chunk_size = struct.unpack_from("<I", data, offset + 4)[0]
+        if chunk_id == b"fmt " and offset + 16 <= len(data):
+            sample_rate = struct.unpack_from("<I", data, offset + 12)[0]
+        if chunk_id == b"data":
+            return offset + 8, sample_rate
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return len(data), sample_rate
+
+
+class AudioFrameEncoder:
+    # Each base64 chunk is decoded once; the WAV header and any odd trailing byte are sliced off
+    # through a memoryview, and the frame is assembled with a single join. ASGI requires a bytes
+    # object per message, so a reused bytearray would only add a copy.
+    def __init__(self, message_type: str = "audio", sample_rate: int = DEFAULT_SAMPLE_RATE,
+                 audio_format: Optional[AudioFormat] = None):
+        self.kind = FRAME_KINDS.get(message_type, FRAME_KINDS["audio"])
+        self.format = audio_format
+        self.codec = audio_format.codec_id if audio_format else 0
+        self.sample_rate = audio_format.provider_rate if audio_format else sample_rate
+        self._resampler: Optional[PcmResampler] = None
+        self._first = True
+        self._carry = b""
+
+    def encode(self, base64_audio: str, is_final: bool) -> bytes:
+        return self.encode_pcm(binascii.a2b_base64(base64_audio), is_final)
+
+    def encode_pcm(self, audio: bytes, is_final: bool) -> bytes:
+        flags = FLAG_FINAL if is_final else 0
+        if self.codec:
+            # Compressed audio goes out as Murf encoded it; the client's decoder finds the frame boundaries
+            return b"".join((FRAME_HEADER.pack(FRAME_VERSION, self.kind, flags, self.codec, self.sample_rate), audio))
+        pcm = memoryview(audio)
+        if self._first:
+            # Murf prefixes the first chunk of each context with a WAV header; strip it here so
+            # clients only ever see PCM and learn the rate from the frame header
+            offset, sample_rate = parse_wav_header(pcm)
+            pcm = pcm[offset:]
+            self.sample_rate = sample_rate or self.sample_rate
+            self._first = False
+        if self._carry:
+            pcm = memoryview(self._carry + pcm)
+        # Keep frames sample-aligned; an odd trailing byte is carried into the next chunk
+        self._carry = bytes(pcm[len(pcm) & ~1:])
+        pcm = pcm[:len(pcm) & ~1]
+        sample_rate = self.sample_rate
+        if self.format and self.format.resample:
+            if self._resampler is None:
+                self._resampler = PcmResampler(self.sample_rate, self.format.sample_rate)
+            pcm = memoryview(self._resampler.process(pcm))
+            sample_rate = self.format.sample_rate
+        header = FRAME_HEADER.pack(FRAME_VERSION, self.kind, flags, 0, sample_rate)
+        return b"".join((header, pcm))
+
+
+class Base64AudioEncoder:
+    # JSON clients get Murf's base64 chunks untouched unless the negotiated format needs resampling;
+    # then the PCM is resampled here and the first chunk gets a WAV header with the delivered rate,
+    # so the "first chunk starts with a WAV header" contract holds either way
+    def __init__(self, audio_format: AudioFormat):
+        self.format = audio_format
+        self._resampler: Optional[PcmResampler] = None
+        self._carry = b""
+
+    def encode(self, base64_audio: str) -> str:
+        if not self.format.resample:
+            return base64_audio
+        return self.encode_pcm(binascii.a2b_base64(base64_audio))
+
+    def encode_pcm(self, audio: bytes) -> str:
+        if not self.format.resample:
+            return binascii.b2a_base64(audio, newline=False).decode("ascii")
+        pcm = memoryview(audio)
+        prefix = b""
+        if self._resampler is None:
+            offset, sample_rate = parse_wav_header(pcm)
+            pcm = pcm[offset:]
+            self._resampler = PcmResampler(sample_rate or self.format.provider_rate, self.format.sample_rate)
+            prefix = wav_header(self.format.sample_rate)
+        if self._carry:
+            pcm = memoryview(self._carry + pcm)
+        self._carry = bytes(pcm[len(pcm) & ~1:])
+        body = self._resampler.process(pcm[:len(pcm) & ~1])
+        return binascii.b2a_base64(prefix + body, newline=False).decode("ascii")
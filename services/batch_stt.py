@@ -0,0 +1,380 @@
+import os
+import glob
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import argparse
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import aiohttp
+
+from services.executor import BlockingExecutor, executor as default_executor, run_to_completion
+from services.history import HistoryStore
+from services.http_client import HttpClient
+from services.knowledge import KnowledgeStore, file_sha1
+from services.metrics import PROVIDER_REQUESTS
+from services.recorder import RECORDING_EXTENSIONS, RECORDING_PREFIX, recording_dir
+from services.tenants import DEFAULT_TENANT
+
+log = logging.getLogger("novaflow")
+
+# Offline transcription of saved recordings through AssemblyAI's async REST API (upload, create a
+# transcript, poll). Many files run at once, bounded by NOVAFLOW_BATCH_STT_CONCURRENCY across all
+# batches; each transcript goes into the chat history and knowledge base as soon as it completes.
+AAI_API_URL = os.getenv("NOVAFLOW_AAI_API_URL", "https://api.assemblyai.com/v2")
+BATCH_CONCURRENCY = int(os.getenv("NOVAFLOW_BATCH_STT_CONCURRENCY", "4"))
+POLL_INTERVAL = float(os.getenv("NOVAFLOW_BATCH_STT_POLL_INTERVAL", "1.0"))
+POLL_MAX_INTERVAL = 15.0
+POLL_GROWTH = 1.5
+JOB_TIMEOUT = float(os.getenv("NOVAFLOW_BATCH_STT_TIMEOUT", "900"))
+UPLOAD_TIMEOUT = float(os.getenv("NOVAFLOW_BATCH_STT_UPLOAD_TIMEOUT", "300"))
+# Content hashes of recordings already transcribed, so renamed or re-submitted files are skipped
+PROCESSED_NAME = ".transcribed.json"
+TRANSCRIPT_SUFFIX = ".transcript.txt"
+MAX_FINISHED_JOBS = 50
+
+
+class TranscriptionError(Exception):
+    pass
+
+
+class AssemblyAIBatchClient:
+    def __init__(self, http: HttpClient, api_key: str, base_url: str = AAI_API_URL,
+                 poll_interval: float = POLL_INTERVAL, timeout: float = JOB_TIMEOUT):
+        self.http = http
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"authorization": api_key}
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.stats = {"uploads": 0, "transcripts": 0, "polls": 0}
+
+    async def _call(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        status, data = await self.http.request_json(method, f"{self.base_url}{path}", headers=self.headers, **kwargs)
+        if status >= 400 or not isinstance(data, dict):
+            detail = data.get("error") if isinstance(data, dict) else data
+            raise TranscriptionError(f"AssemblyAI {method} {path.split('/')[1]} returned {status}: {detail}")
+        return data
+
+    async def upload(self, path: str) -> str:
+        self.stats["uploads"] += 1
+        # A repeated upload only leaves an unused copy, so it is retried; creating a transcript is not
+        data = await self._call("POST", "/upload", file_path=path, idempotent=True,
+                                timeout=aiohttp.ClientTimeout(total=UPLOAD_TIMEOUT))
+        return data["upload_url"]
+
+    async def create(self, audio_url: str) -> str:
+        self.stats["transcripts"] += 1
+        return (await self._call("POST", "/transcript", json={"audio_url": audio_url}))["id"]
+
+    async def wait(self, transcript_id: str) -> Dict[str, Any]:
+        # The poll interval grows (with jitter) while a transcript is queued or processing, so short
+        # files finish promptly and long ones cost a handful of requests rather than one a second
+        deadline = time.monotonic() + self.timeout
+        delay = self.poll_interval
+        while True:
+            self.stats["polls"] += 1
+            data = await self._call("GET", f"/transcript/{transcript_id}")
+            if data.get("status") == "completed":
+                return data
+            if data.get("status") == "error":
+                raise TranscriptionError(data.get("error") or "transcription failed")
+            if time.monotonic() + delay > deadline:
+                raise TranscriptionError(f"transcript {transcript_id} not ready after {self.timeout:.0f}s")
+            await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+            delay = min(POLL_MAX_INTERVAL, delay * POLL_GROWTH)
+
+    async def transcribe(self, path: str) -> Dict[str, Any]:
+        return await self.wait(await self.create(await self.upload(path)))
+
+
+class BatchItem:
+    def __init__(self, path: str):
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.status = "queued"
+        self.sha1: Optional[str] = None
+        self.transcript_id: Optional[str] = None
+        self.words = 0
+        self.audio_seconds = 0.0
+        self.preview = ""
+        self.error: Optional[str] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished or time.time()) - self.started if self.started else 0.0
+        return {
+            "filename": self.filename,
+            "status": self.status,
+            "transcript_id": self.transcript_id,
+            "words": self.words,
+            "audio_seconds": self.audio_seconds,
+            "preview": self.preview,
+            "error": self.error,
+            "elapsed_seconds": round(elapsed, 3),
+        }
+
+
+class BatchJob:
+    def __init__(self, paths: Sequence[str], chat_id: Optional[str], knowledge_base: bool,
+                 tenant_id: str = DEFAULT_TENANT):
+        self.job_id = uuid.uuid4().hex
+        self.tenant_id = tenant_id
+        self.items = [BatchItem(path) for path in paths]
+        self.chat_id = chat_id
+        self.knowledge_base = knowledge_base
+        self.created = time.time()
+        self.finished: Optional[float] = None
+
+    def count(self, status: str) -> int:
+        return sum(item.status == status for item in self.items)
+
+    @property
+    def status(self) -> str:
+        return "done" if self.finished else "running"
+
+    @property
+    def message(self) -> str:
+        done, skipped, failed = self.count("done"), self.count("skipped"), self.count("failed")
+        summary = f"{done} transcribed, {skipped} already done, {failed} failed"
+        if self.finished:
+            return f"Transcribed {len(self.items)} recordings: {summary}."
+        return f"Transcribing {len(self.items)} recordings: {summary} so far..."
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "message": self.message,
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": len(self.items),
+            "done": self.count("done"),
+            "skipped": self.count("skipped"),
+            "failed": self.count("failed"),
+            "chat_id": self.chat_id,
+            "knowledge_base": self.knowledge_base,
+            "elapsed_seconds": round((self.finished or time.time()) - self.created, 3),
+            "files": [item.as_dict() for item in self.items],
+        }
+
+
+class BatchTranscriber:
+    def __init__(self, directory: str, history: HistoryStore, knowledge: KnowledgeStore, http: HttpClient,
+                 pool: BlockingExecutor = default_executor, concurrency: int = BATCH_CONCURRENCY,
+                 base_url: str = AAI_API_URL, on_item: Optional[Callable[[BatchItem], None]] = None):
+        self.directory = directory
+        self.history = history
+        self.knowledge = knowledge
+        self.http = http
+        self.pool = pool
+        self.concurrency = concurrency
+        self.base_url = base_url
+        self.on_item = on_item
+        self.processed_path = os.path.join(directory, PROCESSED_NAME)
+        self.jobs: Dict[str, BatchJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._processed: Dict[str, Dict[str, Any]] = {}
+        self._inflight: set = set()
+        self._lock = threading.Lock()
+        self.stats = {"files": 0, "skipped": 0, "failed": 0, "audio_seconds": 0.0}
+
+    def recordings(self, tenant_id: str = DEFAULT_TENANT) -> List[str]:
+        directory = recording_dir(self.directory, tenant_id)
+        return sorted(p for p in glob.glob(os.path.join(directory, f"{RECORDING_PREFIX}*"))
+                      if p.endswith(RECORDING_EXTENSIONS))
+
+    def submit(self, api_key: str, paths: Optional[Sequence[str]] = None, chat_id: Optional[str] = None,
+               knowledge_base: bool = True, tenant_id: str = DEFAULT_TENANT) -> BatchJob:
+        # Callers check that explicit paths are the tenant's own recordings
+        job = BatchJob(self.recordings(tenant_id) if paths is None else paths, chat_id, knowledge_base, tenant_id)
+        self.jobs[job.job_id] = job
+        client = AssemblyAIBatchClient(self.http, api_key, self.base_url)
+        self._tasks[job.job_id] = asyncio.create_task(self._run(job, client))
+        self._prune()
+        log.info(f"Queued batch transcription {job.job_id}: {len(job.items)} recordings")
+        return job
+
+    def get(self, job_id: str, tenant_id: Optional[str] = None) -> Optional[BatchJob]:
+        job = self.jobs.get(job_id)
+        if job is None or (tenant_id is not None and job.tenant_id != tenant_id):
+            return None
+        return job
+
+    @staticmethod
+    def _processed_key(job: BatchJob, sha1: str) -> str:
+        # The same audio submitted by another tenant is transcribed for that tenant, not skipped
+        return sha1 if job.tenant_id == DEFAULT_TENANT else f"{job.tenant_id}:{sha1}"
+
+    async def wait(self, job_id: str) -> BatchJob:
+        task = self._tasks.get(job_id)
+        if task:
+            await asyncio.shield(task)
+        return self.jobs[job_id]
+
+    async def cancel_all(self) -> int:
+        # Stops running batches (e.g. before the knowledge base is cleared); a transcript being written
+        # finishes first, so nothing is published after this returns
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return len(tasks)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "jobs": len(self.jobs),
+            "running": sum(not task.done() for task in self._tasks.values()),
+            "in_flight": len(self._inflight),
+            "processed": len(self._processed),
+            "concurrency": self.concurrency,
+        }
+
+    def reset(self) -> None:
+        # Forget what was transcribed (e.g. the knowledge base was cleared), so recordings can run again
+        with self._lock:
+            self._processed.clear()
+        if os.path.exists(self.processed_path):
+            os.remove(self.processed_path)
+
+    def _prune(self) -> None:
+        finished = [j for j in self.jobs.values() if j.finished]
+        for job in sorted(finished, key=lambda j: j.created)[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            self.jobs.pop(job.job_id, None)
+
+    def _load_processed(self) -> None:
+        # Re-read per batch so recordings transcribed by the CLI are skipped by the server too
+        try:
+            with open(self.processed_path, "r", encoding="utf-8") as f:
+                processed = json.load(f)
+        except (OSError, ValueError):
+            processed = {}
+        with self._lock:
+            self._processed = {**processed, **self._processed}
+
+    def _save_processed(self) -> None:
+        with self._lock:
+            data = json.dumps(self._processed, indent=1)
+        tmp = f"{self.processed_path}.part"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.processed_path)
+
+    async def _run(self, job: BatchJob, client: AssemblyAIBatchClient) -> None:
+        try:
+            await self.pool.run_io("batch_stt_load", self._load_processed)
+            await asyncio.gather(*(self._transcribe(job, item, client) for item in job.items))
+        finally:
+            job.finished = time.time()
+            self._tasks.pop(job.job_id, None)
+            log.info(f"Batch transcription {job.job_id} finished: {job.message}")
+
+    async def _transcribe(self, job: BatchJob, item: BatchItem, client: AssemblyAIBatchClient) -> None:
+        try:
+            item.sha1 = await self.pool.run_io("batch_stt_hash", file_sha1, item.path)
+            key = self._processed_key(job, item.sha1)
+            if key in self._processed or key in self._inflight:
+                item.status = "skipped"
+                self.stats["skipped"] += 1
+                return
+            self._inflight.add(key)
+            try:
+                async with self._slots:
+                    item.status = "transcribing"
+                    item.started = time.time()
+                    result = await client.transcribe(item.path)
+                PROVIDER_REQUESTS.inc(provider="assemblyai_batch", outcome="ok")
+                await run_to_completion(self._publish(job, item, result))
+            finally:
+                self._inflight.discard(key)
+        except asyncio.CancelledError:
+            if item.status != "done":
+                item.status = "failed"
+                item.error = "cancelled"
+            raise
+        except Exception as e:
+            item.status = "failed"
+            item.error = str(e)
+            self.stats["failed"] += 1
+            PROVIDER_REQUESTS.inc(provider="assemblyai_batch", outcome="error")
+            log.error(f"Batch transcription of {item.filename} failed: {e}")
+        finally:
+            item.finished = time.time()
+            if self.on_item:
+                self.on_item(item)
+
+    async def _publish(self, job: BatchJob, item: BatchItem, result: Dict[str, Any]) -> None:
+        # Written as each file completes, not at the end of the batch
+        text = (result.get("text") or "").strip()
+        item.transcript_id = result.get("id")
+        item.words = len(text.split())
+        item.audio_seconds = float(result.get("audio_duration") or 0)
+        item.preview = text[:200]
+        if text and job.chat_id:
+            await self.pool.run_io("batch_stt_history", self.history.append, job.chat_id, text,
+                                   f"Transcribed from recording {item.filename} ({item.audio_seconds:.0f}s)")
+        if text and job.knowledge_base:
+            name = f"{os.path.splitext(item.filename)[0]}{TRANSCRIPT_SUFFIX}"
+            await self.pool.run_io("batch_stt_kb_add", self.knowledge.add, name, f"{text}\n")
+        entry = {"filename": item.filename, "transcript_id": item.transcript_id, "words": item.words,
+                 "transcribed_at": time.time()}
+        with self._lock:
+            self._processed[self._processed_key(job, item.sha1)] = entry
+        await self.pool.run_io("batch_stt_save", self._save_processed)
+        item.status = "done"
+        self.stats["files"] += 1
+        self.stats["audio_seconds"] += item.audio_seconds
+        log.info(f"Transcribed {item.filename}: {item.words} words")
+
+
+async def _main(args) -> int:
+    # Standalone run against the same stores the server uses; stop the server first, or use
+    # POST /transcribe_recordings so its knowledge base picks the transcripts up immediately
+    from services.history import create_history_store
+
+    if not args.api_key:
+        log.error("No AssemblyAI key: pass --api-key or set aai_api_key")
+        return 2
+    kb_dir = os.path.join(args.uploads, "knowledge_base")
+    os.makedirs(kb_dir, exist_ok=True)
+    history = create_history_store(os.path.join(args.uploads, "chats"))
+    if args.chat_id and not history.chat_exists(args.chat_id, args.tenant):
+        log.error(f"Chat {args.chat_id} does not exist")
+        return 2
+    knowledge = KnowledgeStore(kb_dir)
+    knowledge.load()
+    http = HttpClient()
+
+    def report(item: BatchItem) -> None:
+        detail = item.error or ("already transcribed" if item.status == "skipped" else f"{item.words} words")
+        print(f"{item.status:<12}{item.filename}  {detail}", flush=True)
+
+    transcriber = BatchTranscriber(args.uploads, history, knowledge, http, concurrency=args.concurrency,
+                                   base_url=args.api_url, on_item=report)
+    try:
+        job = transcriber.submit(args.api_key, args.files or None, args.chat_id, not args.no_kb, args.tenant)
+        await transcriber.wait(job.job_id)
+        print(job.message)
+        return 1 if job.count("failed") else 0
+    finally:
+        await http.close()
+        default_executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe saved recordings with AssemblyAI in a bounded batch")
+    parser.add_argument("files", nargs="*", help=f"recordings to transcribe (default: the tenant's {RECORDING_PREFIX}*)")
+    parser.add_argument("--uploads", default="uploads", help="upload directory holding chats/ and knowledge_base/")
+    parser.add_argument("--chat-id", help="append each transcript to this chat's history")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="transcribe this tenant's recordings")
+    parser.add_argument("--no-kb", action="store_true", help="do not add transcripts to the knowledge base")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--api-url", default=AAI_API_URL)
+    parser.add_argument("--api-key", default=os.getenv("aai_api_key", ""))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    raise SystemExit(asyncio.run(_main(args)))
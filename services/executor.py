@@ -0,0 +1,130 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+log = logging.getLogger("novaflow")
+
+IO_WORKERS = int(os.getenv("NOVAFLOW_IO_WORKERS", "32"))
+CPU_WORKERS = int(os.getenv("NOVAFLOW_CPU_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+
+class CallStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    def record(self, wait: float, run: float, failed: bool) -> None:
+        self.calls += 1
+        self.errors += int(failed)
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.run_total += run
+        self.run_max = max(self.run_max, run)
+
+    def as_dict(self) -> Dict[str, Any]:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_wait_ms": round(self.wait_total / calls * 1000, 2),
+            "max_wait_ms": round(self.wait_max * 1000, 2),
+            "avg_run_ms": round(self.run_total / calls * 1000, 2),
+            "max_run_ms": round(self.run_max * 1000, 2),
+        }
+
+
+def _timed_call(func: Callable, args: Tuple, kwargs: Dict) -> Tuple[float, float, Any]:
+    # Runs in the worker (thread or process); wall-clock time is comparable across processes
+    started = time.time()
+    result = func(*args, **kwargs)
+    return started, time.time(), result
+
+
+class BlockingExecutor:
+    def __init__(self, io_workers: int = IO_WORKERS, cpu_workers: int = CPU_WORKERS):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, CallStats] = {}
+        # Calls submitted and not yet finished (queued for a worker or running)
+        self.in_flight = 0
+
+    @property
+    def io_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._io_pool is None:
+                self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="novaflow-io")
+            return self._io_pool
+
+    @property
+    def cpu_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._cpu_pool is None:
+                self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
+            return self._cpu_pool
+
+    async def _run(self, pool: Executor, label: str, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        stats = self.stats.setdefault(label, CallStats())
+        self.in_flight += 1
+        try:
+            started, finished, result = await loop.run_in_executor(pool, partial(_timed_call, func, args, kwargs))
+        except Exception:
+            elapsed = time.time() - submitted
+            stats.record(0.0, elapsed, failed=True)
+            raise
+        finally:
+            self.in_flight -= 1
+        stats.record(max(0.0, started - submitted), finished - started, failed=False)
+        return result
+
+    async def run_io(self, label: str, func: Callable, *args, **kwargs) -> Any:
+        return await self._run(self.io_pool, label, func, *args, **kwargs)
+
+    async def run_cpu(self, label: str, func: Callable, *args, **kwargs) -> Any:
+        return await self._run(self.cpu_pool, label, func, *args, **kwargs)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "io_workers": self.io_workers,
+            "cpu_workers": self.cpu_workers,
+            "in_flight": self.in_flight,
+            "calls": {label: stats.as_dict() for label, stats in sorted(self.stats.items())},
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._io_pool is not None:
+                self._io_pool.shutdown(wait=False, cancel_futures=True)
+                self._io_pool = None
+            if self._cpu_pool is not None:
+                self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+                self._cpu_pool = None
+        log.info("Executor pools shut down")
+
+
+async def run_to_completion(awaitable: Awaitable[Any]) -> Any:
+    # For writes that must not be abandoned half way: a worker thread keeps running after its awaiting
+    # task is cancelled, so on cancellation this waits for the work to land before re-raising. Whatever
+    # the cancelling side does next (e.g. clearing the store) then sees the write finished.
+    task = asyncio.ensure_future(awaitable)
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        await asyncio.wait({task})
+        raise
+
+
+executor = BlockingExecutor()
@@ -0,0 +1,67 @@
+import io
+import os
+from collections import OrderedDict
+from typing import List, Tuple
+
+import PyPDF2
+
+# Parsed PDFs kept per process: ingestion sends each pool worker many page batches of the same file,
+# and re-parsing it (xref table, page tree) cost about a quarter of every 8-page batch
+PDF_READER_CACHE_SIZE = 2
+_pdf_readers: "OrderedDict[str, Tuple[Tuple[int, int], PyPDF2.PdfReader]]" = OrderedDict()
+
+
+def _pdf_reader(path: str) -> PyPDF2.PdfReader:
+    st = os.stat(path)
+    version = (st.st_mtime_ns, st.st_size)
+    cached = _pdf_readers.get(path)
+    if cached and cached[0] == version:
+        _pdf_readers.move_to_end(path)
+        return cached[1]
+    # Read into memory so no file handle stays open between batches
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(io.BytesIO(f.read()))
+    _pdf_readers[path] = (version, reader)
+    while len(_pdf_readers) > PDF_READER_CACHE_SIZE:
+        _pdf_readers.popitem(last=False)
+    return reader
+
+
+def extract_pdf_text(path: str) -> str:
+    with open(path, "rb") as f:
+        pdf = PyPDF2.PdfReader(f)
+        return "\n".join(page.extract_text() or "" for page in pdf.pages)
+
+
+def count_pdf_pages(path: str) -> int:
+    return len(_pdf_reader(path).pages)
+
+
+def extract_pdf_pages(path: str, start: int, end: int) -> List[str]:
+    pdf = _pdf_reader(path)
+    return [pdf.pages[i].extract_text() or "" for i in range(start, min(end, len(pdf.pages)))]
+
+
+def read_text_file(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def write_text_file(path: str, content: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def append_text_file(path: str, content: str) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(content)
+
+
+def remove_files(directory: str) -> int:
+    removed = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            os.remove(path)
+            removed += 1
+    return removed
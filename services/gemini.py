@@ -0,0 +1,234 @@
+import re
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Any
+
+import google.ai.generativelanguage as glm
+from google.generativeai import GenerativeModel
+
+from services.admission import PROVIDER_RETRIES_MAX, backoff_delay, error_status, is_retryable
+from services.executor import executor
+from services.metrics import PROVIDER_RETRIES
+from services.providers import FakeGenerativeModel, is_fake
+
+log = logging.getLogger("novaflow")
+
+SYSTEM_INSTRUCTIONS = {
+    "casual": "You are a friendly and approachable assistant. Use simple, conversational language with a relaxed tone.",
+    "formal": "You are a professional assistant. Use clear, polite, and formal language in your responses.",
+    "technical": "You are a technical expert. Provide detailed, precise, and technical responses suitable for advanced users."
+}
+DEFAULT_SYSTEM_INSTRUCTION = ("You are a wise and gentle guide. Your tone is calm, clear, and comforting, like a thoughtful elder or a trusted friend. "
+                              "You explain things in a simple way, sometimes using small analogies or everyday examples if they help. "
+                              "Keep responses natural and conversational — never too formal, never dramatic, and not motivational. "
+                              "The goal is to make the user feel relaxed, understood, and stress-free, while still giving useful and thoughtful answers.")
+
+SEARCH_GROUNDING = ("Web search results for the user's question follow. Answer the question from these results in a few "
+                    "spoken-style sentences, mention which sources you relied on, and say so if the results do not answer it.")
+
+GEMINI_MODEL = "gemini-1.5-flash"
+MAX_GEMINI_CLIENTS = 32
+MAX_GEMINI_MODELS = 64
+
+SENTENCE_END = re.compile(r'[.!?…]+["\')\]]*\s+')
+CLAUSE_END = re.compile(r'[,;:—]\s+')
+
+_STREAM_DONE = object()
+
+
+class GeminiStreamError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def get_system_instruction(conversation_type: str) -> str:
+    return SYSTEM_INSTRUCTIONS.get(conversation_type, DEFAULT_SYSTEM_INSTRUCTION)
+
+
+_clients: "OrderedDict[str, glm.GenerativeServiceClient]" = OrderedDict()
+_models: "OrderedDict[Tuple[str, str, str], GenerativeModel]" = OrderedDict()
+_clients_lock = threading.Lock()
+
+
+def gemini_client(api_key: str) -> glm.GenerativeServiceClient:
+    # One client per API key instead of the SDK's process-wide configure(), so tenants with their own
+    # keys never overwrite each other's credentials. Clients are thread-safe and reused across turns.
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+            _clients[api_key] = client
+            if len(_clients) > MAX_GEMINI_CLIENTS:
+                _clients.popitem(last=False)
+        else:
+            _clients.move_to_end(api_key)
+        return client
+
+
+def gemini_model(api_key: str, conversation_type: str, model_name: str = GEMINI_MODEL,
+                 system_instruction: Optional[str] = None) -> GenerativeModel:
+    # Models hold no per-request state, so one instance per (key, conversationType) serves every turn.
+    # Internal callers (e.g. memory summaries) pass their own instruction under their own type name.
+    if is_fake("gemini"):
+        return FakeGenerativeModel(system_instruction or get_system_instruction(conversation_type))
+    key = (api_key, conversation_type, model_name)
+    with _clients_lock:
+        model = _models.get(key)
+        if model is not None:
+            _models.move_to_end(key)
+            return model
+    model = GenerativeModel(model_name=model_name,
+                            system_instruction=system_instruction or get_system_instruction(conversation_type))
+    # The SDK falls back to the global default client only when this is unset
+    model._client = gemini_client(api_key)
+    with _clients_lock:
+        model = _models.setdefault(key, model)
+        if len(_models) > MAX_GEMINI_MODELS:
+            _models.popitem(last=False)
+    return model
+
+
+def search_context(results: str) -> str:
+    return f"\n\n{SEARCH_GROUNDING}\n{results}"
+
+
+def _chunk_text(chunk: Any) -> str:
+    try:
+        return chunk.text or ""
+    except ValueError:
+        # Raised by the SDK for chunks without text parts (e.g. safety or finish metadata)
+        return ""
+
+
+def _record_usage(chunk: Any, usage: Dict[str, int]) -> None:
+    # Streamed responses report token counts on the chunks (the final one has the totals)
+    metadata = getattr(chunk, "usage_metadata", None)
+    if metadata is not None and getattr(metadata, "prompt_token_count", 0):
+        usage["prompt_tokens"] = metadata.prompt_token_count
+        usage["output_tokens"] = getattr(metadata, "candidates_token_count", 0)
+
+
+def _cancel_stream(response: Any) -> None:
+    # Streamed SDK responses wrap the gRPC call in _iterator; cancelling it ends the request at Gemini
+    # and unblocks the producer thread instead of letting it read the rest of the answer
+    call = getattr(response, "_iterator", response)
+    cancel = getattr(call, "cancel", None)
+    if callable(cancel):
+        try:
+            cancel()
+        except Exception as e:
+            log.warning(f"Failed to cancel Gemini stream: {e}")
+
+
+async def stream_generate(model: Any, contents: List[Dict], usage: Optional[Dict[str, int]] = None,
+                          retries: int = PROVIDER_RETRIES_MAX) -> AsyncIterator[str]:
+    # Failures before the first delta (429, 5xx, network) are retried with backoff; once text has
+    # reached the caller a failure is final, since it cannot be taken back
+    for attempt in range(retries + 1):
+        started = False
+        try:
+            async for delta in _stream_once(model, contents, usage):
+                started = True
+                yield delta
+            return
+        except GeminiStreamError as e:
+            if started or attempt == retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt)
+            PROVIDER_RETRIES.inc(provider="gemini")
+            log.warning(f"Gemini stream failed before the first token ({e}); retry {attempt + 1}/{retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+async def _stream_once(model: Any, contents: List[Dict], usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    streams: List[Any] = []
+
+    def produce():
+        try:
+            response = model.generate_content(contents, stream=True)
+            streams.append(response)
+            if stop.is_set():
+                # Cancelled while the request was being sent
+                _cancel_stream(response)
+                return
+            for chunk in response:
+                if stop.is_set():
+                    break
+                if usage is not None:
+                    _record_usage(chunk, usage)
+                text = _chunk_text(chunk)
+                if text:
+                    loop.call_soon_threadsafe(queue.put_nowait, text)
+            loop.call_soon_threadsafe(queue.put_nowait, _STREAM_DONE)
+        except Exception as e:
+            if not stop.is_set():
+                loop.call_soon_threadsafe(queue.put_nowait, GeminiStreamError(str(e), error_status(e)))
+
+    asyncio.ensure_future(executor.run_io("gemini_stream", produce))
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_DONE:
+                break
+            if isinstance(item, GeminiStreamError):
+                raise item
+            yield item
+    finally:
+        # Reached on completion, on error and when the turn is cancelled by a barge-in
+        stop.set()
+        for response in streams:
+            _cancel_stream(response)
+
+
+class SentenceChunker:
+    def __init__(self, min_clause_chars: int = 40, max_chars: int = 240):
+        self.min_clause_chars = min_clause_chars
+        self.max_chars = max_chars
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self.buffer += text
+        segments = []
+        while True:
+            end = self._find_cut()
+            if end is None:
+                break
+            segment = self.buffer[:end].strip()
+            self.buffer = self.buffer[end:]
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def flush(self) -> str:
+        segment = self.buffer.strip()
+        self.buffer = ""
+        return segment
+
+    def _find_cut(self) -> Optional[int]:
+        match = SENTENCE_END.search(self.buffer)
+        if match:
+            return match.end()
+        if len(self.buffer) >= self.min_clause_chars:
+            for match in CLAUSE_END.finditer(self.buffer):
+                if match.end() >= self.min_clause_chars:
+                    return match.end()
+        if len(self.buffer) >= self.max_chars:
+            space = self.buffer.rfind(" ", 0, self.max_chars)
+            return space + 1 if space > 0 else self.max_chars
+        return None
+
+
+async def sentence_stream(deltas: AsyncIterator[str], chunker: Optional[SentenceChunker] = None) -> AsyncIterator[str]:
+    chunker = chunker or SentenceChunker()
+    async for delta in deltas:
+        for segment in chunker.feed(delta):
+            yield segment
+    tail = chunker.flush()
+    if tail:
+        yield tail
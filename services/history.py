@@ -0,0 +1,364 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from services.tenants import DEFAULT_TENANT
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+log = logging.getLogger("novaflow")
+
+HISTORY_BACKEND = os.getenv("NOVAFLOW_HISTORY_BACKEND", "sqlite")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class HistoryStore(ABC):
+    # Every chat belongs to one tenant; chats from before tenants existed (and migrated JSON files)
+    # belong to DEFAULT_TENANT. tenant_id=None means any tenant, for tooling that runs outside a request.
+    @abstractmethod
+    def create_chat(self, tenant_id: str = DEFAULT_TENANT) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def chat_exists(self, chat_id: str, tenant_id: Optional[str] = None) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_chats(self, tenant_id: Optional[str] = None) -> List[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def append(self, chat_id: str, user_query: str, ai_response: str, timestamp: Optional[str] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def page(self, chat_id: str, before: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        # Returns up to `limit` entries with id < before (or the newest ones), oldest first
+        raise NotImplementedError
+
+    @abstractmethod
+    def count(self, chat_id: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self, tenant_id: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def import_chat(self, chat_id: str, entries: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def migrate_json(self, chat_dir: str) -> int:
+        migrated = 0
+        for name in sorted(os.listdir(chat_dir)):
+            chat_id, ext = os.path.splitext(name)
+            if ext != ".json" or not chat_id.isdigit():
+                continue
+            path = os.path.join(chat_dir, name)
+            try:
+                with open(path, "r") as f:
+                    entries = json.load(f)
+                self.import_chat(chat_id, entries)
+                os.replace(path, f"{path}.migrated")
+                migrated += 1
+                log.info(f"Migrated chat {chat_id} ({len(entries)} entries) to {type(self).__name__}")
+            except Exception as e:
+                log.error(f"Failed to migrate chat file {path}: {e}")
+        return migrated
+
+
+class SQLiteHistoryStore(HistoryStore):
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS chats (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created TEXT NOT NULL,
+                tenant TEXT NOT NULL DEFAULT '{DEFAULT_TENANT}'
+            );
+            CREATE TABLE IF NOT EXISTS turns (
+                chat_id INTEGER NOT NULL REFERENCES chats(id),
+                seq INTEGER NOT NULL,
+                timestamp TEXT NOT NULL,
+                user_query TEXT NOT NULL,
+                ai_response TEXT NOT NULL,
+                PRIMARY KEY (chat_id, seq)
+            ) WITHOUT ROWID;
+        """)
+        if "tenant" not in [row[1] for row in conn.execute("PRAGMA table_info(chats)")]:
+            # Databases from before tenants: existing chats stay with the default tenant
+            conn.execute(f"ALTER TABLE chats ADD COLUMN tenant TEXT NOT NULL DEFAULT '{DEFAULT_TENANT}'")
+        conn.execute("CREATE INDEX IF NOT EXISTS chats_tenant ON chats (tenant, id)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per executor thread; WAL lets readers run alongside the single writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30.0)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create_chat(self, tenant_id: str = DEFAULT_TENANT) -> str:
+        cur = self._conn().execute("INSERT INTO chats (created, tenant) VALUES (?, ?)", (datetime.now().isoformat(), tenant_id))
+        return str(cur.lastrowid)
+
+    def chat_exists(self, chat_id: str, tenant_id: Optional[str] = None) -> bool:
+        if not chat_id.isdigit():
+            return False
+        if tenant_id is None:
+            row = self._conn().execute("SELECT 1 FROM chats WHERE id = ?", (int(chat_id),)).fetchone()
+        else:
+            row = self._conn().execute("SELECT 1 FROM chats WHERE id = ? AND tenant = ?", (int(chat_id), tenant_id)).fetchone()
+        return row is not None
+
+    def list_chats(self, tenant_id: Optional[str] = None) -> List[str]:
+        if tenant_id is None:
+            return [str(row[0]) for row in self._conn().execute("SELECT id FROM chats ORDER BY id")]
+        return [str(row[0]) for row in self._conn().execute("SELECT id FROM chats WHERE tenant = ? ORDER BY id", (tenant_id,))]
+
+    def append(self, chat_id: str, user_query: str, ai_response: str, timestamp: Optional[str] = None) -> Dict[str, Any]:
+        entry = {
+            "timestamp": timestamp or datetime.now().isoformat(),
+            "user_query": user_query,
+            "ai_response": ai_response,
+        }
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM turns WHERE chat_id = ?", (int(chat_id),)).fetchone()
+            conn.execute(
+                "INSERT INTO turns (chat_id, seq, timestamp, user_query, ai_response) VALUES (?, ?, ?, ?, ?)",
+                (int(chat_id), row[0], entry["timestamp"], user_query, ai_response),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return {"id": row[0], **entry}
+
+    def page(self, chat_id: str, before: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT seq, timestamp, user_query, ai_response FROM turns WHERE chat_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (int(chat_id), before if before is not None else 2 ** 62, limit),
+        ).fetchall()
+        return [{"id": seq, "timestamp": ts, "user_query": q, "ai_response": a} for seq, ts, q, a in reversed(rows)]
+
+    def count(self, chat_id: str) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM turns WHERE chat_id = ?", (int(chat_id),)).fetchone()[0]
+
+    def clear(self, tenant_id: Optional[str] = None) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if tenant_id is None:
+                conn.execute("DELETE FROM turns")
+                conn.execute("DELETE FROM chats")
+                conn.execute("DELETE FROM sqlite_sequence WHERE name = 'chats'")
+            else:
+                # Ids keep counting, so another tenant's chat never inherits a cleared one's id
+                conn.execute("DELETE FROM turns WHERE chat_id IN (SELECT id FROM chats WHERE tenant = ?)", (tenant_id,))
+                conn.execute("DELETE FROM chats WHERE tenant = ?", (tenant_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def import_chat(self, chat_id: str, entries: List[Dict[str, Any]]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO chats (id, created) VALUES (?, ?)", (int(chat_id), datetime.now().isoformat()))
+            conn.execute("DELETE FROM turns WHERE chat_id = ?", (int(chat_id),))
+            conn.executemany(
+                "INSERT INTO turns (chat_id, seq, timestamp, user_query, ai_response) VALUES (?, ?, ?, ?, ?)",
+                [(int(chat_id), seq, e.get("timestamp", ""), e.get("user_query", ""), e.get("ai_response", ""))
+                 for seq, e in enumerate(entries, 1)],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class JsonlHistoryStore(HistoryStore):
+    # <id>.jsonl holds one entry per line; <id>.idx holds the byte offset of every line as uint64;
+    # <id>.tenant names the owning tenant (absent for chats from before tenants: the default tenant).
+    # Workers sharing the directory see each other's chats and turns: the chat list is rescanned, the
+    # index re-stat'ed on every read and appends take an flock. Clearing while another worker appends
+    # is not coordinated, so multi-worker deployments should keep the default SQLite store.
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._chat_locks: Dict[str, threading.Lock] = {}
+        self._offsets: Dict[str, array] = {}
+        self._index_ids: Dict[str, tuple] = {}
+        self._scan()
+
+    def _scan(self) -> None:
+        self._chats = {name[:-6] for name in os.listdir(self.directory) if name.endswith(".jsonl")}
+
+    def _paths(self, chat_id: str):
+        base = os.path.join(self.directory, chat_id)
+        return f"{base}.jsonl", f"{base}.idx"
+
+    def _owner_path(self, chat_id: str) -> str:
+        return os.path.join(self.directory, f"{chat_id}.tenant")
+
+    def _owner(self, chat_id: str) -> str:
+        # Read every time rather than cached: after a clear, another worker may reuse the id for
+        # another tenant's chat
+        try:
+            with open(self._owner_path(chat_id), "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return DEFAULT_TENANT
+
+    def _chat_lock(self, chat_id: str) -> threading.Lock:
+        with self._lock:
+            return self._chat_locks.setdefault(chat_id, threading.Lock())
+
+    def _load_offsets(self, chat_id: str) -> array:
+        # Other workers append to the same index: the cached offsets are extended with whatever was
+        # added since, and reloaded if the index was replaced (cleared, imported) or shrank
+        _, idx_path = self._paths(chat_id)
+        try:
+            st = os.stat(idx_path)
+        except FileNotFoundError:
+            self._offsets[chat_id] = array("Q")
+            self._index_ids.pop(chat_id, None)
+            return self._offsets[chat_id]
+        size = st.st_size - st.st_size % 8
+        offsets = self._offsets.get(chat_id)
+        if offsets is None or self._index_ids.get(chat_id) != (st.st_dev, st.st_ino) or size < len(offsets) * 8:
+            offsets = self._offsets[chat_id] = array("Q")
+            self._index_ids[chat_id] = (st.st_dev, st.st_ino)
+        if size > len(offsets) * 8:
+            with open(idx_path, "rb") as f:
+                f.seek(len(offsets) * 8)
+                offsets.frombytes(f.read(size - len(offsets) * 8))
+        return offsets
+
+    def create_chat(self, tenant_id: str = DEFAULT_TENANT) -> str:
+        with self._lock:
+            self._scan()
+            next_id = max([int(c) for c in self._chats if c.isdigit()] or [0]) + 1
+            while True:
+                try:
+                    # O_EXCL makes the allocation atomic across workers sharing the directory; the owner
+                    # is written before the .jsonl exists, so no worker lists the chat without it
+                    fd = os.open(self._owner_path(str(next_id)), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                    break
+                except FileExistsError:
+                    next_id += 1
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(tenant_id)
+            open(self._paths(str(next_id))[0], "ab").close()
+            self._chats.add(str(next_id))
+        return str(next_id)
+
+    def chat_exists(self, chat_id: str, tenant_id: Optional[str] = None) -> bool:
+        if chat_id not in self._chats and not os.path.exists(self._paths(chat_id)[0]):
+            return False
+        return tenant_id is None or self._owner(chat_id) == tenant_id
+
+    def list_chats(self, tenant_id: Optional[str] = None) -> List[str]:
+        with self._lock:
+            self._scan()
+            chats = list(self._chats)
+        chats = [c for c in chats if tenant_id is None or self._owner(c) == tenant_id]
+        return sorted(chats, key=lambda x: int(x) if x.isdigit() else 0)
+
+    def append(self, chat_id: str, user_query: str, ai_response: str, timestamp: Optional[str] = None) -> Dict[str, Any]:
+        entry = {
+            "timestamp": timestamp or datetime.now().isoformat(),
+            "user_query": user_query,
+            "ai_response": ai_response,
+        }
+        line = (json.dumps(entry) + "\n").encode("utf-8")
+        data_path, idx_path = self._paths(chat_id)
+        with self._chat_lock(chat_id):
+            with open(data_path, "ab") as f:
+                if fcntl:
+                    # Held until the file is closed, so the line and its index entry go in together
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                offsets = self._load_offsets(chat_id)
+                offset = f.seek(0, os.SEEK_END)
+                f.write(line)
+                f.flush()
+                with open(idx_path, "ab") as idx:
+                    idx.write(array("Q", [offset]).tobytes())
+                offsets.append(offset)
+            self._chats.add(chat_id)
+            return {"id": len(offsets), **entry}
+
+    def page(self, chat_id: str, before: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        data_path, _ = self._paths(chat_id)
+        with self._chat_lock(chat_id):
+            offsets = self._load_offsets(chat_id)
+            end = len(offsets) if before is None else max(0, min(before - 1, len(offsets)))
+            start = max(0, end - limit)
+            if start >= end:
+                return []
+            stop = offsets[end] if end < len(offsets) else None
+            with open(data_path, "rb") as f:
+                f.seek(offsets[start])
+                blob = f.read() if stop is None else f.read(stop - offsets[start])
+        lines = blob.decode("utf-8").splitlines()
+        return [{"id": start + i + 1, **json.loads(line)} for i, line in enumerate(lines)]
+
+    def count(self, chat_id: str) -> int:
+        with self._chat_lock(chat_id):
+            return len(self._load_offsets(chat_id))
+
+    def clear(self, tenant_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._scan()
+            for chat_id in list(self._chats):
+                if tenant_id is not None and self._owner(chat_id) != tenant_id:
+                    continue
+                for path in (*self._paths(chat_id), self._owner_path(chat_id)):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self._chats.discard(chat_id)
+                self._offsets.pop(chat_id, None)
+                self._index_ids.pop(chat_id, None)
+
+    def import_chat(self, chat_id: str, entries: List[Dict[str, Any]]) -> None:
+        data_path, idx_path = self._paths(chat_id)
+        offsets = array("Q")
+        with self._chat_lock(chat_id):
+            with open(data_path, "wb") as f:
+                for e in entries:
+                    offsets.append(f.tell())
+                    f.write((json.dumps({k: e.get(k, "") for k in ("timestamp", "user_query", "ai_response")}) + "\n").encode("utf-8"))
+            with open(idx_path, "wb") as f:
+                f.write(offsets.tobytes())
+            self._offsets.pop(chat_id, None)
+            self._chats.add(chat_id)
+
+
+def create_history_store(chat_dir: str, backend: str = HISTORY_BACKEND) -> HistoryStore:
+    if backend == "jsonl":
+        store: HistoryStore = JsonlHistoryStore(chat_dir)
+    elif backend == "sqlite":
+        store = SQLiteHistoryStore(os.path.join(chat_dir, "history.sqlite3"))
+    else:
+        raise ValueError(f"Unknown history backend: {backend}")
+    migrated = store.migrate_json(chat_dir)
+    if migrated:
+        log.info(f"Migrated {migrated} legacy chat files into the {backend} history store")
+    return store
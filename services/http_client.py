@@ -0,0 +1,216 @@
+import os
+import ssl
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Dict, Hashable, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import aiohttp
+
+log = logging.getLogger("novaflow")
+
+HTTP_TIMEOUT = float(os.getenv("NOVAFLOW_HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("NOVAFLOW_HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_LIMIT_PER_HOST = int(os.getenv("NOVAFLOW_HTTP_LIMIT_PER_HOST", "8"))
+HTTP_RETRIES = int(os.getenv("NOVAFLOW_HTTP_RETRIES", "2"))
+HTTP_BACKOFF = 0.2
+SEARCH_CACHE_TTL = float(os.getenv("NOVAFLOW_SEARCH_CACHE_TTL", "60"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("NOVAFLOW_WEBHOOK_QUEUE_SIZE", "100"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# A POST that timed out or got a 5xx may still have been acted on (a Zap run, a transcript billed),
+# so only these are retried unless the caller says the request is safe to repeat
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def url_host(url: str) -> str:
+    # Webhook URLs carry their secret in the path, so logs only name the host
+    return urlsplit(url).netloc or "<invalid url>"
+
+
+def retry_after_seconds(value: Optional[str]) -> float:
+    # Only the delta-seconds form of Retry-After; HTTP dates fall back to the normal backoff
+    try:
+        return min(max(0.0, float(value)), 30.0) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+class HttpError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class HttpClient:
+    # One aiohttp session for the app's lifetime: pooled keep-alive connections with a per-host
+    # limit, cached DNS, timeouts, and retries with full-jitter backoff for transient failures
+    def __init__(self, limit_per_host: int = HTTP_LIMIT_PER_HOST, timeout: float = HTTP_TIMEOUT,
+                 connect_timeout: float = HTTP_CONNECT_TIMEOUT, retries: int = HTTP_RETRIES,
+                 backoff: float = HTTP_BACKOFF, ssl_context: Union[bool, ssl.SSLContext] = True):
+        self.limit_per_host = limit_per_host
+        self.ssl_context = ssl_context
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            # Normally created in start(); this covers calls made before startup or after a close
+            connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host, ttl_dns_cache=300, ssl=self.ssl_context)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def start(self) -> None:
+        self._ensure_session()
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def post_json(self, url: str, payload: Dict[str, Any], retries: Optional[int] = None,
+                        idempotent: Optional[bool] = None) -> Tuple[int, Any]:
+        return await self.request_json("POST", url, retries, idempotent=idempotent, json=payload)
+
+    async def request_json(self, method: str, url: str, retries: Optional[int] = None, file_path: Optional[str] = None,
+                           idempotent: Optional[bool] = None, **kwargs) -> Tuple[int, Any]:
+        # Returns (status, parsed JSON or None); raises HttpError once retries are exhausted. With
+        # file_path the file is streamed as the body, reopened for every attempt. Without explicit
+        # retries, only idempotent requests (by method, or idempotent=True) are retried.
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        if retries is None:
+            retries = self.retries if idempotent else 0
+        for attempt in range(retries + 1):
+            self.stats["requests"] += 1
+            retry_after = 0.0
+            body = open(file_path, "rb") if file_path else None
+            try:
+                if body is not None:
+                    kwargs["data"] = body
+                async with self._ensure_session().request(method, url, **kwargs) as response:
+                    if response.status in RETRY_STATUSES and attempt < retries:
+                        error: Exception = HttpError(f"{url_host(url)} returned {response.status}", response.status)
+                        retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                    else:
+                        try:
+                            data = await response.json(content_type=None)
+                        except ValueError:
+                            data = None
+                        return response.status, data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            finally:
+                if body is not None:
+                    body.close()
+            if attempt == retries:
+                break
+            self.stats["retries"] += 1
+            # A 429/503's Retry-After wins when it asks for longer than the jittered backoff
+            delay = max(random.uniform(0, self.backoff * 2 ** attempt), retry_after)
+            log.warning(f"HTTP {method} to {url_host(url)} failed ({error!r}); retry {attempt + 1}/{retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+        self.stats["failures"] += 1
+        raise HttpError(f"{method} to {url_host(url)} failed after {retries + 1} attempts: {error!r}", getattr(error, "status", None))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "open": self._session is not None and not self._session.closed,
+            "limit_per_host": self.limit_per_host,
+        }
+
+
+class TtlCache:
+    # Small in-memory cache for results that are only worth reusing briefly (e.g. web search)
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        if len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            for k in [k for k, (expires, _) in self._entries.items() if expires < now]:
+                del self._entries[k]
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._entries), "ttl": self.ttl}
+
+
+class WebhookQueue:
+    # Fire-and-forget delivery: callers enqueue and move on, a single worker posts each payload once
+    # (a retried POST after a timeout could run the Zap twice). When the queue is full the new payload
+    # is dropped rather than blocking a turn.
+    def __init__(self, client: HttpClient, maxsize: int = WEBHOOK_QUEUE_SIZE):
+        self.client = client
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._worker: Optional[asyncio.Task] = None
+        self.stats = {"queued": 0, "sent": 0, "failed": 0, "dropped": 0}
+
+    def start(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def submit(self, url: str, payload: Dict[str, Any]) -> bool:
+        if not url:
+            return False
+        try:
+            self._queue.put_nowait((url, payload))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            log.warning(f"Webhook queue full, dropping delivery to {url_host(url)}")
+            return False
+        self.stats["queued"] += 1
+        self.start()
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            url, payload = await self._queue.get()
+            try:
+                status, _ = await self.client.post_json(url, payload, retries=0)
+                if status < 400:
+                    self.stats["sent"] += 1
+                    log.info(f"Webhook delivered to {url_host(url)}: {status}")
+                else:
+                    self.stats["failed"] += 1
+                    log.error(f"Webhook to {url_host(url)} rejected: {status}")
+            except Exception as e:
+                self.stats["failed"] += 1
+                log.error(f"Webhook to {url_host(url)} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def close(self, timeout: float = 5.0) -> None:
+        # Gives queued deliveries a moment to go out before shutdown
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"Shutting down with {self._queue.qsize()} undelivered webhooks")
+        self._worker.cancel()
+        self._worker = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": self._queue.qsize()}
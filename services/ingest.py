@@ -0,0 +1,199 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from services.executor import BlockingExecutor, executor as default_executor, run_to_completion
+from services.files import count_pdf_pages, extract_pdf_pages, read_text_file
+from services.knowledge import KnowledgeStore
+
+log = logging.getLogger("novaflow")
+
+MAX_UPLOAD_BYTES = int(os.getenv("NOVAFLOW_MAX_UPLOAD_MB", "50")) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+PAGES_PER_BATCH = int(os.getenv("NOVAFLOW_INGEST_PAGES_PER_BATCH", "8"))
+MAX_FINISHED_JOBS = 100
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+async def stream_upload_to_disk(upload: Any, path: str, max_bytes: int = MAX_UPLOAD_BYTES,
+                                pool: BlockingExecutor = default_executor) -> int:
+    # Copies the upload in fixed-size chunks so only one chunk is held in memory at a time
+    tmp = f"{path}.part"
+    written = 0
+    f = await pool.run_io("upload_open", open, tmp, "wb")
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > max_bytes:
+                raise UploadTooLarge(f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+            await pool.run_io("upload_write", f.write, chunk)
+    except BaseException:
+        await pool.run_io("upload_close", f.close)
+        await pool.run_io("upload_discard", os.remove, tmp)
+        raise
+    await pool.run_io("upload_close", f.close)
+    await pool.run_io("upload_commit", os.replace, tmp, path)
+    return written
+
+
+class IngestJob:
+    def __init__(self, filename: str, path: str):
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.path = path
+        self.status = "queued"
+        self.pages_total = 0
+        self.pages_done = 0
+        self.words = 0
+        self.preview = ""
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def message(self) -> str:
+        if self.status == "done" and self.words:
+            return f"File {self.filename} uploaded and processed successfully! Extracted {self.words} words."
+        if self.status == "done":
+            return f"File {self.filename} uploaded, but no text could be extracted."
+        if self.status == "failed":
+            return f"File {self.filename} uploaded, but an error occurred: {self.error}"
+        return f"File {self.filename} uploaded; processing page {self.pages_done} of {self.pages_total or '?'}..."
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished or time.time()) - self.started if self.started else 0.0
+        return {
+            "message": self.message,
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "pages_total": self.pages_total,
+            "pages_done": self.pages_done,
+            "progress": round(self.pages_done / self.pages_total, 3) if self.pages_total else 0.0,
+            "words": self.words,
+            "preview": self.preview,
+            "error": self.error,
+            "elapsed_seconds": round(elapsed, 3),
+        }
+
+
+class IngestionManager:
+    def __init__(self, store: KnowledgeStore, pool: BlockingExecutor = default_executor,
+                 pages_per_batch: int = PAGES_PER_BATCH):
+        self.store = store
+        self.pool = pool
+        self.pages_per_batch = pages_per_batch
+        self.jobs: Dict[str, IngestJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, filename: str, path: str) -> IngestJob:
+        job = IngestJob(filename, path)
+        self.jobs[job.job_id] = job
+        self._tasks[job.job_id] = asyncio.create_task(self._run(job))
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    async def wait(self, job_id: str) -> IngestJob:
+        task = self._tasks.get(job_id)
+        if task:
+            await asyncio.shield(task)
+        return self.jobs[job_id]
+
+    async def cancel_all(self) -> int:
+        # Stops running jobs (e.g. before the knowledge base is cleared) and waits for them to unwind,
+        # so none of them adds text afterwards
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return len(tasks)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "jobs": len(self.jobs),
+            "running": sum(not task.done() for task in self._tasks.values()),
+            "failed": sum(job.status == "failed" for job in self.jobs.values()),
+        }
+
+    def _prune(self) -> None:
+        finished = [j for j in self.jobs.values() if j.status in ("done", "failed")]
+        for job in sorted(finished, key=lambda j: j.created)[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            self.jobs.pop(job.job_id, None)
+
+    async def _append(self, job: IngestJob, texts: List[str]) -> None:
+        text = "\n".join(texts) + "\n"
+        if not job.preview:
+            job.preview = text.strip()[:200]
+        job.words += len(text.split())
+        await run_to_completion(self.pool.run_io("kb_append", self.store.append_text, job.filename, text))
+
+    async def _discard(self, job: IngestJob) -> None:
+        try:
+            await run_to_completion(self.pool.run_io("kb_discard", self.store.discard, job.filename))
+        except Exception as e:
+            log.error(f"Failed to discard partial document {job.filename}: {e}")
+
+    async def _run(self, job: IngestJob) -> None:
+        job.status = "running"
+        job.started = time.time()
+        try:
+            await run_to_completion(self.pool.run_io("kb_begin", self.store.begin, job.filename))
+            if job.filename.endswith(".pdf"):
+                job.pages_total = await self.pool.run_cpu("pdf_count_pages", count_pdf_pages, job.path)
+                starts = iter(range(0, job.pages_total, self.pages_per_batch))
+                batches: Deque[asyncio.Future] = deque()
+
+                def submit_next() -> None:
+                    start = next(starts, None)
+                    if start is not None:
+                        batches.append(asyncio.ensure_future(self.pool.run_cpu(
+                            "pdf_extract_pages", extract_pdf_pages, job.path, start, start + self.pages_per_batch)))
+
+                # Batches run in parallel on the process pool but are appended in page order; only about one
+                # per CPU worker is in flight, so extracted text is never buffered far ahead of the index
+                for _ in range(max(1, self.pool.cpu_workers)):
+                    submit_next()
+                try:
+                    while batches:
+                        pages = await batches.popleft()
+                        submit_next()
+                        await self._append(job, pages)
+                        job.pages_done += len(pages)
+                finally:
+                    for batch in batches:
+                        batch.cancel()
+            else:
+                job.pages_total = 1
+                await self._append(job, [await self.pool.run_io("kb_read", read_text_file, job.path)])
+                job.pages_done = 1
+            await run_to_completion(self.pool.run_io("kb_finalize", self.store.finalize, job.filename))
+            job.status = "done"
+            log.info(f"Ingested {job.filename}: {job.pages_done} pages, {job.words} words")
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "cancelled"
+            log.info(f"Ingestion of {job.filename} cancelled")
+            await self._discard(job)
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            log.error(f"Ingestion failed for {job.filename}: {e}")
+            await self._discard(job)
+        finally:
+            job.finished = time.time()
+            self._tasks.pop(job.job_id, None)
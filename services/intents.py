@@ -0,0 +1,124 @@
+import re
+import threading
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+
+SEARCH_WORDS = ("search", "find", "look up")
+EMAIL_PHRASES = ("send to email", "email the summary")
+SUMMARY_WORDS = ("summary",)
+INTENT_KEYWORDS: Dict[str, Iterable[str]] = {
+    "search": SEARCH_WORDS,
+    "email": EMAIL_PHRASES,
+    "summary": SUMMARY_WORDS,
+}
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def name_tokens(text: str) -> Set[str]:
+    return set(PUNCTUATION.sub("", text.lower()).split())
+
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    # Keywords sharing a prefix share one branch, so the regex engine tests each prefix once
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    return f"(?:{pattern})?" if "" in node else pattern
+
+
+class KeywordMatcher:
+    # Substring keyword matching in one pass: the keywords are compiled once into a trie-shaped regex
+    # wrapped in a lookahead, so overlapping keywords ("email the summary" and "summary") all match
+    def __init__(self, keywords: Dict[str, Iterable[str]]):
+        trie: Dict[str, dict] = {}
+        owners: Dict[str, Set[str]] = {}
+        for intent, words in keywords.items():
+            for word in words:
+                word = word.lower()
+                owners.setdefault(word, set()).add(intent)
+                node = trie
+                for char in word:
+                    node = node.setdefault(char, {})
+                node[""] = {}
+        # The regex reports the longest keyword at each position; shorter keywords it starts with count too
+        self._intents: Dict[str, FrozenSet[str]] = {
+            word: frozenset().union(*(owners[w] for w in owners if word.startswith(w))) for word in owners
+        }
+        self._pattern = re.compile(f"(?=({_trie_pattern(trie)}))")
+
+    def match(self, text: str) -> FrozenSet[str]:
+        found: FrozenSet[str] = frozenset()
+        for match in self._pattern.finditer(text.lower()):
+            found |= self._intents[match.group(1)]
+        return found
+
+
+class FilenameIndex:
+    # Inverted index from filename tokens to knowledge base files, kept in step with the store as files
+    # are added and removed. find() returns the earliest-added file sharing a token with the text.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._order: Dict[str, int] = {}
+        self._files: Dict[str, Set[str]] = {}
+        self._added = 0
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def add(self, filename: str) -> None:
+        with self._lock:
+            if filename in self._order:
+                return
+            self._order[filename] = self._added
+            self._added += 1
+            for token in name_tokens(filename):
+                self._files.setdefault(token, set()).add(filename)
+
+    def remove(self, filename: str) -> None:
+        with self._lock:
+            if self._order.pop(filename, None) is None:
+                return
+            for token in name_tokens(filename):
+                files = self._files.get(token)
+                if files is not None:
+                    files.discard(filename)
+                    if not files:
+                        del self._files[token]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._order.clear()
+            self._files.clear()
+
+    def find(self, text: str) -> Optional[str]:
+        with self._lock:
+            candidates = [f for token in name_tokens(text) for f in self._files.get(token, ())]
+            return min(candidates, key=self._order.__getitem__) if candidates else None
+
+
+class Intent:
+    def __init__(self, search: bool, email: bool, summary_file: Optional[str]):
+        self.search = search
+        self.email = email
+        self.summary_file = summary_file
+
+
+class IntentRouter:
+    # Built once at startup; per turn it costs one keyword pass plus, for "summary" requests, a few
+    # inverted-index lookups, independent of how many files the knowledge base holds
+    def __init__(self, keywords: Dict[str, Iterable[str]] = INTENT_KEYWORDS):
+        self.matcher = KeywordMatcher(keywords)
+
+    def route(self, transcript: str, files: Optional[FilenameIndex] = None) -> Intent:
+        intents = self.matcher.match(transcript)
+        summary_file = files.find(transcript) if files is not None and "summary" in intents else None
+        # A file summary is answered from the knowledge base, not the web
+        search = "search" in intents and summary_file is None
+        return Intent(search, "email" in intents, summary_file)
+
+
+router = IntentRouter()
+
+
+def has_search_intent(text: str) -> bool:
+    return "search" in router.matcher.match(text)
@@ -0,0 +1,249 @@
+import os
+import json
+import mmap
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from services.files import append_text_file, extract_pdf_text, read_text_file, write_text_file
+from services.intents import FilenameIndex
+from services.metrics import current_rss_bytes
+from services.retrieval import KnowledgeIndex, Source
+
+log = logging.getLogger("novaflow")
+
+MANIFEST_NAME = ".manifest.json"
+MMAP_THRESHOLD = int(os.getenv("NOVAFLOW_KB_MMAP_THRESHOLD", str(256 * 1024)))
+SIDECAR_SUFFIXES = (".pdf.txt", ".txt.txt")
+SOURCE_SUFFIXES = (".pdf", ".txt")
+
+
+def file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class KnowledgeStore:
+    # Documents live on disk as <name>.txt sidecars next to the uploaded source. Large sidecars are
+    # memory-mapped so the index can point into them instead of holding the text in Python strings.
+    def __init__(self, directory: str, index: Optional[KnowledgeIndex] = None):
+        self.directory = directory
+        self.index = index or KnowledgeIndex()
+        # Filename tokens -> files, for routing "summary of <file>" requests without scanning every name
+        self.names = FilenameIndex()
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self._lock = threading.RLock()
+        self._sources: Dict[str, Source] = {}
+        self._manifest: Dict[str, Dict[str, Any]] = {}
+        self.loaded = threading.Event()
+        self.load_stats: Dict[str, Any] = {}
+        self._version: Optional[str] = None
+        self._appends = 0
+
+    @property
+    def version(self) -> str:
+        # Fingerprint of the documents and their contents; changes whenever a document is added,
+        # replaced, extended or removed, so it can key caches of answers built from the knowledge base
+        with self._lock:
+            if self._version is None:
+                entries = sorted((name, self._manifest.get(name, {}).get("sha1") or f"partial:{self._appends}")
+                                 for name in self._sources)
+                self._version = hashlib.sha1(json.dumps(entries).encode("utf-8")).hexdigest()[:16]
+            return self._version
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._sources))
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._sources
+
+    def _sidecar(self, filename: str) -> str:
+        return os.path.join(self.directory, f"{filename}.txt")
+
+    def _open_source(self, filename: str) -> Source:
+        path = self._sidecar(filename)
+        size = os.path.getsize(path)
+        if size < MMAP_THRESHOLD or size == 0:
+            return read_text_file(path)
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_source(self, source: Optional[Source]) -> None:
+        if isinstance(source, mmap.mmap):
+            try:
+                source.close()
+            except BufferError:
+                # Still referenced by a chunk being read; the mapping is released once that finishes
+                pass
+
+    def _read_manifest(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self) -> None:
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def _source_entry(self, filename: str) -> Dict[str, Any]:
+        path = os.path.join(self.directory, filename)
+        if not os.path.exists(path):
+            return {}
+        stat = os.stat(path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime, "sha1": file_sha1(path)}
+
+    def _register(self, filename: str) -> int:
+        source = self._open_source(filename)
+        with self._lock:
+            old = self._sources.get(filename)
+            self._sources[filename] = source
+            self._version = None
+        self.names.add(filename)
+        chunks = self.index.add_document(filename, source)
+        if old is not None and old is not source:
+            self._close_source(old)
+        return chunks
+
+    def load(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        rss_before = current_rss_bytes()
+        with self._lock:
+            # Read and swapped under the lock that add() holds while it updates and writes the manifest,
+            # so an upload finishing mid-load is in either the file read here or the dict it updates
+            self._manifest = self._read_manifest()
+        names = set(os.listdir(self.directory))
+        sources = [n for n in names if n.endswith(SOURCE_SUFFIXES) and not n.endswith(SIDECAR_SUFFIXES) and not n.startswith(".")]
+        orphans = [n[:-4] for n in names if n.endswith(SIDECAR_SUFFIXES) and n[:-4] not in names]
+        reused = extracted = mapped = 0
+        for filename in sorted(sources):
+            try:
+                path = os.path.join(self.directory, filename)
+                stat = os.stat(path)
+                with self._lock:
+                    entry = dict(self._manifest.get(filename, {}))
+                has_sidecar = f"{filename}.txt" in names
+                if has_sidecar and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+                    reused += 1
+                elif has_sidecar and entry and entry.get("sha1") == file_sha1(path):
+                    with self._lock:
+                        self._manifest[filename] = {**entry, "mtime": stat.st_mtime}
+                    reused += 1
+                else:
+                    text = extract_pdf_text(path) if filename.endswith(".pdf") else read_text_file(path)
+                    write_text_file(self._sidecar(filename), text)
+                    source_entry = self._source_entry(filename)
+                    with self._lock:
+                        self._manifest[filename] = source_entry
+                    extracted += 1
+                self._register(filename)
+                mapped += isinstance(self._sources.get(filename), mmap.mmap)
+            except Exception as e:
+                log.error(f"Failed to load knowledge base file {filename}: {e}")
+        for filename in sorted(orphans):
+            try:
+                self._register(filename)
+                mapped += isinstance(self._sources.get(filename), mmap.mmap)
+            except Exception as e:
+                log.error(f"Failed to load knowledge base sidecar {filename}: {e}")
+        with self._lock:
+            self._write_manifest()
+        self.load_stats = {
+            "documents": len(self._sources),
+            "reused_sidecars": reused,
+            "extracted": extracted,
+            "memory_mapped": mapped,
+            "load_seconds": round(time.perf_counter() - started, 3),
+            "load_rss_delta_bytes": current_rss_bytes() - rss_before,
+        }
+        self.loaded.set()
+        log.info(f"Knowledge base loaded: {self.load_stats}")
+        return self.load_stats
+
+    def add(self, filename: str, text: str) -> int:
+        write_text_file(self._sidecar(filename), text)
+        with self._lock:
+            self._manifest[filename] = self._source_entry(filename)
+            self._write_manifest()
+        return self._register(filename)
+
+    def begin(self, filename: str) -> None:
+        # Starts an incremental ingestion: the document is listed and searchable as text arrives
+        self.remove(filename)
+        write_text_file(self._sidecar(filename), "")
+        with self._lock:
+            self._sources[filename] = ""
+            self._version = None
+        self.names.add(filename)
+
+    def append_text(self, filename: str, text: str) -> int:
+        append_text_file(self._sidecar(filename), text)
+        with self._lock:
+            self._appends += 1
+            self._version = None
+        return self.index.extend_document(filename, text)
+
+    def finalize(self, filename: str) -> int:
+        # Swaps the per-batch strings for the (possibly memory-mapped) sidecar now that it is complete
+        with self._lock:
+            self._manifest[filename] = self._source_entry(filename)
+            self._write_manifest()
+        return self._register(filename)
+
+    def remove(self, filename: str) -> bool:
+        with self._lock:
+            source = self._sources.pop(filename, None)
+            self._manifest.pop(filename, None)
+            self._version = None
+            self._write_manifest()
+        self.names.remove(filename)
+        removed = self.index.remove_document(filename)
+        self._close_source(source)
+        return removed
+
+    def discard(self, filename: str) -> None:
+        # Drops a document whose ingestion failed part way, sidecar included, so none of it stays searchable
+        self.remove(filename)
+        try:
+            os.remove(self._sidecar(filename))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            sources = list(self._sources.values())
+            self._sources.clear()
+            self._manifest.clear()
+            self._version = None
+        self.names.clear()
+        self.index.clear()
+        for source in sources:
+            self._close_source(source)
+
+    def filenames(self) -> List[str]:
+        return list(self)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            mapped = sum(isinstance(s, mmap.mmap) for s in self._sources.values())
+            mapped_bytes = sum(len(s) for s in self._sources.values() if isinstance(s, mmap.mmap))
+        return {
+            **self.index.stats(),
+            "loaded": self.loaded.is_set(),
+            "memory_mapped": mapped,
+            "memory_mapped_bytes": mapped_bytes,
+            "resident_memory_bytes": current_rss_bytes(),
+            "load": self.load_stats,
+        }
@@ -0,0 +1,57 @@
+import os
+import queue
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict
+
+LOG_LEVEL = os.getenv("NOVAFLOW_LOG_LEVEL", "INFO").upper()
+# Per-logger overrides, e.g. "novaflow=DEBUG,websockets=WARNING"
+LOG_LEVELS = os.getenv("NOVAFLOW_LOG_LEVELS", "websockets=WARNING,asyncio=WARNING,multipart=WARNING")
+LOG_QUEUE_SIZE = int(os.getenv("NOVAFLOW_LOG_QUEUE_SIZE", "10000"))
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    # Callers (the event loop included) only enqueue the record; a listener thread does the I/O.
+    # When the queue is full the record is dropped and counted rather than stalling the caller.
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    levels: Dict[str, int] = {}
+    for item in spec.split(","):
+        name, _, level = item.strip().partition("=")
+        value = logging.getLevelName(level.strip().upper())
+        if name and isinstance(value, int):
+            levels[name.strip()] = value
+    return levels
+
+
+def configure_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS,
+                      queue_size: int = LOG_QUEUE_SIZE) -> QueueListener:
+    # Replaces the root handlers with the queue handler; call stop() on the listener at shutdown to flush
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(NonBlockingQueueHandler(log_queue))
+    root.setLevel(level)
+    for name, value in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(value)
+    listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def dropped_records() -> int:
+    return sum(getattr(handler, "dropped", 0) for handler in logging.getLogger().handlers)
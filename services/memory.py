@@ -0,0 +1,265 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from services.gemini import gemini_model
+from services.history import HistoryStore
+from services.retrieval import KB_TOKEN_BUDGET, estimate_tokens
+from services.state import StateBackend
+from services.tenants import DEFAULT_TENANT
+
+log = logging.getLogger("novaflow")
+
+MEMORY_TURNS = int(os.getenv("NOVAFLOW_MEMORY_TURNS", "4"))
+MEMORY_BATCH = int(os.getenv("NOVAFLOW_MEMORY_BATCH", "4"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("NOVAFLOW_MEMORY_SUMMARY_TOKENS", "300"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("NOVAFLOW_CONTEXT_TOKEN_BUDGET", "4000"))
+# Shares of the budget left after the question; unused memory and search share goes to the knowledge base
+MEMORY_SHARE = 0.4
+SEARCH_SHARE = 0.25
+MAX_BACKLOG = 40
+SUMMARY_INSTRUCTION = ("You maintain a running summary of a voice assistant conversation. Merge the new turns into the "
+                       "existing summary. Keep names, facts, decisions, preferences and open questions; drop small talk. "
+                       "Write at most a short paragraph in plain sentences.")
+
+Turn = Dict[str, Any]
+Summarizer = Callable[[str, List[Turn]], str]
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    if estimate_tokens(text) <= tokens:
+        return text
+    cut = text[:max(0, tokens) * 4]
+    # Prefer ending on a line, then a word, so the model does not see half a result
+    for separator in ("\n", " "):
+        end = cut.rfind(separator)
+        if end > len(cut) // 2:
+            return cut[:end]
+    return cut
+
+
+def extractive_summary(previous: str, turns: List[Turn], max_tokens: int = MEMORY_SUMMARY_TOKENS) -> str:
+    # Used when no LLM summary is available: one line per turn, keeping the newest lines that fit
+    lines = [line for line in previous.splitlines() if line.strip()]
+    for turn in turns:
+        lines.append(f"- User: {turn['user_query'][:160]} / Assistant: {turn['ai_response'][:200]}")
+    kept: List[str] = []
+    used = 0
+    for line in reversed(lines):
+        used += estimate_tokens(line)
+        if used > max_tokens:
+            break
+        kept.append(line)
+    return "\n".join(reversed(kept))
+
+
+def gemini_summarizer(api_key: str, max_tokens: int = MEMORY_SUMMARY_TOKENS) -> Summarizer:
+    def summarize(previous: str, turns: List[Turn]) -> str:
+        transcript = "\n".join(f"User: {t['user_query']}\nAssistant: {t['ai_response']}" for t in turns)
+        prompt = f"Existing summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"
+        try:
+            model = gemini_model(api_key, "memory-summary", system_instruction=SUMMARY_INSTRUCTION)
+            return truncate_to_tokens(model.generate_content(prompt).text.strip(), max_tokens)
+        except Exception as e:
+            log.warning(f"Gemini summary failed, keeping an extractive summary: {e}")
+            return extractive_summary(previous, turns, max_tokens)
+    return summarize
+
+
+class ChatMemory:
+    # What one turn sees of its chat: the rolling summary of older turns plus the newest turns verbatim
+    def __init__(self, summary: str = "", summarized_through: int = 0, recent: Optional[List[Turn]] = None):
+        self.summary = summary
+        self.summarized_through = summarized_through
+        self.recent = recent or []
+
+    @property
+    def digest(self) -> str:
+        # Identifies the remembered context, so cached answers are only reused for the same context
+        if not self.summary and not self.recent:
+            return "no-history"
+        parts = [self.summary] + [f"{t['user_query']}\x00{t['ai_response']}" for t in self.recent]
+        return hashlib.sha1("\x01".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class PromptContext:
+    # Gemini contents for one turn, assembled within the token budget, with the per-part token counts
+    def __init__(self, contents: List[Dict[str, Any]], tokens: Dict[str, int], history_turns: int, dropped_turns: int):
+        self.contents = contents
+        self.tokens = tokens
+        self.history_turns = history_turns
+        self.dropped_turns = dropped_turns
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(self.tokens.values())
+
+
+class ContextBudget:
+    # Splits the prompt budget between the question, conversation memory, search results and knowledge
+    # base chunks. The question always goes in whole; memory and search are capped at their share and
+    # the knowledge base gets the rest, up to its own NOVAFLOW_KB_TOKEN_BUDGET.
+    def __init__(self, question: str, memory: ChatMemory, search: bool, total: int = CONTEXT_TOKEN_BUDGET):
+        self.question_tokens = estimate_tokens(question)
+        remaining = max(0, total - self.question_tokens)
+        memory_need = estimate_tokens(memory.summary) if memory.summary else 0
+        memory_need += sum(self._turn_tokens(t) for t in memory.recent)
+        self.memory = min(memory_need, int(remaining * MEMORY_SHARE))
+        self.search = int(remaining * SEARCH_SHARE) if search else 0
+        self.knowledge = max(0, min(KB_TOKEN_BUDGET, remaining - self.memory - self.search))
+
+    @staticmethod
+    def _turn_tokens(turn: Turn) -> int:
+        return estimate_tokens(turn["user_query"]) + estimate_tokens(turn["ai_response"])
+
+    def build(self, question_parts: List[Dict[str, str]], memory: ChatMemory, search_text: str = "",
+              knowledge_text: str = "") -> PromptContext:
+        # Memory priority: the newest turn, then the summary, then older turns newest first
+        budget = self.memory
+        kept: List[Turn] = []
+        summary = ""
+        for position, turn in enumerate(reversed(memory.recent)):
+            cost = self._turn_tokens(turn)
+            if position == 1 and memory.summary:
+                summary = truncate_to_tokens(memory.summary, budget)
+                budget -= estimate_tokens(summary) if summary else 0
+            if cost > budget:
+                break
+            kept.append(turn)
+            budget -= cost
+        if memory.summary and not summary and budget > 0:
+            summary = truncate_to_tokens(memory.summary, budget)
+        kept.reverse()
+
+        contents: List[Dict[str, Any]] = []
+        if summary:
+            contents.append({"role": "user", "parts": [{"text": f"Summary of our earlier conversation:\n{summary}"}]})
+            contents.append({"role": "model", "parts": [{"text": "Got it, I'll keep that in mind."}]})
+        for turn in kept:
+            contents.append({"role": "user", "parts": [{"text": turn["user_query"]}]})
+            contents.append({"role": "model", "parts": [{"text": turn["ai_response"]}]})
+
+        parts = list(question_parts)
+        search_text = truncate_to_tokens(search_text, self.search) if search_text else ""
+        if search_text:
+            parts.append({"text": search_text})
+        if knowledge_text:
+            parts.append({"text": knowledge_text})
+        contents.append({"role": "user", "parts": parts})
+        tokens = {
+            "question": self.question_tokens,
+            "summary": estimate_tokens(summary) if summary else 0,
+            "history": sum(self._turn_tokens(t) for t in kept),
+            "search": estimate_tokens(search_text) if search_text else 0,
+            "knowledge": estimate_tokens(knowledge_text) if knowledge_text else 0,
+        }
+        return PromptContext(contents, tokens, len(kept), len(memory.recent) - len(kept))
+
+
+class ConversationMemory:
+    # Per-chat rolling summary in the shared state backend ("memory:<tenant>:<chat id>"), so every worker
+    # sees it and clearing one tenant's memory leaves the others alone.
+    # Turns after the summary are replayed verbatim; once MEMORY_TURNS + MEMORY_BATCH of them pile up the
+    # oldest batch is folded into the summary, after the turn, off the response path. Blocking methods
+    # are called through executor.run_io.
+    def __init__(self, history: HistoryStore, state: StateBackend, turns: int = MEMORY_TURNS, batch: int = MEMORY_BATCH):
+        self.history = history
+        self.state = state
+        self.turns = turns
+        self.batch = max(1, batch)
+
+    @staticmethod
+    def _key(tenant_id: str, chat_id: str) -> str:
+        return f"memory:{tenant_id}:{chat_id}"
+
+    def load(self, chat_id: str, tenant_id: str = DEFAULT_TENANT) -> ChatMemory:
+        if self.turns <= 0:
+            return ChatMemory()
+        document = self.state.get(self._key(tenant_id, chat_id)) or {}
+        recent = self.history.page(chat_id, limit=self.turns + self.batch)
+        through = document.get("through", 0)
+        if recent and through > recent[-1]["id"]:
+            # The chat's history was cleared and its id reused; the old summary belongs to another chat
+            document, through = {}, 0
+        return ChatMemory(document.get("summary", ""), through, [t for t in recent if t["id"] > through])
+
+    def summary_due(self, chat_id: str, tenant_id: str = DEFAULT_TENANT) -> bool:
+        # Cheap check (no LLM call) so callers only queue for the summarizer when there is work
+        if self.turns <= 0:
+            return False
+        document = self.state.get(self._key(tenant_id, chat_id)) or {}
+        return self.history.count(chat_id) - self.turns - document.get("through", 0) >= self.batch
+
+    def update_summary(self, chat_id: str, summarize: Summarizer, tenant_id: str = DEFAULT_TENANT) -> bool:
+        # Folds the turns that fell out of the verbatim window into the summary; returns whether it did
+        if self.turns <= 0:
+            return False
+        document = self.state.get(self._key(tenant_id, chat_id)) or {}
+        through = document.get("through", 0)
+        newest = self.history.count(chat_id)
+        cutoff = newest - self.turns
+        if cutoff - through < self.batch:
+            return False
+        # Oldest unsummarized turns first; a backlog beyond MAX_BACKLOG is folded in by the following calls
+        older = self.history.page(chat_id, before=min(cutoff, through + MAX_BACKLOG) + 1,
+                                  limit=min(cutoff - through, MAX_BACKLOG))
+        if not older:
+            return False
+        last = older[-1]["id"]
+        summary = summarize(document.get("summary", ""), older)
+
+        def mutate(current: Dict[str, Any]) -> Dict[str, Any]:
+            # Another worker may have summarized the same turns meanwhile; the first one wins
+            if current.get("through", 0) != through:
+                return current
+            return {"summary": summary, "through": last, "updated": time.time()}
+
+        self.state.update(self._key(tenant_id, chat_id), mutate)
+        log.info(f"Summarized turns {through + 1}-{last} of chat {chat_id} ({estimate_tokens(summary)} tokens)")
+        return True
+
+    def clear(self, tenant_id: Optional[str] = None) -> None:
+        for key in self.state.keys("memory:" if tenant_id is None else f"memory:{tenant_id}:"):
+            self.state.delete(key)
+
+
+class ContextStats:
+    # Prompt size per turn (estimated by part, and as billed when Gemini reports usage) for /context_stats
+    def __init__(self, keep: int = 200):
+        self._lock = threading.Lock()
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self.turns = 0
+        self.prompt_tokens = 0
+
+    def record(self, chat_id: str, context: PromptContext, usage: Dict[str, int], first_token: Optional[float]) -> None:
+        entry = {
+            "chat_id": chat_id,
+            "estimated_prompt_tokens": context.prompt_tokens,
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "output_tokens": usage.get("output_tokens"),
+            "parts": context.tokens,
+            "history_turns": context.history_turns,
+            "dropped_turns": context.dropped_turns,
+            "first_token_ms": round(first_token * 1000) if first_token is not None else None,
+        }
+        with self._lock:
+            self._recent.append(entry)
+            self.turns += 1
+            self.prompt_tokens += usage.get("prompt_tokens") or context.prompt_tokens
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = list(self._recent)
+        sizes = sorted(e["estimated_prompt_tokens"] for e in recent)
+        return {
+            "turns": self.turns,
+            "prompt_tokens_total": self.prompt_tokens,
+            "estimated_prompt_tokens_p50": sizes[len(sizes) // 2] if sizes else 0,
+            "estimated_prompt_tokens_max": sizes[-1] if sizes else 0,
+            "budget": CONTEXT_TOKEN_BUDGET,
+            "recent": recent[-20:],
+        }
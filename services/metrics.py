@@ -0,0 +1,219 @@
+import os
+import re
+import sys
+import math
+import bisect
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+log = logging.getLogger("novaflow")
+
+
+def current_rss_bytes() -> int:
+    # /proc gives the current resident set on Linux; elsewhere fall back to the peak from getrusage
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        if resource is None:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Prometheus text exposition (format 0.0.4) without a client library: counters, gauges and histograms
+# with labels, plus collectors that publish the numeric fields of the existing *_stats snapshots
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if not labels:
+        return f"{name} {_format_value(value)}"
+    pairs = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+    return f"{name}{{{pairs}}} {_format_value(value)}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labels, key))
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, self._labels(key), value) for key, value in sorted(self._values.items())]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        samples: List[Sample] = []
+        for key, (counts, total) in values:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+def _flatten(prefix: str, snapshot: Dict[str, Any]) -> List[Tuple[str, float]]:
+    # Numeric and boolean fields become gauges; nested dicts extend the name, lists and strings are skipped
+    fields: List[Tuple[str, float]] = []
+    for key, value in snapshot.items():
+        name = f"{prefix}_{METRIC_NAME.sub('_', str(key))}"
+        if isinstance(value, dict):
+            fields.extend(_flatten(name, value))
+        elif isinstance(value, (bool, int, float)):
+            fields.append((name, float(value)))
+    return fields
+
+
+class MetricsRegistry:
+    def __init__(self, namespace: str = "novaflow"):
+        self.namespace = namespace
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(f"{self.namespace}_{name}", help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", help_text, labels, buckets))
+
+    def collector(self, name: str, snapshot: Callable[[], Dict[str, Any]]) -> None:
+        # snapshot() is called on every scrape, so it must be cheap and non-blocking
+        with self._lock:
+            self._collectors[name] = snapshot
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(_format_sample(name, labels, value) for name, labels, value in metric.samples())
+        for name, snapshot in collectors:
+            try:
+                fields = _flatten(f"{self.namespace}_{name}", snapshot())
+            except Exception as e:
+                log.warning(f"Metrics collector {name} failed: {e}")
+                continue
+            for field, value in fields:
+                lines.append(f"# TYPE {field} gauge")
+                lines.append(_format_sample(field, {}, value))
+        lines.append(f"# TYPE {self.namespace}_process_resident_memory_bytes gauge")
+        lines.append(_format_sample(f"{self.namespace}_process_resident_memory_bytes", {}, current_rss_bytes()))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+TURN_MARKS = registry.histogram("turn_mark_seconds", "Time from the start of a turn to each milestone", ["mark"])
+TURN_SPANS = registry.histogram("turn_span_seconds", "Time spent in each stage of a turn", ["span"])
+ACTIVE_SESSIONS = registry.gauge("active_sessions", "Open voice WebSocket sessions")
+PROVIDER_REQUESTS = registry.counter("provider_requests_total", "Calls to external providers by outcome",
+                                     ["provider", "outcome"])
+INTERRUPTIONS = registry.counter("interruptions_total", "Replies cut off by a barge-in", ["reason"])
+PROVIDER_RETRIES = registry.counter("provider_retries_total", "Provider calls retried after a 429, 5xx or network error",
+                                    ["provider"])
+PROVIDER_QUEUE_WAIT = registry.histogram("provider_queue_wait_seconds", "Time a call waited for a provider slot",
+                                         ["provider"])
+PROVIDER_SHED = registry.counter("provider_shed_total", "Calls refused by admission control", ["provider", "reason"])
+DEGRADED_TURNS = registry.counter("degraded_turns_total", "Turns served with a fallback because a provider was saturated",
+                                  ["policy"])
+PLAYBACK_START = registry.histogram("playback_start_seconds", "Client time from a reply's first audio chunk to playback")
+PLAYBACK_UNDERRUNS = registry.counter("playback_underruns_total", "Client jitter buffer ran dry mid-reply")
+PLAYBACK_STALL = registry.counter("playback_stall_seconds_total", "Client playback time lost to underruns")
+PLAYBACK_REPORTS = registry.counter("playback_reports_total", "Replies whose client playback stats were reported",
+                                    ["outcome"])
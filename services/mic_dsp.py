@@ -0,0 +1,101 @@
+import os
+import math
+
+import numpy as np
+
+AGC_TARGET_DB = float(os.getenv("NOVAFLOW_AGC_TARGET_DB", "-20"))
+AGC_MAX_GAIN = float(os.getenv("NOVAFLOW_AGC_MAX_GAIN", "8"))
+GATE_THRESHOLD_DB = float(os.getenv("NOVAFLOW_GATE_THRESHOLD_DB", "-50"))
+GATE_HOLD_MS = 200
+AGC_MIN_DB = -60.0  # below this a frame is treated as silence and does not move the AGC gain
+AGC_ATTACK = 0.5  # fraction of the way to the target gain per frame when turning down
+AGC_RELEASE = 0.05  # ... and when turning up, so the gain does not pump between words
+MIC_MODES = ("off", "agc", "gate")
+FULL_SCALE = 32768.0
+# float32 scalars keep the in-place ufuncs on float32 loops
+INT16_MAX = np.float32(32767)
+INT16_MIN = np.float32(-32768)
+
+
+def level_db(rms: float) -> float:
+    return 20 * math.log10(rms / FULL_SCALE + 1e-9)
+
+
+class MicProcessor:
+    # Applies mic sensitivity and the optional AGC / noise gate to int16 PCM frames in preallocated
+    # float32 and int16 buffers. With unity gain and no processing, frames pass through untouched.
+    # The returned bytes object is new for every processed frame, so the recorder and the STT sink
+    # can both hold on to it.
+    def __init__(self, frame_samples: int = 1600, sample_rate: int = 16000, agc_target_db: float = AGC_TARGET_DB,
+                 agc_max_gain: float = AGC_MAX_GAIN, gate_threshold_db: float = GATE_THRESHOLD_DB):
+        self.sample_rate = sample_rate
+        self.agc_target_db = agc_target_db
+        self.agc_max_gain = agc_max_gain
+        self.gate_threshold_db = gate_threshold_db
+        self.gain = 1.0
+        self._gain32 = np.float32(1.0)
+        self.mode = "off"
+        self.settings_version = -1
+        self.agc_gain = 1.0
+        self._gate_hold_ms = 0.0
+        self._allocate(frame_samples)
+
+    def _allocate(self, samples: int) -> None:
+        self._scratch = np.empty(samples, dtype=np.float32)
+        self._out = np.empty(samples, dtype=np.int16)
+        self._silence = bytes(samples * 2)
+
+    @property
+    def passthrough(self) -> bool:
+        return self.mode == "off" and self.gain == 1.0
+
+    def configure(self, gain: float, mode: str = "off") -> None:
+        # Kept both as a Python float for the per-frame checks (numpy scalar compares are slow)
+        # and as a float32 for the multiply
+        self.gain = float(gain)
+        self._gain32 = np.float32(gain)
+        mode = mode if mode in MIC_MODES else "off"
+        if mode != self.mode:
+            self.mode = mode
+            self.agc_gain = 1.0
+            self._gate_hold_ms = 0.0
+
+    def _update_agc(self, frame_db: float) -> None:
+        if frame_db < AGC_MIN_DB:
+            return
+        target = min(10 ** ((self.agc_target_db - frame_db) / 20), self.agc_max_gain)
+        rate = AGC_ATTACK if target < self.agc_gain else AGC_RELEASE
+        self.agc_gain += (target - self.agc_gain) * rate
+
+    def process(self, frame: bytes) -> bytes:
+        if self.passthrough:
+            return frame
+        samples = len(frame) // 2
+        if samples > len(self._scratch):
+            self._allocate(samples)
+        x = self._scratch[:samples]
+        # Widen in place first; multiplying straight from int16 would allocate a cast buffer
+        np.copyto(x, np.frombuffer(frame, dtype=np.int16, count=samples))
+        if self.gain != 1.0:
+            np.multiply(x, self._gain32, out=x)
+        if self.mode != "off":
+            frame_db = level_db(math.sqrt(float(np.dot(x, x)) / max(samples, 1)))
+            if self.mode == "agc":
+                self._update_agc(frame_db)
+                np.multiply(x, np.float32(self.agc_gain), out=x)
+            elif frame_db < self.gate_threshold_db:
+                # Keep the gate open briefly after speech so word tails are not clipped
+                if self._gate_hold_ms <= 0:
+                    return self._silence if samples == len(self._scratch) else bytes(samples * 2)
+                self._gate_hold_ms -= samples * 1000 / self.sample_rate
+            else:
+                self._gate_hold_ms = GATE_HOLD_MS
+            if self.mode == "gate" and self.gain == 1.0:
+                # An open gate at unity gain leaves the audio as it was
+                return frame
+        if self.gain > 1.0 or self.mode == "agc":
+            np.minimum(x, INT16_MAX, out=x)
+            np.maximum(x, INT16_MIN, out=x)
+        out = self._out[:samples]
+        np.copyto(out, x, casting="unsafe")
+        return out.tobytes()
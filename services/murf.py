@@ -0,0 +1,349 @@
+import os
+import json
+import time
+import uuid
+import base64
+import asyncio
+import binascii
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+import websockets
+
+from services.admission import with_retries
+from services.audio_format import AudioFormat
+from services.audio_frames import AudioFrameEncoder, Base64AudioEncoder, SendBytes
+from services.providers import fake_murf_connect, is_fake
+from services.timing import TurnTimer
+
+log = logging.getLogger("novaflow")
+
+MURF_WS_URL_DEFAULT = "wss://api.murf.ai/v1/speech/stream-input"
+# Used when no format was negotiated (services/audio_format.py)
+MURF_AUDIO_PARAMS = "format=WAV&sample_rate=44100&channel_type=MONO"
+# How long to wait for Murf's first and following audio chunks before ending the reply's audio
+MURF_FIRST_CHUNK_TIMEOUT = float(os.getenv("NOVAFLOW_MURF_FIRST_CHUNK_TIMEOUT", "10"))
+MURF_CHUNK_TIMEOUT = float(os.getenv("NOVAFLOW_MURF_CHUNK_TIMEOUT", "5"))
+
+SendJson = Callable[[Dict[str, Any]], Awaitable[None]]
+# (api_key, voice_id, speed, Murf audio params): a connection's output format is fixed when it opens
+PoolKey = Tuple[str, str, float, str]
+
+
+async def _single(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+class AudioCapture:
+    # Collects the text sent to Murf and the audio that came back so a turn can be cached; only a
+    # turn that reached Murf's final chunk is complete
+    def __init__(self):
+        self.segments: List[str] = []
+        self.chunks: List[bytes] = []
+        self.complete = False
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.segments)
+
+
+async def replay_audio(chunks: List[bytes], send_json: SendJson, message_type: str = "audio",
+                       send_bytes: Optional[SendBytes] = None, audio_format: Optional[AudioFormat] = None) -> int:
+    # Sends cached Murf chunks exactly as relay_murf_audio would have forwarded them
+    encoder = AudioFrameEncoder(message_type, audio_format=audio_format) if send_bytes else None
+    json_encoder = Base64AudioEncoder(audio_format) if audio_format and not send_bytes else None
+    for i, chunk in enumerate(chunks):
+        is_final = i == len(chunks) - 1
+        if encoder:
+            await send_bytes(encoder.encode_pcm(chunk, is_final))
+        else:
+            await send_json({
+                "type": message_type,
+                "data": json_encoder.encode_pcm(chunk) if json_encoder else base64.b64encode(chunk).decode("ascii"),
+                "is_final": is_final
+            })
+    return len(chunks)
+
+
+async def relay_murf_audio(murf_ws: Any, send_json: SendJson, message_type: str = "audio",
+                           timer: Optional[TurnTimer] = None, text_done: Optional[asyncio.Event] = None,
+                           context_id: Optional[str] = None, send_bytes: Optional[SendBytes] = None,
+                           capture: Optional[AudioCapture] = None, audio_format: Optional[AudioFormat] = None,
+                           completed: Optional[asyncio.Event] = None) -> int:
+    # Forwards Murf audio to the client until the final chunk; with text_done set, intermediate
+    # is_final flags are ignored until all text for the context has been sent. Messages that are
+    # untagged or tagged with another context (e.g. a cancelled turn on a reused connection) are dropped. With
+    # send_bytes, audio goes out as binary frames instead of base64 JSON; with capture, the
+    # decoded chunks are kept for the TTS cache (as Murf sent them, before any resampling).
+    # completed is set once the context's final chunk arrives, not when the relay gives up on a timeout.
+    chunks = 0
+    encoder = AudioFrameEncoder(message_type, audio_format=audio_format) if send_bytes else None
+    json_encoder = Base64AudioEncoder(audio_format) if audio_format and not send_bytes else None
+    timeout = MURF_FIRST_CHUNK_TIMEOUT
+    while True:
+        try:
+            murf_response = await asyncio.wait_for(murf_ws.recv(), timeout=timeout)
+        except asyncio.TimeoutError:
+            log.warning("Timeout waiting for additional Murf audio")
+            break
+        murf_data = json.loads(murf_response)
+        if context_id and murf_data.get("context_id") != context_id:
+            continue
+        timeout = MURF_CHUNK_TIMEOUT
+        base64_audio = murf_data.get("audio", "")
+        is_final = murf_data.get("is_final", False) and (text_done is None or text_done.is_set())
+        if base64_audio:
+            if timer:
+                timer.mark("first_audio")
+            if capture is not None:
+                capture.chunks.append(binascii.a2b_base64(base64_audio))
+            if encoder:
+                await send_bytes(encoder.encode(base64_audio, is_final))
+            else:
+                await send_json({
+                    "type": message_type,
+                    "data": json_encoder.encode(base64_audio) if json_encoder else base64_audio,
+                    "is_final": is_final
+                })
+            chunks += 1
+            log.debug("Sent %s chunk to client (final: %s, length: %d)", message_type, is_final, len(base64_audio))
+        elif is_final and encoder and chunks:
+            # Header-only frame so binary clients always learn where the turn's audio ends
+            await send_bytes(encoder.encode("", True))
+        if is_final:
+            if capture is not None:
+                capture.complete = True
+            if completed is not None:
+                completed.set()
+            break
+    return chunks
+
+
+async def stream_text_to_speech(murf_ws: Any, segments: AsyncIterator[str], send_json: SendJson,
+                                message_type: str = "audio", timer: Optional[TurnTimer] = None,
+                                context_id: Optional[str] = None, send_bytes: Optional[SendBytes] = None,
+                                capture: Optional[AudioCapture] = None, audio_format: Optional[AudioFormat] = None,
+                                completed: Optional[asyncio.Event] = None) -> int:
+    # The first segment goes out immediately so audio can start; after that one segment is held
+    # back so the last one can carry "end" and close the Murf context.
+    text_done = asyncio.Event()
+    receiver: Optional[asyncio.Task] = None
+    pending: Optional[str] = None
+
+    def message(text: str, **extra) -> str:
+        payload = {"text": text, **extra}
+        if context_id:
+            payload["context_id"] = context_id
+        return json.dumps(payload)
+
+    try:
+        async for segment in segments:
+            if capture is not None:
+                capture.segments.append(segment)
+            if receiver is None:
+                await murf_ws.send(message(segment))
+                if timer:
+                    timer.mark("first_tts_text")
+                receiver = asyncio.create_task(relay_murf_audio(murf_ws, send_json, message_type, timer, text_done, context_id,
+                                                                send_bytes, capture, audio_format, completed))
+                continue
+            if pending is not None:
+                await murf_ws.send(message(pending))
+            pending = segment
+        if receiver is None:
+            # No text, so no context was opened
+            if completed is not None:
+                completed.set()
+            return 0
+        text_done.set()
+        await murf_ws.send(message(pending or "", end=True))
+        return await receiver
+    finally:
+        if receiver and not receiver.done():
+            receiver.cancel()
+
+
+class MurfConnection:
+    def __init__(self, ws: Any, key: PoolKey):
+        self.ws = ws
+        self.key = key
+        self.audio_format: Optional[AudioFormat] = None
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.turns = 0
+        self.context_id: Optional[str] = None
+        self.broken = False
+        self._task: Optional[asyncio.Task] = None
+        self._barged_in = False
+
+    @property
+    def is_open(self) -> bool:
+        return not self.broken and getattr(self.ws, "open", True)
+
+    async def speak(self, text: Union[str, AsyncIterator[str]], send_json: SendJson,
+                    message_type: str = "audio", timer: Optional[TurnTimer] = None,
+                    send_bytes: Optional[SendBytes] = None, capture: Optional[AudioCapture] = None) -> int:
+        segments = _single(text) if isinstance(text, str) else text
+        self.context_id = f"novaflow-{uuid.uuid4().hex[:12]}"
+        self.turns += 1
+        self._barged_in = False
+        completed = asyncio.Event()
+        self._task = asyncio.ensure_future(
+            stream_text_to_speech(self.ws, segments, send_json, message_type, timer, self.context_id, send_bytes, capture,
+                                  self.audio_format, completed))
+        try:
+            chunks = await self._task
+            if not completed.is_set():
+                # The relay gave up waiting for audio: Murf may still be working on this context, so the
+                # connection is not handed to another turn
+                log.warning(f"Murf context {self.context_id} did not complete; discarding the connection")
+                self.broken = True
+            return chunks
+        except asyncio.CancelledError:
+            if self._barged_in:
+                log.info(f"Murf synthesis cancelled for context {self.context_id}")
+                return 0
+            # The whole turn was cancelled: stop Murf synthesizing for it before the connection is reused
+            await self._clear()
+            raise
+        except websockets.ConnectionClosed:
+            self.broken = True
+            raise
+        except Exception:
+            # e.g. the client socket failed mid-relay: stop Murf synthesizing before the connection is reused
+            await self._clear()
+            raise
+        finally:
+            self.last_used = time.monotonic()
+            self._task = None
+
+    async def _clear(self) -> None:
+        try:
+            await self.ws.send(json.dumps({"context_id": self.context_id, "clear": True}))
+        except Exception as e:
+            log.warning(f"Failed to clear Murf context {self.context_id}: {e}")
+            self.broken = True
+
+    async def cancel(self) -> None:
+        if not self._task or self._task.done():
+            return
+        await self._clear()
+        self._barged_in = True
+        self._task.cancel()
+
+    async def ping(self, timeout: float) -> bool:
+        try:
+            pong = await self.ws.ping()
+            await asyncio.wait_for(pong, timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    async def close(self) -> None:
+        try:
+            await self.ws.close()
+        except Exception:
+            pass
+
+
+class MurfPool:
+    def __init__(self, base_url: str = MURF_WS_URL_DEFAULT, max_idle_per_key: int = 4,
+                 idle_ttl: float = 120.0, health_check_after: float = 15.0, ping_timeout: float = 2.0,
+                 connect: Callable[..., Awaitable[Any]] = websockets.connect):
+        self.base_url = base_url
+        self.max_idle_per_key = max_idle_per_key
+        self.idle_ttl = idle_ttl
+        self.health_check_after = health_check_after
+        self.ping_timeout = ping_timeout
+        self._connect = connect
+        self._idle: Dict[PoolKey, List[MurfConnection]] = {}
+        self._active: Dict[Hashable, MurfConnection] = {}
+        self._lock = asyncio.Lock()
+        self.stats = {"connects": 0, "reuses": 0, "health_failures": 0, "cancels": 0}
+
+    def build_url(self, api_key: str, audio_params: str = MURF_AUDIO_PARAMS) -> str:
+        return f"{self.base_url}?api_key={api_key}&{audio_params}"
+
+    async def _open(self, key: PoolKey) -> MurfConnection:
+        api_key, voice_id, speed, audio_params = key
+        ws = await self._connect(self.build_url(api_key, audio_params), ping_interval=None)
+        await ws.send(json.dumps({"init": True}))
+        await ws.send(json.dumps({"voice_config": {"voiceId": voice_id, "style": "Narration", "speed": speed}}))
+        self.stats["connects"] += 1
+        log.info(f"Opened Murf connection for voice {voice_id}")
+        return MurfConnection(ws, key)
+
+    async def _healthy(self, conn: MurfConnection) -> bool:
+        if not conn.is_open or time.monotonic() - conn.last_used > self.idle_ttl:
+            return False
+        if time.monotonic() - conn.last_used > self.health_check_after:
+            return await conn.ping(self.ping_timeout)
+        return True
+
+    async def acquire(self, api_key: str, voice_id: str, speed: float,
+                      audio_format: Optional[AudioFormat] = None) -> MurfConnection:
+        key = (api_key, voice_id, float(speed), audio_format.murf_params if audio_format else MURF_AUDIO_PARAMS)
+        while True:
+            async with self._lock:
+                idle = self._idle.get(key)
+                conn = idle.pop() if idle else None
+            if conn is None:
+                # 429s and 5xx on the handshake are retried with backoff (services/admission.py)
+                conn = await with_retries("murf", lambda: self._open(key))
+                # Tiers can share Murf's params but not the delivered rate, so the format is per use
+                conn.audio_format = audio_format
+                return conn
+            if await self._healthy(conn):
+                self.stats["reuses"] += 1
+                conn.audio_format = audio_format
+                return conn
+            self.stats["health_failures"] += 1
+            await conn.close()
+
+    async def release(self, conn: MurfConnection) -> None:
+        async with self._lock:
+            idle = self._idle.setdefault(conn.key, [])
+            if conn.is_open and len(idle) < self.max_idle_per_key:
+                idle.append(conn)
+                return
+        await conn.close()
+
+    @asynccontextmanager
+    async def connection(self, api_key: str, voice_id: str, speed: float, owner: Optional[Hashable] = None,
+                         audio_format: Optional[AudioFormat] = None):
+        conn = await self.acquire(api_key, voice_id, speed, audio_format)
+        if owner is not None:
+            self._active[owner] = conn
+        try:
+            yield conn
+        finally:
+            if owner is not None and self._active.get(owner) is conn:
+                del self._active[owner]
+            await self.release(conn)
+
+    async def cancel(self, owner: Hashable) -> bool:
+        conn = self._active.get(owner)
+        if conn is None:
+            return False
+        self.stats["cancels"] += 1
+        await conn.cancel()
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "idle": sum(len(conns) for conns in self._idle.values()),
+            "active": len(self._active),
+        }
+
+    async def close(self) -> None:
+        async with self._lock:
+            conns = [conn for idle in self._idle.values() for conn in idle]
+            self._idle.clear()
+        for conn in conns:
+            await conn.close()
+
+
+# NOVAFLOW_FAKE_PROVIDERS=murf swaps the WebSocket for an in-process fake (services/providers.py)
+murf_pool = MurfPool(connect=fake_murf_connect) if is_fake("murf") else MurfPool()
@@ -0,0 +1,444 @@
+import os
+import json
+import time
+import base64
+import random
+import struct
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+log = logging.getLogger("novaflow")
+
+# Local stand-ins for the external providers, so the app can be load-tested and profiled without keys.
+# NOVAFLOW_FAKE_PROVIDERS=all fakes every provider; a comma list (gemini,murf,stt,search) fakes some.
+FAKE_PROVIDERS = os.getenv("NOVAFLOW_FAKE_PROVIDERS", "")
+FAKE_SEED = int(os.getenv("NOVAFLOW_FAKE_SEED", "0"))
+# Each delay gets +/- this fraction of jitter, drawn from an RNG seeded by the request, so runs repeat
+FAKE_JITTER = float(os.getenv("NOVAFLOW_FAKE_JITTER", "0.1"))
+FAKE_LLM_FIRST_TOKEN_MS = float(os.getenv("NOVAFLOW_FAKE_LLM_FIRST_TOKEN_MS", "300"))
+FAKE_LLM_CHUNK_MS = float(os.getenv("NOVAFLOW_FAKE_LLM_CHUNK_MS", "30"))
+FAKE_LLM_CHUNK_WORDS = int(os.getenv("NOVAFLOW_FAKE_LLM_CHUNK_WORDS", "4"))
+FAKE_LLM_REPLY_WORDS = int(os.getenv("NOVAFLOW_FAKE_LLM_REPLY_WORDS", "60"))
+FAKE_TTS_CONNECT_MS = float(os.getenv("NOVAFLOW_FAKE_TTS_CONNECT_MS", "150"))
+FAKE_TTS_FIRST_CHUNK_MS = float(os.getenv("NOVAFLOW_FAKE_TTS_FIRST_CHUNK_MS", "150"))
+FAKE_TTS_CHUNK_MS = float(os.getenv("NOVAFLOW_FAKE_TTS_CHUNK_MS", "20"))
+FAKE_TTS_CHARS_PER_CHUNK = int(os.getenv("NOVAFLOW_FAKE_TTS_CHARS_PER_CHUNK", "40"))
+# Bitrate of the stand-in MP3 stream; its bytes are sized like Murf's MP3 but are not decodable audio
+FAKE_TTS_MP3_KBPS = int(os.getenv("NOVAFLOW_FAKE_TTS_MP3_KBPS", "48"))
+FAKE_STT_CONNECT_MS = float(os.getenv("NOVAFLOW_FAKE_STT_CONNECT_MS", "100"))
+FAKE_STT_PARTIAL_MS = float(os.getenv("NOVAFLOW_FAKE_STT_PARTIAL_MS", "500"))
+FAKE_STT_FINAL_MS = float(os.getenv("NOVAFLOW_FAKE_STT_FINAL_MS", "150"))
+FAKE_SEARCH_MS = float(os.getenv("NOVAFLOW_FAKE_SEARCH_MS", "400"))
+# Provider-side capacity, e.g. "gemini=4,murf=4": calls beyond it get a 429 as the real APIs would under a burst
+FAKE_CAPACITY = os.getenv("NOVAFLOW_FAKE_CAPACITY", "")
+
+PROVIDER_NAMES = ("gemini", "murf", "stt", "search")
+PROVIDER_KEYS = {"gemini_api_key": "gemini", "murf_api_key": "murf", "aai_api_key": "stt", "tavily_api_key": "search"}
+FAKE_API_KEY = "fake-key"
+
+MURF_SAMPLE_RATE = 44100
+SPOKEN_CHARS_PER_SECOND = 15
+STT_BYTES_PER_SECOND = 16000 * 2
+WORDS = ("the", "cloud", "service", "scales", "with", "demand", "and", "teams", "deploy", "updates", "quickly",
+         "storage", "costs", "depend", "on", "usage", "so", "plan", "capacity", "carefully", "for", "each", "region")
+SPOKEN_WORDS = ("tell", "me", "about", "cloud", "computing", "pricing", "models", "and", "how", "storage", "works",
+                "today", "please", "explain", "the", "difference", "between", "services")
+
+
+def fake_providers(spec: str = FAKE_PROVIDERS) -> frozenset:
+    names = {name.strip().lower() for name in spec.split(",") if name.strip()}
+    return frozenset(PROVIDER_NAMES) if "all" in names else frozenset(names & set(PROVIDER_NAMES))
+
+
+FAKED = fake_providers()
+
+
+def is_fake(provider: str) -> bool:
+    return provider in FAKED
+
+
+def fake_api_key(key_name: str) -> str:
+    # Faked providers need no credentials; returns "" for providers that are live
+    return FAKE_API_KEY if is_fake(PROVIDER_KEYS.get(key_name, "")) else ""
+
+
+class FakeProviderError(Exception):
+    # Carries the HTTP status like websockets' InvalidStatusCode, so retry logic treats it the same way
+    def __init__(self, message: str, status_code: int = 429):
+        super().__init__(f"{status_code} {message}")
+        self.status_code = status_code
+
+
+class FakeQuota:
+    # Concurrent calls a faked provider accepts (0 = unlimited); thread-safe for the Gemini worker threads
+    def __init__(self, provider: str, limit: int = 0):
+        self.provider = provider
+        self.limit = limit
+        self.active = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def enter(self) -> None:
+        with self._lock:
+            if self.limit and self.active >= self.limit:
+                self.rejected += 1
+                raise FakeProviderError(f"Resource has been exhausted (fake {self.provider} capacity {self.limit})")
+            self.active += 1
+
+    def leave(self) -> None:
+        with self._lock:
+            self.active = max(0, self.active - 1)
+
+
+def fake_quotas(spec: str = FAKE_CAPACITY) -> Dict[str, FakeQuota]:
+    limits: Dict[str, int] = {}
+    for item in spec.split(","):
+        name, _, value = item.strip().partition("=")
+        if name.strip() in PROVIDER_NAMES and value.strip().isdigit():
+            limits[name.strip()] = int(value)
+    return {name: FakeQuota(name, limits.get(name, 0)) for name in PROVIDER_NAMES}
+
+
+QUOTAS = fake_quotas()
+
+
+def quota_snapshot() -> Dict[str, Any]:
+    return {name: {"active": quota.active, "rejected": quota.rejected, "limit": quota.limit} for name, quota in QUOTAS.items()}
+
+
+def seeded(*parts: Any) -> random.Random:
+    digest = hashlib.sha1("\x00".join(str(p) for p in (FAKE_SEED,) + parts).encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def jittered(rng: random.Random, ms: float) -> float:
+    return max(0.0, ms * (1 + rng.uniform(-FAKE_JITTER, FAKE_JITTER))) / 1000
+
+
+# --- Gemini -------------------------------------------------------------------------------------
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+
+class FakeChunk:
+    def __init__(self, text: str, usage: Optional[FakeUsage] = None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+def _prompt_text(contents: Union[str, List[Dict[str, Any]]]) -> str:
+    if isinstance(contents, str):
+        return contents
+    texts = [part.get("text", "") for message in contents for part in message.get("parts", []) if isinstance(part, dict)]
+    return "\n".join(texts)
+
+
+class FakeGenerativeModel:
+    # Same surface as GenerativeModel.generate_content: a deterministic answer for each prompt,
+    # streamed in chunks of FAKE_LLM_CHUNK_WORDS after a first-token delay
+    def __init__(self, system_instruction: str = "", first_token_ms: float = FAKE_LLM_FIRST_TOKEN_MS,
+                 chunk_ms: float = FAKE_LLM_CHUNK_MS, chunk_words: int = FAKE_LLM_CHUNK_WORDS,
+                 reply_words: int = FAKE_LLM_REPLY_WORDS):
+        self.system_instruction = system_instruction
+        self.first_token_ms = first_token_ms
+        self.chunk_ms = chunk_ms
+        self.chunk_words = chunk_words
+        self.reply_words = reply_words
+
+    def reply(self, prompt: str) -> List[str]:
+        rng = seeded("gemini", self.system_instruction, prompt)
+        words = [rng.choice(WORDS) for _ in range(self.reply_words)]
+        # Sentence ends every dozen words so the sentence chunker and TTS see realistic segments
+        sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+        words = " ".join(sentences).split(" ")
+        return [" ".join(words[i:i + self.chunk_words]) + " " for i in range(0, len(words), self.chunk_words)]
+
+    def generate_content(self, contents, stream: bool = False):
+        prompt = _prompt_text(contents)
+        chunks = self.reply(prompt)
+        rng = seeded("gemini-latency", prompt)
+        usage = FakeUsage(max(1, len(prompt) // 4), sum(len(c) for c in chunks) // 4)
+        if not stream:
+            QUOTAS["gemini"].enter()
+            try:
+                time.sleep(jittered(rng, self.first_token_ms) + sum(jittered(rng, self.chunk_ms) for _ in chunks))
+                return FakeChunk("".join(chunks), usage)
+            finally:
+                QUOTAS["gemini"].leave()
+        return self._stream(chunks, rng, usage)
+
+    def _stream(self, chunks: List[str], rng: random.Random, usage: FakeUsage) -> Iterator[FakeChunk]:
+        # Capacity is taken when iteration starts, so a stream dropped before its first read holds none
+        QUOTAS["gemini"].enter()
+        try:
+            time.sleep(jittered(rng, self.first_token_ms))
+            for i, chunk in enumerate(chunks):
+                yield FakeChunk(chunk, usage if i == len(chunks) - 1 else None)
+                time.sleep(jittered(rng, self.chunk_ms))
+        finally:
+            QUOTAS["gemini"].leave()
+
+
+# --- Murf ---------------------------------------------------------------------------------------
+
+def wav_header(sample_rate: int = MURF_SAMPLE_RATE, data_bytes: int = 0) -> bytes:
+    return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + data_bytes, b"WAVE", b"fmt ", 16, 1, 1,
+                       sample_rate, sample_rate * 2, 2, 16, b"data", data_bytes)
+
+
+class FakeMurfSocket:
+    # Speaks Murf's stream-input protocol over in-process queues: per-context synthesis, one audio
+    # chunk per FAKE_TTS_CHARS_PER_CHUNK characters (the first with a WAV header, for WAV), is_final
+    # on the last chunk of each text message, and "clear" to drop a context
+    def __init__(self, first_chunk_ms: float = FAKE_TTS_FIRST_CHUNK_MS, chunk_ms: float = FAKE_TTS_CHUNK_MS,
+                 chars_per_chunk: int = FAKE_TTS_CHARS_PER_CHUNK, sample_rate: int = MURF_SAMPLE_RATE,
+                 audio_format: str = "WAV"):
+        self.first_chunk_ms = first_chunk_ms
+        self.chunk_ms = chunk_ms
+        self.chars_per_chunk = chars_per_chunk
+        self.sample_rate = sample_rate
+        self.audio_format = audio_format.upper()
+        self.open = True
+        self._outbox: asyncio.Queue = asyncio.Queue()
+        self._contexts: Dict[Optional[str], asyncio.Queue] = {}
+        self._workers: Dict[Optional[str], asyncio.Task] = {}
+        self._started: set = set()
+
+    async def send(self, message: str) -> None:
+        if not self.open:
+            raise ConnectionError("fake Murf socket is closed")
+        data = json.loads(message)
+        context_id = data.get("context_id")
+        if data.get("clear"):
+            worker = self._workers.pop(context_id, None)
+            self._contexts.pop(context_id, None)
+            if worker:
+                worker.cancel()
+            return
+        if "text" not in data:
+            return  # init / voice_config
+        if context_id not in self._contexts:
+            self._contexts[context_id] = asyncio.Queue()
+            self._workers[context_id] = asyncio.create_task(self._synthesize(context_id, self._contexts[context_id]))
+        await self._contexts[context_id].put(data)
+
+    async def _synthesize(self, context_id: Optional[str], texts: asyncio.Queue) -> None:
+        while True:
+            data = await texts.get()
+            text = data.get("text", "")
+            rng = seeded("murf", context_id, text)
+            if text:
+                await asyncio.sleep(jittered(rng, self.first_chunk_ms))
+                chunks = max(1, len(text) // self.chars_per_chunk)
+                seconds = self.chars_per_chunk / SPOKEN_CHARS_PER_SECOND
+                for i in range(chunks):
+                    if self.audio_format == "MP3":
+                        # Frame sync bytes and silence, FAKE_TTS_MP3_KBPS worth of them
+                        pcm = (b"\xff\xfb\x90\x64" + b"\x00" * 140) * max(1, int(seconds * FAKE_TTS_MP3_KBPS * 125 / 144))
+                    else:
+                        pcm = b"\x00\x00" * int(seconds * self.sample_rate)
+                        if context_id not in self._started:
+                            self._started.add(context_id)
+                            pcm = wav_header(self.sample_rate, data_bytes=len(pcm)) + pcm
+                    await asyncio.sleep(jittered(rng, self.chunk_ms))
+                    await self._outbox.put(json.dumps({"audio": base64.b64encode(pcm).decode("ascii"),
+                                                       "context_id": context_id, "is_final": i == chunks - 1}))
+            else:
+                await self._outbox.put(json.dumps({"audio": "", "context_id": context_id, "is_final": True}))
+            if data.get("end"):
+                self._workers.pop(context_id, None)
+                self._contexts.pop(context_id, None)
+                return
+
+    async def recv(self) -> str:
+        return await self._outbox.get()
+
+    async def ping(self) -> "asyncio.Future":
+        pong = asyncio.get_running_loop().create_future()
+        pong.set_result(None)
+        return pong
+
+    async def close(self) -> None:
+        if self.open:
+            QUOTAS["murf"].leave()
+        self.open = False
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers.clear()
+
+
+async def fake_murf_connect(url: str, **kwargs) -> FakeMurfSocket:
+    # Murf's capacity counts open connections, idle pooled ones included; format and rate come from the URL
+    await asyncio.sleep(FAKE_TTS_CONNECT_MS / 1000)
+    QUOTAS["murf"].enter()
+    query = parse_qs(urlsplit(url).query)
+    return FakeMurfSocket(sample_rate=int(query.get("sample_rate", [MURF_SAMPLE_RATE])[0]),
+                          audio_format=query.get("format", ["WAV"])[0])
+
+
+# --- AssemblyAI ---------------------------------------------------------------------------------
+
+class FakeTranscriber:
+    # Turns audio into deterministic words: one more word per FAKE_STT_PARTIAL_MS of audio, the
+    # vocabulary picked by a hash of the first frame so the same recording gives the same transcript
+    def __init__(self, partial_ms: float = FAKE_STT_PARTIAL_MS):
+        self.partial_bytes = max(2, int(partial_ms / 1000 * STT_BYTES_PER_SECOND))
+        self.received = 0
+        self.words: List[str] = []
+        self._rng: Optional[random.Random] = None
+
+    def feed(self, frame: bytes) -> Optional[Dict[str, Any]]:
+        if self._rng is None:
+            self._rng = seeded("stt", hashlib.sha1(frame).hexdigest())
+        before = self.received // self.partial_bytes
+        self.received += len(frame)
+        if self.received // self.partial_bytes == before:
+            return None
+        self.words.append(self._rng.choice(SPOKEN_WORDS))
+        return {"type": "Turn", "transcript": " ".join(self.words), "end_of_turn": False,
+                "turn_is_formatted": False, "audio_ms": self.received * 1000 // STT_BYTES_PER_SECOND}
+
+    def final(self) -> List[Dict[str, Any]]:
+        events = []
+        if self.words:
+            events.append({"type": "Turn", "transcript": " ".join(self.words).capitalize() + "?", "end_of_turn": True,
+                           "turn_is_formatted": True, "audio_ms": self.received * 1000 // STT_BYTES_PER_SECOND})
+        events.append({"type": "Termination", "audio_duration_seconds": self.received / STT_BYTES_PER_SECOND})
+        return events
+
+
+class FakeSttSocket:
+    # AssemblyAI v3 streaming as AsyncStreamingSTT sees it: iterate for events, send audio or Terminate
+    def __init__(self, final_ms: float = FAKE_STT_FINAL_MS):
+        self.final_ms = final_ms
+        self.transcriber = FakeTranscriber()
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._events.put_nowait(json.dumps({"type": "Begin", "id": f"fake-{id(self):x}"}))
+        self.open = True
+
+    async def send(self, message: Union[str, bytes]) -> None:
+        if isinstance(message, bytes):
+            event = self.transcriber.feed(message)
+            if event:
+                await self._events.put(json.dumps(event))
+            return
+        if json.loads(message).get("type") == "Terminate":
+            await asyncio.sleep(self.final_ms / 1000)
+            for event in self.transcriber.final():
+                await self._events.put(json.dumps(event))
+            await self._events.put(None)
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[str]:
+        while self.open:
+            raw = await self._events.get()
+            if raw is None:
+                return
+            yield raw
+
+    async def close(self) -> None:
+        if self.open:
+            QUOTAS["stt"].leave()
+        self.open = False
+        self._events.put_nowait(None)
+
+
+async def fake_stt_connect(url: str, **kwargs) -> FakeSttSocket:
+    await asyncio.sleep(FAKE_STT_CONNECT_MS / 1000)
+    QUOTAS["stt"].enter()
+    return FakeSttSocket()
+
+
+class FakeSttMessage:
+    def __init__(self, data: Dict[str, Any]):
+        self.type = data["type"]
+        self.transcript = data.get("transcript", "")
+        self.turn_is_formatted = data.get("turn_is_formatted", False)
+        self.end_of_turn = data.get("end_of_turn", False)
+
+    def __str__(self) -> str:
+        return json.dumps({"type": self.type, "transcript": self.transcript})
+
+
+class FakeStreamingClient:
+    # Stand-in for the AssemblyAI SDK's StreamingClient (server-microphone mode): handlers are called
+    # from the streaming thread, as the SDK does, and disconnect(terminate=True) delivers the final turn
+    def __init__(self, options: Any = None):
+        self.options = options
+        self._handlers: Dict[str, List[Callable]] = {}
+        self._transcriber = FakeTranscriber()
+        self._lock = threading.Lock()
+
+    def on(self, event: Any, handler: Callable) -> None:
+        self._handlers.setdefault(str(getattr(event, "value", event)), []).append(handler)
+
+    def _emit(self, data: Dict[str, Any]) -> None:
+        message = FakeSttMessage(data)
+        for handler in self._handlers.get(message.type, []):
+            handler(self, message)
+
+    def connect(self, params: Any = None) -> None:
+        time.sleep(FAKE_STT_CONNECT_MS / 1000)
+        self._emit({"type": "Begin"})
+
+    def stream(self, data: bytes) -> None:
+        with self._lock:
+            event = self._transcriber.feed(data)
+        if event:
+            self._emit(event)
+
+    def disconnect(self, terminate: bool = False) -> None:
+        if terminate:
+            time.sleep(FAKE_STT_FINAL_MS / 1000)
+            with self._lock:
+                events, self._transcriber = self._transcriber.final(), FakeTranscriber()
+            for event in events:
+                self._emit(event)
+
+
+# --- Web search ---------------------------------------------------------------------------------
+
+SearchResponse = Tuple[int, Optional[Dict[str, Any]]]
+
+
+class TavilySearch:
+    def __init__(self, client: Any, url: str):
+        self.client = client
+        self.url = url
+
+    async def search(self, api_key: str, query: str, max_results: int) -> SearchResponse:
+        # A search has no side effects, so transient failures are retried
+        return await self.client.post_json(self.url, {"api_key": api_key, "query": query, "max_results": max_results},
+                                           idempotent=True)
+
+
+class FakeSearch:
+    # Tavily-shaped results for any query after FAKE_SEARCH_MS
+    def __init__(self, latency_ms: float = FAKE_SEARCH_MS):
+        self.latency_ms = latency_ms
+
+    async def search(self, api_key: str, query: str, max_results: int) -> SearchResponse:
+        rng = seeded("search", query)
+        try:
+            QUOTAS["search"].enter()
+        except FakeProviderError:
+            return 429, None
+        try:
+            await asyncio.sleep(jittered(rng, self.latency_ms))
+        finally:
+            QUOTAS["search"].leave()
+        results = []
+        for i in range(max(0, int(max_results))):
+            words = " ".join(rng.choice(WORDS) for _ in range(30))
+            results.append({"title": f"Result {i + 1} for {query[:40]}", "content": words.capitalize() + ".",
+                            "url": f"https://example.com/{hashlib.sha1(f'{query}{i}'.encode()).hexdigest()[:10]}"})
+        return 200, {"results": results}
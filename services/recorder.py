@@ -0,0 +1,180 @@
+import os
+import glob
+import time
+import wave
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+import ffmpeg
+
+from services.tenants import DEFAULT_TENANT
+
+log = logging.getLogger("novaflow")
+
+MAX_RECORDING_SECONDS = float(os.getenv("NOVAFLOW_RECORDING_MAX_SECONDS", "3600"))
+RECORDING_FORMAT = os.getenv("NOVAFLOW_RECORDING_FORMAT", "wav").lower()
+RECORDING_RETENTION_DAYS = float(os.getenv("NOVAFLOW_RECORDING_RETENTION_DAYS", "0"))
+RECORDING_MAX_FILES = int(os.getenv("NOVAFLOW_RECORDING_MAX_FILES", "200"))
+RECORDING_PREFIX = "recorded_audio_"
+RECORDING_EXTENSIONS = (".wav", ".flac", ".ogg")
+# The default tenant's recordings stay in the upload directory; every other tenant gets its own
+# recordings/<tenant>/ below it, so listing, batch transcription and cleanup never cross tenants
+RECORDINGS_SUBDIR = "recordings"
+WRITE_BUFFER_BYTES = 64 * 1024
+CODECS = {"flac": ("flac", {}), "opus": ("libopus", {"audio_bitrate": "24k"})}
+
+
+class AudioRecorder:
+    # Streams PCM frames into a WAV file as they arrive, so a session holds at most one write
+    # buffer in memory instead of the whole recording. Frames past max_seconds are dropped.
+    def __init__(self, directory: str, sample_rate: int = 16000, channels: int = 1, sample_width: int = 2,
+                 max_seconds: float = MAX_RECORDING_SECONDS, compression: str = RECORDING_FORMAT):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.max_bytes = int(max_seconds * sample_rate * channels * sample_width)
+        self.compression = compression if compression in CODECS else None
+        self.path: Optional[str] = None
+        self.bytes_written = 0
+        self.frames_dropped = 0
+        self._file = None
+        self._wav: Optional[wave.Wave_write] = None
+        self._lock = threading.Lock()
+        self._frames: "queue.SimpleQueue[Optional[bytes]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+
+    @property
+    def seconds(self) -> float:
+        return self.bytes_written / (self.sample_rate * self.channels * self.sample_width)
+
+    def start(self) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.path = os.path.join(self.directory, f"{RECORDING_PREFIX}{ts}.wav")
+        self._file = open(self.path, "wb", buffering=WRITE_BUFFER_BYTES)
+        self._wav = wave.open(self._file, "wb")
+        self._wav.setnchannels(self.channels)
+        self._wav.setsampwidth(self.sample_width)
+        self._wav.setframerate(self.sample_rate)
+        return self.path
+
+    def write(self, frame: bytes) -> bool:
+        with self._lock:
+            if self._wav is None:
+                return False
+            if self.bytes_written + len(frame) > self.max_bytes:
+                if not self.frames_dropped:
+                    log.warning(f"Recording reached {self.seconds:.1f}s limit; dropping further audio")
+                self.frames_dropped += 1
+                return False
+            self._wav.writeframesraw(frame)
+            self.bytes_written += len(frame)
+            return True
+
+    def submit(self, frame: bytes) -> None:
+        # For the event loop: queues the frame for this recording's writer thread, which writes frames
+        # in arrival order, so no file I/O happens on the loop
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._drain, name="novaflow-recorder", daemon=True)
+            self._writer.start()
+        self._frames.put(frame)
+
+    def _drain(self) -> None:
+        while True:
+            frame = self._frames.get()
+            if frame is None:
+                return
+            self.write(frame)
+
+    def _close(self) -> None:
+        # Everything submitted so far is written before the file is closed
+        if self._writer is not None:
+            self._frames.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._lock:
+            wav, f = self._wav, self._file
+            self._wav = self._file = None
+        if wav:
+            # Patches the RIFF header sizes now that the final length is known
+            wav.close()
+        if f:
+            f.close()
+
+    def finish(self) -> Optional[str]:
+        self._close()
+        if not self.path or not os.path.exists(self.path):
+            return None
+        if not self.bytes_written:
+            os.remove(self.path)
+            return None
+        if self.compression:
+            self.path = compress_recording(self.path, self.compression)
+        log.info(f"Saved audio file: {self.path} ({self.seconds:.1f}s, {self.frames_dropped} frames over limit)")
+        return self.path
+
+    def discard(self) -> None:
+        self._close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def compress_recording(path: str, compression: str) -> str:
+    # Transcodes a finished WAV with ffmpeg; without an ffmpeg binary the WAV is kept as-is
+    codec, options = CODECS[compression]
+    target = f"{os.path.splitext(path)[0]}.{'ogg' if compression == 'opus' else compression}"
+    try:
+        ffmpeg.input(path).output(target, acodec=codec, **options).overwrite_output().run(quiet=True)
+    except (ffmpeg.Error, FileNotFoundError) as e:
+        log.warning(f"Could not compress {path} to {compression}, keeping WAV: {e}")
+        if os.path.exists(target):
+            os.remove(target)
+        return path
+    os.remove(path)
+    return target
+
+
+def recording_dir(directory: str, tenant_id: str = DEFAULT_TENANT) -> str:
+    if tenant_id == DEFAULT_TENANT:
+        return directory
+    return os.path.join(directory, RECORDINGS_SUBDIR, tenant_id)
+
+
+def recording_dirs(directory: str) -> List[str]:
+    return [directory] + sorted(glob.glob(os.path.join(directory, RECORDINGS_SUBDIR, "*")))
+
+
+def is_recording_name(name: str) -> bool:
+    # A bare file name the recorder could have written; anything else in uploads/ (state, chats,
+    # knowledge base files) is never a recording
+    return (name == os.path.basename(name) and name.startswith(RECORDING_PREFIX)
+            and name.endswith(RECORDING_EXTENSIONS))
+
+
+def cleanup_recordings(directory: str, retention_days: float = RECORDING_RETENTION_DAYS,
+                       max_files: int = RECORDING_MAX_FILES) -> int:
+    # Deletes recordings older than retention_days (0 keeps them), then the oldest beyond max_files
+    recordings = sorted(
+        (os.path.getmtime(p), p)
+        for p in glob.glob(os.path.join(directory, f"{RECORDING_PREFIX}*"))
+        if p.endswith(RECORDING_EXTENSIONS)
+    )
+    cutoff = time.time() - retention_days * 86400
+    expired = [p for mtime, p in recordings if retention_days > 0 and mtime < cutoff]
+    remaining = [p for _, p in recordings if p not in expired]
+    if max_files > 0 and len(remaining) > max_files:
+        expired += remaining[:len(remaining) - max_files]
+    removed = 0
+    for path in expired:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError as e:
+            log.warning(f"Failed to remove old recording {path}: {e}")
+    if removed:
+        log.info(f"Removed {removed} old recordings from {directory}")
+    return removed
@@ -0,0 +1,265 @@
+import os
+import re
+import json
+import time
+import struct
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+log = logging.getLogger("novaflow")
+
+LLM_CACHE_MAX_BYTES = int(os.getenv("NOVAFLOW_LLM_CACHE_MAX_BYTES", str(16 * 2**20)))
+LLM_CACHE_TTL = float(os.getenv("NOVAFLOW_LLM_CACHE_TTL", str(24 * 3600)))
+# Jaccard similarity of prompt word sets for a fuzzy hit; 0 matches normalized prompts exactly
+LLM_CACHE_SIMILARITY = float(os.getenv("NOVAFLOW_LLM_CACHE_SIMILARITY", "0"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("NOVAFLOW_TTS_CACHE_MAX_BYTES", str(256 * 2**20)))
+TTS_CACHE_TTL = float(os.getenv("NOVAFLOW_TTS_CACHE_TTL", str(7 * 24 * 3600)))
+ENTRY_SUFFIX = ".bin"
+CHUNK_LENGTH = struct.Struct("<I")
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def cache_key(*parts: Any) -> str:
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def normalize_prompt(text: str) -> str:
+    return " ".join(PUNCTUATION.sub(" ", text.lower()).split())
+
+
+def normalize_speech(text: str) -> str:
+    # Streamed answers reach Murf as stripped segments; collapsing whitespace makes the joined
+    # segments and the full answer text hash the same
+    return " ".join(text.split())
+
+
+class DiskCache:
+    # Content-addressed files under one directory. The modification time is the creation time (TTL)
+    # and the access time is set explicitly on every hit (LRU), so both survive restarts.
+    def __init__(self, directory: str, max_bytes: int, ttl: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._index: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()  # key -> (size, created)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "bytes_saved": 0, "writes": 0, "evictions": 0, "expired": 0}
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{ENTRY_SUFFIX}")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._index)
+
+    def load(self) -> int:
+        if not self.enabled:
+            return 0
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(ENTRY_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_atime, name[:-len(ENTRY_SUFFIX)], stat.st_size, stat.st_mtime))
+        with self._lock:
+            self._index.clear()
+            self._bytes = 0
+            for _, key, size, created in sorted(entries):
+                self._index[key] = (size, created)
+                self._bytes += size
+            self._evict()
+        return len(self._index)
+
+    def _remove(self, key: str) -> None:
+        size, _ = self._index.pop(key)
+        self._bytes -= size
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        now = time.time()
+        for key in [k for k, (_, created) in self._index.items() if now - created > self.ttl]:
+            self._remove(key)
+            self.stats["expired"] += 1
+        while self._bytes > self.max_bytes and self._index:
+            self._remove(next(iter(self._index)))
+            self.stats["evictions"] += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl:
+                self._remove(key)
+                self.stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._index.move_to_end(key)
+        try:
+            with open(self.path(key), "rb") as f:
+                data = f.read()
+            os.utime(self.path(key), (time.time(), entry[1]))
+        except OSError as e:
+            log.warning(f"Cache entry {key} unreadable, dropping it: {e}")
+            with self._lock:
+                if key in self._index:
+                    self._remove(key)
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += len(data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        path = self.path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            if key in self._index:
+                self._bytes -= self._index.pop(key)[0]
+            self._index[key] = (len(data), os.path.getmtime(path))
+            self._bytes += len(data)
+            self.stats["writes"] += 1
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class ResponseCache:
+    # Gemini answers keyed on the normalized prompt plus a context string (conversation type and
+    # knowledge base version). With a similarity threshold, near-identical prompts in the same
+    # context also hit.
+    def __init__(self, directory: str, max_bytes: int = LLM_CACHE_MAX_BYTES, ttl: float = LLM_CACHE_TTL,
+                 similarity: float = LLM_CACHE_SIMILARITY):
+        self.store = DiskCache(directory, max_bytes, ttl)
+        self.similarity = similarity
+        self._prompts: Dict[str, Dict[str, Set[str]]] = {}  # context -> key -> prompt words
+        self._lock = threading.Lock()
+
+    def load(self) -> int:
+        count = self.store.load()
+        if self.similarity > 0:
+            for key in self.store.keys():
+                try:
+                    with open(self.store.path(key), "r", encoding="utf-8") as f:
+                        entry = json.load(f)
+                    self._remember(entry["context"], key, entry["prompt"])
+                except (OSError, ValueError, KeyError):
+                    continue
+        return count
+
+    def _remember(self, context: str, key: str, prompt: str) -> None:
+        with self._lock:
+            self._prompts.setdefault(context, {})[key] = set(prompt.split())
+
+    def _similar_key(self, context: str, prompt: str) -> Optional[str]:
+        words = set(prompt.split())
+        best_key, best_score = None, self.similarity
+        with self._lock:
+            candidates = self._prompts.get(context, {})
+            for key in [k for k in candidates if k not in self.store]:
+                del candidates[key]
+            for key, other in candidates.items():
+                score = len(words & other) / len(words | other) if words | other else 0.0
+                if score >= best_score:
+                    best_key, best_score = key, score
+        return best_key
+
+    def get(self, prompt: str, context: str) -> Optional[str]:
+        if not self.store.enabled:
+            return None
+        normalized = normalize_prompt(prompt)
+        key = cache_key(context, normalized)
+        if key not in self.store and self.similarity > 0:
+            key = self._similar_key(context, normalized) or key
+        data = self.store.get(key)
+        if data is None:
+            return None
+        return json.loads(data)["answer"]
+
+    def put(self, prompt: str, context: str, answer: str) -> None:
+        normalized = normalize_prompt(prompt)
+        if not normalized or not answer or not self.store.enabled:
+            return
+        key = cache_key(context, normalized)
+        entry = {"prompt": normalized, "context": context, "answer": answer, "created": time.time()}
+        self.store.put(key, json.dumps(entry).encode("utf-8"))
+        if self.similarity > 0:
+            self._remember(context, key, normalized)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.store.snapshot(), "similarity": self.similarity}
+
+
+class TtsCache:
+    # Murf audio chunks keyed on the spoken text, voice, speed and Murf's audio params (format and
+    # rate); an entry is the chunks as received (first one still carrying its WAV header), each
+    # prefixed with its length
+    def __init__(self, directory: str, max_bytes: int = TTS_CACHE_MAX_BYTES, ttl: float = TTS_CACHE_TTL):
+        self.store = DiskCache(directory, max_bytes, ttl)
+
+    def load(self) -> int:
+        return self.store.load()
+
+    def key(self, text: str, voice_id: str, speed: float, audio_params: str = "") -> str:
+        return cache_key(voice_id, float(speed), normalize_speech(text), audio_params)
+
+    def get(self, text: str, voice_id: str, speed: float, audio_params: str = "") -> Optional[List[bytes]]:
+        if not self.store.enabled:
+            return None
+        data = self.store.get(self.key(text, voice_id, speed, audio_params))
+        if data is None:
+            return None
+        chunks, offset = [], 0
+        while offset < len(data):
+            (length,) = CHUNK_LENGTH.unpack_from(data, offset)
+            offset += CHUNK_LENGTH.size
+            chunks.append(data[offset:offset + length])
+            offset += length
+        return chunks
+
+    def put(self, text: str, voice_id: str, speed: float, chunks: List[bytes], audio_params: str = "") -> None:
+        if not chunks or not normalize_speech(text):
+            return
+        data = b"".join(part for chunk in chunks for part in (CHUNK_LENGTH.pack(len(chunk)), chunk))
+        self.store.put(self.key(text, voice_id, speed, audio_params), data)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self.store.snapshot()
@@ -0,0 +1,255 @@
+import os
+import re
+import math
+import mmap
+import zlib
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+log = logging.getLogger("novaflow")
+
+CHUNK_WORDS = int(os.getenv("NOVAFLOW_KB_CHUNK_WORDS", "180"))
+CHUNK_OVERLAP = int(os.getenv("NOVAFLOW_KB_CHUNK_OVERLAP", "30"))
+KB_TOKEN_BUDGET = int(os.getenv("NOVAFLOW_KB_TOKEN_BUDGET", "1500"))
+KB_TOP_K = int(os.getenv("NOVAFLOW_KB_TOP_K", "6"))
+KB_EMBEDDINGS = os.getenv("NOVAFLOW_KB_EMBEDDINGS", "false").lower() == "true"
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+WORD_RE = re.compile(r"\S+")
+WORD_BYTES_RE = re.compile(rb"\S+")
+STOPWORDS = frozenset("""
+a an and are as at be but by can do for from has have how i if in into is it its me my of on or our so
+that the their them then there these they this to was we what when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly 4 characters per token for English text; good enough for prompt budgeting
+    return len(text) // 4 + 1
+
+
+def chunk_spans(source: "Source", chunk_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[Tuple[int, int]]:
+    # Works on str or on bytes-like sources (e.g. an mmap of a sidecar) without copying the text
+    pattern = WORD_RE if isinstance(source, str) else WORD_BYTES_RE
+    words = [(m.start(), m.end()) for m in pattern.finditer(source)]
+    if not words:
+        return []
+    step = max(1, chunk_words - overlap)
+    spans = []
+    for start in range(0, len(words), step):
+        window = words[start:start + chunk_words]
+        spans.append((window[0][0], window[-1][1]))
+        if start + chunk_words >= len(words):
+            break
+    return spans
+
+
+def chunk_text(text: str, chunk_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    return [text[start:end] for start, end in chunk_spans(text, chunk_words, overlap)]
+
+
+class HashedEmbedder:
+    # Feature-hashed unigrams and bigrams, L2-normalised; no model download needed
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def embed(self, tokens: List[str]) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+        if not features:
+            return vector
+        indices = np.fromiter((zlib.crc32(f.encode()) % self.dim for f in features), dtype=np.int64, count=len(features))
+        np.add.at(vector, indices, 1.0)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+Source = Union[str, bytes, memoryview, "mmap.mmap"]
+
+
+class Chunk:
+    # Holds offsets into the document source rather than a copy of the text
+    __slots__ = ("chunk_id", "filename", "position", "source", "start", "end", "length")
+
+    def __init__(self, chunk_id: int, filename: str, position: int, source: Source, start: int, end: int, length: int):
+        self.chunk_id = chunk_id
+        self.filename = filename
+        self.position = position
+        self.source = source
+        self.start = start
+        self.end = end
+        self.length = length
+
+    @property
+    def text(self) -> str:
+        try:
+            piece = self.source[self.start:self.end]
+        except ValueError:
+            # The backing mmap was closed because the document was removed mid-query
+            return ""
+        return piece if isinstance(piece, str) else bytes(piece).decode("utf-8", "replace")
+
+
+class KnowledgeIndex:
+    def __init__(self, k1: float = 1.5, b: float = 0.75, use_embeddings: bool = KB_EMBEDDINGS, embedding_weight: float = 0.5):
+        self.k1 = k1
+        self.b = b
+        self.embedder = HashedEmbedder() if use_embeddings else None
+        self.embedding_weight = embedding_weight
+        self._lock = threading.RLock()
+        self._next_id = 0
+        self.chunks: Dict[int, Chunk] = {}
+        self.documents: Dict[str, List[int]] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.vectors: Dict[int, np.ndarray] = {}
+        self.total_length = 0
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def _prepare(self, source: Source, first_position: int = 0) -> List[Tuple]:
+        prepared = []
+        for position, (start, end) in enumerate(chunk_spans(source), first_position):
+            piece = source[start:end]
+            tokens = tokenize(piece if isinstance(piece, str) else bytes(piece).decode("utf-8", "replace"))
+            vector = self.embedder.embed(tokens) if self.embedder else None
+            prepared.append((position, start, end, Counter(tokens), len(tokens), vector))
+        return prepared
+
+    def _insert(self, filename: str, source: Source, prepared: List[Tuple]) -> List[int]:
+        ids = []
+        for position, start, end, counts, length, vector in prepared:
+            chunk_id = self._next_id
+            self._next_id += 1
+            self.chunks[chunk_id] = Chunk(chunk_id, filename, position, source, start, end, length)
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[chunk_id] = tf
+            if vector is not None:
+                self.vectors[chunk_id] = vector
+            self.total_length += length
+            ids.append(chunk_id)
+        return ids
+
+    def add_document(self, filename: str, source: Source) -> int:
+        prepared = self._prepare(source)
+        with self._lock:
+            self._remove(filename)
+            self.documents[filename] = self._insert(filename, source, prepared)
+            self.version += 1
+        log.info(f"Indexed {filename}: {len(prepared)} chunks")
+        return len(prepared)
+
+    def extend_document(self, filename: str, source: Source) -> int:
+        # Appends chunks for more text of a document that is still being ingested
+        with self._lock:
+            first_position = len(self.documents.get(filename, ()))
+        prepared = self._prepare(source, first_position)
+        with self._lock:
+            self.documents.setdefault(filename, []).extend(self._insert(filename, source, prepared))
+            self.version += 1
+        return len(prepared)
+
+    def remove_document(self, filename: str) -> bool:
+        with self._lock:
+            removed = self._remove(filename)
+            if removed:
+                self.version += 1
+            return removed
+
+    def _remove(self, filename: str) -> bool:
+        ids = self.documents.pop(filename, None)
+        if not ids:
+            return False
+        for chunk_id in ids:
+            chunk = self.chunks.pop(chunk_id)
+            self.total_length -= chunk.length
+            self.vectors.pop(chunk_id, None)
+            for term in set(tokenize(chunk.text)):
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self.postings[term]
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self.chunks.clear()
+            self.documents.clear()
+            self.postings.clear()
+            self.vectors.clear()
+            self.total_length = 0
+            self.version += 1
+
+    def search(self, query: str, k: int = KB_TOP_K, filename: Optional[str] = None) -> List[Tuple[float, Chunk]]:
+        terms = tokenize(query)
+        with self._lock:
+            n = len(self.chunks)
+            if not n or not terms:
+                return []
+            avgdl = self.total_length / n or 1.0
+            scores: Dict[int, float] = {}
+            for term in set(terms):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    length = self.chunks[chunk_id].length
+                    denom = tf + self.k1 * (1 - self.b + self.b * length / avgdl)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / denom
+            if filename is not None:
+                allowed = set(self.documents.get(filename, ()))
+                scores = {cid: s for cid, s in scores.items() if cid in allowed}
+            if self.embedder and scores:
+                best = max(scores.values())
+                query_vector = self.embedder.embed(terms)
+                ids = list(scores)
+                similarity = np.stack([self.vectors[cid] for cid in ids]) @ query_vector
+                for cid, sim in zip(ids, similarity):
+                    scores[cid] = scores[cid] / best + self.embedding_weight * float(sim)
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [(score, self.chunks[cid]) for cid, score in ranked]
+
+    def leading_chunks(self, filename: str) -> List[Chunk]:
+        with self._lock:
+            return [self.chunks[cid] for cid in self.documents.get(filename, [])]
+
+    def build_context(self, query: str, token_budget: int = KB_TOKEN_BUDGET, k: int = KB_TOP_K,
+                      filename: Optional[str] = None) -> str:
+        # With a target filename (e.g. "summarize file X") the file is read from the start;
+        # otherwise the top-k BM25 chunks are used, best first, until the budget runs out.
+        if filename is not None:
+            chunks = self.leading_chunks(filename)
+        else:
+            chunks = [chunk for _, chunk in self.search(query, k)]
+        parts = []
+        used = 0
+        for chunk in chunks:
+            part = f"\nFile: {chunk.filename} (part {chunk.position + 1})\n{chunk.text}\n"
+            cost = estimate_tokens(part)
+            if used + cost > token_budget:
+                break
+            parts.append(part)
+            used += cost
+        if not parts:
+            return ""
+        return "\n\nKnowledge Base Content:\n" + "".join(parts)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "documents": len(self.documents),
+                "chunks": len(self.chunks),
+                "terms": len(self.postings),
+                "version": self.version,
+            }
@@ -0,0 +1,76 @@
+import os
+import re
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from services.intents import has_search_intent
+
+log = logging.getLogger("novaflow")
+
+SPECULATIVE_DEBOUNCE = float(os.getenv("NOVAFLOW_SPECULATIVE_DEBOUNCE", "0.3"))
+SPECULATIVE_MIN_WORDS = int(os.getenv("NOVAFLOW_SPECULATIVE_MIN_WORDS", "3"))
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_query(text: str) -> str:
+    # Partials are unformatted and finals are punctuated; both normalize to the same words
+    return " ".join(PUNCTUATION.sub(" ", text.lower()).split())
+
+
+class SpeculativeSearch:
+    # Starts the web search from partial transcripts that already show search intent, so the results
+    # are usually ready (or in flight) when the final transcript arrives. Each new wording replaces
+    # the pending search; a search only goes out once the wording has been stable for `debounce`
+    # seconds, or immediately when the final transcript asks for it.
+    def __init__(self, search: Callable[[str], Awaitable[str]], debounce: float = SPECULATIVE_DEBOUNCE,
+                 min_words: int = SPECULATIVE_MIN_WORDS):
+        self.search = search
+        self.debounce = debounce
+        self.min_words = min_words
+        self._query: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._release: Optional[asyncio.Event] = None
+        self.stats: Dict[str, int] = {"started": 0, "reused": 0, "cancelled": 0, "direct": 0}
+
+    async def _run(self, text: str, release: asyncio.Event) -> str:
+        try:
+            await asyncio.wait_for(release.wait(), self.debounce)
+        except asyncio.TimeoutError:
+            pass
+        return await self.search(text)
+
+    def update(self, partial: str) -> None:
+        query = normalize_query(partial)
+        if query == self._query or len(query.split()) < self.min_words or not has_search_intent(query):
+            return
+        self.cancel()
+        self._query = query
+        self._release = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run(partial, self._release))
+        self.stats["started"] += 1
+        log.debug(f"Speculative search queued for: {partial}")
+
+    def cancel(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            self.stats["cancelled"] += 1
+        self._task = self._release = self._query = None
+
+    async def result(self, final: str) -> Optional[str]:
+        # Search results for the final transcript, reusing the speculative search when it was started
+        # for the same words. Returns None, dropping any speculative work, if the intent went away.
+        query = normalize_query(final)
+        if not has_search_intent(query):
+            self.cancel()
+            return None
+        if self._task is not None and self._query == query:
+            task, release = self._task, self._release
+            self._task = self._release = self._query = None
+            release.set()
+            self.stats["reused"] += 1
+            log.info(f"Using speculative search for: {final}")
+            return await task
+        self.cancel()
+        self.stats["direct"] += 1
+        return await self.search(final)
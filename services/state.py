@@ -0,0 +1,159 @@
+import os
+import json
+import copy
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger("novaflow")
+
+STATE_BACKEND = os.getenv("NOVAFLOW_STATE_BACKEND", "memory")
+STATE_PATH = os.getenv("NOVAFLOW_STATE_PATH", "")
+STATE_REDIS_URL = os.getenv("NOVAFLOW_REDIS_URL", "redis://localhost:6379/0")
+
+Document = Dict[str, Any]
+
+
+class StateBackend(ABC):
+    # Shared key -> JSON document store. update() is atomic for every process using the same backend,
+    # so uvicorn workers can read-modify-write a document without losing each other's changes.
+    name = "base"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Document]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, key: str, mutate: Callable[[Document], Document]) -> Document:
+        # `mutate` gets a copy of the current document ({} if missing) and returns the new one
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def keys(self, prefix: str = "") -> List[str]:
+        raise NotImplementedError
+
+
+class MemoryStateBackend(StateBackend):
+    # Process-local; fine for a single worker, invisible to the others when running several
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents: Dict[str, str] = {}
+
+    def get(self, key: str) -> Optional[Document]:
+        raw = self._documents.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def update(self, key: str, mutate: Callable[[Document], Document]) -> Document:
+        with self._lock:
+            raw = self._documents.get(key)
+            document = mutate(json.loads(raw) if raw is not None else {})
+            self._documents[key] = json.dumps(document)
+        return copy.deepcopy(document)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._documents.pop(key, None) is not None
+
+    def keys(self, prefix: str = "") -> List[str]:
+        return sorted(k for k in list(self._documents) if k.startswith(prefix))
+
+
+class SQLiteStateBackend(StateBackend):
+    # One WAL database file shared by every worker on the host; writers serialize on BEGIN IMMEDIATE
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30.0)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Document]:
+        row = self._conn().execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, key: str, mutate: Callable[[Document], Document]) -> Document:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+            document = mutate(json.loads(row[0]) if row else {})
+            conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, json.dumps(document)))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return document
+
+    def delete(self, key: str) -> bool:
+        return self._conn().execute("DELETE FROM state WHERE key = ?", (key,)).rowcount > 0
+
+    def keys(self, prefix: str = "") -> List[str]:
+        rows = self._conn().execute("SELECT key FROM state WHERE substr(key, 1, ?) = ? ORDER BY key", (len(prefix), prefix))
+        return [row[0] for row in rows]
+
+
+class RedisStateBackend(StateBackend):
+    # For workers spread over several hosts. Needs the optional `redis` package; anything speaking the
+    # Redis protocol works (Redis, Valkey, KeyDB). Updates use WATCH/MULTI optimistic transactions.
+    name = "redis"
+
+    def __init__(self, url: str = STATE_REDIS_URL, namespace: str = "novaflow:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("NOVAFLOW_STATE_BACKEND=redis requires the `redis` package (pip install redis)") from e
+        self.namespace = namespace
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Document]:
+        raw = self._client.get(self.namespace + key)
+        return json.loads(raw) if raw is not None else None
+
+    def update(self, key: str, mutate: Callable[[Document], Document]) -> Document:
+        name = self.namespace + key
+        result: Dict[str, Document] = {}
+
+        def transaction(pipe) -> None:
+            raw = pipe.get(name)
+            document = mutate(json.loads(raw) if raw is not None else {})
+            pipe.multi()
+            pipe.set(name, json.dumps(document))
+            result["document"] = document
+
+        self._client.transaction(transaction, name)
+        return result["document"]
+
+    def delete(self, key: str) -> bool:
+        return self._client.delete(self.namespace + key) > 0
+
+    def keys(self, prefix: str = "") -> List[str]:
+        start = len(self.namespace)
+        return sorted(k.decode("utf-8")[start:] for k in self._client.scan_iter(match=f"{self.namespace}{prefix}*"))
+
+
+def create_state_backend(directory: str, backend: str = STATE_BACKEND) -> StateBackend:
+    if backend == "memory":
+        return MemoryStateBackend()
+    if backend == "sqlite":
+        return SQLiteStateBackend(STATE_PATH or os.path.join(directory, "state.sqlite3"))
+    if backend == "redis":
+        return RedisStateBackend()
+    raise ValueError(f"Unknown state backend: {backend}")
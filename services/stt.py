@@ -0,0 +1,137 @@
+import os
+import json
+import asyncio
+import logging
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import websockets
+
+from services.admission import with_retries
+from services.providers import fake_stt_connect, is_fake
+
+log = logging.getLogger("novaflow")
+
+AAI_STREAMING_URL = os.getenv("NOVAFLOW_AAI_STREAMING_URL", "wss://streaming.assemblyai.com/v3/ws")
+STT_QUEUE_FRAMES = int(os.getenv("NOVAFLOW_STT_QUEUE_FRAMES", "50"))
+
+# Open sessions, for the queue depth gauges on /metrics
+_sessions: "weakref.WeakSet[AsyncStreamingSTT]" = weakref.WeakSet()
+
+
+class SttEvent:
+    # Mirrors the attributes forward_event reads from the SDK's StreamingClient messages
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.type = data.get("type", "")
+        self.transcript = data.get("transcript", "")
+        self.turn_is_formatted = data.get("turn_is_formatted", False)
+        self.end_of_turn = data.get("end_of_turn", False)
+
+    def __str__(self) -> str:
+        return json.dumps(self.data)
+
+
+class AsyncStreamingSTT:
+    # AssemblyAI v3 streaming over a plain asyncio WebSocket: audio goes through a bounded queue
+    # drained by one sender task, so a session costs two tasks rather than an OS thread.
+    def __init__(self, api_key: str, on_event: Callable[[SttEvent], Awaitable[None]], sample_rate: int = 16000,
+                 url: str = AAI_STREAMING_URL, queue_frames: int = STT_QUEUE_FRAMES, put_timeout: float = 0.2,
+                 connect: Optional[Callable[..., Awaitable[Any]]] = None):
+        self.api_key = api_key
+        self.on_event = on_event
+        self.sample_rate = sample_rate
+        self.url = url
+        self.put_timeout = put_timeout
+        self._connect = connect or (fake_stt_connect if is_fake("stt") else websockets.connect)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_frames)
+        self.terminated = asyncio.Event()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self._ws: Any = None
+        self._tasks = []
+
+    async def start(self) -> None:
+        self._ws = await with_retries("assemblyai", lambda: self._connect(
+            f"{self.url}?sample_rate={self.sample_rate}&format_turns=true",
+            extra_headers={"Authorization": self.api_key},
+        ))
+        self._tasks = [asyncio.create_task(self._sender()), asyncio.create_task(self._receiver())]
+        _sessions.add(self)
+
+    async def send_audio(self, frame: bytes) -> bool:
+        # Waits briefly for room (backpressure on the browser socket); if STT is still behind,
+        # the oldest queued frame is dropped so latency stays bounded.
+        if self.terminated.is_set():
+            self.frames_dropped += 1
+            return False
+        try:
+            await asyncio.wait_for(self.queue.put(frame), timeout=self.put_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self._drop_oldest()
+            self.queue.put_nowait(frame)
+            return False
+
+    def _drop_oldest(self) -> None:
+        try:
+            self.queue.get_nowait()
+            self.frames_dropped += 1
+        except asyncio.QueueEmpty:
+            pass
+
+    async def _sender(self) -> None:
+        try:
+            while True:
+                frame = await self.queue.get()
+                if frame is None:
+                    await self._ws.send(json.dumps({"type": "Terminate"}))
+                    return
+                await self._ws.send(frame)
+                self.frames_sent += 1
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            log.error(f"STT sender error: {e}")
+
+    async def _receiver(self) -> None:
+        try:
+            async for raw in self._ws:
+                event = SttEvent(json.loads(raw))
+                if event.type == "Termination":
+                    self.terminated.set()
+                    return
+                await self.on_event(event)
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            log.error(f"STT receiver error: {e}")
+            await self.on_event(SttEvent({"type": "error", "error": str(e)}))
+        finally:
+            self.terminated.set()
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        if self._ws is None:
+            return
+        if self.queue.full():
+            self._drop_oldest()
+        self.queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(self.terminated.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            log.warning("Timeout waiting for STT termination")
+        for task in self._tasks:
+            task.cancel()
+        await self._ws.close()
+        self._ws = None
+        _sessions.discard(self)
+        log.info(f"STT stream closed: {self.frames_sent} frames sent, {self.frames_dropped} dropped")
+
+
+def snapshot() -> Dict[str, Any]:
+    sessions = list(_sessions)
+    return {
+        "sessions": len(sessions),
+        "queued_frames": sum(session.queue.qsize() for session in sessions),
+        "frames_dropped": sum(session.frames_dropped for session in sessions),
+    }
@@ -0,0 +1,143 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import secrets
+from typing import Any, Dict, List, Mapping, Optional
+
+from services.state import Document, StateBackend
+
+log = logging.getLogger("novaflow")
+
+DEFAULT_TENANT = "default"
+TOKEN_COOKIE = "novaflow_token"
+# Tenant ids name directories (per-tenant recordings), so they cannot start with a dot
+TENANT_ID = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]{0,63}$")
+# Requests without a token act as the default tenant (the single-user behaviour); turn this off
+# whenever tenants are issued tokens, or anyone can use the default tenant's settings and keys
+ALLOW_ANONYMOUS = os.getenv("NOVAFLOW_ALLOW_ANONYMOUS", "1") != "0"
+API_KEY_NAMES = ("aai_api_key", "gemini_api_key", "murf_api_key", "tavily_api_key", "zapier_webhook_url")
+DEFAULT_SETTINGS: Dict[str, Any] = {
+    "voiceId": "en-IN-alia",
+    "playbackSpeed": 1.0,
+    "conversationType": "casual",
+    "micSensitivity": 50,
+    "audioQuality": "medium",
+    "captureMode": "server",
+    "micProcessing": "off",
+    "autoSaveHistory": True,
+    "includeKnowledgeBase": True,
+    "enableSearch": True,
+    "maxSearchResults": 3,
+    "enableSound": True,
+    "notificationDuration": 4,
+    "theme": "dark",
+    "accentColor": "orange"
+}
+
+
+class TenantAuthError(Exception):
+    pass
+
+
+def request_token(headers: Mapping[str, str], query: Mapping[str, str], cookies: Mapping[str, str]) -> Optional[str]:
+    # The tenant is never taken from the client, only from a token the server issued: an
+    # "Authorization: Bearer" header, ?token= (browsers cannot set headers on a WebSocket) or the
+    # cookie set by /login
+    scheme, _, credentials = headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials.strip():
+        return credentials.strip()
+    return query.get("token") or cookies.get(TOKEN_COOKIE) or None
+
+
+class TenantContext:
+    # Immutable snapshot of one tenant's settings and API keys. Sessions hold one and swap it for a
+    # fresh snapshot between turns, so a turn never sees settings change halfway through.
+    def __init__(self, tenant_id: str, document: Optional[Document] = None):
+        document = document or {}
+        self.tenant_id = tenant_id
+        self.settings: Dict[str, Any] = {**DEFAULT_SETTINGS, **document.get("settings", {})}
+        self.api_keys: Dict[str, str] = dict(document.get("api_keys", {}))
+        self.override_env: bool = document.get("override_env", False)
+        # Bumped on every change, so per-session caches (mic gain) know to refresh
+        self.version: int = document.get("version", 0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        # Never exposes key values, only which ones the tenant has set
+        return {
+            "tenant": self.tenant_id,
+            "settings": self.settings,
+            "api_keys": sorted(name for name, value in self.api_keys.items() if value),
+            "override_env": self.override_env,
+            "version": self.version,
+        }
+
+
+class TenantRegistry:
+    # Tenant documents in a StateBackend, one per tenant under "tenant:<id>". Methods block on the
+    # backend, so callers on the event loop go through executor.run_io.
+    def __init__(self, backend: StateBackend):
+        self.backend = backend
+
+    @staticmethod
+    def _key(tenant_id: str) -> str:
+        return f"tenant:{tenant_id}"
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        # Only a hash is stored, so the backend (and its backups) never hold usable tokens
+        return f"token:{hashlib.sha256(token.encode('utf-8')).hexdigest()}"
+
+    def issue_token(self, tenant_id: str) -> str:
+        if not TENANT_ID.match(tenant_id):
+            raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+        token = secrets.token_urlsafe(32)
+        self.backend.update(self._token_key(token), lambda document: {"tenant": tenant_id, "issued": time.time()})
+        log.info(f"Issued a token for tenant {tenant_id}")
+        return token
+
+    def revoke_token(self, token: str) -> bool:
+        return self.backend.delete(self._token_key(token))
+
+    def authenticate(self, token: Optional[str]) -> str:
+        if not token:
+            if ALLOW_ANONYMOUS:
+                return DEFAULT_TENANT
+            raise TenantAuthError("A tenant token is required")
+        document = self.backend.get(self._token_key(token))
+        if not document or "tenant" not in document:
+            raise TenantAuthError("Invalid or revoked tenant token")
+        return document["tenant"]
+
+    def _update(self, tenant_id: str, change) -> TenantContext:
+        def mutate(document: Document) -> Document:
+            change(document)
+            document["version"] = document.get("version", 0) + 1
+            return document
+        return TenantContext(tenant_id, self.backend.update(self._key(tenant_id), mutate))
+
+    def load(self, tenant_id: str) -> TenantContext:
+        return TenantContext(tenant_id, self.backend.get(self._key(tenant_id)))
+
+    def update_settings(self, tenant_id: str, settings: Dict[str, Any]) -> TenantContext:
+        return self._update(tenant_id, lambda document: document.setdefault("settings", {}).update(settings))
+
+    def set_api_keys(self, tenant_id: str, keys: Dict[str, str], override_env: bool) -> TenantContext:
+        def change(document: Document) -> None:
+            document.setdefault("api_keys", {}).update({k: v for k, v in keys.items() if k in API_KEY_NAMES})
+            document["override_env"] = override_env
+        return self._update(tenant_id, change)
+
+    def reset(self, tenant_id: str) -> TenantContext:
+        # Keeps the version counter running so sessions still notice the change
+        def change(document: Document) -> None:
+            for field in ("settings", "api_keys", "override_env"):
+                document.pop(field, None)
+        return self._update(tenant_id, change)
+
+    def tenants(self) -> List[str]:
+        return [key.split(":", 1)[1] for key in self.backend.keys("tenant:")]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"backend": self.backend.name, "tenants": len(self.tenants())}
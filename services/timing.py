@@ -0,0 +1,68 @@
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from services.metrics import TURN_MARKS, TURN_SPANS
+
+log = logging.getLogger("novaflow")
+
+
+class TurnTimer:
+    # Marks are milestones measured from the start of the turn (first_token, first_audio, ...); spans
+    # are time spent in one stage (stt_final, intent, kb_retrieve, client_send, ...), summed when a
+    # stage runs several times. finish() publishes both to the /metrics histograms.
+    def __init__(self, label: str):
+        self.label = label
+        self.started = time.perf_counter()
+        self.marks: Dict[str, float] = {}
+        self.spans: Dict[str, float] = {}
+        self.finished = False
+
+    def mark(self, name: str) -> None:
+        # Only the first occurrence counts, so "first_token" / "first_audio" can be marked in loops
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.started
+
+    def get(self, name: str) -> Optional[float]:
+        return self.marks.get(name)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    @contextmanager
+    def span(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    async def timed(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        with self.span(name):
+            return await awaitable
+
+    def timed_send(self, send: Callable[[Any], Awaitable[None]]) -> Callable[[Any], Awaitable[None]]:
+        # Wraps a WebSocket send so the time spent pushing deltas and audio to the client is a span
+        async def send_timed(message: Any) -> None:
+            with self.span("client_send"):
+                await send(message)
+        return send_timed
+
+    def finish(self) -> None:
+        if self.finished:
+            return
+        self.finished = True
+        self.mark("complete")
+        for name, value in self.marks.items():
+            TURN_MARKS.observe(value, mark=name)
+        for name, value in self.spans.items():
+            TURN_SPANS.observe(value, span=name)
+        self.log_summary()
+
+    def log_summary(self) -> None:
+        if not log.isEnabledFor(logging.INFO):
+            return
+        parts = ", ".join(f"{name}={value * 1000:.0f}ms" for name, value in self.marks.items())
+        spans = ", ".join(f"{name}={value * 1000:.0f}ms" for name, value in self.spans.items())
+        log.info(f"Turn timings [{self.label}]: {parts}" + (f"; spans: {spans}" if spans else ""))
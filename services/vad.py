@@ -0,0 +1,153 @@
+import os
+import collections
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import webrtcvad
+except ImportError:  # optional: pip install webrtcvad
+    webrtcvad = None
+
+VAD_MODE = os.getenv("NOVAFLOW_VAD", "energy").lower()  # off | energy | webrtc
+VAD_END_SILENCE_MS = int(os.getenv("NOVAFLOW_VAD_END_SILENCE_MS", "800"))
+VAD_MIN_SPEECH_MS = int(os.getenv("NOVAFLOW_VAD_MIN_SPEECH_MS", "300"))
+VAD_MARGIN_DB = float(os.getenv("NOVAFLOW_VAD_MARGIN_DB", "10"))
+VAD_MIN_DB = float(os.getenv("NOVAFLOW_VAD_MIN_DB", "-60"))
+VAD_ZCR_MAX = float(os.getenv("NOVAFLOW_VAD_ZCR_MAX", "0.35"))
+VAD_WEBRTC_AGGRESSIVENESS = int(os.getenv("NOVAFLOW_VAD_WEBRTC_AGGRESSIVENESS", "3"))
+PREROLL_MS = 300
+HANGOVER_MS = 300
+WARMUP_MS = 500
+SUBFRAME_MS = 10
+SPEECH_SUBFRAME_RATIO = 0.3
+FLOOR_RISE_DB = 0.1  # per frame while not speaking; a tenth of that during speech
+DIGITAL_SILENCE_DB = -80.0
+FULL_SCALE_DB = 20 * np.log10(32768)
+
+
+def frame_features(samples: np.ndarray, subframe: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Per-subframe energy (dBFS) and zero-crossing rate, computed for the whole frame at once
+    x = samples[:len(samples) // subframe * subframe].reshape(-1, subframe).astype(np.float32)
+    energy_db = 10 * np.log10(np.mean(x * x, axis=1) + 1e-3) - FULL_SCALE_DB
+    signs = np.signbit(x)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (subframe - 1)
+    return energy_db, zcr
+
+
+class EndpointResult:
+    def __init__(self, frames: List[bytes], speech: bool, end_of_turn: bool):
+        self.frames = frames
+        self.speech = speech
+        self.end_of_turn = end_of_turn
+
+
+class Endpointer:
+    # Classifies each int16 frame as speech or silence, forwards speech (with pre-roll and hangover
+    # so STT sees onsets and word tails) and suppresses the rest. Once speech has lasted
+    # min_speech_ms, end_silence_ms of silence raises a single local end-of-turn.
+    def __init__(self, sample_rate: int = 16000, mode: str = VAD_MODE, end_silence_ms: int = VAD_END_SILENCE_MS,
+                 min_speech_ms: int = VAD_MIN_SPEECH_MS, margin_db: float = VAD_MARGIN_DB,
+                 min_db: float = VAD_MIN_DB, zcr_max: float = VAD_ZCR_MAX,
+                 aggressiveness: int = VAD_WEBRTC_AGGRESSIVENESS):
+        if mode == "webrtc" and webrtcvad is None:
+            raise RuntimeError("NOVAFLOW_VAD=webrtc requires the webrtcvad package")
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.end_silence_ms = end_silence_ms
+        self.min_speech_ms = min_speech_ms
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.zcr_max = zcr_max
+        self.subframe = sample_rate * SUBFRAME_MS // 1000
+        self._webrtc = webrtcvad.Vad(aggressiveness) if mode == "webrtc" else None
+        self.stats = {"frames": 0, "sent": 0, "suppressed": 0, "end_of_turn": 0}
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("energy", "webrtc")
+
+    def reset(self) -> None:
+        self.noise_floor: Optional[float] = None
+        self.elapsed_ms = 0.0
+        self.speech_ms = 0.0
+        self.silence_ms = 0.0
+        self.in_speech = False
+        self.turn_started = False
+        self.turn_ended = False
+        self._hangover_ms = 0.0
+        self._preroll: Deque[bytes] = collections.deque()
+        self._preroll_ms = 0.0
+
+    def _is_speech_energy(self, samples: np.ndarray) -> bool:
+        energy_db, zcr = frame_features(samples, self.subframe)
+        frame_db = float(10 * np.log10(np.mean(10 ** (energy_db / 10)) + 1e-12))
+        if frame_db <= DIGITAL_SILENCE_DB:
+            return False
+        if self.elapsed_ms < WARMUP_MS or self.noise_floor is None:
+            # Microphones ramp up over the first few hundred ms; seed the floor from the latest level
+            self.noise_floor = frame_db
+            return False
+        threshold = max(self.noise_floor + self.margin_db, self.min_db)
+        voiced = (energy_db > threshold) & ((zcr < self.zcr_max) | (energy_db > threshold + 6))
+        speech = bool(np.mean(voiced) >= SPEECH_SUBFRAME_RATIO)
+        # Floor falls immediately to quieter frames and creeps up slowly, so speech barely moves it
+        if frame_db < self.noise_floor:
+            self.noise_floor = frame_db
+        else:
+            rise = FLOOR_RISE_DB / 10 if speech else FLOOR_RISE_DB
+            self.noise_floor += min(rise, frame_db - self.noise_floor)
+        return speech
+
+    def _is_speech_webrtc(self, frame: bytes) -> bool:
+        step = self.subframe * 2
+        flags = [self._webrtc.is_speech(frame[i:i + step], self.sample_rate)
+                 for i in range(0, len(frame) - step + 1, step)]
+        return bool(flags) and sum(flags) / len(flags) >= SPEECH_SUBFRAME_RATIO
+
+    def is_speech(self, frame: bytes) -> bool:
+        if self.mode == "webrtc":
+            return self._is_speech_webrtc(frame)
+        return self._is_speech_energy(np.frombuffer(frame, dtype=np.int16))
+
+    def process(self, frame: bytes) -> EndpointResult:
+        if not self.enabled:
+            return EndpointResult([frame], True, False)
+        duration_ms = len(frame) / 2 * 1000 / self.sample_rate
+        speech = self.is_speech(frame)
+        self.elapsed_ms += duration_ms
+        self.stats["frames"] += 1
+        frames: List[bytes] = []
+        end_of_turn = False
+        if speech:
+            self.speech_ms += duration_ms
+            self.silence_ms = 0.0
+            self._hangover_ms = HANGOVER_MS
+            if not self.in_speech:
+                # Onset: flush the pre-roll so STT gets the start of the first word
+                frames.extend(self._preroll)
+                self._preroll.clear()
+                self._preroll_ms = 0.0
+                self.in_speech = True
+            frames.append(frame)
+            if self.speech_ms >= self.min_speech_ms:
+                self.turn_started = True
+        else:
+            self.silence_ms += duration_ms
+            if self.in_speech and self._hangover_ms > 0:
+                self._hangover_ms -= duration_ms
+                frames.append(frame)
+            else:
+                self.in_speech = False
+                self._preroll.append(frame)
+                self._preroll_ms += duration_ms
+                while self._preroll_ms > PREROLL_MS:
+                    self._preroll.popleft()
+                    self._preroll_ms -= duration_ms
+            if self.turn_started and not self.turn_ended and self.silence_ms >= self.end_silence_ms:
+                self.turn_ended = end_of_turn = True
+                self.stats["end_of_turn"] += 1
+        self.stats["sent"] += len(frames)
+        self.stats["suppressed"] = self.stats["frames"] - self.stats["sent"]
+        return EndpointResult(frames, speech, end_of_turn)
@@ -0,0 +1,43 @@
+// static/capture-worklet.js
+// Downsamples the microphone to 16 kHz mono and posts 100 ms Int16 PCM frames to the main thread.
+
+const TARGET_RATE = 16000;
+const FRAME_SAMPLES = 1600;
+
+class PcmCaptureProcessor extends AudioWorkletProcessor {
+  constructor() {
+    super();
+    this.ratio = sampleRate / TARGET_RATE;
+    this.position = 0;
+    this.frame = new Int16Array(FRAME_SAMPLES);
+    this.filled = 0;
+    this.previous = 0;
+  }
+
+  process(inputs) {
+    const input = inputs[0];
+    if (!input || !input[0]) return true;
+    const samples = input[0];
+    // Linear-interpolation resampling; position carries the fractional offset across blocks and
+    // may start just below zero, in which case the last sample of the previous block is used
+    while (this.position < samples.length - 1) {
+      const index = Math.floor(this.position);
+      const fraction = this.position - index;
+      const left = index < 0 ? this.previous : samples[index];
+      const value = left + (samples[index + 1] - left) * fraction;
+      const clamped = Math.max(-1, Math.min(1, value));
+      this.frame[this.filled++] = clamped < 0 ? clamped * 0x8000 : clamped * 0x7fff;
+      if (this.filled === FRAME_SAMPLES) {
+        this.port.postMessage(this.frame.buffer, [this.frame.buffer]);
+        this.frame = new Int16Array(FRAME_SAMPLES);
+        this.filled = 0;
+      }
+      this.position += this.ratio;
+    }
+    this.position -= samples.length;
+    this.previous = samples[samples.length - 1];
+    return true;
+  }
+}
+
+registerProcessor("pcm-capture", PcmCaptureProcessor);
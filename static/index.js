@@ -1,17 +1,39 @@
 let ws = null;
 let audioContext = null;
-let audioQueue = [];
-let isPlaying = false;
+let playbackReady = null; // Resolves to the playback worklet node, or null to use the fallback below
+let isPlaying = false; // A reply's audio is queued or playing
 let nextStartTime = 0;
 let isFirstAudio = true;
+let pendingFinal = false;
+let activeSources = [];
 let currentChatId = "1";
 let rippleInterval = null;
 let lastUserMessage = null;
+let streamingAIMessage = null;
+let captureContext = null;
+let captureStream = null;
+let captureNode = null;
+let audioFormat = null; // Last "audio_format" message: { tier, codec, sample_rate }
+let wavSampleRate = 44100;
+let mp3Carry = new Uint8Array(0);
+let mp3Decoding = Promise.resolve();
+let audioGeneration = 0;
 
 const SAMPLE_RATE = 44100; // Murf output sample rate
 const CHANNELS = 1;
 const BITS_PER_SAMPLE = 16;
 
+// Binary audio frames (?audio=binary): 8-byte header, then s16le PCM
+const FRAME_HEADER_BYTES = 8;
+const FRAME_VERSION = 1;
+const FRAME_KIND_AUDIO = 1;
+const FLAG_FINAL = 0x01;
+// Fallback playback (no AudioWorklet): chunks are scheduled this far ahead of the clock
+const SCHEDULE_LEAD_S = 0.05;
+const CODEC_MP3 = 1;
+// MP3 is decoded in runs of whole frames at least this long; smaller runs cost a decoder start each
+const MP3_MIN_DECODE_BYTES = 4096;
+
 const startBtn = document.getElementById("micBtn");
 const stopBtn = document.getElementById("stopListening");
 const status = document.getElementById("status");
@@ -90,6 +112,7 @@ function initAudioContext() {
       "AudioContext initialized, sampleRate:",
       audioContext.sampleRate
     );
+    playbackReady = startPlaybackEngine();
   }
   // Resume AudioContext if suspended
   if (audioContext.state === "suspended") {
@@ -99,6 +122,61 @@ function initAudioContext() {
   }
 }
 
+// TTS playback runs in an AudioWorklet (static/playback-worklet.js) with its own jitter buffer;
+// browsers without one fall back to AudioBufferSources scheduled ahead on the context clock
+async function startPlaybackEngine() {
+  if (!audioContext.audioWorklet) return null;
+  try {
+    await audioContext.audioWorklet.addModule("/static/playback-worklet.js");
+    const node = new AudioWorkletNode(audioContext, "pcm-playback", {
+      numberOfInputs: 0,
+      outputChannelCount: [CHANNELS],
+    });
+    node.connect(audioContext.destination);
+    node.port.onmessage = (event) => onPlaybackMessage(event.data);
+    return node;
+  } catch (error) {
+    console.warn("Playback worklet unavailable, scheduling buffers instead:", error);
+    return null;
+  }
+}
+
+function onPlaybackMessage(message) {
+  if (message.type === "started") {
+    status.textContent = "Status: Playing audio 🔊";
+  } else if (message.type === "underrun") {
+    console.warn("Audio underrun; jitter buffer now", Math.round(message.targetMs), "ms");
+  } else if (message.type === "ended") {
+    finishAudioPlayback();
+    sendPlaybackStats(message.stats);
+  } else if (message.type === "flushed") {
+    sendPlaybackStats(message.stats);
+  }
+}
+
+// Client-side stalls are only visible here, so each reply's playback stats go back to the server
+function sendPlaybackStats(stats) {
+  if (!stats.played_ms && !stats.interrupted) return;
+  if (ws && ws.readyState === WebSocket.OPEN) {
+    ws.send(`playback_stats:${JSON.stringify(stats)}`);
+  }
+}
+
+// Hand samples (Int16 PCM, or Float32 from the MP3 decoder) to the playback engine; messages go
+// through playbackReady in call order, so chunks sent before the worklet loads keep their order
+function playSamples(samples, sampleRate, isFinal) {
+  isPlaying = true;
+  const generation = audioGeneration;
+  playbackReady.then((node) => {
+    if (generation !== audioGeneration) return;
+    if (node) {
+      node.port.postMessage({ samples, sampleRate, final: isFinal }, [samples.buffer]);
+    } else {
+      scheduleSamples(samples, sampleRate, isFinal);
+    }
+  });
+}
+
 // Decode base64 to ArrayBuffer
 function base64ToArrayBuffer(base64) {
   try {
@@ -129,11 +207,24 @@ async function queueAudio(base64Audio, isFinal) {
       status.textContent = "Error: Failed to decode audio data ❌";
       return;
     }
+    if (audioFormat && audioFormat.codec === "mp3") {
+      queueCompressed(new Uint8Array(pcmBuffer), isFinal);
+      return;
+    }
     if (isFirstAudio) {
-      console.log("First audio chunk: skipping 44-byte WAV header");
+      // The WAV header carries the negotiated rate; without one it is Murf's default
+      const header = new DataView(pcmBuffer);
+      if (pcmBuffer.byteLength >= 44 && header.getUint32(0, false) === 0x52494646) {
+        wavSampleRate = header.getUint32(24, true);
+      }
+      console.log("First audio chunk: skipping 44-byte WAV header, rate", wavSampleRate);
       pcmBuffer = pcmBuffer.slice(44);
       isFirstAudio = false;
     }
+    if (isFinal) {
+      // The next reply's first chunk starts with a header again, even while this one is still playing
+      isFirstAudio = true;
+    }
 
     const int16 = new Int16Array(pcmBuffer);
     if (int16.length === 0) {
@@ -141,57 +232,155 @@ async function queueAudio(base64Audio, isFinal) {
       status.textContent = "Error: Empty audio buffer ❌";
       return;
     }
-    const float32 = new Float32Array(int16.length);
-    for (let i = 0; i < int16.length; i++) {
-      float32[i] = int16[i] / 32768;
+    playSamples(int16, wavSampleRate, isFinal);
+  } catch (error) {
+    console.error("Error processing audio:", error);
+    status.textContent = "Error: Failed to play audio ❌";
+  }
+}
+
+// Fallback playback: convert into a new AudioBuffer and schedule it right behind the previous one
+// on the context clock, so chunks play back to back without waiting for onended
+function scheduleSamples(samples, sampleRate, isFinal) {
+  if (samples.length) {
+    const scale = samples instanceof Int16Array ? 1 / 32768 : 1;
+    const audioBuffer = audioContext.createBuffer(CHANNELS, samples.length, sampleRate);
+    const channel = audioBuffer.getChannelData(0);
+    for (let i = 0; i < samples.length; i++) {
+      channel[i] = samples[i] * scale;
     }
+    const source = audioContext.createBufferSource();
+    source.buffer = audioBuffer;
+    source.connect(audioContext.destination);
+    const startAt = Math.max(nextStartTime, audioContext.currentTime + SCHEDULE_LEAD_S);
+    source.start(startAt);
+    nextStartTime = startAt + audioBuffer.duration;
+    activeSources.push(source);
+    source.onended = () => {
+      activeSources = activeSources.filter((active) => active !== source);
+      if (activeSources.length === 0 && pendingFinal) finishAudioPlayback();
+    };
+  }
+  if (isFinal) {
+    if (activeSources.length) {
+      pendingFinal = true;
+    } else {
+      finishAudioPlayback();
+    }
+  }
+}
 
-    const audioBuffer = audioContext.createBuffer(
-      CHANNELS,
-      float32.length,
-      SAMPLE_RATE
-    );
-    audioBuffer.copyToChannel(float32, 0);
+// Index just past the last MP3 frame sync in bytes, so everything before it is whole frames
+function lastFrameBoundary(bytes) {
+  for (let i = bytes.length - 2; i > 0; i--) {
+    if (bytes[i] === 0xff && (bytes[i + 1] & 0xe0) === 0xe0) return i;
+  }
+  return 0;
+}
 
-    console.log(
-      "Audio chunk processed, duration:",
-      audioBuffer.duration,
-      "isFinal:",
-      isFinal
+// MP3 chunks do not line up with frames, so bytes are carried until a run of whole frames is
+// ready; decodes run one at a time to keep order, and a flush (new generation) drops stale ones
+function queueCompressed(bytes, isFinal) {
+  const joined = new Uint8Array(mp3Carry.length + bytes.length);
+  joined.set(mp3Carry);
+  joined.set(bytes, mp3Carry.length);
+  let cut = isFinal ? joined.length : lastFrameBoundary(joined);
+  if (!isFinal && cut < MP3_MIN_DECODE_BYTES) cut = 0;
+  mp3Carry = joined.slice(cut);
+  const run = joined.slice(0, cut);
+  const generation = audioGeneration;
+  mp3Decoding = mp3Decoding.then(async () => {
+    if (generation !== audioGeneration) return;
+    if (run.length === 0) {
+      if (isFinal) markAudioFinal();
+      return;
+    }
+    try {
+      const audioBuffer = await audioContext.decodeAudioData(run.buffer);
+      if (generation !== audioGeneration) return;
+      playSamples(audioBuffer.getChannelData(0).slice(), audioBuffer.sampleRate, isFinal);
+    } catch (error) {
+      console.error("Error decoding MP3 audio:", error);
+      if (isFinal) markAudioFinal();
+    }
+  });
+}
+
+// Queue a binary audio frame; the server has already stripped the WAV header
+function queueAudioFrame(frame) {
+  try {
+    const view = new DataView(frame);
+    if (frame.byteLength < FRAME_HEADER_BYTES || view.getUint8(0) !== FRAME_VERSION) {
+      console.error("Unsupported audio frame");
+      return;
+    }
+    const isFinal = (view.getUint8(2) & FLAG_FINAL) !== 0;
+    const sampleRate = view.getUint32(4, true);
+    const int16 = new Int16Array(
+      frame,
+      FRAME_HEADER_BYTES,
+      (frame.byteLength - FRAME_HEADER_BYTES) >> 1
     );
-    audioQueue.push({ buffer: audioBuffer, isFinal });
-    playNextAudio();
+    if (view.getUint8(1) === FRAME_KIND_AUDIO) {
+      const ripples = document.querySelectorAll(".ripple");
+      ripples.forEach((ripple) => ripple.classList.add("active"));
+    }
+    if (view.getUint8(3) === CODEC_MP3) {
+      queueCompressed(new Uint8Array(frame, FRAME_HEADER_BYTES), isFinal);
+      return;
+    }
+    if (int16.length === 0) {
+      if (isFinal) markAudioFinal();
+      return;
+    }
+    playSamples(int16, sampleRate, isFinal);
   } catch (error) {
-    console.error("Error processing audio:", error);
+    console.error("Error processing audio frame:", error);
     status.textContent = "Error: Failed to play audio ❌";
   }
 }
 
-// Play queued audio chunks
-function playNextAudio() {
-  if (isPlaying || audioQueue.length === 0) return;
-
-  isPlaying = true;
-  const { buffer, isFinal } = audioQueue.shift();
-  const source = audioContext.createBufferSource();
-  source.buffer = buffer;
-  source.connect(audioContext.destination);
+// A header-only final frame ends the turn after whatever is queued or playing
+function markAudioFinal() {
+  playSamples(new Int16Array(0), SAMPLE_RATE, true);
+}
 
-  const currentTime = audioContext.currentTime;
-  source.start(Math.max(nextStartTime, currentTime));
-  nextStartTime = Math.max(nextStartTime, currentTime) + buffer.duration;
+function finishAudioPlayback() {
+  isPlaying = false;
+  nextStartTime = 0;
+  pendingFinal = false;
+  console.log("Audio playback complete");
+  status.textContent = "Status: Audio playback complete ✅";
+}
 
-  source.onended = () => {
-    isPlaying = false;
-    if (isFinal) {
-      audioQueue = [];
-      nextStartTime = 0;
-      isFirstAudio = true;
-      console.log("Audio playback complete");
-      status.textContent = "Status: Audio playback complete ✅";
+// Barge-in: the server cancelled the reply, so silence what is playing and drop what is queued
+function flushAudio() {
+  const wasPlaying = isPlaying;
+  if (playbackReady) {
+    playbackReady.then((node) => {
+      if (node) node.port.postMessage({ type: "flush" });
+    });
+  }
+  activeSources.forEach((source) => {
+    source.onended = null;
+    try {
+      source.stop();
+    } catch (error) {
+      // Already stopped
     }
-    playNextAudio();
-  };
+  });
+  activeSources = [];
+  isPlaying = false;
+  nextStartTime = 0;
+  isFirstAudio = true;
+  pendingFinal = false;
+  mp3Carry = new Uint8Array(0);
+  audioGeneration++;
+  clearAIDelta();
+  if (wasPlaying) {
+    console.log("Audio playback interrupted");
+    status.textContent = "Status: Interrupted ⏹️";
+  }
 }
 
 // Append user message to transcription
@@ -247,6 +436,25 @@ function appendAIMessage(text) {
   transcription.scrollTop = transcription.scrollHeight;
 }
 
+// Append a streamed response delta to the in-progress AI message
+function appendAIDelta(text) {
+  if (!streamingAIMessage) {
+    streamingAIMessage = document.createElement("div");
+    streamingAIMessage.classList.add("ai-message", "temporary");
+    transcription.appendChild(streamingAIMessage);
+  }
+  streamingAIMessage.textContent += text;
+  transcription.scrollTop = transcription.scrollHeight;
+}
+
+// Drop the in-progress AI message once the full response arrives
+function clearAIDelta() {
+  if (streamingAIMessage) {
+    streamingAIMessage.remove();
+    streamingAIMessage = null;
+  }
+}
+
 // Append search result to transcription
 function appendSearchResult(text) {
   const message = document.createElement("div");
@@ -279,6 +487,7 @@ async function loadChats() {
         li.classList.add("active");
         loadCurrentConversation();
         fetchChatHistory();
+        stopBrowserCapture();
         if (ws) ws.close();
         connectWebSocket();
       });
@@ -289,11 +498,27 @@ async function loadChats() {
   }
 }
 
+// /chat_history returns one page, oldest first; walk back with `before` to the start of the chat
+const HISTORY_PAGE_SIZE = 500;
+async function fetchFullHistory(chatId) {
+  let entries = [];
+  let before = null;
+  while (true) {
+    const params = new URLSearchParams({ chat_id: chatId, limit: HISTORY_PAGE_SIZE });
+    if (before !== null) params.set("before", before);
+    const response = await fetch(`/chat_history?${params}`);
+    const page = await response.json();
+    if (!Array.isArray(page)) return page;
+    entries = page.concat(entries);
+    if (page.length < HISTORY_PAGE_SIZE) return entries;
+    before = page[0].id;
+  }
+}
+
 // Fetch and display chat history
 async function fetchChatHistory() {
   try {
-    const response = await fetch(`/chat_history?chat_id=${currentChatId}`);
-    const history = await response.json();
+    const history = await fetchFullHistory(currentChatId);
     if (Array.isArray(history)) {
       chatHistory.innerHTML = history.length
         ? history
@@ -325,8 +550,7 @@ async function fetchChatHistory() {
 // Load current conversation into transcription
 async function loadCurrentConversation() {
   try {
-    const response = await fetch(`/chat_history?chat_id=${currentChatId}`);
-    const history = await response.json();
+    const history = await fetchFullHistory(currentChatId);
     if (Array.isArray(history)) {
       transcription.innerHTML =
         '<span class="spinner" style="display: none">⏳</span>';
@@ -355,11 +579,55 @@ function showNotification(message) {
   }, 2500);
 }
 
+// Browser microphone capture: a worklet posts 16 kHz Int16 frames that go out as binary messages
+async function startBrowserCapture() {
+  captureStream = await navigator.mediaDevices.getUserMedia({
+    audio: { channelCount: 1, echoCancellation: true, noiseSuppression: true },
+  });
+  captureContext = new (window.AudioContext || window.webkitAudioContext)();
+  await captureContext.audioWorklet.addModule("/static/capture-worklet.js");
+  const source = captureContext.createMediaStreamSource(captureStream);
+  captureNode = new AudioWorkletNode(captureContext, "pcm-capture");
+  captureNode.port.onmessage = (event) => {
+    // Skip frames while the socket is backed up rather than queueing them without bound
+    if (ws && ws.readyState === WebSocket.OPEN && ws.bufferedAmount < 64000) {
+      ws.send(event.data);
+    }
+  };
+  source.connect(captureNode);
+}
+
+function stopBrowserCapture() {
+  if (captureNode) {
+    captureNode.port.onmessage = null;
+    captureNode.disconnect();
+    captureNode = null;
+  }
+  if (captureStream) {
+    captureStream.getTracks().forEach((track) => track.stop());
+    captureStream = null;
+  }
+  if (captureContext) {
+    captureContext.close();
+    captureContext = null;
+  }
+}
+
+// Offer MP3 first on metered or slow connections; the server still picks PCM for the "high" tier
+function preferredCodecs() {
+  const connection = navigator.connection;
+  if (connection && (connection.saveData || ["slow-2g", "2g", "3g"].includes(connection.effectiveType))) {
+    return "mp3,pcm";
+  }
+  return "pcm";
+}
+
 // Initialize WebSocket connection
 function connectWebSocket() {
   ws = new WebSocket(
-    `ws://${window.location.host}/ws?chat_id=${currentChatId}`
+    `ws://${window.location.host}/ws?chat_id=${currentChatId}&audio=binary&codecs=${preferredCodecs()}`
   );
+  ws.binaryType = "arraybuffer";
 
   ws.onopen = () => {
     console.log("WebSocket opened");
@@ -368,6 +636,11 @@ function connectWebSocket() {
   };
 
   ws.onmessage = async (event) => {
+    if (event.data instanceof ArrayBuffer) {
+      initAudioContext();
+      queueAudioFrame(event.data);
+      return;
+    }
     console.log(
       "WebSocket message received:",
       event.data.substring(0, 100) + "..."
@@ -388,7 +661,10 @@ function connectWebSocket() {
         await queueAudio(jsonData.data, jsonData.is_final);
         const ripples = document.querySelectorAll(".ripple");
         ripples.forEach((ripple) => ripple.classList.add("active"));
+      } else if (jsonData.type === "response_delta" && jsonData.data) {
+        appendAIDelta(jsonData.data);
       } else if (jsonData.type === "response" && jsonData.data) {
+        clearAIDelta();
         appendAIMessage(jsonData.data);
         await fetchChatHistory();
         const ripples = document.querySelectorAll(".ripple");
@@ -403,13 +679,23 @@ function connectWebSocket() {
         appendAIMessage(jsonData.data);
         await fetchChatHistory();
       } else if (jsonData.type === "error" && jsonData.data) {
+        clearAIDelta();
         showNotification(`Error: ${jsonData.data}`);
         status.textContent = `Error: ${jsonData.data}`;
         const ripples = document.querySelectorAll(".ripple");
         ripples.forEach((ripple) => ripple.classList.remove("active"));
+      } else if (jsonData.type === "flush_audio") {
+        flushAudio();
+        const ripples = document.querySelectorAll(".ripple");
+        ripples.forEach((ripple) => ripple.classList.remove("active"));
       } else if (jsonData.type === "info" && jsonData.data) {
         showNotification(jsonData.data);
+      } else if (jsonData.type === "audio_format" && jsonData.data) {
+        audioFormat = jsonData.data;
+        console.log("Audio format:", audioFormat);
       } else if (jsonData.type === "turn_ended") {
+        // The server may end the turn on its own after a pause, so release the microphone here too
+        stopBrowserCapture();
         status.textContent = "Status: Processing response 🤖";
         spinner.style.display = "none";
         listeningModal.style.display = "none";
@@ -443,6 +729,7 @@ function connectWebSocket() {
           });
         }, 1500);
       } else if (data === "Stopped transcription") {
+        stopBrowserCapture();
         status.textContent = "Status: Idle ⏳";
         spinner.style.display = "none";
         listeningModal.style.display = "none";
@@ -489,6 +776,22 @@ function connectWebSocket() {
   };
 }
 
+// Poll an ingestion job until its pages have been extracted
+async function pollIngestJob(job) {
+  while (job.status === "queued" || job.status === "running") {
+    status.textContent = `Status: ${job.message} 📄`;
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+    const res = await fetch(`/ingest/${job.job_id}`);
+    job = await res.json();
+    if (job.error && !job.status) {
+      job.message = job.error;
+      break;
+    }
+  }
+  status.textContent = "Status: Idle ⏳";
+  return job;
+}
+
 // Handle file upload
 uploadForm.addEventListener("submit", async (e) => {
   e.preventDefault();
@@ -498,10 +801,13 @@ uploadForm.addEventListener("submit", async (e) => {
       method: "POST",
       body: formData,
     });
-    const result = await response.json();
+    let result = await response.json();
+    fileInput.value = "";
+    if (result.job_id) {
+      result = await pollIngestJob(result);
+    }
     showNotification(result.message);
     appendAIMessage(result.message);
-    fileInput.value = "";
   } catch (error) {
     console.error("Error uploading file:", error);
     showNotification("Error uploading file ❌");
@@ -533,20 +839,33 @@ async function initApp() {
 // Event listeners
 document.addEventListener("DOMContentLoaded", () => {
   // Start microphone
-  startBtn.addEventListener("click", () => {
+  startBtn.addEventListener("click", async () => {
     initAudioContext();
     isFirstAudio = true;
     lastUserMessage = null; // Reset user message
     listeningModal.style.display = "flex";
-    if (ws && ws.readyState === WebSocket.OPEN) {
-      ws.send("start");
-    } else {
+    if (!ws || ws.readyState !== WebSocket.OPEN) {
       showNotification("WebSocket not connected ❌");
+      return;
+    }
+    if (localStorage.getItem("captureMode") === "browser") {
+      try {
+        ws.send("start_stream");
+        await startBrowserCapture();
+      } catch (error) {
+        console.error("Error starting browser microphone:", error);
+        showNotification("Microphone access failed ❌");
+        stopBrowserCapture();
+        ws.send("stop");
+      }
+    } else {
+      ws.send("start");
     }
   });
 
   // Stop microphone
   stopBtn.addEventListener("click", () => {
+    stopBrowserCapture();
     if (ws && ws.readyState === WebSocket.OPEN) {
       ws.send("stop");
     }
@@ -584,6 +903,7 @@ document.addEventListener("DOMContentLoaded", () => {
       await loadChats();
       await loadCurrentConversation();
       await fetchChatHistory();
+      stopBrowserCapture();
       if (ws) ws.close();
       connectWebSocket();
     } catch (error) {
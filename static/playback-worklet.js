@@ -0,0 +1,144 @@
+// static/playback-worklet.js
+// TTS playback off the main thread: chunks arrive over the port as Int16 PCM (or Float32 from the
+// MP3 decoder) at any rate, are converted and resampled here, and play back to back from a jitter
+// buffer. Playback starts once the buffer holds the target depth or the reply's final chunk; a
+// mid-reply underrun raises the target, replies that play through lower it again.
+
+const MIN_TARGET_MS = 40;
+const MAX_TARGET_MS = 500;
+const START_TARGET_MS = 80;
+const UNDERRUN_GROWTH = 1.5;
+const CLEAN_DECAY = 0.9;
+
+class PcmPlaybackProcessor extends AudioWorkletProcessor {
+  constructor() {
+    super();
+    this.targetMs = START_TARGET_MS;
+    this.chunks = [];
+    this.readOffset = 0;
+    this.buffered = 0;
+    this.port.onmessage = (event) => this.receive(event.data);
+    this.reset();
+  }
+
+  reset() {
+    this.chunks = [];
+    this.readOffset = 0;
+    this.buffered = 0;
+    this.state = "idle"; // idle -> buffering -> playing (-> buffering on underrun)
+    this.final = false;
+    this.position = 0;
+    this.previous = 0;
+    this.turn = null;
+  }
+
+  receive(message) {
+    if (message.type === "flush") {
+      // Barge-in: drop everything queued; the reply's stats still go back to the server
+      if (this.turn) this.report(true);
+      this.reset();
+      return;
+    }
+    if (!this.turn) {
+      this.turn = { arrived: currentTime, startedAt: null, underruns: 0, stalledFrames: 0, playedFrames: 0 };
+      this.state = "buffering";
+    }
+    if (message.samples) {
+      const samples = this.convert(message.samples, message.sampleRate);
+      if (samples.length) {
+        this.chunks.push(samples);
+        this.buffered += samples.length;
+      }
+    }
+    if (message.final) this.final = true;
+  }
+
+  // Int16 -> Float32 and linear-interpolation resampling to the context rate; position carries the
+  // fractional offset across chunks and may start just below zero, using the previous chunk's last sample
+  convert(input, rate) {
+    const scale = input instanceof Int16Array ? 1 / 32768 : 1;
+    if (rate === sampleRate) {
+      const out = new Float32Array(input.length);
+      for (let i = 0; i < input.length; i++) out[i] = input[i] * scale;
+      return out;
+    }
+    const step = rate / sampleRate;
+    const last = input.length - 1;
+    const count = Math.max(0, Math.ceil((last - this.position) / step));
+    const out = new Float32Array(count);
+    let position = this.position;
+    for (let i = 0; i < count; i++, position += step) {
+      const index = Math.floor(position);
+      const fraction = position - index;
+      const left = index < 0 ? this.previous : input[index] * scale;
+      out[i] = left + (input[index + 1] * scale - left) * fraction;
+    }
+    this.position = position - input.length;
+    if (input.length) this.previous = input[last] * scale;
+    return out;
+  }
+
+  report(interrupted) {
+    const turn = this.turn;
+    if (!interrupted && turn.underruns === 0) {
+      this.targetMs = Math.max(MIN_TARGET_MS, this.targetMs * CLEAN_DECAY);
+    }
+    this.port.postMessage({
+      type: interrupted ? "flushed" : "ended",
+      stats: {
+        start_latency_ms: turn.startedAt === null ? null : (turn.startedAt - turn.arrived) * 1000,
+        underruns: turn.underruns,
+        stall_ms: (turn.stalledFrames / sampleRate) * 1000,
+        played_ms: (turn.playedFrames / sampleRate) * 1000,
+        target_ms: this.targetMs,
+        interrupted,
+      },
+    });
+  }
+
+  process(inputs, outputs) {
+    const output = outputs[0][0];
+    if (this.state === "idle") return true;
+    if (this.state === "buffering") {
+      if (this.buffered < (this.targetMs / 1000) * sampleRate && !this.final) {
+        if (this.turn.startedAt !== null) this.turn.stalledFrames += output.length;
+        return true;
+      }
+      if (this.turn.startedAt === null) {
+        this.turn.startedAt = currentTime;
+        this.port.postMessage({ type: "started" });
+      }
+      this.state = "playing";
+    }
+    let written = 0;
+    while (written < output.length && this.chunks.length) {
+      const chunk = this.chunks[0];
+      const take = Math.min(output.length - written, chunk.length - this.readOffset);
+      output.set(chunk.subarray(this.readOffset, this.readOffset + take), written);
+      written += take;
+      this.readOffset += take;
+      if (this.readOffset === chunk.length) {
+        this.chunks.shift();
+        this.readOffset = 0;
+      }
+    }
+    this.buffered -= written;
+    this.turn.playedFrames += written;
+    if (this.chunks.length === 0) {
+      if (this.final) {
+        this.report(false);
+        this.reset();
+      } else if (written < output.length) {
+        // Ran dry before the reply ended: rebuffer to a deeper target
+        this.turn.underruns++;
+        this.turn.stalledFrames += output.length - written;
+        this.targetMs = Math.min(MAX_TARGET_MS, this.targetMs * UNDERRUN_GROWTH);
+        this.state = "buffering";
+        this.port.postMessage({ type: "underrun", targetMs: this.targetMs });
+      }
+    }
+    return true;
+  }
+}
+
+registerProcessor("pcm-playback", PcmPlaybackProcessor);
@@ -57,6 +57,8 @@ document.addEventListener("DOMContentLoaded", () => {
   const savedAccentColor = localStorage.getItem("accentColor") || "orange";
   themeSelect.value = savedTheme;
   accentColorSelect.value = savedAccentColor;
+  document.querySelector("select[name='captureMode']").value =
+    localStorage.getItem("captureMode") || "server";
   applyTheme(savedTheme, savedAccentColor);
 });
 
@@ -202,6 +204,8 @@ saveBtn.addEventListener("click", async () => {
       document.querySelector("input[name='micSensitivity']").value
     ),
     audioQuality: document.querySelector("select[name='audioQuality']").value,
+    captureMode: document.querySelector("select[name='captureMode']").value,
+    micProcessing: document.querySelector("select[name='micProcessing']").value,
     autoSaveHistory: document.querySelector("input[name='autoSaveHistory']")
       .checked,
     includeKnowledgeBase: document.querySelector(
@@ -233,6 +237,7 @@ saveBtn.addEventListener("click", async () => {
       // Save to localStorage
       localStorage.setItem("theme", settings.theme);
       localStorage.setItem("accentColor", settings.accentColor);
+      localStorage.setItem("captureMode", settings.captureMode);
       applyTheme(settings.theme, settings.accentColor);
     }
     setTimeout(() => (window.location.href = "/app"), 2000);
@@ -288,6 +293,7 @@ resetBtn.addEventListener("click", async () => {
       applyTheme("dark", "orange");
       localStorage.setItem("theme", "dark");
       localStorage.setItem("accentColor", "orange");
+      localStorage.setItem("captureMode", "server");
     }
   } catch (error) {
     showNotification("Error resetting settings.", true);